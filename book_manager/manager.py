@@ -7,7 +7,11 @@ import sqlite3
 import json
 import time
 from typing import Dict, List, Any, Optional, Union
-from database import get_connection
+from database import (
+    get_connection, ensure_fulltext_index, search_fulltext,
+    ensure_term_stats, index_book_terms, get_term_frequencies, get_tfidf_terms,
+    ensure_positional_index, index_book_positions, search_book_text
+)
 from loguru import logger
 from utils.notifications import get_notification_manager, NotificationLevel, NotificationType
 
@@ -68,6 +72,21 @@ class BookManager:
             )
             ''')
             
+            # Index the sort key so paginated listings do not sort the whole table
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books(title)")
+            
+            # Create the FTS5 index over book contents (kept in sync by triggers)
+            logger.trace("Creating book_contents full-text index if not exists")
+            self.fulltext_enabled = ensure_fulltext_index(conn)
+            
+            # Create the term statistics tables used by word clouds and keyword tables
+            logger.trace("Creating term statistics tables if not exists")
+            ensure_term_stats(conn)
+            
+            # Create the positional index used by in-document search
+            logger.trace("Creating positional index tables if not exists")
+            ensure_positional_index(conn)
+            
             conn.commit()
             logger.debug("Database tables initialized successfully")
             
@@ -136,6 +155,12 @@ class BookManager:
                     "INSERT INTO book_contents (book_id, content) VALUES (?, ?)",
                     (book_id, content)
                 )
+                
+                # Count and locate the book's terms once, so word clouds and
+                # in-document search don't re-scan it
+                if isinstance(content, str):
+                    index_book_terms(conn, book_id, content)
+                    index_book_positions(conn, book_id, content)
             
             conn.commit()
             elapsed_time = time.time() - start_time
@@ -409,6 +434,10 @@ class BookManager:
                     (book_id, content)
                 )
             
+            # Refresh the book's term statistics and positional index
+            index_book_terms(conn, book_id, content)
+            index_book_positions(conn, book_id, content)
+            
             conn.commit()
             
             # Add notification
@@ -480,14 +509,65 @@ class BookManager:
         finally:
             conn.close()
     
-    def get_all_books(self):
+    def _query_books(self, cursor, where_clauses=None, params=None, limit=None, offset=0):
+        """
+        Fetch books with their categories in a single query.
+        
+        Categories are aggregated with GROUP_CONCAT instead of one query per book.
+        
+        Args:
+            cursor: Cursor of an open connection
+            where_clauses: SQL conditions on the books table, joined with AND
+            params: Parameters for the conditions
+            limit: Maximum number of books to return (None for all)
+            offset: Number of books to skip
+        
+        Returns:
+            A list of dictionaries with book details
+        """
+        sql = """
+        SELECT books.id, books.title, books.author, books.file_path, books.date_added,
+               GROUP_CONCAT(categories.name, char(31)) AS category_names
+        FROM books
+        LEFT JOIN book_categories ON books.id = book_categories.book_id
+        LEFT JOIN categories ON book_categories.category_id = categories.id
+        """
+        params = list(params or [])
+        
+        if where_clauses:
+            sql += f" WHERE {' AND '.join(where_clauses)}"
+        
+        sql += " GROUP BY books.id ORDER BY books.title, books.id"
+        
+        # Apply pagination (SQLite needs a LIMIT for OFFSET; -1 means no limit)
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset])
+        
+        logger.trace(f"Book query SQL: {sql} with params {params}")
+        cursor.execute(sql, params)
+        
+        books = []
+        for book_row in cursor.fetchall():
+            book = dict(book_row)
+            category_names = book.pop('category_names')
+            book['categories'] = category_names.split(chr(31)) if category_names else []
+            books.append(book)
+        
+        return books
+    
+    def get_all_books(self, limit=None, offset=0):
         """
         Get all books in the database.
         
+        Args:
+            limit: Maximum number of books to return (None for all)
+            offset: Number of books to skip, for pagination
+        
         Returns:
             A list of dictionaries with book details
         """
-        logger.debug("Retrieving all books")
+        logger.debug(f"Retrieving all books (limit: {limit}, offset: {offset})")
         start_time = time.time()
         
         conn = get_connection()
@@ -495,34 +575,7 @@ class BookManager:
         cursor = conn.cursor()
         
         try:
-            # Get all books
-            cursor.execute(
-                """
-                SELECT books.id, books.title, books.author, books.file_path, books.date_added
-                FROM books
-                ORDER BY books.title
-                """
-            )
-            book_rows = cursor.fetchall()
-            
-            # Convert rows to dicts and add categories
-            books = []
-            for book_row in book_rows:
-                book = dict(book_row)
-                
-                # Get categories for this book
-                cursor.execute(
-                    """
-                    SELECT categories.name
-                    FROM categories
-                    JOIN book_categories ON categories.id = book_categories.category_id
-                    WHERE book_categories.book_id = ?
-                    """,
-                    (book['id'],)
-                )
-                
-                book['categories'] = [row['name'] for row in cursor.fetchall()]
-                books.append(book)
+            books = self._query_books(cursor, limit=limit, offset=offset)
             
             elapsed_time = time.time() - start_time
             logger.debug(f"Retrieved {len(books)} books in {elapsed_time:.4f}s")
@@ -534,13 +587,15 @@ class BookManager:
         finally:
             conn.close()
     
-    def search_books(self, query="", category=None):
+    def search_books(self, query="", category=None, limit=None, offset=0):
         """
         Search books by title, author, or category.
         
         Args:
             query: Search string for title or author
             category: Filter by category name
+            limit: Maximum number of books to return (None for all)
+            offset: Number of books to skip, for pagination
             
         Returns:
             A list of dictionaries with book details
@@ -553,20 +608,7 @@ class BookManager:
         cursor = conn.cursor()
         
         try:
-            # Base query
-            base_query = """
-            SELECT DISTINCT books.id, books.title, books.author, books.file_path, books.date_added
-            FROM books
-            """
-            
-            # Add category join if needed
-            if category:
-                base_query += """
-                JOIN book_categories ON books.id = book_categories.book_id
-                JOIN categories ON book_categories.category_id = categories.id
-                """
-            
-            # Add WHERE clause
+            # Build WHERE clause
             where_clauses = []
             params = []
             
@@ -575,46 +617,218 @@ class BookManager:
                 params.extend([f"%{query}%", f"%{query}%"])
             
             if category:
-                where_clauses.append("categories.name = ?")
+                # Filter with a subquery so the book's other categories are still aggregated
+                where_clauses.append(
+                    """books.id IN (
+                        SELECT book_categories.book_id
+                        FROM book_categories
+                        JOIN categories ON book_categories.category_id = categories.id
+                        WHERE categories.name = ?
+                    )"""
+                )
                 params.append(category)
             
-            if where_clauses:
-                base_query += f" WHERE {' AND '.join(where_clauses)}"
+            books = self._query_books(cursor, where_clauses, params, limit=limit, offset=offset)
             
-            # Add order by
-            base_query += " ORDER BY books.title"
+            elapsed_time = time.time() - start_time
+            logger.debug(f"Search found {len(books)} books in {elapsed_time:.4f}s")
+            return books
             
-            logger.trace(f"Search SQL: {base_query} with params {params}")
+        except Exception as e:
+            logger.error(f"Error searching books: {str(e)}")
+            raise
+        finally:
+            conn.close()
+    
+    def search_book_contents(self, query, limit=20, offset=0, match_all=True,
+                             snippet_tokens=24, highlight_start="<mark>", highlight_end="</mark>"):
+        """
+        Full-text search over book contents, ranked by BM25.
+        
+        Args:
+            query: Keywords to search for (a trailing * matches prefixes)
+            limit: Maximum number of results
+            offset: Number of results to skip, for pagination
+            match_all: Require every keyword instead of any keyword
+            snippet_tokens: Maximum number of tokens in each snippet
+            highlight_start: Marker inserted before each matched term
+            highlight_end: Marker inserted after each matched term
+        
+        Returns:
+            A list of dictionaries with book_id, title, author, score (higher is better)
+            and snippet (matched terms wrapped in the highlight markers)
+        """
+        logger.debug(f"Full-text search for: '{query}' (limit: {limit}, offset: {offset})")
+        start_time = time.time()
+        
+        if not self.fulltext_enabled:
+            logger.warning("Full-text search is not available in this SQLite build")
+            return []
+        
+        conn = get_connection()
+        
+        try:
+            results = search_fulltext(
+                conn, query, limit=limit, offset=offset, match_all=match_all,
+                snippet_tokens=snippet_tokens,
+                highlight_start=highlight_start, highlight_end=highlight_end
+            )
             
-            # Execute query
-            cursor.execute(base_query, params)
-            book_rows = cursor.fetchall()
+            elapsed_time = time.time() - start_time
+            logger.debug(f"Full-text search found {len(results)} books in {elapsed_time:.4f}s")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error searching book contents: {str(e)}")
+            raise
+        finally:
+            conn.close()
+    
+    def find_in_book(self, book_id, query, context_window=100, limit=None, offset=0,
+                     highlight_start=None, highlight_end=None):
+        """
+        Find occurrences of a word, prefix (word*) or phrase in one book, using its positional index.
+        
+        Args:
+            book_id: ID of the book to search
+            query: Search query
+            context_window: Number of characters to include around each match
+            limit: Maximum number of matches to return (None for all)
+            offset: Number of matches to skip, for pagination
+            highlight_start: Marker inserted before every query term (None for no highlighting)
+            highlight_end: Marker inserted after every query term
+        
+        Returns:
+            A list of (context_text, position) tuples, in document order
+        """
+        logger.debug(f"Searching book ID {book_id} for: '{query}' (limit: {limit}, offset: {offset})")
+        start_time = time.time()
+        
+        conn = get_connection()
+        
+        try:
+            matches = search_book_text(
+                conn, book_id, query, context_window=context_window, limit=limit, offset=offset,
+                highlight_start=highlight_start, highlight_end=highlight_end
+            )
             
-            # Convert rows to dicts and add categories
-            books = []
-            for book_row in book_rows:
-                book = dict(book_row)
-                
-                # Get categories for this book
-                cursor.execute(
-                    """
-                    SELECT categories.name
-                    FROM categories
-                    JOIN book_categories ON categories.id = book_categories.category_id
-                    WHERE book_categories.book_id = ?
-                    """,
-                    (book['id'],)
-                )
-                
-                book['categories'] = [row['name'] for row in cursor.fetchall()]
-                books.append(book)
+            elapsed_time = time.time() - start_time
+            logger.debug(f"Found {len(matches)} matches in book ID {book_id} in {elapsed_time:.4f}s")
+            return matches
+        
+        except Exception as e:
+            logger.error(f"Error searching book ID {book_id}: {str(e)}")
+            raise
+        finally:
+            conn.close()
+    
+    def _term_stats_book_ids(self, cursor, book_id=None, category=None):
+        """
+        Resolve the books whose term statistics should be aggregated.
+        
+        Args:
+            cursor: Cursor of an open connection
+            book_id: A single book ID
+            category: A category name (ignored if book_id is given)
+        
+        Returns:
+            A list of book IDs, or None for the whole library
+        """
+        if book_id is not None:
+            return [book_id]
+        
+        if category:
+            cursor.execute(
+                """
+                SELECT book_categories.book_id
+                FROM book_categories
+                JOIN categories ON book_categories.category_id = categories.id
+                WHERE categories.name = ?
+                """,
+                (category,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+        
+        return None
+    
+    def get_term_frequencies(self, book_id=None, category=None, min_length=2, exclude_stopwords=True,
+                             custom_stopwords=None, limit=None):
+        """
+        Get precomputed term frequencies for a book, a category or the whole library.
+        
+        Args:
+            book_id: ID of the book to analyze
+            category: Category to analyze (used when book_id is None)
+            min_length: Minimum word length to include
+            exclude_stopwords: Whether to exclude common stopwords
+            custom_stopwords: Additional words to exclude
+            limit: Maximum number of terms to return (None for all)
+        
+        Returns:
+            A list of (term, frequency) tuples, sorted by frequency (descending)
+        """
+        logger.debug(f"Retrieving term frequencies (book: {book_id}, category: '{category}', limit: {limit})")
+        start_time = time.time()
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            book_ids = self._term_stats_book_ids(cursor, book_id, category)
+            terms = get_term_frequencies(
+                conn, book_ids, min_length=min_length, exclude_stopwords=exclude_stopwords,
+                custom_stopwords=custom_stopwords, limit=limit
+            )
             
             elapsed_time = time.time() - start_time
-            logger.debug(f"Search found {len(books)} books in {elapsed_time:.4f}s")
-            return books
+            logger.debug(f"Retrieved {len(terms)} term frequencies in {elapsed_time:.4f}s")
+            return terms
+        
+        except Exception as e:
+            logger.error(f"Error retrieving term frequencies: {str(e)}")
+            raise
+        finally:
+            conn.close()
+    
+    def get_tfidf_terms(self, book_id=None, category=None, min_length=3, exclude_stopwords=True,
+                        custom_stopwords=None, limit=50):
+        """
+        Get the most distinctive terms of a book or category, ranked by TF-IDF against the library.
+        
+        Args:
+            book_id: ID of the book to analyze
+            category: Category to analyze (used when book_id is None)
+            min_length: Minimum word length to include
+            exclude_stopwords: Whether to exclude common stopwords
+            custom_stopwords: Additional words to exclude
+            limit: Maximum number of terms to return (None for all)
+        
+        Returns:
+            A list of (term, score) tuples, sorted by score (descending)
+        """
+        logger.debug(f"Retrieving TF-IDF terms (book: {book_id}, category: '{category}', limit: {limit})")
+        start_time = time.time()
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            book_ids = self._term_stats_book_ids(cursor, book_id, category)
+            if book_ids is None:
+                cursor.execute("SELECT book_id FROM book_term_totals")
+                book_ids = [row[0] for row in cursor.fetchall()]
+            
+            terms = get_tfidf_terms(
+                conn, book_ids, min_length=min_length, exclude_stopwords=exclude_stopwords,
+                custom_stopwords=custom_stopwords, limit=limit
+            )
             
+            elapsed_time = time.time() - start_time
+            logger.debug(f"Retrieved {len(terms)} TF-IDF terms in {elapsed_time:.4f}s")
+            return terms
+        
         except Exception as e:
-            logger.error(f"Error searching books: {str(e)}")
+            logger.error(f"Error retrieving TF-IDF terms: {str(e)}")
             raise
         finally:
             conn.close()
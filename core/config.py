@@ -24,6 +24,12 @@ DEFAULT_OCR_SETTINGS = {
     'show_extracted_text': True
 }
 
+# PDF extraction settings
+DEFAULT_PDF_EXTRACTION_WORKERS = max(1, min(8, (os.cpu_count() or 1) - 1))  # Processes extracting page text in parallel
+DEFAULT_PDF_PARALLEL_MIN_PAGES = 40  # Smaller PDFs are extracted serially (pool start-up is not worth it)
+DEFAULT_PDF_RANGE_TIMEOUT = 120  # Seconds without a finished page range before falling back to serial extraction
+PAGE_BREAK = "\f"  # Marks page boundaries in extracted text, so chunk offsets map back to pages
+
 # Thumbnail settings
 DEFAULT_THUMBNAIL_SIZE = (200, 280)
 DEFAULT_THUMBNAIL_BG_COLOR = (240, 240, 240)
@@ -49,6 +55,11 @@ DATABASE_FILE = "book_manager.db"
 # Application configurations
 _config = {
     'ocr': DEFAULT_OCR_SETTINGS,
+    'pdf': {
+        'extraction_workers': DEFAULT_PDF_EXTRACTION_WORKERS,
+        'parallel_min_pages': DEFAULT_PDF_PARALLEL_MIN_PAGES,
+        'range_timeout': DEFAULT_PDF_RANGE_TIMEOUT
+    },
     'thumbnail': {
         'size': DEFAULT_THUMBNAIL_SIZE,
         'bg_color': DEFAULT_THUMBNAIL_BG_COLOR,
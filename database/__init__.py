@@ -7,6 +7,15 @@ from database.connection import get_connection
 from database.utils import execute_query, execute_insert, table_exists
 from database.initialize import initialize_database
 from database.schema import init_database, apply_migrations, get_database_info
+from database.fulltext import ensure_fulltext_index, rebuild_fulltext_index, search_fulltext
+from database.term_stats import (
+    ensure_term_stats, rebuild_term_stats, index_book_terms,
+    get_term_frequencies, get_tfidf_terms
+)
+from database.positional_index import (
+    ensure_positional_index, rebuild_positional_index, index_book_positions,
+    find_phrase_spans, find_term_spans, search_book_text
+)
 from database.models import Book, BookContent, Category, KnowledgeBaseEntry
 from database.repository import BookRepository, KnowledgeBaseRepository
 
@@ -23,6 +32,26 @@ __all__ = [
     'apply_migrations',
     'get_database_info',
     
+    # Full-text search
+    'ensure_fulltext_index',
+    'rebuild_fulltext_index',
+    'search_fulltext',
+    
+    # Term statistics
+    'ensure_term_stats',
+    'rebuild_term_stats',
+    'index_book_terms',
+    'get_term_frequencies',
+    'get_tfidf_terms',
+    
+    # Positional index
+    'ensure_positional_index',
+    'rebuild_positional_index',
+    'index_book_positions',
+    'find_phrase_spans',
+    'find_term_spans',
+    'search_book_text',
+    
     # Data models
     'Book',
     'BookContent',
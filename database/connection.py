@@ -32,6 +32,9 @@ def get_connection() -> sqlite3.Connection:
         # Enable foreign keys
         conn.execute("PRAGMA foreign_keys = ON")
         
+        # Let rows removed by INSERT OR REPLACE fire delete triggers (keeps the full-text index in sync)
+        conn.execute("PRAGMA recursive_triggers = ON")
+        
         return conn
         
     except sqlite3.Error as e:
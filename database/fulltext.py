@@ -0,0 +1,185 @@
+"""
+Full-text search over book contents for Book Knowledge AI application.
+Maintains an FTS5 index of book_contents and runs ranked keyword queries against it.
+"""
+
+import re
+import sqlite3
+from typing import List, Dict, Any
+
+from utils.logger import get_logger
+
+# Get a logger for this module
+logger = get_logger(__name__)
+
+# Name of the FTS5 table indexing book_contents.content
+FTS_TABLE = "book_contents_fts"
+
+# External-content table: the text is stored once, in book_contents, and the
+# FTS rowid is the book_contents rowid (book_id or id, depending on the schema)
+CREATE_BOOK_CONTENTS_FTS_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    content,
+    content='book_contents',
+    content_rowid='rowid',
+    tokenize='porter unicode61'
+)
+"""
+
+# Triggers keeping the index in sync with book_contents
+CREATE_BOOK_CONTENTS_FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_contents_fts_insert AFTER INSERT ON book_contents BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.rowid, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_contents_fts_delete AFTER DELETE ON book_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.rowid, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_contents_fts_update AFTER UPDATE OF content ON book_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.rowid, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.rowid, new.content);
+    END
+    """
+]
+
+# Default number of tokens in a result snippet
+DEFAULT_SNIPPET_TOKENS = 24
+
+def ensure_fulltext_index(conn: sqlite3.Connection) -> bool:
+    """
+    Create the FTS5 index and its sync triggers if they don't exist.
+    
+    A newly created index is populated from the existing book_contents rows.
+    The caller is responsible for committing.
+    
+    Args:
+        conn: SQLite database connection (book_contents must already exist)
+    
+    Returns:
+        True if the index is available, False if SQLite lacks FTS5 support
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+        (FTS_TABLE,)
+    )
+    created = cursor.fetchone() is None
+    
+    try:
+        cursor.execute(CREATE_BOOK_CONTENTS_FTS_TABLE)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search unavailable (SQLite built without FTS5?): {str(e)}")
+        return False
+    
+    for trigger in CREATE_BOOK_CONTENTS_FTS_TRIGGERS:
+        cursor.execute(trigger)
+    
+    if created:
+        # Index the contents that were stored before the FTS table existed
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        logger.info(f"Created full-text index {FTS_TABLE}")
+    
+    return True
+
+def rebuild_fulltext_index(conn: sqlite3.Connection) -> None:
+    """
+    Rebuild the FTS5 index from book_contents and merge its segments.
+    
+    Args:
+        conn: SQLite database connection
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+def build_match_query(query: str, match_all: bool = True) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    
+    Each word is quoted so punctuation and FTS5 operators in user input
+    cannot cause syntax errors. A trailing ``*`` on a word keeps prefix matching.
+    
+    Args:
+        query: Free-text search string
+        match_all: Require every word (AND) instead of any word (OR)
+    
+    Returns:
+        MATCH expression, or an empty string if the query has no words
+    """
+    terms = [
+        f'"{word}"{"*" if prefix else ""}'
+        for word, prefix in re.findall(r"(\w+)(\*?)", query)
+    ]
+    return (" AND " if match_all else " OR ").join(terms)
+
+def search_fulltext(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    match_all: bool = True,
+    snippet_tokens: int = DEFAULT_SNIPPET_TOKENS,
+    highlight_start: str = "<mark>",
+    highlight_end: str = "</mark>"
+) -> List[Dict[str, Any]]:
+    """
+    Run a ranked full-text query over book contents.
+    
+    Results are ordered by BM25. Snippets are only computed for the page of
+    results being returned, not for every matching book.
+    
+    Args:
+        conn: SQLite database connection
+        query: Free-text search string
+        limit: Maximum number of results
+        offset: Number of results to skip, for pagination
+        match_all: Require every word (AND) instead of any word (OR)
+        snippet_tokens: Maximum number of tokens in each snippet
+        highlight_start: Marker inserted before each matched term
+        highlight_end: Marker inserted after each matched term
+    
+    Returns:
+        List of dictionaries with book_id, title, author, score (higher is
+        better) and snippet (matched terms wrapped in the highlight markers)
+    """
+    match = build_match_query(query, match_all)
+    if not match:
+        return []
+    
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT book_contents.book_id, books.title, books.author,
+               -bm25({FTS_TABLE}) AS score,
+               snippet({FTS_TABLE}, 0, ?, ?, '...', ?) AS snippet
+        FROM {FTS_TABLE}
+        JOIN book_contents ON book_contents.rowid = {FTS_TABLE}.rowid
+        JOIN books ON books.id = book_contents.book_id
+        WHERE {FTS_TABLE} MATCH ?
+          AND {FTS_TABLE}.rowid IN (
+              SELECT rowid FROM {FTS_TABLE}
+              WHERE {FTS_TABLE} MATCH ?
+              ORDER BY rank
+              LIMIT ? OFFSET ?
+          )
+        ORDER BY score DESC
+        """,
+        # FTS5 caps snippets at 64 tokens
+        (highlight_start, highlight_end, max(1, min(snippet_tokens, 64)), match, match, limit, offset)
+    )
+    
+    return [
+        {
+            "book_id": row[0],
+            "title": row[1],
+            "author": row[2],
+            "score": row[3],
+            "snippet": row[4]
+        }
+        for row in cursor.fetchall()
+    ]
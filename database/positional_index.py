@@ -0,0 +1,297 @@
+"""
+Positional inverted index for Book Knowledge AI application.
+Stores, for every book, where each term occurs (token position and character
+span), so in-document term, phrase and prefix searches read a few posting
+lists instead of scanning the book text.
+"""
+
+import sqlite3
+from collections import defaultdict
+from typing import List, Tuple, Optional, Iterable
+
+import numpy as np
+
+from utils.logger import get_logger
+from utils.text_processing import tokenize_with_offsets, parse_search_terms, highlight_spans
+
+# Get a logger for this module
+logger = get_logger(__name__)
+
+# Posting lists: one row per (book, term), positions packed as int32 triples
+# (token index, start character, end character) ordered by token index
+CREATE_BOOK_TERM_POSITIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS book_term_positions (
+    book_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (book_id, term),
+    FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE
+)
+"""
+
+# Books whose positions are indexed, with their token count
+CREATE_BOOK_POSITION_TOTALS_TABLE = """
+CREATE TABLE IF NOT EXISTS book_position_totals (
+    book_id INTEGER PRIMARY KEY,
+    token_count INTEGER NOT NULL,
+    FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE
+)
+"""
+
+# Storage layout of a posting list
+POSITION_DTYPE = np.dtype("<i4")
+POSITION_FIELDS = 3
+
+# Upper bound appended to a prefix to form the end of its term range
+_PREFIX_RANGE_END = "\U0010ffff"
+
+def ensure_positional_index(conn: sqlite3.Connection) -> None:
+    """
+    Create the positional index tables if they don't exist.
+    
+    Newly created tables are populated from the existing book_contents rows.
+    The caller is responsible for committing.
+    
+    Args:
+        conn: SQLite database connection (book_contents must already exist)
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='book_term_positions'")
+    created = cursor.fetchone() is None
+    
+    cursor.execute(CREATE_BOOK_TERM_POSITIONS_TABLE)
+    cursor.execute(CREATE_BOOK_POSITION_TOTALS_TABLE)
+    
+    if created:
+        rebuild_positional_index(conn)
+
+def rebuild_positional_index(conn: sqlite3.Connection) -> int:
+    """
+    Recompute the positional index of every book from book_contents.
+    
+    Args:
+        conn: SQLite database connection
+    
+    Returns:
+        Number of books indexed
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM book_term_positions")
+    cursor.execute("DELETE FROM book_position_totals")
+    
+    book_ids = [row[0] for row in cursor.execute("SELECT DISTINCT book_id FROM book_contents").fetchall()]
+    for book_id in book_ids:
+        row = cursor.execute("SELECT content FROM book_contents WHERE book_id = ?", (book_id,)).fetchone()
+        index_book_positions(conn, book_id, row[0] if row else None)
+    
+    if book_ids:
+        logger.info(f"Indexed term positions for {len(book_ids)} books")
+    return len(book_ids)
+
+def index_book_positions(conn: sqlite3.Connection, book_id: int, content: Optional[str]) -> None:
+    """
+    Replace the positional index of one book.
+    
+    The caller is responsible for committing.
+    
+    Args:
+        conn: SQLite database connection
+        book_id: ID of the book
+        content: Text content of the book (None or empty removes its postings)
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM book_term_positions WHERE book_id = ?", (book_id,))
+    cursor.execute("DELETE FROM book_position_totals WHERE book_id = ?", (book_id,))
+    
+    if not isinstance(content, str):
+        return
+    
+    postings = defaultdict(list)
+    token_count = 0
+    for token_index, (term, start, end) in enumerate(tokenize_with_offsets(content)):
+        postings[term].extend((token_index, start, end))
+        token_count += 1
+    
+    cursor.executemany(
+        "INSERT INTO book_term_positions (book_id, term, positions) VALUES (?, ?, ?)",
+        ((book_id, term, np.asarray(positions, dtype=POSITION_DTYPE).tobytes())
+         for term, positions in postings.items())
+    )
+    cursor.execute(
+        "INSERT INTO book_position_totals (book_id, token_count) VALUES (?, ?)",
+        (book_id, token_count)
+    )
+
+def _ensure_book_indexed(conn: sqlite3.Connection, book_id: int) -> None:
+    """Index a book on first use if its content was stored without going through the indexer."""
+    cursor = conn.cursor()
+    if cursor.execute("SELECT 1 FROM book_position_totals WHERE book_id = ?", (book_id,)).fetchone():
+        return
+    
+    row = cursor.execute("SELECT content FROM book_contents WHERE book_id = ?", (book_id,)).fetchone()
+    if row and row[0]:
+        logger.info(f"Building missing positional index for book {book_id}")
+        index_book_positions(conn, book_id, row[0])
+        conn.commit()
+
+def _decode_positions(blob: bytes) -> np.ndarray:
+    """Unpack a posting list into an (n, 3) array of (token index, start, end)."""
+    return np.frombuffer(blob, dtype=POSITION_DTYPE).reshape(-1, POSITION_FIELDS)
+
+def _term_postings(conn: sqlite3.Connection, book_id: int, term: str, prefix: bool = False) -> np.ndarray:
+    """
+    Get the positions of a term (or of every term starting with a prefix) in a book.
+    
+    Both lookups are primary-key seeks; a prefix reads one contiguous key range.
+    
+    Returns:
+        (n, 3) array of (token index, start, end), ordered by token index
+    """
+    cursor = conn.cursor()
+    if prefix:
+        cursor.execute(
+            "SELECT positions FROM book_term_positions WHERE book_id = ? AND term >= ? AND term < ?",
+            (book_id, term, term + _PREFIX_RANGE_END)
+        )
+    else:
+        cursor.execute(
+            "SELECT positions FROM book_term_positions WHERE book_id = ? AND term = ?",
+            (book_id, term)
+        )
+    
+    postings = [_decode_positions(row[0]) for row in cursor.fetchall()]
+    if not postings:
+        return np.empty((0, POSITION_FIELDS), dtype=POSITION_DTYPE)
+    if len(postings) == 1:
+        return postings[0]
+    
+    merged = np.concatenate(postings)
+    return merged[np.argsort(merged[:, 0], kind="stable")]
+
+def find_phrase_spans(conn: sqlite3.Connection, book_id: int, query: str) -> np.ndarray:
+    """
+    Find the character spans where a query occurs in a book.
+    
+    A single word matches that token, ``word*`` matches tokens starting with
+    it, and several words match them as consecutive tokens (a phrase; each
+    word may itself be a prefix).
+    
+    Args:
+        conn: SQLite database connection
+        book_id: ID of the book
+        query: Search query
+    
+    Returns:
+        (n, 2) array of (start, end) character spans in document order
+    """
+    terms = parse_search_terms(query)
+    empty = np.empty((0, 2), dtype=np.int64)
+    if not terms:
+        return empty
+    
+    _ensure_book_indexed(conn, book_id)
+    
+    # Intersect the shifted token positions, starting from the rarest term
+    postings = [_term_postings(conn, book_id, term, prefix) for term, prefix in terms]
+    if any(len(posting) == 0 for posting in postings):
+        return empty
+    
+    order = sorted(range(len(postings)), key=lambda i: len(postings[i]))
+    phrase_starts = postings[order[0]][:, 0] - order[0]
+    for i in order[1:]:
+        phrase_starts = np.intersect1d(phrase_starts, postings[i][:, 0] - i, assume_unique=True)
+        if len(phrase_starts) == 0:
+            return empty
+    
+    first, last = postings[0], postings[-1]
+    starts = first[np.searchsorted(first[:, 0], phrase_starts), 1]
+    ends = last[np.searchsorted(last[:, 0], phrase_starts + len(postings) - 1), 2]
+    
+    return np.column_stack((starts, ends)).astype(np.int64)
+
+def find_term_spans(conn: sqlite3.Connection, book_id: int, terms: Iterable[Tuple[str, bool]]) -> np.ndarray:
+    """
+    Find the character spans of several terms at once, e.g. to highlight all query terms.
+    
+    Args:
+        conn: SQLite database connection
+        book_id: ID of the book
+        terms: (term, is_prefix) tuples, as returned by parse_search_terms
+    
+    Returns:
+        (n, 2) array of (start, end) character spans in document order
+    """
+    _ensure_book_indexed(conn, book_id)
+    
+    postings = [_term_postings(conn, book_id, term, prefix) for term, prefix in set(terms)]
+    postings = [posting for posting in postings if len(posting)]
+    if not postings:
+        return np.empty((0, 2), dtype=np.int64)
+    
+    spans = np.concatenate(postings)[:, 1:].astype(np.int64)
+    return spans[np.argsort(spans[:, 0], kind="stable")]
+
+def search_book_text(
+    conn: sqlite3.Connection,
+    book_id: int,
+    query: str,
+    context_window: int = 100,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    highlight_start: Optional[str] = None,
+    highlight_end: Optional[str] = None
+) -> List[Tuple[str, int]]:
+    """
+    Find occurrences of a query in a book with surrounding context.
+    
+    Matches come from the positional index; the book text is read only to cut
+    the context windows of the returned page of matches.
+    
+    Args:
+        conn: SQLite database connection
+        book_id: ID of the book
+        query: Search query (a word, ``prefix*`` or a phrase)
+        context_window: Number of characters to include around each match
+        limit: Maximum number of matches to return (None for all)
+        offset: Number of matches to skip, for pagination
+        highlight_start: Marker inserted before every query term in the
+            contexts (None for no highlighting)
+        highlight_end: Marker inserted after every query term in the contexts
+    
+    Returns:
+        List of tuples containing (context_text, position)
+    """
+    spans = find_phrase_spans(conn, book_id, query)
+    spans = spans[offset:] if limit is None else spans[offset:offset + limit]
+    if len(spans) == 0:
+        return []
+    
+    row = conn.execute("SELECT content FROM book_contents WHERE book_id = ?", (book_id,)).fetchone()
+    if not row or not row[0]:
+        return []
+    document = row[0]
+    
+    highlights = None
+    if highlight_start is not None:
+        highlights = find_term_spans(conn, book_id, parse_search_terms(query))
+    
+    matches = []
+    for start, end in spans.tolist():
+        context_start = max(0, start - context_window)
+        context_end = min(len(document), end + context_window)
+        context = document[context_start:context_end]
+        
+        if highlights is not None:
+            # Only the highlight spans that fall inside this window
+            lo = max(0, np.searchsorted(highlights[:, 0], context_start, side="left") - 1)
+            hi = np.searchsorted(highlights[:, 0], context_end, side="left")
+            context = highlight_spans(
+                context, highlights[lo:hi].tolist(),
+                highlight_start, highlight_end if highlight_end is not None else highlight_start,
+                offset=context_start
+            )
+        
+        matches.append((context, start))
+    
+    return matches
@@ -11,6 +11,9 @@ from datetime import datetime
 from utils.logger import get_logger
 from database.connection import get_connection
 from database.utils import execute_query, execute_insert, table_exists
+from database.fulltext import search_fulltext, DEFAULT_SNIPPET_TOKENS
+from database.term_stats import index_book_terms
+from database.positional_index import index_book_positions, search_book_text
 from database.models import Book, BookContent, Category, KnowledgeBaseEntry
 
 # Get a logger for this module
@@ -403,6 +406,87 @@ class BookRepository:
             logger.error(f"Error searching books: {str(e)}")
             return []
     
+    @staticmethod
+    def search_content(
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        match_all: bool = True,
+        snippet_tokens: int = DEFAULT_SNIPPET_TOKENS,
+        highlight_start: str = "<mark>",
+        highlight_end: str = "</mark>"
+    ) -> List[Dict[str, Any]]:
+        """
+        Full-text search over book contents, ranked by BM25.
+        
+        Args:
+            query: Keywords to search for (a trailing * matches prefixes)
+            limit: Maximum number of results
+            offset: Number of results to skip, for pagination
+            match_all: Require every keyword instead of any keyword
+            snippet_tokens: Maximum number of tokens in each snippet
+            highlight_start: Marker inserted before each matched term
+            highlight_end: Marker inserted after each matched term
+        
+        Returns:
+            List of dictionaries with book_id, title, author, score and snippet
+        """
+        try:
+            conn = get_connection()
+            
+            results = search_fulltext(
+                conn, query, limit=limit, offset=offset, match_all=match_all,
+                snippet_tokens=snippet_tokens,
+                highlight_start=highlight_start, highlight_end=highlight_end
+            )
+            
+            conn.close()
+            return results
+        
+        except sqlite3.Error as e:
+            logger.error(f"Error searching book contents: {str(e)}")
+            return []
+    
+    @staticmethod
+    def find_in_book(
+        book_id: int,
+        query: str,
+        context_window: int = 100,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        highlight_start: Optional[str] = None,
+        highlight_end: Optional[str] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Find occurrences of a word, prefix (word*) or phrase in one book.
+        
+        Args:
+            book_id: ID of the book
+            query: Search query
+            context_window: Number of characters to include around each match
+            limit: Maximum number of matches to return (None for all)
+            offset: Number of matches to skip, for pagination
+            highlight_start: Marker inserted before every query term (None for no highlighting)
+            highlight_end: Marker inserted after every query term
+        
+        Returns:
+            List of tuples containing (context_text, position)
+        """
+        try:
+            conn = get_connection()
+            
+            matches = search_book_text(
+                conn, book_id, query, context_window=context_window, limit=limit, offset=offset,
+                highlight_start=highlight_start, highlight_end=highlight_end
+            )
+            
+            conn.close()
+            return matches
+        
+        except sqlite3.Error as e:
+            logger.error(f"Error searching book {book_id}: {str(e)}")
+            return []
+    
     @staticmethod
     def get_all_categories() -> List[str]:
         """
@@ -487,6 +571,10 @@ class BookRepository:
                 (len(content), book_id)
             )
             
+            # Refresh the book's term statistics and positional index
+            index_book_terms(conn, book_id, content)
+            index_book_positions(conn, book_id, content)
+            
             conn.commit()
             conn.close()
             
@@ -10,6 +10,9 @@ from datetime import datetime
 from utils.logger import get_logger
 from database.connection import get_connection
 from database.utils import table_exists, execute_query
+from database.fulltext import FTS_TABLE, ensure_fulltext_index
+from database.term_stats import ensure_term_stats
+from database.positional_index import ensure_positional_index
 
 # Get a logger for this module
 logger = get_logger(__name__)
@@ -132,6 +135,12 @@ def init_database(reset: bool = False) -> bool:
             
             # Drop tables in order (respect foreign key constraints)
             tables = [
+                FTS_TABLE,
+                "book_terms",
+                "book_term_totals",
+                "corpus_terms",
+                "book_term_positions",
+                "book_position_totals",
                 "metadata_history",
                 "book_categories",
                 "book_contents",
@@ -175,6 +184,15 @@ def init_database(reset: bool = False) -> bool:
             cursor.execute(CREATE_METADATA_HISTORY_TABLE)
             created_tables.append("metadata_history")
         
+        # Create the full-text index over book contents
+        ensure_fulltext_index(conn)
+        
+        # Create the per-book and library-wide term statistics
+        ensure_term_stats(conn)
+        
+        # Create the per-book positional index used by in-document search
+        ensure_positional_index(conn)
+        
         # Apply any pending migrations
         apply_migrations(conn)
         
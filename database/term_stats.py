@@ -0,0 +1,275 @@
+"""
+Term statistics for Book Knowledge AI application.
+Stores per-book term counts and library-wide aggregates so word clouds and
+keyword tables are read from precomputed counts instead of re-tokenizing books.
+"""
+
+import math
+import sqlite3
+from collections import Counter
+from typing import List, Tuple, Optional, Iterable, Set
+
+from utils.logger import get_logger
+from utils.text_processing import tokenize, BASIC_STOPWORDS
+
+# Get a logger for this module
+logger = get_logger(__name__)
+
+# Per-book term counts
+CREATE_BOOK_TERMS_TABLE = """
+CREATE TABLE IF NOT EXISTS book_terms (
+    book_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (book_id, term),
+    FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE
+) WITHOUT ROWID
+"""
+
+# Per-book totals (token count and vocabulary size)
+CREATE_BOOK_TERM_TOTALS_TABLE = """
+CREATE TABLE IF NOT EXISTS book_term_totals (
+    book_id INTEGER PRIMARY KEY,
+    total_terms INTEGER NOT NULL,
+    unique_terms INTEGER NOT NULL,
+    FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE
+)
+"""
+
+# Library-wide term frequency (TF) and document frequency (DF)
+CREATE_CORPUS_TERMS_TABLE = """
+CREATE TABLE IF NOT EXISTS corpus_terms (
+    term TEXT PRIMARY KEY,
+    total_count INTEGER NOT NULL,
+    doc_count INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Triggers keeping corpus_terms in sync with book_terms, including cascaded deletes
+CREATE_TERM_STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS book_terms_insert AFTER INSERT ON book_terms BEGIN
+        INSERT INTO corpus_terms (term, total_count, doc_count) VALUES (new.term, new.count, 1)
+        ON CONFLICT(term) DO UPDATE SET
+            total_count = total_count + excluded.total_count,
+            doc_count = doc_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_terms_delete AFTER DELETE ON book_terms BEGIN
+        UPDATE corpus_terms
+        SET total_count = total_count - old.count, doc_count = doc_count - 1
+        WHERE term = old.term;
+        DELETE FROM corpus_terms WHERE term = old.term AND doc_count <= 0;
+    END
+    """
+]
+
+def ensure_term_stats(conn: sqlite3.Connection) -> None:
+    """
+    Create the term statistics tables and triggers if they don't exist.
+    
+    Newly created tables are populated from the existing book_contents rows.
+    The caller is responsible for committing.
+    
+    Args:
+        conn: SQLite database connection (book_contents must already exist)
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='book_terms'")
+    created = cursor.fetchone() is None
+    
+    cursor.execute(CREATE_BOOK_TERMS_TABLE)
+    cursor.execute(CREATE_BOOK_TERM_TOTALS_TABLE)
+    cursor.execute(CREATE_CORPUS_TERMS_TABLE)
+    for trigger in CREATE_TERM_STATS_TRIGGERS:
+        cursor.execute(trigger)
+    
+    if created:
+        rebuild_term_stats(conn)
+
+def rebuild_term_stats(conn: sqlite3.Connection) -> int:
+    """
+    Recompute the term statistics of every book from book_contents.
+    
+    Args:
+        conn: SQLite database connection
+    
+    Returns:
+        Number of books indexed
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM corpus_terms")
+    cursor.execute("DELETE FROM book_terms")
+    cursor.execute("DELETE FROM book_term_totals")
+    
+    book_ids = [row[0] for row in cursor.execute("SELECT DISTINCT book_id FROM book_contents").fetchall()]
+    for book_id in book_ids:
+        row = cursor.execute("SELECT content FROM book_contents WHERE book_id = ?", (book_id,)).fetchone()
+        index_book_terms(conn, book_id, row[0] if row else None)
+    
+    if book_ids:
+        logger.info(f"Indexed term statistics for {len(book_ids)} books")
+    return len(book_ids)
+
+def index_book_terms(conn: sqlite3.Connection, book_id: int, content: Optional[str]) -> None:
+    """
+    Replace the term counts of one book.
+    
+    Library-wide aggregates are adjusted by triggers, so only the book's own
+    terms are touched. The caller is responsible for committing.
+    
+    Args:
+        conn: SQLite database connection
+        book_id: ID of the book
+        content: Text content of the book (None or empty removes its terms)
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM book_terms WHERE book_id = ?", (book_id,))
+    cursor.execute("DELETE FROM book_term_totals WHERE book_id = ?", (book_id,))
+    
+    counts = Counter(tokenize(content)) if content else Counter()
+    if not counts:
+        return
+    
+    cursor.executemany(
+        "INSERT INTO book_terms (book_id, term, count) VALUES (?, ?, ?)",
+        ((book_id, term, count) for term, count in counts.items())
+    )
+    cursor.execute(
+        "INSERT INTO book_term_totals (book_id, total_terms, unique_terms) VALUES (?, ?, ?)",
+        (book_id, sum(counts.values()), len(counts))
+    )
+
+def _select_terms(
+    rows: Iterable[Tuple[str, float]],
+    min_length: int,
+    stopwords: Set[str],
+    limit: Optional[int]
+) -> List[Tuple[str, float]]:
+    """Take ranked (term, value) rows that pass the length and stopword checks, up to limit."""
+    selected = []
+    for term, value in rows:
+        if len(term) < min_length or term in stopwords:
+            continue
+        selected.append((term, value))
+        if limit is not None and len(selected) >= limit:
+            break
+    return selected
+
+def _stopword_set(exclude_stopwords: bool, custom_stopwords: Optional[Iterable[str]]) -> Set[str]:
+    """Combine the basic stopwords (if requested) with custom ones."""
+    stopwords = set(BASIC_STOPWORDS) if exclude_stopwords else set()
+    stopwords.update(word.lower() for word in (custom_stopwords or ()))
+    return stopwords
+
+def get_term_frequencies(
+    conn: sqlite3.Connection,
+    book_ids: Optional[List[int]] = None,
+    min_length: int = 2,
+    exclude_stopwords: bool = True,
+    custom_stopwords: Optional[Iterable[str]] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[str, int]]:
+    """
+    Get term frequencies of one or more books, or of the whole library.
+    
+    Args:
+        conn: SQLite database connection
+        book_ids: IDs of the books to aggregate (None for the whole library)
+        min_length: Minimum term length to include
+        exclude_stopwords: Whether to exclude common stopwords
+        custom_stopwords: Additional terms to exclude
+        limit: Maximum number of terms to return (None for all)
+    
+    Returns:
+        List of (term, frequency) tuples, sorted by frequency (descending)
+    """
+    if book_ids is not None and not book_ids:
+        return []
+    
+    cursor = conn.cursor()
+    
+    if book_ids is None:
+        cursor.execute(
+            "SELECT term, total_count FROM corpus_terms WHERE length(term) >= ? ORDER BY total_count DESC",
+            (min_length,)
+        )
+    elif len(book_ids) == 1:
+        cursor.execute(
+            "SELECT term, count FROM book_terms WHERE book_id = ? AND length(term) >= ? ORDER BY count DESC",
+            (book_ids[0], min_length)
+        )
+    else:
+        placeholders = ",".join("?" * len(book_ids))
+        cursor.execute(
+            f"""
+            SELECT term, SUM(count) AS frequency FROM book_terms
+            WHERE book_id IN ({placeholders}) AND length(term) >= ?
+            GROUP BY term ORDER BY frequency DESC
+            """,
+            (*book_ids, min_length)
+        )
+    
+    stopwords = _stopword_set(exclude_stopwords, custom_stopwords)
+    return _select_terms(cursor, min_length, stopwords, limit)
+
+def get_tfidf_terms(
+    conn: sqlite3.Connection,
+    book_ids: List[int],
+    min_length: int = 3,
+    exclude_stopwords: bool = True,
+    custom_stopwords: Optional[Iterable[str]] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[str, float]]:
+    """
+    Rank the terms of one or more books by TF-IDF against the whole library.
+    
+    TF is the term's share of the books' tokens; IDF is the smoothed
+    ``log((1 + N) / (1 + DF)) + 1`` over the N indexed books.
+    
+    Args:
+        conn: SQLite database connection
+        book_ids: IDs of the books to score
+        min_length: Minimum term length to include
+        exclude_stopwords: Whether to exclude common stopwords
+        custom_stopwords: Additional terms to exclude
+        limit: Maximum number of terms to return (None for all)
+    
+    Returns:
+        List of (term, score) tuples, sorted by score (descending)
+    """
+    if not book_ids:
+        return []
+    
+    cursor = conn.cursor()
+    placeholders = ",".join("?" * len(book_ids))
+    
+    book_count = cursor.execute("SELECT COUNT(*) FROM book_term_totals").fetchone()[0]
+    total_terms = cursor.execute(
+        f"SELECT COALESCE(SUM(total_terms), 0) FROM book_term_totals WHERE book_id IN ({placeholders})",
+        book_ids
+    ).fetchone()[0]
+    if not total_terms:
+        return []
+    
+    cursor.execute(
+        f"""
+        SELECT book_terms.term, SUM(book_terms.count), corpus_terms.doc_count
+        FROM book_terms
+        JOIN corpus_terms ON corpus_terms.term = book_terms.term
+        WHERE book_terms.book_id IN ({placeholders}) AND length(book_terms.term) >= ?
+        GROUP BY book_terms.term
+        """,
+        (*book_ids, min_length)
+    )
+    
+    scores = [
+        (term, (count / total_terms) * (math.log((1 + book_count) / (1 + doc_count)) + 1))
+        for term, count, doc_count in cursor.fetchall()
+    ]
+    scores.sort(key=lambda item: item[1], reverse=True)
+    
+    stopwords = _stopword_set(exclude_stopwords, custom_stopwords)
+    return _select_terms(scores, min_length, stopwords, limit)
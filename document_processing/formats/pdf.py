@@ -6,11 +6,14 @@ This module provides functionality for extracting text and images from PDF files
 
 import os
 import base64
+import multiprocessing
 import tempfile
 from io import BytesIO
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from typing import Dict, List, Any, Optional, Union, Callable, Tuple
 
 from utils.logger import get_logger
+from core.config import get_config, PAGE_BREAK
 from core.exceptions import DocumentProcessingError, DocumentFormatError
 
 # Initialize logger
@@ -31,13 +34,133 @@ except ImportError:
     logger.warning("pdf2image not available. PDF image extraction will be limited.")
     PDF2IMAGE_AVAILABLE = False
 
+# Page extraction outcomes
+PAGE_OK = "ok"
+PAGE_EMPTY = "empty"
+PAGE_ERROR = "error"
+
+# Text between two pages: a page break on a line of its own
+PAGE_SEPARATOR = f"\n{PAGE_BREAK}\n"
+
+def join_pages(pages: List[str]) -> str:
+    """
+    Join the text of each page into the document text.
+    
+    Pages are separated by ``PAGE_SEPARATOR``, and pages without text are
+    kept, so the page breaks in the text count the pages exactly and chunk
+    offsets can be mapped back to page numbers.
+    
+    Args:
+        pages: Text of each page, in order
+    
+    Returns:
+        Document text, or an empty string if no page has text
+    """
+    if not any(page.strip() for page in pages):
+        return ""
+    return PAGE_SEPARATOR.join(page.strip() for page in pages)
+
+def _extract_page_text(page: Any, page_number: int) -> Tuple[str, str, List[str]]:
+    """
+    Extract the text of one PDF page, with a fallback over the page objects.
+    
+    Args:
+        page: PyPDF2 page object
+        page_number: 1-based page number (for messages)
+    
+    Returns:
+        Tuple of (whitespace-normalized text, status, warnings)
+    """
+    warnings = []
+    try:
+        page_text = ""
+        try:
+            page_text = page.extract_text() or ""
+        except Exception as e1:
+            logger.warning(f"Standard extraction failed on page {page_number}: {str(e1)}")
+            warnings.append(f"Standard extraction failed on page {page_number}: {str(e1)}")
+            try:
+                page_elements = getattr(page, "_objects", None)
+                if page_elements:
+                    page_text = " ".join([str(elem) for elem in page_elements if hasattr(elem, "get_text")])
+            except Exception as e2:
+                logger.warning(f"Alternative extraction failed on page {page_number}: {str(e2)}")
+                warnings.append(f"Alternative extraction failed on page {page_number}: {str(e2)}")
+        if len(page_text) == 0:
+            logger.warning(f"No text extracted from page {page_number}")
+            warnings.append(f"No text extracted from page {page_number}")
+            status = PAGE_EMPTY
+        else:
+            logger.info(f"Extracted {len(page_text)} characters from page {page_number}")
+            status = PAGE_OK
+        return " ".join(page_text.split()), status, warnings
+    except Exception as page_error:
+        logger.error(f"Error extracting text from page {page_number}: {str(page_error)}")
+        warnings.append(f"Error extracting text from page {page_number}: {str(page_error)}")
+        return "", PAGE_ERROR, warnings
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[str, str, List[str]]]:
+    """
+    Extract the text of pages ``start`` to ``end - 1`` in a worker process.
+    
+    Each worker opens the file itself, so only the path and page numbers are
+    sent to it and only the extracted text comes back.
+    
+    Args:
+        file_path: Path to the PDF file
+        start: First page index (0-based)
+        end: Page index after the last one
+    
+    Returns:
+        List of (text, status, warnings) tuples, one per page
+    """
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [_extract_page_text(pdf_reader.pages[i], i + 1) for i in range(start, end)]
+
+def _stop_executor(executor: ProcessPoolExecutor) -> None:
+    """
+    Shut down a process pool without waiting for its running tasks.
+    
+    A worker stuck on a malformed page would otherwise block shutdown, so
+    the worker processes are terminated.
+    
+    Args:
+        executor: Process pool to stop
+    """
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
 class PDFProcessor:
     """
     PDF processor for extracting text and images from PDF files.
     """
     
-    def __init__(self):
-        """Initialize the PDF processor."""
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        parallel_min_pages: Optional[int] = None,
+        range_timeout: Optional[float] = None
+    ):
+        """
+        Initialize the PDF processor.
+        
+        Args:
+            max_workers: Processes used for parallel text extraction (defaults to the 'pdf' config)
+            parallel_min_pages: Minimum page count for parallel extraction (defaults to the 'pdf' config)
+            range_timeout: Seconds to wait for any page range to finish before giving up
+                on the pool and extracting serially (defaults to the 'pdf' config)
+        """
+        pdf_config = get_config('pdf')
+        self.max_workers = max(1, int(max_workers or pdf_config.get('extraction_workers', 1)))
+        self.parallel_min_pages = int(parallel_min_pages if parallel_min_pages is not None
+                                      else pdf_config.get('parallel_min_pages', 0))
+        self.range_timeout = float(range_timeout if range_timeout is not None
+                                   else pdf_config.get('range_timeout', 120))
+        
         # Check dependencies
         if not PYPDF2_AVAILABLE:
             logger.warning("PyPDF2 not available. PDF text extraction will be limited.")
@@ -86,11 +209,12 @@ class PDFProcessor:
             'error': None, 'warnings': []
         }
         try:
-            def send_progress(current, total, message="Processing PDF"):
+            def send_progress(fraction, message="Processing PDF"):
                 if progress_callback:
-                    progress_callback(current / total, message)
+                    progress_callback(fraction, message)
             text_result = self.extract_text(file_path, progress_callback=send_progress)
             result['text'] = text_result.get('text', '')
+            result['pages'] = text_result.get('pages', [])
             result['page_count'] = text_result.get('page_count', 0)
             if text_result.get('warnings'):
                 result['warnings'].extend(text_result['warnings'])
@@ -120,54 +244,53 @@ class PDFProcessor:
     def extract_text(
         self, 
         file_path: str,
-        progress_callback: Optional[Callable] = None
+        progress_callback: Optional[Callable] = None,
+        parallel: Optional[bool] = None,
+        max_workers: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Extract text from a PDF file with enhanced error handling and fallback mechanisms.
-        Always returns a dict with text, page_count, error, and warnings.
+        Always returns a dict with text, pages (text of each page, in order), page_count,
+        error, and warnings.
+        
+        Args:
+            file_path: Path to the PDF file
+            progress_callback: Optional callback taking (fraction, message)
+            parallel: Extract page ranges in a process pool (None decides by page count)
+            max_workers: Number of worker processes (defaults to self.max_workers)
         """
         if not PYPDF2_AVAILABLE:
             logger.error("PyPDF2 is not available. Cannot extract text from PDF.")
-            return {'text': '', 'page_count': 0, 'error': 'PyPDF2 unavailable', 'warnings': []}
+            return {'text': '', 'pages': [], 'page_count': 0, 'error': 'PyPDF2 unavailable', 'warnings': []}
         warnings = []
         try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 page_count = len(pdf_reader.pages)
                 logger.info(f"PDF has {page_count} pages: {file_path}")
+                
+                workers = max(1, int(max_workers or self.max_workers))
+                if parallel is None:
+                    parallel = workers > 1 and page_count >= self.parallel_min_pages
+                
+                page_results = None
+                if parallel and workers > 1 and page_count > 1:
+                    page_results = self._extract_pages_parallel(file_path, page_count, workers, progress_callback)
+                if page_results is None:
+                    page_results = self._extract_pages_serial(pdf_reader, page_count, progress_callback)
+                
+                # Assemble the pages in order
+                pages = []
                 pages_with_errors = []
                 empty_pages = []
-                text = ""
-                for i, page in enumerate(pdf_reader.pages):
-                    if progress_callback:
-                        progress_callback(i / page_count, f"Extracting text from page {i+1}/{page_count}")
-                    try:
-                        page_text = ""
-                        try:
-                            page_text = page.extract_text() or ""
-                        except Exception as e1:
-                            logger.warning(f"Standard extraction failed on page {i+1}: {str(e1)}")
-                            warnings.append(f"Standard extraction failed on page {i+1}: {str(e1)}")
-                            try:
-                                page_elements = getattr(page, "_objects", None)
-                                if page_elements:
-                                    page_text = " ".join([str(elem) for elem in page_elements if hasattr(elem, "get_text")])
-                            except Exception as e2:
-                                logger.warning(f"Alternative extraction failed on page {i+1}: {str(e2)}")
-                                warnings.append(f"Alternative extraction failed on page {i+1}: {str(e2)}")
-                        if len(page_text) == 0:
-                            logger.warning(f"No text extracted from page {i+1}")
-                            warnings.append(f"No text extracted from page {i+1}")
-                            empty_pages.append(i+1)
-                        else:
-                            logger.info(f"Extracted {len(page_text)} characters from page {i+1}")
-                        page_text = " ".join(page_text.split())
-                        text += page_text + "\n\n"
-                    except Exception as page_error:
-                        logger.error(f"Error extracting text from page {i+1}: {str(page_error)}")
-                        warnings.append(f"Error extracting text from page {i+1}: {str(page_error)}")
+                for i, (page_text, status, page_warnings) in enumerate(page_results):
+                    warnings.extend(page_warnings)
+                    pages.append(page_text)
+                    if status == PAGE_ERROR:
                         pages_with_errors.append(i+1)
-                text = text.strip()
+                    elif status == PAGE_EMPTY:
+                        empty_pages.append(i+1)
+                text = join_pages(pages)
                 if pages_with_errors:
                     logger.warning(f"Had errors extracting text from pages: {pages_with_errors}")
                     warnings.append(f"Had errors extracting text from pages: {pages_with_errors}")
@@ -190,6 +313,7 @@ class PDFProcessor:
                                 logger.info(f"OCR extracted more text ({len(ocr_text)} chars) than PyPDF2 ({len(text)} chars). Using OCR result.")
                                 warnings.append(f"OCR extracted more text than PyPDF2 on {file_path}")
                                 text = ocr_text
+                                pages = ocr_result.get('pages') or [ocr_text]
                             else:
                                 logger.info(f"PyPDF2 extracted more text ({len(text)} chars) than OCR ({len(ocr_text)} chars). Using PyPDF2 result.")
                         else:
@@ -207,6 +331,7 @@ class PDFProcessor:
                     warnings.append(f"Failed to extract any text from {file_path}")
                 return {
                     'text': text,
+                    'pages': pages,
                     'page_count': page_count,
                     'error': None,
                     'warnings': warnings
@@ -225,6 +350,7 @@ class PDFProcessor:
                 if ocr_result and 'text' in ocr_result:
                     return {
                         'text': ocr_result['text'],
+                        'pages': ocr_result.get('pages') or [ocr_result['text']],
                         'page_count': ocr_result.get('page_count', 0),
                         'error': None,
                         'warnings': warnings + ["Used OCR fallback due to PyPDF2 failure"]
@@ -232,7 +358,94 @@ class PDFProcessor:
             except Exception as ocr_error:
                 logger.error(f"Final OCR attempt also failed: {str(ocr_error)}")
                 warnings.append(f"Final OCR attempt also failed: {str(ocr_error)}")
-            return {'text': '', 'page_count': 0, 'error': 'Text extraction failed', 'warnings': warnings}
+            return {'text': '', 'pages': [], 'page_count': 0, 'error': 'Text extraction failed', 'warnings': warnings}
+    
+    def _extract_pages_serial(
+        self,
+        pdf_reader: Any,
+        page_count: int,
+        progress_callback: Optional[Callable] = None
+    ) -> List[Tuple[str, str, List[str]]]:
+        """
+        Extract every page in this process.
+        
+        Args:
+            pdf_reader: Open PyPDF2 reader
+            page_count: Number of pages
+            progress_callback: Optional callback taking (fraction, message)
+        
+        Returns:
+            List of (text, status, warnings) tuples, one per page
+        """
+        page_results = []
+        for i, page in enumerate(pdf_reader.pages):
+            if progress_callback:
+                progress_callback(i / page_count, f"Extracting text from page {i+1}/{page_count}")
+            page_results.append(_extract_page_text(page, i + 1))
+        return page_results
+    
+    def _extract_pages_parallel(
+        self,
+        file_path: str,
+        page_count: int,
+        workers: int,
+        progress_callback: Optional[Callable] = None
+    ) -> Optional[List[Tuple[str, str, List[str]]]]:
+        """
+        Extract page ranges in a process pool.
+        
+        The pages are split into a few ranges per worker so progress keeps
+        moving and a slow range does not leave the other workers idle. Workers
+        are spawned rather than forked, since the caller may run in a process
+        with other threads holding locks. If no range finishes within
+        range_timeout seconds the workers are stopped and None is returned.
+        
+        Args:
+            file_path: Path to the PDF file
+            page_count: Number of pages
+            workers: Number of worker processes
+            progress_callback: Optional callback taking (fraction, message)
+        
+        Returns:
+            List of (text, status, warnings) tuples, one per page, or None if
+            the pool failed and the caller should extract serially
+        """
+        range_size = max(1, -(-page_count // (workers * 4)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+        page_results: List[Optional[Tuple[str, str, List[str]]]] = [None] * page_count
+        
+        logger.info(f"Extracting {page_count} pages in {len(ranges)} ranges with {workers} processes: {file_path}")
+        executor = None
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=min(workers, len(ranges)),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            futures = {
+                executor.submit(_extract_page_range, file_path, start, end): (start, end)
+                for start, end in ranges
+            }
+            pending = set(futures)
+            pages_done = 0
+            while pending:
+                done, pending = wait(pending, timeout=self.range_timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError(f"no page range finished within {self.range_timeout:g}s")
+                
+                for future in done:
+                    start, end = futures[future]
+                    page_results[start:end] = future.result()
+                    pages_done += end - start
+                if progress_callback:
+                    progress_callback(pages_done / page_count, f"Extracted text from {pages_done}/{page_count} pages")
+        except Exception as e:
+            logger.warning(f"Parallel PDF extraction failed, extracting serially: {str(e)}")
+            if executor is not None:
+                _stop_executor(executor)
+            return None
+        
+        executor.shutdown()
+        return page_results
     
     def extract_images(
         self,
@@ -435,12 +648,12 @@ class PDFProcessor:
                 # Get base64 encoded string
                 thumbnail_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
                 
-                return thumbnail_base64
-                
-            except ImportError:
-                logger.warning("PIL not available for thumbnail generation")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error creating thumbnail for {file_path}: {str(e)}")
+                return thumbnail_base64
+                
+            except ImportError:
+                logger.warning("PIL not available for thumbnail generation")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error creating thumbnail for {file_path}: {str(e)}")
             return None
\ No newline at end of file
@@ -4,14 +4,16 @@ Provides analytics for knowledge base content.
 """
 
 import re
+import heapq
 import string
 from collections import Counter
-from typing import List, Dict, Any, Optional, Tuple, Set
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable, Hashable, Mapping
 
 from utils.logger import get_logger
 from knowledge_base.config import (
     DEFAULT_KEYWORD_MIN_COUNT, DEFAULT_KEYWORD_MAX_WORDS,
-    DEFAULT_STOPWORDS_LANGUAGE
+    DEFAULT_KEYWORD_SKETCH_SIZE, DEFAULT_STOPWORDS_LANGUAGE
 )
 
 # Get a logger for this module
@@ -41,12 +43,279 @@ STOPWORDS = {
     ])
 }
 
+# Words counted per batch; bounds the size of the per-batch n-gram counters
+_KEYWORD_BATCH_WORDS = 65536
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+class SpaceSavingCounter:
+    """
+    Approximate top-k counter with bounded memory (Space-Saving sketch).
+    
+    At most ``2 * capacity`` keys are tracked. When the table fills up it is
+    pruned back to the ``capacity`` heaviest keys, and keys seen afterwards
+    start from the largest evicted count. Each estimate therefore
+    overcounts by at most its recorded error, and every key whose true count
+    exceeds ``total / capacity`` is guaranteed to be tracked.
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_KEYWORD_SKETCH_SIZE):
+        """
+        Args:
+            capacity: Number of keys guaranteed to survive a prune
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        
+        self.capacity = capacity
+        self.total = 0
+        self._floor = 0
+        # Parallel tables keyed alike: estimated count and maximum overcount;
+        # payloads are kept only for keys added with one
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+        self._payloads: Dict[Hashable, Any] = {}
+    
+    def __len__(self) -> int:
+        return len(self._counts)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+    
+    def add(self, key: Hashable, count: int = 1, payload: Any = None) -> None:
+        """
+        Count occurrences of a key.
+        
+        Args:
+            key: Key to count
+            count: Number of occurrences
+            payload: Value stored with a newly tracked key (e.g. its decoded form)
+        """
+        self.total += count
+        if key in self._counts:
+            self._counts[key] += count
+            return
+        
+        self._counts[key] = self._floor + count
+        self._errors[key] = self._floor
+        if payload is not None:
+            self._payloads[key] = payload
+        if len(self._counts) >= 2 * self.capacity:
+            self._prune()
+    
+    def update(self, counts: Mapping[Hashable, int]) -> None:
+        """
+        Count many keys at once, e.g. the exact counts of a batch of text.
+        
+        The table is pruned once after the whole batch instead of whenever it
+        fills up, so it may briefly hold more than ``2 * capacity`` keys.
+        
+        Args:
+            counts: Mapping of keys to their number of occurrences
+        """
+        tracked = self._counts
+        known = counts.keys() & tracked.keys()
+        for key in known:
+            tracked[key] += counts[key]
+        
+        new = counts.keys() - known
+        new_counts = map(counts.__getitem__, new)
+        if self._floor:
+            new_counts = map(self._floor.__add__, new_counts)
+        tracked.update(zip(new, new_counts))
+        self._errors.update(dict.fromkeys(new, self._floor))
+        
+        self.total += sum(counts.values())
+        if len(tracked) >= 2 * self.capacity:
+            self._prune()
+    
+    def _prune(self) -> None:
+        """Drop all but the ``capacity`` heaviest keys and raise the floor."""
+        ranked = sorted(self._counts.values(), reverse=True)
+        if len(ranked) <= self.capacity:
+            return
+        
+        # Keep every key above the capacity-th count, then fill up with keys at that count
+        threshold = ranked[self.capacity - 1]
+        kept = {key: count for key, count in self._counts.items() if count > threshold}
+        ties = (item for item in self._counts.items() if item[1] == threshold)
+        kept.update(islice(ties, self.capacity - len(kept)))
+        
+        # The heaviest evicted key sets the floor
+        self._floor = max(self._floor, ranked[self.capacity])
+        self._counts = kept
+        self._errors = {key: self._errors[key] for key in kept}
+        self._payloads = {key: payload for key, payload in self._payloads.items() if key in kept}
+    
+    def estimate(self, key: Hashable) -> Tuple[int, int]:
+        """
+        Get the count bounds of a key.
+        
+        Args:
+            key: Key to look up
+        
+        Returns:
+            Tuple of (lower bound, upper bound) on the true count
+        """
+        count = self._counts.get(key)
+        if count is None:
+            return 0, self._floor
+        return count - self._errors[key], count
+    
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int, Any]]:
+        """
+        Get the heaviest keys by guaranteed count.
+        
+        Args:
+            n: Number of keys to return (None for all tracked keys)
+        
+        Returns:
+            List of (key, guaranteed count, payload) tuples, heaviest first
+        """
+        items = (
+            (key, count - self._errors[key], self._payloads.get(key))
+            for key, count in self._counts.items()
+        )
+        if n is None:
+            return sorted(items, key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(n, items, key=lambda item: item[1])
+
+class KeywordExtractor:
+    """
+    Streaming keyword and phrase counter.
+    
+    Words are interned to integer ids and phrases of up to ``max_words``
+    words are keyed by the tuple of those ids, so no phrase strings are
+    built while counting. Each batch of words is counted exactly per phrase
+    length with ``Counter`` and then merged into a Space-Saving sketch, which
+    keeps memory bounded no matter how much text is fed in. Several documents
+    (e.g. a whole library) can be scored in one pass; phrases never span
+    documents.
+    """
+    
+    def __init__(
+        self,
+        max_words: int = DEFAULT_KEYWORD_MAX_WORDS,
+        capacity: int = DEFAULT_KEYWORD_SKETCH_SIZE,
+        language: str = DEFAULT_STOPWORDS_LANGUAGE,
+        custom_stopwords: Optional[Set[str]] = None,
+        min_length: int = 3
+    ):
+        """
+        Args:
+            max_words: Maximum words in a keyword phrase
+            capacity: Number of keywords and phrases tracked by the sketch
+            language: Language of stopwords to use
+            custom_stopwords: Additional stopwords to exclude
+            min_length: Minimum word length to include
+        """
+        self.max_words = max(1, max_words)
+        self.min_length = min_length
+        self.stopwords = STOPWORDS.get(language.lower(), set()) | set(custom_stopwords or ())
+        self.sketch = SpaceSavingCounter(capacity)
+        self.document_count = 0
+        
+        self._vocabulary: Dict[str, int] = {}
+        self._words: List[str] = []
+    
+    def _intern(self, word: str) -> int:
+        """Get the id of a word, assigning the next id to new words."""
+        word_id = self._vocabulary.get(word)
+        if word_id is None:
+            word_id = len(self._words)
+            self._vocabulary[word] = word_id
+            self._words.append(word)
+        return word_id
+    
+    def add_text(self, text: str) -> None:
+        """
+        Count the keywords and phrases of one document.
+        
+        Args:
+            text: Document text
+        """
+        self.document_count += 1
+        if not text:
+            return
+        
+        stopwords = self.stopwords
+        min_length = self.min_length
+        vocabulary = self._vocabulary
+        intern = self._intern
+        
+        words = _WORD_PATTERN.findall(text.lower())
+        
+        # Ids of the last words of the previous batch, so phrases continue across batches
+        carry: List[int] = []
+        for batch_start in range(0, len(words), _KEYWORD_BATCH_WORDS):
+            batch = [
+                vocabulary[word] if word in vocabulary else intern(word)
+                for word in words[batch_start:batch_start + _KEYWORD_BATCH_WORDS]
+                if len(word) >= min_length and word not in stopwords
+            ]
+            if not batch:
+                continue
+            
+            self._count_batch(carry, batch)
+            carry = (carry + batch)[-(self.max_words - 1):] if self.max_words > 1 else []
+    
+    def _count_batch(self, carry: List[int], batch: List[int]) -> None:
+        """
+        Count the phrases ending in a batch of word ids and merge them into the sketch.
+        
+        Args:
+            carry: Ids of the words just before the batch in the same document
+            batch: Word ids of the batch
+        """
+        ids = carry + batch
+        start = len(carry)
+        counts = Counter()
+        for n in range(1, self.max_words + 1):
+            # Phrases of n words ending in the batch start at index start - n + 1 or later
+            first = max(0, start - n + 1)
+            if len(ids) - first < n:
+                break
+            counts.update(zip(*(ids[first + offset:] for offset in range(n))))
+        self.sketch.update(counts)
+    
+    def add_texts(self, texts: Iterable[str]) -> None:
+        """
+        Count the keywords and phrases of several documents.
+        
+        Args:
+            texts: Document texts
+        """
+        for text in texts:
+            self.add_text(text)
+    
+    def keywords(self, min_count: int = DEFAULT_KEYWORD_MIN_COUNT, top_k: Optional[int] = None) -> Dict[str, int]:
+        """
+        Get the most frequent keywords and phrases.
+        
+        Counts are guaranteed lower bounds; they are exact unless the sketch
+        had to evict entries.
+        
+        Args:
+            min_count: Minimum count for a keyword to be included
+            top_k: Maximum number of keywords to return (None for all tracked)
+        
+        Returns:
+            Dictionary of keywords and their counts, most frequent first
+        """
+        keywords = {}
+        for word_ids, count, _ in self.sketch.most_common(top_k):
+            if count < min_count:
+                break
+            keywords[" ".join(self._words[word_id] for word_id in word_ids)] = count
+        return keywords
+
 def extract_keywords(
     text: str,
     min_count: int = DEFAULT_KEYWORD_MIN_COUNT,
     max_words: int = DEFAULT_KEYWORD_MAX_WORDS,
     language: str = DEFAULT_STOPWORDS_LANGUAGE,
-    custom_stopwords: Optional[Set[str]] = None
+    custom_stopwords: Optional[Set[str]] = None,
+    capacity: int = DEFAULT_KEYWORD_SKETCH_SIZE
 ) -> Dict[str, int]:
     """
     Extract keywords from text.
@@ -57,51 +326,58 @@ def extract_keywords(
         max_words: Maximum words in a keyword phrase
         language: Language of stopwords to use
         custom_stopwords: Additional stopwords to exclude
+        capacity: Number of keywords and phrases tracked (bounds memory use)
         
     Returns:
-        Dictionary of keywords and their counts
+        Dictionary of keywords and their counts, most frequent first
     """
     if not text:
         return {}
     
-    # Get stopwords for the specified language
-    stopwords = STOPWORDS.get(language.lower(), set())
-    
-    # Add custom stopwords if provided
-    if custom_stopwords:
-        stopwords.update(custom_stopwords)
-    
-    # Clean and normalize text
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', ' ', text)  # Replace punctuation with spaces
-    text = re.sub(r'\s+', ' ', text)      # Replace multiple spaces with a single space
+    extractor = KeywordExtractor(
+        max_words=max_words,
+        capacity=capacity,
+        language=language,
+        custom_stopwords=custom_stopwords
+    )
+    extractor.add_text(text)
     
-    # Split into words
-    words = text.split()
-    
-    # Remove stopwords and short words
-    words = [word for word in words if word not in stopwords and len(word) > 2]
-    
-    # Count single words
-    word_counts = Counter(words)
-    
-    # Extract multi-word phrases if max_words > 1
-    phrase_counts = {}
-    if max_words > 1:
-        for n in range(2, min(max_words + 1, len(words))):
-            for i in range(len(words) - n + 1):
-                phrase = " ".join(words[i:i+n])
-                if phrase not in phrase_counts:
-                    phrase_counts[phrase] = 0
-                phrase_counts[phrase] += 1
+    return extractor.keywords(min_count)
+
+def extract_library_keywords(
+    texts: Iterable[str],
+    min_count: int = DEFAULT_KEYWORD_MIN_COUNT,
+    max_words: int = DEFAULT_KEYWORD_MAX_WORDS,
+    language: str = DEFAULT_STOPWORDS_LANGUAGE,
+    custom_stopwords: Optional[Set[str]] = None,
+    capacity: int = DEFAULT_KEYWORD_SKETCH_SIZE,
+    top_k: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Extract keywords across many documents in a single pass.
     
-    # Combine single words and phrases
-    all_counts = {**word_counts, **phrase_counts}
+    Args:
+        texts: Document texts (any iterable, e.g. a generator over the library)
+        min_count: Minimum count for a keyword to be included
+        max_words: Maximum words in a keyword phrase
+        language: Language of stopwords to use
+        custom_stopwords: Additional stopwords to exclude
+        capacity: Number of keywords and phrases tracked (bounds memory use)
+        top_k: Maximum number of keywords to return (None for all tracked)
     
-    # Filter by minimum count
-    keywords = {k: v for k, v in all_counts.items() if v >= min_count}
+    Returns:
+        Dictionary of keywords and their counts, most frequent first
+    """
+    extractor = KeywordExtractor(
+        max_words=max_words,
+        capacity=capacity,
+        language=language,
+        custom_stopwords=custom_stopwords
+    )
+    extractor.add_texts(texts)
     
-    return keywords
+    logger.debug(f"Scored keywords of {extractor.document_count} documents")
+    return extractor.keywords(min_count, top_k)
 
 def get_word_frequencies(
     text: str,
@@ -127,9 +403,9 @@ def get_word_frequencies(
     # Get stopwords for the specified language
     stopwords = STOPWORDS.get(language.lower(), set())
     
-    # Add custom stopwords if provided
+    # Add custom stopwords if provided (without modifying the shared set)
     if custom_stopwords:
-        stopwords.update(custom_stopwords)
+        stopwords = stopwords | set(custom_stopwords)
     
     # Clean and normalize text
     text = text.lower()
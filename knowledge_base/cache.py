@@ -0,0 +1,165 @@
+"""
+In-memory caches for the knowledge base.
+Query embeddings and search results are kept in small LRU caches so repeated
+queries (e.g. Streamlit reruns of the same chat turn) skip the embedding model
+and the index.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from knowledge_base.config import DEFAULT_QUERY_EMBEDDING_CACHE_SIZE
+
+# Sentinel distinguishing a cached None from a miss
+_MISSING = object()
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+    """
+    
+    def __init__(self, max_size: int):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_size: Maximum number of entries (0 disables caching)
+        """
+        self.max_size = max(0, int(max_size))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get an entry and mark it as recently used.
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+        
+        Returns:
+            Cached value, or default if the key is not cached
+        """
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store an entry, evicting the least recently used ones beyond max_size.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if self.max_size == 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all entries (the hit/miss counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with size, max_size, hits, misses and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+# Query embeddings are shared by every store using the same embedding model
+_query_embedding_cache = LRUCache(DEFAULT_QUERY_EMBEDDING_CACHE_SIZE)
+
+def get_query_embedding_cache() -> LRUCache:
+    """
+    Get the process-wide query embedding cache.
+    
+    Returns:
+        LRUCache keyed by (model, normalized query)
+    """
+    return _query_embedding_cache
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for use in cache keys (trimmed, single-spaced).
+    
+    Args:
+        query: Query string
+    
+    Returns:
+        Normalized query
+    """
+    return " ".join(query.split())
+
+def embedding_model_key(embedding_function: Callable) -> str:
+    """
+    Identify the model behind an embedding function, for cache keys.
+    
+    Embedding functions expose ``model_name`` when it is known; anything else
+    is keyed by the function object itself, so unrelated functions never share
+    cached vectors.
+    
+    Args:
+        embedding_function: Embedding function
+    
+    Returns:
+        Model key
+    """
+    model_name = getattr(embedding_function, "model_name", None)
+    if model_name:
+        return str(model_name)
+    
+    name = getattr(embedding_function, "__qualname__", type(embedding_function).__qualname__)
+    return f"{name}@{id(embedding_function):x}"
+
+def search_cache_key(
+    kind: str,
+    query: str,
+    limit: int,
+    where: Optional[Dict[str, Any]],
+    generation: int
+) -> tuple:
+    """
+    Build the key of a cached search result.
+    
+    Args:
+        kind: Kind of search ('vector' or 'keyword')
+        query: Search query
+        limit: Maximum number of results
+        where: Filter condition
+        generation: Store generation the results were computed at
+    
+    Returns:
+        Hashable cache key
+    """
+    where_key = json.dumps(where, sort_keys=True, default=str) if where else ""
+    return (kind, normalize_query(query), int(limit), where_key, generation)
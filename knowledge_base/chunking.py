@@ -4,9 +4,11 @@ Provides functions for chunking text for the knowledge base.
 """
 
 import re
-from typing import List, Dict, Any, Optional, Union, Tuple
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterable, Iterator, NamedTuple
 
 from utils.logger import get_logger
+from core.config import PAGE_BREAK
 from knowledge_base.config import (
     DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, DEFAULT_SPLIT_BY
 )
@@ -14,199 +16,195 @@ from knowledge_base.config import (
 # Initialize logger
 logger = get_logger(__name__)
 
-def chunk_text(
-    text: str,
+# Separator assumed between pages passed as a list
+DEFAULT_PAGE_SEPARATOR = "\n\n"
+
+# Paragraph breaks (blank lines) and sentence ends (terminal punctuation, optionally
+# closed by quotes or brackets, followed by whitespace), found in one scan
+BOUNDARY_PATTERN = re.compile(r"(?P<paragraph>\n[ \t]*\n)|(?P<sentence>[.!?][\"')\]\u201d\u2019]*(?=\s))")
+
+class TextChunk(NamedTuple):
+    """A chunk of text and where it came from."""
+    text: str
+    start: int  # Offset of the first character in the page-joined document
+    end: int  # Offset just past the last character
+    page: int  # Page (1-based) on which the chunk starts
+
+def iter_text_chunks(
+    pages: Union[str, Iterable[str]],
     chunk_size: int = DEFAULT_CHUNK_SIZE,
     chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
-    split_by: str = DEFAULT_SPLIT_BY
-) -> List[str]:
+    split_by: str = DEFAULT_SPLIT_BY,
+    page_separator: str = DEFAULT_PAGE_SEPARATOR
+) -> Iterator[TextChunk]:
     """
-    Split text into chunks with enhanced handling for various text formats.
+    Lazily split text into chunks, keeping exact offsets.
+    
+    Pages are consumed one at a time and scanned once for paragraph and
+    sentence boundaries, so only the current page and the unfinished chunk
+    are held in memory. Each chunk ends at the last preferred boundary in
+    the second half of its window (paragraph, then sentence, then
+    whitespace), falling back to a hard cut. Chunk text is a slice of the
+    original text, so ``document[chunk.start:chunk.end] == chunk.text`` where
+    ``document = page_separator.join(pages)``.
     
     Args:
-        text: Text to split
+        pages: Text of the document, either whole or as an iterable of pages
         chunk_size: Maximum chunk size in characters
         chunk_overlap: Overlap between chunks in characters
-        split_by: How to split the text ('paragraph', 'sentence', 'character', 'hybrid')
-        
-    Returns:
-        List of text chunks
+        split_by: Preferred boundaries ('paragraph', 'sentence', 'hybrid' and
+            'auto' prefer paragraphs; 'character' ignores boundaries)
+        page_separator: Text assumed between consecutive pages
+    
+    Yields:
+        TextChunk tuples in document order
     """
-    if not text:
-        logger.warning("Attempted to chunk empty text")
-        return []
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError("chunk_overlap must be non-negative and smaller than chunk_size")
     
-    # Clean text before chunking to ensure consistent patterns
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    if isinstance(pages, str):
+        pages = [pages]
     
-    # Restore paragraph breaks
-    text = re.sub(r'(\. |\? |! )([A-Z])', r'.\n\n\2', text)
+    use_boundaries = split_by != "character"
+    prefer_paragraphs = split_by in ("paragraph", "hybrid", "auto")
     
-    # Log text length for debugging
-    logger.info(f"Chunking text of length {len(text)} with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}, split_by={split_by}")
+    # Unconsumed text and the document offset of its first character
+    buffer = ""
+    buffer_start = 0
+    text_end = 0
+    
+    # Document offsets of page starts and of candidate chunk ends
+    page_starts: List[int] = []
+    paragraph_ends: List[int] = []
+    sentence_ends: List[int] = []
+    
+    # Where the next chunk starts
+    position = 0
+    
+    def skip_whitespace(offset: int) -> int:
+        while offset < text_end and buffer[offset - buffer_start].isspace():
+            offset += 1
+        return offset
+    
+    def last_boundary(boundaries: List[int], low: int, high: int) -> Optional[int]:
+        index = bisect_right(boundaries, high) - 1
+        if index >= 0 and boundaries[index] > low:
+            return boundaries[index]
+        return None
     
-    # Auto-detect the best splitting method based on content
-    if split_by == "auto":
-        # Count paragraphs
-        paragraph_count = len(re.split(r'\n\s*\n', text))
-        # Count sentences
-        sentence_count = len(re.split(r'(?<=[.!?])\s', text))
+    def next_chunk(final: bool) -> Optional[TextChunk]:
+        nonlocal position
         
-        logger.info(f"Text has approximately {paragraph_count} paragraphs and {sentence_count} sentences")
+        position = skip_whitespace(position)
+        limit = position + chunk_size
+        if position >= text_end or (limit >= text_end and not final):
+            return None
         
-        # Choose method based on content structure
-        if paragraph_count > 5:
-            split_by = "paragraph"
-            logger.info("Auto-selected paragraph splitting method")
-        elif sentence_count > 10:
-            split_by = "sentence"
-            logger.info("Auto-selected sentence splitting method")
+        if limit >= text_end:
+            cut = text_end
         else:
-            split_by = "character"
-            logger.info("Auto-selected character splitting method")
-    
-    # Define split patterns based on split_by
-    if split_by == "paragraph":
-        # Split by double newline (paragraph)
-        split_pattern = r'\n\s*\n'
-    elif split_by == "sentence":
-        # Split by sentence-ending punctuation followed by space or newline
-        split_pattern = r'(?<=[.!?])\s'
-    elif split_by == "character":
-        # Split by character count without respect to boundaries
-        chunks = []
-        for i in range(0, len(text), chunk_size - chunk_overlap):
-            chunk = text[i:i + chunk_size].strip()
-            if chunk:  # Only add non-empty chunks
-                chunks.append(chunk)
+            cut = None
+            if use_boundaries:
+                # Only cut in the second half of the window, so chunks stay reasonably full
+                low = position + chunk_size // 2
+                if prefer_paragraphs:
+                    cut = last_boundary(paragraph_ends, low, limit)
+                if cut is None:
+                    candidates = [last_boundary(paragraph_ends, low, limit), last_boundary(sentence_ends, low, limit)]
+                    candidates = [candidate for candidate in candidates if candidate is not None]
+                    cut = max(candidates) if candidates else None
+                if cut is None:
+                    space = max(buffer.rfind(char, low - buffer_start, limit - buffer_start) for char in " \n\t")
+                    cut = space + buffer_start if space >= 0 else None
+            if cut is None:
+                cut = limit
         
-        logger.info(f"Character-based chunking created {len(chunks)} chunks")
-        return chunks
-    elif split_by == "hybrid":
-        # Try paragraph splitting first
-        segments = re.split(r'\n\s*\n', text)
-        segments = [s.strip() for s in segments if s.strip()]
+        end = cut
+        while end > position and buffer[end - 1 - buffer_start].isspace():
+            end -= 1
         
-        # If paragraphs are too large, split them into sentences
-        processed_segments = []
-        for segment in segments:
-            if len(segment) > chunk_size:
-                # Split large paragraphs into sentences
-                sentences = re.split(r'(?<=[.!?])\s', segment)
-                sentences = [s.strip() for s in sentences if s.strip()]
-                processed_segments.extend(sentences)
-            else:
-                processed_segments.append(segment)
+        chunk = TextChunk(
+            buffer[position - buffer_start:end - buffer_start],
+            position,
+            end,
+            bisect_right(page_starts, position)
+        )
         
-        segments = processed_segments
-        logger.info(f"Hybrid chunking created {len(segments)} initial segments")
-    else:
-        # Default to paragraph splitting
-        split_pattern = r'\n\s*\n'
-        logger.info(f"Using default paragraph splitting method")
-    
-    # Split text by pattern (except for character and hybrid methods)
-    segments = []
-    if split_by not in ["character", "hybrid"]:
-        segments = re.split(split_pattern, text)
-        segments = [s.strip() for s in segments if s.strip()]
-    
-    # Handle case where splitting produced no segments (common with PDFs)
-    if not segments:
-        logger.warning(f"Splitting with method '{split_by}' produced no segments, falling back to character method")
-        # Fall back to character-based chunking
-        chunks = []
-        for i in range(0, len(text), chunk_size - chunk_overlap):
-            chunk = text[i:i + chunk_size].strip()
-            if chunk:  # Only add non-empty chunks
-                chunks.append(chunk)
+        # Start the next chunk chunk_overlap characters back, at a word start if possible
+        next_position = cut
+        if chunk_overlap and cut - position > chunk_overlap and cut < text_end:
+            next_position = cut - chunk_overlap
+            if use_boundaries:
+                spaces = [buffer.find(char, next_position - buffer_start, cut - buffer_start) for char in " \n\t"]
+                spaces = [space for space in spaces if space >= 0]
+                if spaces:
+                    next_position = min(spaces) + buffer_start + 1
+        position = next_position
         
-        logger.info(f"Fallback character-based chunking created {len(chunks)} chunks")
-        return chunks
+        return chunk
     
-    chunks = []
-    current_chunk = ""
-    
-    for segment in segments:
-        # Skip empty segments
-        if not segment.strip():
-            continue
-            
-        # If adding segment exceeds chunk size and we already have content,
-        # add current chunk to list and start a new one
-        if len(current_chunk) + len(segment) > chunk_size and current_chunk:
-            chunks.append(current_chunk)
-            
-            # Start new chunk with overlap if possible
-            if chunk_overlap > 0 and len(current_chunk) > chunk_overlap:
-                # Try to find a clean break point for the overlap
-                overlap_text = current_chunk[-chunk_overlap:]
-                
-                # Find a space to break at in the overlap region
-                space_pos = overlap_text.find(' ')
-                if space_pos > 0:
-                    current_chunk = current_chunk[-(chunk_overlap - space_pos):]
-                else:
-                    current_chunk = current_chunk[-chunk_overlap:]
-            else:
-                current_chunk = ""
+    for page in pages:
+        separator = page_separator if page_starts else ""
+        page_start = text_end + len(separator)
+        page_starts.append(page_start)
+        
+        # Drop the consumed text and append the new page
+        buffer = buffer[position - buffer_start:] + separator + page
+        buffer_start = position
+        text_end = page_start + len(page)
         
-        # If the segment itself is larger than the chunk size, we need to split it
-        if len(segment) > chunk_size:
-            # First add any current chunk if it exists
-            if current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = ""
-            
-            # Split the large segment into smaller chunks of chunk_size with overlap
-            for i in range(0, len(segment), chunk_size - chunk_overlap):
-                sub_chunk = segment[i:i + chunk_size]
-                if i + chunk_size >= len(segment):  # This is the last sub-chunk
-                    current_chunk = sub_chunk
+        # Forget boundaries that can no longer end a chunk
+        del paragraph_ends[:bisect_left(paragraph_ends, position)]
+        del sentence_ends[:bisect_left(sentence_ends, position)]
+        
+        if use_boundaries:
+            if separator:
+                paragraph_ends.append(page_start - len(separator))
+            for match in BOUNDARY_PATTERN.finditer(page):
+                if match.lastgroup == "paragraph":
+                    paragraph_ends.append(page_start + match.start())
                 else:
-                    chunks.append(sub_chunk)
-        else:
-            # Add segment to current chunk
-            if current_chunk:
-                current_chunk += " " + segment
-            else:
-                current_chunk = segment
-            
-            # If current chunk is already at/over chunk size, add it and reset
-            if len(current_chunk) >= chunk_size:
-                chunks.append(current_chunk)
-                current_chunk = ""
-    
-    # Add any remaining content
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    # Handle empty result
-    if not chunks:
-        # If no chunks were created, create at least one with the original text,
-        # truncated if needed
-        logger.warning("Chunking process created no chunks, falling back to basic truncation")
-        chunks = [text[:chunk_size]]
+                    sentence_ends.append(page_start + match.end())
+        
+        chunk = next_chunk(final=False)
+        while chunk is not None:
+            yield chunk
+            chunk = next_chunk(final=False)
     
-    # Ensure minimum chunk size
-    MIN_VIABLE_CHUNK_SIZE = 50  # Minimum number of characters to be considered a valid chunk
-    chunks = [chunk for chunk in chunks if len(chunk) >= MIN_VIABLE_CHUNK_SIZE]
+    chunk = next_chunk(final=True)
+    while chunk is not None:
+        yield chunk
+        chunk = next_chunk(final=True)
+
+def chunk_text(
+    text: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    split_by: str = DEFAULT_SPLIT_BY
+) -> List[str]:
+    """
+    Split text into chunks.
     
-    # If we removed all chunks due to minimum size, keep at least one
-    if not chunks and text:
-        chunks = [text[:chunk_size]]
+    Args:
+        text: Text to split
+        chunk_size: Maximum chunk size in characters
+        chunk_overlap: Overlap between chunks in characters
+        split_by: How to split the text ('paragraph', 'sentence', 'character', 'hybrid', 'auto')
+        
+    Returns:
+        List of text chunks
+    """
+    if not text:
+        logger.warning("Attempted to chunk empty text")
+        return []
     
-    logger.info(f"Chunked text into {len(chunks)} chunks (min size={MIN_VIABLE_CHUNK_SIZE})")
+    logger.info(f"Chunking text of length {len(text)} with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}, split_by={split_by}")
     
-    # Log the size distribution of chunks for debugging
-    if chunks:
-        chunk_sizes = [len(chunk) for chunk in chunks]
-        avg_size = sum(chunk_sizes) / len(chunks)
-        min_size = min(chunk_sizes)
-        max_size = max(chunk_sizes)
-        logger.info(f"Chunk size distribution - avg: {avg_size:.1f}, min: {min_size}, max: {max_size}")
+    chunks = [chunk.text for chunk in iter_text_chunks(text, chunk_size, chunk_overlap, split_by)]
     
+    logger.info(f"Chunked text into {len(chunks)} chunks")
     return chunks
 
 def chunk_document(
@@ -218,8 +216,13 @@ def chunk_document(
     """
     Chunk a document into smaller parts.
     
+    Each chunk records where it came from: ``start_char`` and ``end_char``
+    (offsets in the document text) and ``page`` (1-based). Page breaks
+    (``PAGE_BREAK``) in the text start new pages, so chunks of extracted PDF
+    text keep their page numbers.
+    
     Args:
-        document: Document to chunk
+        document: Document to chunk, with "text" or a list of "pages"
         chunk_size: Maximum chunk size in characters
         chunk_overlap: Overlap between chunks in characters
         split_by: How to split the text ('paragraph', 'sentence', 'character')
@@ -227,32 +230,31 @@ def chunk_document(
     Returns:
         List of document chunks with metadata
     """
-    if not document or "text" not in document:
+    if not document or ("text" not in document and "pages" not in document):
         return []
     
-    text = document["text"]
+    pages = document.get("pages")
+    page_separator = DEFAULT_PAGE_SEPARATOR
+    if not pages:
+        text = document.get("text") or ""
+        pages = text.split(PAGE_BREAK)
+        page_separator = PAGE_BREAK
     metadata = document.get("metadata", {})
     
     # Get document ID
     doc_id = document.get("id") or metadata.get("id")
     
-    # Chunk the text
-    text_chunks = chunk_text(
-        text,
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        split_by=split_by
-    )
-    
     # Create chunks with metadata
     chunks = []
-    for i, chunk_content in enumerate(text_chunks):
+    for i, text_chunk in enumerate(iter_text_chunks(pages, chunk_size, chunk_overlap, split_by, page_separator)):
         # Clone metadata for each chunk
         chunk_metadata = metadata.copy()
         
         # Add chunk-specific metadata
         chunk_metadata["chunk_index"] = i
-        chunk_metadata["chunk_count"] = len(text_chunks)
+        chunk_metadata["start_char"] = text_chunk.start
+        chunk_metadata["end_char"] = text_chunk.end
+        chunk_metadata["page"] = text_chunk.page
         
         if doc_id:
             chunk_metadata["document_id"] = doc_id
@@ -260,11 +262,14 @@ def chunk_document(
         # Create chunk document
         chunk = {
             "id": f"{doc_id}_chunk_{i}" if doc_id else f"chunk_{i}",
-            "text": chunk_content,
+            "text": text_chunk.text,
             "metadata": chunk_metadata
         }
         
         chunks.append(chunk)
     
+    for chunk in chunks:
+        chunk["metadata"]["chunk_count"] = len(chunks)
+    
     logger.info(f"Created {len(chunks)} document chunks")
     return chunks
\ No newline at end of file
@@ -14,9 +14,32 @@ DEFAULT_VECTOR_STORE = "faiss"
 # Vector store options
 VECTOR_STORE_OPTIONS = ["faiss", "chromadb", "annoy", "simple"]
 
+# FAISS index settings
+FAISS_INDEX_TYPES = ["flat", "ivf_flat", "ivf_pq", "hnsw"]
+DEFAULT_FAISS_INDEX_TYPE = "flat"
+DEFAULT_FAISS_NLIST = 256  # Number of IVF cells
+DEFAULT_FAISS_NPROBE = 16  # IVF cells visited per query (higher = better recall, slower)
+DEFAULT_FAISS_TRAIN_POINTS_PER_LIST = 39  # Vectors per IVF cell required before training
+DEFAULT_FAISS_PQ_M = 16  # Number of PQ sub-quantizers (must divide the embedding dimension)
+DEFAULT_FAISS_PQ_NBITS = 8  # Bits per PQ sub-quantizer code
+DEFAULT_FAISS_HNSW_M = 32  # Neighbors per HNSW node
+DEFAULT_FAISS_EF_CONSTRUCTION = 200  # HNSW build-time candidate list size
+DEFAULT_FAISS_EF_SEARCH = 64  # HNSW query-time candidate list size (higher = better recall, slower)
+DEFAULT_FAISS_TOMBSTONE_RATIO = 0.2  # Fraction of deleted HNSW vectors that triggers a compaction
+
+# Annoy index settings
+DEFAULT_ANNOY_BUFFER_SIZE = 1000  # Fresh items searched by brute force before they are sealed into a segment
+DEFAULT_ANNOY_MAX_SEGMENTS = 8  # Sealed segments allowed before a compaction merges the smallest ones
+DEFAULT_ANNOY_TOMBSTONE_RATIO = 0.2  # Fraction of deleted items that triggers a segment compaction
+
 # Embedding settings
 DEFAULT_EMBEDDING_DIMENSION = 384  # Default embedding dimension
 DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Default sentence-transformers model
+DEFAULT_EMBEDDING_BATCH_SIZE = 64  # Number of chunks passed to the embedding function per call
+DEFAULT_QUERY_EMBEDDING_CACHE_SIZE = 1024  # Query embeddings kept in memory, shared by all stores
+DEFAULT_USE_EMBEDDING_CACHE = True  # Reuse chunk embeddings stored on disk instead of re-running the model
+DEFAULT_EMBEDDING_CACHE_DIR = "./knowledge_base_data/embedding_cache"
+DEFAULT_EMBEDDING_CACHE_SHARD_ROWS = 65536  # Vectors per memory-mapped shard file
 
 # Chunking settings
 DEFAULT_CHUNK_SIZE = 500
@@ -24,11 +47,30 @@ DEFAULT_CHUNK_OVERLAP = 50
 
 # Search settings
 DEFAULT_SEARCH_LIMIT = 5
+DEFAULT_FILTER_EXACT_SEARCH_LIMIT = 4096  # Filtered searches with at most this many candidates are scored exactly
 DEFAULT_SEARCH_THRESHOLD = 0.2
+SEARCH_MODES = ["vector", "keyword", "hybrid"]
+DEFAULT_SEARCH_MODE = "hybrid"
+DEFAULT_HYBRID_CANDIDATES = 4  # Each ranking fetches this many times the result limit before fusion
+DEFAULT_RRF_K = 60  # Reciprocal-rank fusion constant (higher flattens the rank weighting)
+DEFAULT_SEARCH_CACHE_SIZE = 256  # Search results kept per store until the next add, delete or reset
+
+# Ingestion queue settings
+DEFAULT_INGESTION_DB = "./knowledge_base_data/ingestion.sqlite"
+DEFAULT_INGESTION_WORK_DIR = "./knowledge_base_data/ingestion"  # Stage outputs of unfinished jobs
+DEFAULT_INGESTION_WORKERS = 2  # Jobs processed concurrently (indexing itself is serialized)
+DEFAULT_INGESTION_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before checking for new jobs
+
+# Rebuild settings
+REBUILD_MODES = ["side_by_side", "in_place"]
+DEFAULT_REBUILD_MODE = "side_by_side"  # Build a fresh index next to the live one and swap it in when done
+DEFAULT_REBUILD_WORKERS = 4  # Books chunked and embedded concurrently
+DEFAULT_REBUILD_CHECKPOINT_BOOKS = 20  # Books indexed between saves of the new index
 
 # Analytics settings
 DEFAULT_KEYWORD_MIN_COUNT = 2
-DEFAULT_KEYWORD_MAX_WORDS = 100
+DEFAULT_KEYWORD_MAX_WORDS = 3  # Longest keyword phrase (n-gram length)
+DEFAULT_KEYWORD_SKETCH_SIZE = 10000  # Phrases tracked by the top-k keyword sketch
 DEFAULT_STOPWORDS_LANGUAGE = "english"
 
 # Splitting settings
@@ -9,7 +9,8 @@ import importlib.util
 from typing import List, Dict, Any, Optional, Union, Callable, TypeVar, Tuple
 
 from utils.logger import get_logger
-from knowledge_base.config import DEFAULT_EMBEDDING_DIMENSION
+from knowledge_base.config import DEFAULT_EMBEDDING_DIMENSION, DEFAULT_USE_EMBEDDING_CACHE
+from knowledge_base.embedding_cache import CachedEmbeddingFunction
 from core.exceptions import EmbeddingError
 from ai.utils import create_fallback_embedding as create_ai_fallback_embedding
 
@@ -35,6 +36,7 @@ class SimpleEmbedding:
             dimension: Embedding dimension
         """
         self.dimension = dimension
+        self.model_name = f"simple-{dimension}"
         logger.warning("Using SimpleEmbedding for development/testing only")
     
     def __call__(self, texts: Union[str, List[str]]) -> EmbeddingVector:
@@ -103,7 +105,8 @@ def check_embedding_dependencies() -> Tuple[bool, str]:
 
 def get_embedding_function(
     model_name: Optional[str] = None,
-    force_simple: bool = False
+    force_simple: bool = False,
+    use_cache: bool = DEFAULT_USE_EMBEDDING_CACHE
 ) -> Callable:
     """
     Get an embedding function based on the model name.
@@ -111,10 +114,18 @@ def get_embedding_function(
     Args:
         model_name: Name of the embedding model to use
         force_simple: If True, force use of SimpleEmbedding
+        use_cache: If True, read and write the persistent embedding cache
         
     Returns:
         Embedding function
     """
+    embedding_function = _load_embedding_function(model_name, force_simple)
+    if use_cache:
+        return CachedEmbeddingFunction(embedding_function)
+    return embedding_function
+
+def _load_embedding_function(model_name: Optional[str], force_simple: bool) -> Callable:
+    """Load the embedding function of the best available library."""
     if force_simple:
         logger.info("Using SimpleEmbedding as requested")
         return SimpleEmbedding()
@@ -144,6 +155,7 @@ def get_embedding_function(
                 else:
                     return encoder.encode(texts).tolist()
                     
+            sentence_transformer_embedder.model_name = f"sentence_transformers:{model}"
             return sentence_transformer_embedder
             
         elif library == "langchain":
@@ -162,6 +174,7 @@ def get_embedding_function(
                 else:
                     return encoder.embed_documents(texts)
                     
+            langchain_embedder.model_name = f"langchain:{model}"
             return langchain_embedder
             
         elif library == "transformers":
@@ -190,6 +203,7 @@ def get_embedding_function(
                         embeddings.append(embedding)
                     return embeddings
             
+            transformers_embedder.model_name = f"transformers:{model}"
             return transformers_embedder
         
         else:
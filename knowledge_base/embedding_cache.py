@@ -0,0 +1,390 @@
+"""
+Persistent embedding cache for Book Knowledge AI.
+Chunk embeddings are stored on disk keyed by (embedding model, sha256 of the
+text), so re-indexing a book, changing a vector store backend or rebuilding an
+index reads vectors back instead of running the model again.
+
+Vectors live in append-only float32 shard files read through memory maps; a
+small SQLite index maps each (model, digest) to its shard and row.
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Callable, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.logger import get_logger
+from knowledge_base.config import DEFAULT_EMBEDDING_CACHE_DIR, DEFAULT_EMBEDDING_CACHE_SHARD_ROWS
+
+logger = get_logger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_MAX_PARAMS = 900
+
+# Storage type of the shard files
+VECTOR_DTYPE = np.dtype("<f4")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_shards (
+    model TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    dimension INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (model, shard)
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    shard INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (model, digest)
+) WITHOUT ROWID;
+"""
+
+def text_digest(text: str) -> bytes:
+    """
+    Get the content address of a text.
+    
+    Args:
+        text: Text to hash
+    
+    Returns:
+        SHA-256 digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk store of embedding vectors.
+    
+    Shards are only ever appended to. The row count recorded in the index is
+    authoritative, so vectors written to a shard by an interrupted call are
+    overwritten by the next append rather than read back.
+    """
+    
+    def __init__(self, path: str = DEFAULT_EMBEDDING_CACHE_DIR, shard_rows: int = DEFAULT_EMBEDDING_CACHE_SHARD_ROWS):
+        """
+        Open (or create) the cache.
+        
+        Args:
+            path: Directory holding the index and shard files
+            shard_rows: Maximum number of vectors per shard file
+        """
+        self.path = path
+        self.shard_rows = max(1, int(shard_rows))
+        os.makedirs(path, exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._maps: Dict[Tuple[str, int], np.memmap] = {}
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Close the index and drop the shard memory maps."""
+        with self._lock:
+            self._maps.clear()
+            self._conn.close()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def _shard_path(self, model: str, shard: int) -> str:
+        """Get the file of a shard (model names are hashed to keep file names safe)."""
+        model_key = hashlib.sha256(model.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.path, f"{model_key}_{shard:05d}.f32")
+    
+    def _shard_map(self, model: str, shard: int, rows: int, dimension: int) -> np.memmap:
+        """Get a read-only memory map covering at least ``rows`` vectors of a shard."""
+        key = (model, shard)
+        mapped = self._maps.get(key)
+        if mapped is None or mapped.shape[0] < rows:
+            mapped = np.memmap(self._shard_path(model, shard), dtype=VECTOR_DTYPE, mode="r", shape=(rows, dimension))
+            self._maps[key] = mapped
+        return mapped
+    
+    def _lookup(self, model: str, digests: Sequence[bytes]) -> Dict[bytes, Tuple[int, int]]:
+        """Map the cached digests to their (shard, row)."""
+        locations = {}
+        for start in range(0, len(digests), _MAX_PARAMS):
+            batch = list(digests[start:start + _MAX_PARAMS])
+            placeholders = ",".join("?" * len(batch))
+            cursor = self._conn.execute(
+                f"SELECT digest, shard, row FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                (model, *batch)
+            )
+            for digest, shard, row in cursor:
+                locations[bytes(digest)] = (shard, row)
+        return locations
+    
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Read cached embeddings.
+        
+        Args:
+            model: Embedding model name
+            texts: Texts whose embeddings to read
+        
+        Returns:
+            List aligned with ``texts`` of float32 vectors (None where not cached)
+        """
+        digests = [text_digest(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        if not texts:
+            return vectors
+        
+        with self._lock:
+            locations = self._lookup(model, list(dict.fromkeys(digests)))
+            if not locations:
+                return vectors
+            
+            shards = {
+                shard: (dimension, rows)
+                for shard, dimension, rows in self._conn.execute(
+                    "SELECT shard, dimension, rows FROM embedding_shards WHERE model = ?",
+                    (model,)
+                )
+            }
+            
+            # Read every shard's hits with one fancy-indexing call
+            by_shard: Dict[int, List[int]] = {}
+            for position, digest in enumerate(digests):
+                location = locations.get(digest)
+                if location is not None:
+                    by_shard.setdefault(location[0], []).append(position)
+            
+            for shard, positions in by_shard.items():
+                dimension, rows = shards[shard]
+                try:
+                    mapped = self._shard_map(model, shard, rows, dimension)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Embedding cache shard {shard} of model '{model}' is unreadable: {str(e)}")
+                    continue
+                
+                block = np.array(mapped[[locations[digests[p]][1] for p in positions]])
+                for position, vector in zip(positions, block):
+                    vectors[position] = vector
+        
+        return vectors
+    
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Any]) -> int:
+        """
+        Store embeddings that are not cached yet.
+        
+        Args:
+            model: Embedding model name
+            texts: Embedded texts
+            vectors: Embedding of each text (None or invalid vectors are skipped)
+        
+        Returns:
+            Number of vectors written
+        """
+        with self._lock:
+            # Keep one valid vector per new digest
+            pending: Dict[bytes, np.ndarray] = {}
+            for text, vector in zip(texts, vectors):
+                if vector is None or len(vector) == 0:
+                    continue
+                digest = text_digest(text)
+                if digest in pending:
+                    continue
+                vector = np.asarray(vector, dtype=VECTOR_DTYPE).ravel()
+                if not np.isfinite(vector).all():
+                    continue
+                pending[digest] = vector
+            
+            for digest in self._lookup(model, list(pending)):
+                del pending[digest]
+            if not pending:
+                return 0
+            
+            # Group by dimension; a model always produces one, but stay safe
+            by_dimension: Dict[int, List[Tuple[bytes, np.ndarray]]] = {}
+            for digest, vector in pending.items():
+                by_dimension.setdefault(len(vector), []).append((digest, vector))
+            
+            with self._conn:
+                for dimension, items in by_dimension.items():
+                    self._append(model, dimension, items)
+            
+            return len(pending)
+    
+    def _append(self, model: str, dimension: int, items: List[Tuple[bytes, np.ndarray]]) -> None:
+        """Append vectors to the model's open shards and index them (inside the caller's transaction)."""
+        row = self._conn.execute(
+            "SELECT shard, dimension, rows FROM embedding_shards WHERE model = ? ORDER BY shard DESC LIMIT 1",
+            (model,)
+        ).fetchone()
+        if row is None:
+            shard, rows = 0, 0
+        elif row[1] != dimension or row[2] >= self.shard_rows:
+            shard, rows = row[0] + 1, 0
+        else:
+            shard, rows = row[0], row[2]
+        
+        start = 0
+        while start < len(items):
+            take = min(len(items) - start, self.shard_rows - rows)
+            batch = items[start:start + take]
+            block = np.stack([vector for _, vector in batch]).astype(VECTOR_DTYPE, copy=False)
+            
+            # Write at the committed end of the shard (not the file end) before indexing
+            path = self._shard_path(model, shard)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(rows * dimension * VECTOR_DTYPE.itemsize)
+                f.write(block.tobytes())
+            
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, digest, shard, row) VALUES (?, ?, ?, ?)",
+                ((model, digest, shard, rows + offset) for offset, (digest, _) in enumerate(batch))
+            )
+            self._conn.execute(
+                """
+                INSERT INTO embedding_shards (model, shard, dimension, rows) VALUES (?, ?, ?, ?)
+                ON CONFLICT(model, shard) DO UPDATE SET rows = excluded.rows
+                """,
+                (model, shard, dimension, rows + take)
+            )
+            
+            start += take
+            shard, rows = shard + 1, 0
+    
+    def clear(self, model: Optional[str] = None) -> None:
+        """
+        Remove cached embeddings.
+        
+        Args:
+            model: Model whose embeddings to remove (None for all models)
+        """
+        with self._lock, self._conn:
+            if model is None:
+                shards = self._conn.execute("SELECT model, shard FROM embedding_shards").fetchall()
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.execute("DELETE FROM embedding_shards")
+            else:
+                shards = self._conn.execute(
+                    "SELECT model, shard FROM embedding_shards WHERE model = ?", (model,)
+                ).fetchall()
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+                self._conn.execute("DELETE FROM embedding_shards WHERE model = ?", (model,))
+            
+            for shard_model, shard in shards:
+                self._maps.pop((shard_model, shard), None)
+                path = self._shard_path(shard_model, shard)
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with the number of cached vectors per model
+        """
+        with self._lock:
+            models = dict(self._conn.execute("SELECT model, COUNT(*) FROM embeddings GROUP BY model").fetchall())
+        return {"vector_count": sum(models.values()), "models": models}
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Get the process-wide embedding cache in the default directory.
+    
+    Returns:
+        EmbeddingCache instance
+    """
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+class CachedEmbeddingFunction:
+    """
+    Embedding function that reads and writes the persistent embedding cache.
+    
+    Only texts missing from the cache reach the wrapped function. Functions
+    without a ``model_name`` cannot be keyed on disk and are called directly.
+    """
+    
+    def __init__(self, embedding_function: Callable, cache: Optional[EmbeddingCache] = None):
+        """
+        Wrap an embedding function.
+        
+        Args:
+            embedding_function: Function embedding a text or a list of texts
+            cache: Cache to use (defaults to the process-wide cache)
+        """
+        self.wrapped = embedding_function
+        self.model_name = getattr(embedding_function, "model_name", None)
+        self._cache = cache
+    
+    @property
+    def cache(self) -> EmbeddingCache:
+        """The embedding cache, opened on first use."""
+        if self._cache is None:
+            self._cache = get_embedding_cache()
+        return self._cache
+    
+    def __call__(self, texts: Union[str, List[str]]) -> Any:
+        """
+        Embed a text or a list of texts, reusing cached vectors.
+        
+        Args:
+            texts: Single text or list of texts to embed
+        
+        Returns:
+            Embedding as a list of floats, or a list of them
+        """
+        if not self.model_name:
+            return self.wrapped(texts)
+        
+        if isinstance(texts, str):
+            return self._embed_list([texts], single=True)[0]
+        return self._embed_list(list(texts))
+    
+    def _embed_list(self, texts: List[str], single: bool = False) -> List[Any]:
+        """Embed texts, calling the wrapped function only for the distinct cache misses."""
+        try:
+            vectors = self.cache.get_many(self.model_name, texts)
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed, embedding directly: {str(e)}")
+            vectors = [None] * len(texts)
+        
+        results = [vector.tolist() if vector is not None else None for vector in vectors]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if not missing:
+            return results
+        
+        # A single text keeps the wrapped function's single-input call
+        if single:
+            embedded = [self.wrapped(missing[0])]
+        else:
+            embedded = self.wrapped(missing)
+            if embedded is None or len(embedded) != len(missing):
+                return self.wrapped(texts)
+            embedded = list(embedded)
+        
+        embedded = [
+            vector.tolist() if isinstance(vector, np.ndarray) else vector
+            for vector in embedded
+        ]
+        
+        try:
+            self.cache.put_many(self.model_name, missing, embedded)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+        
+        computed = dict(zip(missing, embedded))
+        return [
+            result if result is not None else computed[text]
+            for text, result in zip(texts, results)
+        ]
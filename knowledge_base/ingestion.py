@@ -0,0 +1,741 @@
+"""
+Background ingestion queue for Book Knowledge AI.
+Adding a book to (or removing it from) the knowledge base is recorded as a job
+in a SQLite table and processed by a pool of worker threads, so the UI never
+waits for a large book to be chunked and embedded.
+
+An add job runs four stages: extract (read the book text), chunk, embed (fill
+the persistent embedding cache) and index. Each stage writes its output to the
+job's work directory before it is marked complete, so a job interrupted by a
+pause, a crash or a restart continues after its last completed stage.
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Iterator, Set
+
+from utils.logger import get_logger
+from knowledge_base.config import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_INGESTION_DB,
+    DEFAULT_INGESTION_WORK_DIR,
+    DEFAULT_INGESTION_WORKERS,
+    DEFAULT_INGESTION_POLL_INTERVAL
+)
+
+logger = get_logger(__name__)
+
+# Stages of an add job, in order
+STAGES = ["extract", "chunk", "embed", "index"]
+
+# Job progress reached when each stage completes
+STAGE_PROGRESS = {"extract": 0.05, "chunk": 0.15, "embed": 0.9, "index": 1.0}
+
+JOB_ACTIONS = ["add", "remove"]
+JOB_STATUSES = ["queued", "running", "completed", "failed", "cancelled"]
+ACTIVE_STATUSES = ("queued", "running")
+
+# book_id has no declared type so integer and string IDs round-trip unchanged
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    book_id NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    action TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL DEFAULT '',
+    paused INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs(status, id);
+CREATE TABLE IF NOT EXISTS ingestion_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_COLUMNS = [
+    "id", "book_id", "title", "action", "status", "stage", "paused", "progress",
+    "message", "error", "attempts", "created_at", "updated_at"
+]
+
+class JobInterrupted(Exception):
+    """Raised inside a worker when its job is paused or cancelled between stages."""
+
+class IngestionQueue:
+    """
+    Persistent queue of knowledge-base ingestion jobs with a worker pool.
+    
+    Jobs for the same book run in the order they were queued; jobs for
+    different books run concurrently, except for the index stage, which is
+    serialized because the vector stores are not safe for concurrent writes.
+    The queue assumes a single process owns the database: on start, jobs left
+    'running' by a previous process are queued again.
+    """
+    
+    def __init__(
+        self,
+        knowledge_base: Any,
+        book_manager: Any,
+        path: str = DEFAULT_INGESTION_DB,
+        work_dir: str = DEFAULT_INGESTION_WORK_DIR,
+        max_workers: int = DEFAULT_INGESTION_WORKERS,
+        poll_interval: float = DEFAULT_INGESTION_POLL_INTERVAL,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+    ):
+        """
+        Open (or create) the queue. Workers start on the first start() or enqueue().
+        
+        Args:
+            knowledge_base: KnowledgeBase (VectorStore) instance jobs are indexed into
+            book_manager: BookManager instance book contents are read from
+            path: Path to the SQLite database file
+            work_dir: Directory holding the stage outputs of unfinished jobs
+            max_workers: Number of worker threads
+            poll_interval: Seconds an idle worker waits before checking for jobs
+            chunk_size: Chunk size used by the chunk stage
+            chunk_overlap: Chunk overlap used by the chunk stage
+        """
+        self.knowledge_base = knowledge_base
+        self.book_manager = book_manager
+        self.path = path
+        self.work_dir = work_dir
+        self.max_workers = max(1, int(max_workers))
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(work_dir, exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._index_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._workers: List[threading.Thread] = []
+        self._callbacks: Dict[int, Callable[[int, int, str], None]] = {}
+        self._writing: Set[int] = set()
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+    
+    def start(self) -> None:
+        """Start the worker threads, requeueing jobs interrupted by a previous run."""
+        with self._lock:
+            if any(worker.is_alive() for worker in self._workers):
+                return
+            
+            with self._conn:
+                recovered = self._conn.execute(
+                    "UPDATE ingestion_jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                    (datetime.now().isoformat(),)
+                ).rowcount
+            if recovered:
+                logger.info(f"Requeued {recovered} interrupted ingestion job(s)")
+            
+            self._stopping.clear()
+            self._workers = [
+                threading.Thread(target=self._worker, name=f"ingestion-worker-{i}", daemon=True)
+                for i in range(self.max_workers)
+            ]
+            for worker in self._workers:
+                worker.start()
+            
+            logger.info(f"Started ingestion queue with {self.max_workers} worker(s)")
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers after their current stage. Unfinished jobs stay queued.
+        
+        Args:
+            timeout: Seconds to wait for each worker (None waits indefinitely)
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+    
+    def close(self) -> None:
+        """Stop the workers and close the database connection."""
+        self.stop()
+        with self._lock:
+            self._conn.close()
+    
+    @property
+    def running(self) -> bool:
+        """Whether any worker thread is alive."""
+        return any(worker.is_alive() for worker in self._workers)
+    
+    def enqueue(
+        self,
+        book_id: Any,
+        action: str = "add",
+        title: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int, str], None]] = None
+    ) -> int:
+        """
+        Queue a job adding a book to, or removing it from, the knowledge base.
+        
+        An active job for the same book and action is reused. Queued jobs for
+        the same book with the opposite action are cancelled, since the new
+        job supersedes them.
+        
+        Args:
+            book_id: Book ID
+            action: 'add' or 'remove'
+            title: Book title, shown in job listings
+            progress_callback: Optional callback called from the worker thread
+                as (percent, 100, message)
+        
+        Returns:
+            Job ID
+        """
+        if action not in JOB_ACTIONS:
+            raise ValueError(f"Unknown ingestion action '{action}', expected one of {JOB_ACTIONS}")
+        
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                """
+                SELECT id FROM ingestion_jobs
+                WHERE book_id = ? AND action = ? AND status IN ('queued', 'running')
+                ORDER BY id DESC LIMIT 1
+                """,
+                (book_id, action)
+            ).fetchone()
+            
+            if row is not None:
+                job_id = row[0]
+            else:
+                superseded = [
+                    superseded_id for superseded_id, in self._conn.execute(
+                        "SELECT id FROM ingestion_jobs WHERE book_id = ? AND action != ? AND status = 'queued'",
+                        (book_id, action)
+                    )
+                ]
+                for superseded_id in superseded:
+                    self._conn.execute(
+                        """
+                        UPDATE ingestion_jobs SET status = 'cancelled', message = 'Superseded by a newer job',
+                            updated_at = ?
+                        WHERE id = ?
+                        """,
+                        (now, superseded_id)
+                    )
+                    self._cleanup(superseded_id)
+                
+                job_id = self._conn.execute(
+                    """
+                    INSERT INTO ingestion_jobs (book_id, title, action, status, created_at, updated_at)
+                    VALUES (?, ?, ?, 'queued', ?, ?)
+                    """,
+                    (book_id, title or str(book_id), action, now, now)
+                ).lastrowid
+                logger.info(f"Queued ingestion job {job_id}: {action} book {book_id}")
+        
+        if progress_callback:
+            self._callbacks[job_id] = progress_callback
+        
+        self.start()
+        self._wakeup.set()
+        return job_id
+    
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a job.
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            Job dictionary, or None if the job does not exist
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+    
+    def list_jobs(self, statuses: Optional[List[str]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        List jobs, newest first.
+        
+        Args:
+            statuses: Only return jobs with these statuses
+            limit: Maximum number of jobs
+        
+        Returns:
+            List of job dictionaries
+        """
+        query = f"SELECT {', '.join(_COLUMNS)} FROM ingestion_jobs"
+        params: List[Any] = []
+        if statuses:
+            query += f" WHERE status IN ({','.join('?' * len(statuses))})"
+            params.extend(statuses)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+    
+    def active_jobs(self) -> Dict[Any, Dict[str, Any]]:
+        """
+        Get the newest queued or running job of each book.
+        
+        Returns:
+            Dictionary mapping book ID to job
+        """
+        jobs = {}
+        for job in self.list_jobs(list(ACTIVE_STATUSES), limit=-1):
+            jobs.setdefault(job["book_id"], job)
+        return jobs
+    
+    def wait(self, job_ids: Optional[List[int]] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until jobs are no longer queued or running.
+        
+        Paused jobs never finish on their own, so waiting on them times out.
+        
+        Args:
+            job_ids: Jobs to wait for (None waits for all jobs)
+            timeout: Maximum number of seconds to wait (None waits indefinitely)
+        
+        Returns:
+            True if the jobs finished, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                query = "SELECT COUNT(*) FROM ingestion_jobs WHERE status IN ('queued', 'running')"
+                params: List[Any] = []
+                if job_ids is not None:
+                    if not job_ids:
+                        return True
+                    query += f" AND id IN ({','.join('?' * len(job_ids))})"
+                    params.extend(job_ids)
+                pending = self._conn.execute(query, params).fetchone()[0]
+            
+            if not pending:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+    
+    def clear_finished(self) -> int:
+        """
+        Delete completed and cancelled jobs.
+        
+        Returns:
+            Number of jobs deleted
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM ingestion_jobs WHERE status IN ('completed', 'cancelled')"
+            ).rowcount
+    
+    @property
+    def paused(self) -> bool:
+        """Whether the whole queue is paused."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM ingestion_state WHERE key = 'paused'").fetchone()
+        return bool(row and row[0] == "1")
+    
+    def pause(self) -> None:
+        """Pause the queue; running jobs stop after their current stage (or embedding batch)."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO ingestion_state (key, value) VALUES ('paused', '1')")
+        logger.info("Paused ingestion queue")
+    
+    def resume(self) -> None:
+        """Resume the queue."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO ingestion_state (key, value) VALUES ('paused', '0')")
+        self._wakeup.set()
+        logger.info("Resumed ingestion queue")
+    
+    def pause_job(self, job_id: int) -> bool:
+        """
+        Pause a queued or running job; a running job stops after its current stage.
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            True if the job was active and is now paused
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE ingestion_jobs SET paused = 1, updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (datetime.now().isoformat(), job_id)
+            ).rowcount > 0
+    
+    def resume_job(self, job_id: int) -> bool:
+        """
+        Resume a paused job, or retry a failed one from its last completed stage.
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            True if the job is queued again
+        """
+        with self._lock, self._conn:
+            resumed = self._conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET paused = 0, status = CASE WHEN status = 'failed' THEN 'queued' ELSE status END,
+                    error = NULL, updated_at = ?
+                WHERE id = ? AND status IN ('queued', 'running', 'failed')
+                """,
+                (datetime.now().isoformat(), job_id)
+            ).rowcount > 0
+        
+        if resumed:
+            self._wakeup.set()
+        return resumed
+    
+    def cancel_job(self, job_id: int) -> bool:
+        """
+        Cancel a job; a running job stops after its current stage. A job that
+        is already writing to the knowledge base can no longer be cancelled.
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            True if the job was cancelled
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT status FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] not in ("queued", "running", "failed") or job_id in self._writing:
+                return False
+            
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'cancelled', message = 'Cancelled', updated_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), job_id)
+            )
+        
+        # A running job removes its outputs when it notices the cancellation
+        if row[0] != "running":
+            self._cleanup(job_id)
+        return True
+    
+    def _worker(self) -> None:
+        """Claim and run jobs until the queue is stopped."""
+        while not self._stopping.is_set():
+            job = None
+            try:
+                if not self.paused:
+                    job = self._claim()
+            except Exception as e:
+                logger.error(f"Error claiming ingestion job: {str(e)}")
+            
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            
+            self._run(job)
+    
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest runnable job as running and return it."""
+        with self._lock, self._conn:
+            # A job waits for every earlier active job of the same book
+            row = self._conn.execute(
+                """
+                SELECT id FROM ingestion_jobs AS job
+                WHERE status = 'queued' AND paused = 0 AND NOT EXISTS (
+                    SELECT 1 FROM ingestion_jobs AS earlier
+                    WHERE earlier.book_id = job.book_id AND earlier.id < job.id
+                      AND earlier.status IN ('queued', 'running')
+                )
+                ORDER BY id LIMIT 1
+                """
+            ).fetchone()
+            if row is None:
+                return None
+            
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), row[0])
+            )
+        return self.get_job(row[0])
+    
+    def _run(self, job: Dict[str, Any]) -> None:
+        """Run a claimed job to completion, interruption or failure."""
+        job_id = job["id"]
+        try:
+            if job["action"] == "remove":
+                self._remove(job)
+            else:
+                self._ingest(job)
+        except JobInterrupted:
+            return
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} ({job['action']} book {job['book_id']}) failed: {str(e)}")
+            self._set(job_id, status="failed", error=str(e), message=f"Failed: {str(e)}", only_running=True)
+            self._report(job_id, job["progress"], f"Failed: {str(e)}")
+            self._callbacks.pop(job_id, None)
+            return
+        
+        self._set(job_id, status="completed", progress=1.0, message="Done", only_running=True)
+        self._report(job_id, 1.0, "Done")
+        self._callbacks.pop(job_id, None)
+        self._cleanup(job_id)
+        logger.info(f"Ingestion job {job_id} completed: {job['action']} book {job['book_id']}")
+    
+    def _checkpoint(self, job_id: int) -> None:
+        """Stop the job here if it was cancelled or paused, or the queue is stopping."""
+        job = self.get_job(job_id)
+        if job is None or job["status"] == "cancelled":
+            self._callbacks.pop(job_id, None)
+            self._cleanup(job_id)
+            raise JobInterrupted(job_id)
+        
+        if job["paused"] or self.paused or self._stopping.is_set():
+            # Queued again; the completed stages are skipped when it resumes
+            self._set(job_id, status="queued", only_running=True)
+            raise JobInterrupted(job_id)
+    
+    @contextmanager
+    def _writing_to_index(self, job_id: int) -> Iterator[None]:
+        """
+        Let a job write to the knowledge base. The job is checked for
+        cancellation once it holds the index lock, and cannot be cancelled
+        from then on, so a cancelled job never changes the index.
+        """
+        with self._index_lock:
+            with self._lock:
+                self._checkpoint(job_id)
+                self._writing.add(job_id)
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._writing.discard(job_id)
+    
+    def _ingest(self, job: Dict[str, Any]) -> None:
+        """Run the stages of an add job that have not completed yet."""
+        job_id = job["id"]
+        completed = STAGES.index(job["stage"]) + 1 if job["stage"] in STAGES else 0
+        
+        # Start over if the outputs of the completed stages are gone
+        outputs = ["content.txt"] + (["chunks.json"] if completed > 1 else [])
+        if completed and not all(os.path.exists(os.path.join(self._job_dir(job_id), name)) for name in outputs):
+            logger.warning(f"Stage outputs of ingestion job {job_id} are missing, restarting it")
+            completed = 0
+        
+        for stage in STAGES[completed:]:
+            self._checkpoint(job_id)
+            message = getattr(self, f"_stage_{stage}")(job)
+            self._set(job_id, stage=stage, progress=STAGE_PROGRESS[stage], message=message)
+            self._report(job_id, STAGE_PROGRESS[stage], message)
+    
+    def _remove(self, job: Dict[str, Any]) -> None:
+        """Remove a book from the knowledge base."""
+        with self._writing_to_index(job["id"]):
+            if not self.knowledge_base.vector_store.delete_document(job["book_id"]):
+                raise RuntimeError(f"Failed to remove book {job['book_id']} from knowledge base")
+    
+    def _stage_extract(self, job: Dict[str, Any]) -> str:
+        """Read the book text into the job directory."""
+        content = self.book_manager.get_book_content(job["book_id"])
+        if not content:
+            raise ValueError("no content available")
+        
+        self._write(job["id"], "content.txt", content)
+        return f"Extracted {len(content):,} characters"
+    
+    def _stage_chunk(self, job: Dict[str, Any]) -> str:
+        """Split the book text into chunks."""
+        content = self._read(job["id"], "content.txt")
+        chunks = self.knowledge_base.vector_store.chunk_document_text(
+            job["book_id"],
+            content,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap
+        )
+        
+        self._write(job["id"], "chunks.json", json.dumps(chunks, ensure_ascii=False, default=str))
+        return f"Split into {len(chunks)} chunks"
+    
+    def _stage_embed(self, job: Dict[str, Any]) -> str:
+        """
+        Embed the chunks into the persistent embedding cache, so the index stage
+        only reads vectors. Progress is saved after every batch: vectors already
+        cached are not embedded again when an interrupted job resumes.
+        """
+        job_id = job["id"]
+        chunks = json.loads(self._read(job_id, "chunks.json"))
+        start_progress, end_progress = STAGE_PROGRESS["chunk"], STAGE_PROGRESS["embed"]
+        
+        def batch_done(done: int, total: int) -> None:
+            progress = start_progress + (end_progress - start_progress) * done / total
+            message = f"Embedded {done}/{total} chunks"
+            self._set(job_id, progress=progress, message=message)
+            self._report(job_id, progress, message)
+            if done < total:
+                self._checkpoint(job_id)
+        
+        cached = self.knowledge_base.vector_store.cache_embeddings(
+            [chunk["text"] for chunk in chunks],
+            progress_callback=batch_done
+        )
+        if not cached:
+            return "Embedding during indexing (no embedding cache)"
+        
+        return f"Embedded {len(chunks)} chunks"
+    
+    def _stage_index(self, job: Dict[str, Any]) -> str:
+        """
+        Bring the book's indexed chunks in line with the new ones; chunks left
+        by an earlier attempt or an earlier version of the book are reused.
+        """
+        job_id = job["id"]
+        content = self._read(job_id, "content.txt")
+        chunks = json.loads(self._read(job_id, "chunks.json"))
+        
+        with self._writing_to_index(job_id):
+            counts = self.knowledge_base.vector_store.update_document_chunks(
+                job["book_id"],
+                content,
+                chunks
+            )
+        
+        return (
+            f"Indexed {counts['added']} new chunks, reused {counts['unchanged'] + counts['moved']}, "
+            f"removed {counts['removed']}"
+        )
+    
+    def _set(self, job_id: int, only_running: bool = False, **fields: Any) -> None:
+        """Update job fields (only while the job is running, if requested)."""
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        query = f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?"
+        if only_running:
+            query += " AND status = 'running'"
+        
+        with self._lock, self._conn:
+            self._conn.execute(query, (*fields.values(), job_id))
+    
+    def _report(self, job_id: int, progress: float, message: str) -> None:
+        """Pass job progress to the job's callback, if any."""
+        callback = self._callbacks.get(job_id)
+        if callback is None:
+            return
+        try:
+            callback(round(progress * 100), 100, message)
+        except Exception as e:
+            logger.warning(f"Progress callback of ingestion job {job_id} failed: {str(e)}")
+    
+    def _job_dir(self, job_id: int) -> str:
+        """Get the work directory of a job."""
+        return os.path.join(self.work_dir, f"job_{job_id}")
+    
+    def _write(self, job_id: int, name: str, data: str) -> None:
+        """Write a stage output atomically, so a crash never leaves a partial file."""
+        directory = self._job_dir(job_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+    
+    def _read(self, job_id: int, name: str) -> str:
+        """Read a stage output."""
+        with open(os.path.join(self._job_dir(job_id), name), "r", encoding="utf-8") as f:
+            return f.read()
+    
+    def _cleanup(self, job_id: int) -> None:
+        """Remove a job's work directory."""
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+_queues: Dict[str, IngestionQueue] = {}
+_queues_lock = threading.Lock()
+
+def get_ingestion_queue(
+    knowledge_base: Any,
+    book_manager: Any,
+    path: str = DEFAULT_INGESTION_DB
+) -> IngestionQueue:
+    """
+    Get the process-wide ingestion queue for a database, starting its workers.
+    
+    Streamlit creates new KnowledgeBase and BookManager objects per session;
+    the queue always processes jobs with the most recently passed ones.
+    
+    Args:
+        knowledge_base: KnowledgeBase (VectorStore) instance
+        book_manager: BookManager instance
+        path: Path to the SQLite database file
+    
+    Returns:
+        IngestionQueue instance
+    """
+    with _queues_lock:
+        queue = _queues.get(path)
+        if queue is None:
+            queue = IngestionQueue(knowledge_base, book_manager, path=path)
+            _queues[path] = queue
+        else:
+            queue.knowledge_base = knowledge_base
+            queue.book_manager = book_manager
+    
+    queue.start()
+    return queue
+
+
+@contextmanager
+def exclusive_indexing(knowledge_base: Any) -> Iterator[None]:
+    """
+    Hold back the index stage of every ingestion queue writing into a
+    knowledge base's store, e.g. while the store is rebuilt and swapped.
+    
+    Jobs keep extracting, chunking and embedding meanwhile. When the block
+    ends the queues index into ``knowledge_base``, which may hold a new store.
+    
+    Args:
+        knowledge_base: KnowledgeBase (VectorStore) instance
+    """
+    def store_path(kb: Any) -> Optional[str]:
+        base_path = getattr(kb.vector_store, "base_path", None)
+        return os.path.normpath(base_path) if base_path else None
+    
+    path = store_path(knowledge_base)
+    with _queues_lock:
+        queues = [queue for _, queue in sorted(_queues.items()) if path and store_path(queue.knowledge_base) == path]
+    
+    locked = []
+    try:
+        for queue in queues:
+            queue._index_lock.acquire()
+            locked.append(queue)
+        yield
+        for queue in queues:
+            queue.knowledge_base = knowledge_base
+    finally:
+        for queue in reversed(locked):
+            queue._index_lock.release()
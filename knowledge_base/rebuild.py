@@ -0,0 +1,364 @@
+"""
+Side-by-side rebuild of the knowledge base.
+A fresh index is built in staging directories next to the live ones while the
+live index keeps serving searches. Books are chunked and embedded by a thread
+pool and indexed by the calling thread, which saves the new index once per
+checkpoint. When every book is indexed the staging directories are swapped in.
+
+Progress is recorded in a state file after each checkpoint, so an interrupted
+rebuild resumes from its last checkpoint instead of starting over.
+"""
+
+import os
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+
+from utils.logger import get_logger
+from knowledge_base.config import DEFAULT_REBUILD_WORKERS, DEFAULT_REBUILD_CHECKPOINT_BOOKS
+from knowledge_base.ingestion import exclusive_indexing
+
+logger = get_logger(__name__)
+
+# Suffixes of the staging directories and of the live directories being replaced
+STAGING_SUFFIX = ".rebuild"
+OLD_SUFFIX = ".old"
+
+def _state_path(data_path: str) -> str:
+    """Get the rebuild state file of a store (kept outside the directories that are swapped)."""
+    return os.path.normpath(data_path) + ".rebuild.json"
+
+def _read_state(data_path: str) -> Optional[Dict[str, Any]]:
+    """Read the rebuild state, or None if no rebuild is in progress."""
+    path = _state_path(data_path)
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable rebuild state {path}: {str(e)}")
+        return None
+
+def _write_state(data_path: str, state: Dict[str, Any]) -> None:
+    """Write the rebuild state atomically."""
+    path = _state_path(data_path)
+    state["updated_at"] = datetime.now().isoformat()
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def _swap_directories(base_path: str, data_path: str) -> None:
+    """Move the staging directories into place, keeping the replaced ones until both moved."""
+    pairs = [(os.path.normpath(path), os.path.normpath(path) + STAGING_SUFFIX) for path in (base_path, data_path)]
+    
+    for live, staging in pairs:
+        # A pair without a staging directory was already swapped before an interruption
+        if not os.path.exists(staging):
+            continue
+        if os.path.exists(live):
+            shutil.rmtree(live + OLD_SUFFIX, ignore_errors=True)
+            os.replace(live, live + OLD_SUFFIX)
+        os.replace(staging, live)
+    
+    os.remove(_state_path(data_path))
+    for live, _ in pairs:
+        shutil.rmtree(live + OLD_SUFFIX, ignore_errors=True)
+
+def finish_interrupted_swap(base_path: str, data_path: str) -> bool:
+    """
+    Complete a swap that was interrupted between moving the two directories.
+    
+    Called before a store is opened, so a crash during the swap never leaves
+    the store half old and half new.
+    
+    Args:
+        base_path: Path of the live vector database files
+        data_path: Path of the live document data
+    
+    Returns:
+        True if an interrupted swap was completed
+    """
+    state = _read_state(data_path)
+    if not state or state.get("phase") != "swapping":
+        return False
+    
+    logger.info("Completing an interrupted knowledge base rebuild swap")
+    _swap_directories(base_path, data_path)
+    return True
+
+class IndexRebuild:
+    """
+    Resumable side-by-side rebuild of a knowledge base.
+    
+    The staging directories are siblings of the live base_path and data_path
+    (with a '.rebuild' suffix), so the two paths must not be nested in each
+    other. Ingestion queues hold their index stage until the rebuild is
+    done. Books added, changed or removed in the live store by other means
+    (including before a resume) are found through the live manifest and
+    indexed again or dropped before the swap.
+    """
+    
+    def __init__(
+        self,
+        knowledge_base: Any,
+        book_manager: Any,
+        max_workers: int = DEFAULT_REBUILD_WORKERS,
+        checkpoint_books: int = DEFAULT_REBUILD_CHECKPOINT_BOOKS
+    ):
+        """
+        Prepare a rebuild.
+        
+        Args:
+            knowledge_base: KnowledgeBase (VectorStore) instance to rebuild
+            book_manager: BookManager instance book contents are read from
+            max_workers: Number of threads chunking and embedding books
+            checkpoint_books: Number of books indexed between checkpoints
+        """
+        self.knowledge_base = knowledge_base
+        self.book_manager = book_manager
+        self.max_workers = max(1, int(max_workers))
+        self.checkpoint_books = max(1, int(checkpoint_books))
+        
+        store = knowledge_base.vector_store
+        self.base_path = os.path.normpath(store.base_path)
+        self.data_path = os.path.normpath(store.data_path)
+        self.staging_base_path = self.base_path + STAGING_SUFFIX
+        self.staging_data_path = self.data_path + STAGING_SUFFIX
+        self.store_type = type(store).__name__
+    
+    @property
+    def pending(self) -> bool:
+        """Whether an interrupted rebuild of this store can be resumed."""
+        state = _read_state(self.data_path)
+        return bool(state) and state.get("store_type") == self.store_type
+    
+    def run(self, progress_callback: Optional[Callable[[int, int, str], None]] = None) -> bool:
+        """
+        Rebuild the knowledge base, resuming an interrupted rebuild if there is one.
+        
+        Args:
+            progress_callback: Optional callback called as (books done, total books, message)
+        
+        Returns:
+            True if the new index was swapped in
+        """
+        with exclusive_indexing(self.knowledge_base):
+            return self._run(progress_callback)
+    
+    def _run(self, progress_callback: Optional[Callable[[int, int, str], None]]) -> bool:
+        """Rebuild while the ingestion queues are held back (see run)."""
+        if finish_interrupted_swap(self.base_path, self.data_path):
+            # The previous rebuild only had its swap left; open the swapped-in index
+            self.knowledge_base.vector_store = self.knowledge_base._create_store(self.base_path, self.data_path)
+            return True
+        
+        state = _read_state(self.data_path)
+        if state and state.get("store_type") == self.store_type:
+            logger.info(
+                f"Resuming knowledge base rebuild: {len(state['completed'])}/{len(state['book_ids'])} books done"
+            )
+            self._apply_live_changes(state)
+        else:
+            state = self._start()
+        
+        # Without a checkpoint nothing in the staging directories is usable
+        if not state["completed"]:
+            for path in (self.staging_base_path, self.staging_data_path):
+                shutil.rmtree(path, ignore_errors=True)
+        
+        staging = self.knowledge_base._create_store(self.staging_base_path, self.staging_data_path)
+        try:
+            while True:
+                self._discard_uncheckpointed(staging, state)
+                self._index_books(staging, state, progress_callback)
+                if not self._apply_live_changes(state):
+                    break
+        finally:
+            staging.close()
+        
+        # Release the live store's files before its directories are replaced
+        state["phase"] = "swapping"
+        _write_state(self.data_path, state)
+        self.knowledge_base.vector_store.close()
+        _swap_directories(self.base_path, self.data_path)
+        self.knowledge_base.vector_store = self.knowledge_base._create_store(self.base_path, self.data_path)
+        
+        if progress_callback:
+            total = len(state["book_ids"])
+            progress_callback(total, total, "Knowledge base rebuild complete")
+        
+        logger.info(
+            f"Knowledge base rebuilt: {len(state['book_ids']) - len(state['skipped'])} books indexed, "
+            f"{len(state['skipped'])} skipped"
+        )
+        return True
+    
+    def _start(self) -> Dict[str, Any]:
+        """Start a new rebuild of the books currently in the knowledge base."""
+        now = datetime.now().isoformat()
+        state = {
+            "store_type": self.store_type,
+            "phase": "building",
+            "book_ids": self.knowledge_base.get_indexed_book_ids(),
+            "completed": [],
+            "skipped": [],
+            "started_at": now,
+            "synced_at": now
+        }
+        _write_state(self.data_path, state)
+        
+        logger.info(f"Starting knowledge base rebuild of {len(state['book_ids'])} books")
+        return state
+    
+    def _apply_live_changes(self, state: Dict[str, Any]) -> bool:
+        """
+        Catch up with books added, changed or removed in the live store since
+        the last check. Changed and new books are queued to be indexed again;
+        their staged copies count as uncheckpointed and are discarded.
+        
+        Args:
+            state: Rebuild state, updated and saved if anything changed
+        
+        Returns:
+            True if any book has to be indexed again or was dropped
+        """
+        synced_at = state.get("synced_at", state["started_at"])
+        now = datetime.now().isoformat()
+        live = {
+            entry["id"]: entry
+            for entry in self.knowledge_base.vector_store.manifest.list() if entry["id"]
+        }
+        
+        changed = [document_id for document_id, entry in live.items() if entry["updated_at"] > synced_at]
+        changed += [document_id for document_id in live if document_id not in state["book_ids"]]
+        removed = [book_id for book_id in state["book_ids"] if book_id not in live]
+        
+        state["synced_at"] = now
+        if not changed and not removed:
+            _write_state(self.data_path, state)
+            return False
+        
+        stale = set(changed) | set(removed)
+        state["book_ids"] = [book_id for book_id in state["book_ids"] if book_id not in removed]
+        state["book_ids"] += [document_id for document_id in dict.fromkeys(changed) if document_id not in state["book_ids"]]
+        state["completed"] = [book_id for book_id in state["completed"] if book_id not in stale]
+        state["skipped"] = [book_id for book_id in state["skipped"] if book_id not in stale]
+        _write_state(self.data_path, state)
+        
+        logger.info(
+            f"Rebuild catching up with the live index: {len(set(changed))} books to index again, "
+            f"{len(removed)} removed"
+        )
+        return True
+    
+    def _discard_uncheckpointed(self, staging: Any, state: Dict[str, Any]) -> None:
+        """Remove books indexed after the last checkpoint; the saved index may not contain them."""
+        completed = set(state["completed"])
+        for document_id in staging.list_document_ids():
+            if document_id not in completed:
+                staging.delete_document(document_id)
+                staging.sparse_index.delete(where={"document_id": document_id})
+    
+    def _index_books(
+        self,
+        staging: Any,
+        state: Dict[str, Any],
+        progress_callback: Optional[Callable[[int, int, str], None]]
+    ) -> None:
+        """Index the books not checkpointed yet into the staging store."""
+        total = len(state["book_ids"])
+        done = set(state["completed"])
+        todo = [book_id for book_id in state["book_ids"] if book_id not in done]
+        since_checkpoint: List[str] = []
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rebuild") as executor, \
+                staging.deferred_saves():
+            for book_id, prepared in self._prepare_books(executor, staging, todo):
+                if prepared is None:
+                    if book_id not in state["skipped"]:
+                        state["skipped"].append(book_id)
+                else:
+                    book, content, chunks = prepared
+                    staging.index_document_chunks(book_id, content, chunks, metadata=book)
+                
+                since_checkpoint.append(book_id)
+                if len(since_checkpoint) >= self.checkpoint_books:
+                    self._checkpoint(staging, state, since_checkpoint)
+                
+                if progress_callback:
+                    count = len(state["completed"]) + len(since_checkpoint)
+                    title = prepared[0].get("title", book_id) if prepared else book_id
+                    progress_callback(count, total, f"Indexed book {count}/{total}: {title}")
+            
+            self._checkpoint(staging, state, since_checkpoint)
+    
+    def _checkpoint(self, staging: Any, state: Dict[str, Any], book_ids: List[str]) -> None:
+        """Save the staging index and record the books it now contains."""
+        if not staging.flush():
+            raise RuntimeError("Could not save the rebuilt index")
+        
+        state["completed"].extend(book_ids)
+        book_ids.clear()
+        _write_state(self.data_path, state)
+        logger.info(f"Rebuild checkpoint: {len(state['completed'])}/{len(state['book_ids'])} books")
+    
+    def _prepare_books(
+        self,
+        executor: ThreadPoolExecutor,
+        staging: Any,
+        book_ids: List[str]
+    ) -> Iterator[Tuple[str, Optional[Tuple[Dict[str, Any], str, List[Dict[str, Any]]]]]]:
+        """
+        Chunk and embed books in the pool, yielding them as they finish.
+        
+        Only a few books per worker are in flight, so memory stays bounded
+        however large the library is.
+        """
+        remaining = iter(book_ids)
+        in_flight: Dict[Future, str] = {}
+        
+        def submit() -> None:
+            book_id = next(remaining, None)
+            if book_id is not None:
+                in_flight[executor.submit(self._prepare_book, staging, book_id)] = book_id
+        
+        for _ in range(self.max_workers * 2):
+            submit()
+        
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                book_id = in_flight.pop(future)
+                submit()
+                yield book_id, future.result()
+    
+    def _prepare_book(
+        self,
+        staging: Any,
+        book_id: str
+    ) -> Optional[Tuple[Dict[str, Any], str, List[Dict[str, Any]]]]:
+        """Read, chunk and embed one book (runs in a worker thread); None if it is skipped."""
+        try:
+            book = self.book_manager.get_book(book_id)
+            if not book:
+                logger.warning(f"Book {book_id} not found in book manager")
+                return None
+            
+            content = self.book_manager.get_book_content(book_id)
+            if not content:
+                logger.warning(f"No content found for book {book_id}")
+                return None
+            
+            chunks = staging.chunk_document_text(book_id, content, metadata=book)
+            staging.cache_embeddings([chunk["text"] for chunk in chunks])
+            return book, content, chunks
+        
+        except Exception as e:
+            logger.error(f"Error preparing book {book_id} for the rebuild: {str(e)}")
+            return None
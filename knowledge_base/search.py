@@ -5,11 +5,15 @@ Handles searching the knowledge base.
 
 from typing import List, Dict, Any, Optional, Union
 import re
+import time
 from datetime import datetime, timedelta
 
 from utils.logger import get_logger
 from knowledge_base.config import (DEFAULT_SEARCH_LIMIT,
-                                   DEFAULT_SEARCH_THRESHOLD)
+                                   DEFAULT_SEARCH_THRESHOLD,
+                                   DEFAULT_SEARCH_MODE,
+                                   DEFAULT_HYBRID_CANDIDATES,
+                                   DEFAULT_RRF_K)
 from knowledge_base import KnowledgeBase
 
 # Get a logger for this module
@@ -21,7 +25,9 @@ def search_knowledge_base(
         kb: KnowledgeBase,
         limit: int = DEFAULT_SEARCH_LIMIT,
         threshold: float = DEFAULT_SEARCH_THRESHOLD,
-        filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        filters: Dict[str, Any] = None,
+        mode: str = DEFAULT_SEARCH_MODE,
+        timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
     """
     Search the knowledge base.
     
@@ -29,8 +35,12 @@ def search_knowledge_base(
         query: Search query
         kb: KnowledgeBase instance
         limit: Maximum number of results
-        threshold: Minimum score threshold
+        threshold: Minimum score threshold (applies to vector scores)
         filters: Optional search filters
+        mode: 'vector' (dense only), 'keyword' (BM25 only) or 'hybrid'
+            (both, fused by reciprocal rank)
+        timings: Optional dictionary filled with per-stage latencies in
+            milliseconds ('vector_ms', 'keyword_ms', 'fusion_ms', 'total_ms')
         
     Returns:
         List of search results
@@ -47,13 +57,25 @@ def search_knowledge_base(
         # Convert filters to vector store where clause if provided
         where = filters or {}
 
+        if mode == "hybrid":
+            return hybrid_search(query, kb, limit=limit, threshold=threshold, where=where, timings=timings)
+
         # Perform search
-        results = kb.search(query, limit=limit, where=where)
+        start_time = time.perf_counter()
+        if mode == "keyword":
+            results = kb.search_sparse(query, limit=limit, where=where)
+        else:
+            results = kb.search(query, limit=limit, where=where)
+
+            # Apply threshold filter
+            results = [r for r in results if r.get("score", 0) >= threshold]
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
 
-        # Apply threshold filter
-        results = [r for r in results if r.get("score", 0) >= threshold]
+        if timings is not None:
+            timings["keyword_ms" if mode == "keyword" else "vector_ms"] = elapsed_ms
+            timings["total_ms"] = elapsed_ms
 
-        logger.info(f"Search for '{query}' returned {len(results)} results")
+        logger.info(f"Search for '{query}' ({mode}) returned {len(results)} results in {elapsed_ms:.1f}ms")
 
         return results
 
@@ -62,6 +84,122 @@ def search_knowledge_base(
         return []
 
 
+def hybrid_search(
+        query: str,
+        kb: KnowledgeBase,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        threshold: float = DEFAULT_SEARCH_THRESHOLD,
+        where: Optional[Dict[str, Any]] = None,
+        candidates: int = DEFAULT_HYBRID_CANDIDATES,
+        rrf_k: int = DEFAULT_RRF_K,
+        timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Search with dense vectors and BM25, fusing both rankings.
+    
+    Each ranking fetches ``limit * candidates`` hits; vector hits below the
+    threshold are dropped before fusion, keyword hits are kept whatever their
+    vector similarity, so exact-term matches are not lost.
+    
+    Args:
+        query: Search query (already cleaned)
+        kb: KnowledgeBase instance
+        limit: Maximum number of results
+        threshold: Minimum vector score for a vector hit to count
+        where: Optional filter condition
+        candidates: Candidates fetched per ranking, as a multiple of limit
+        rrf_k: Reciprocal-rank fusion constant
+        timings: Optional dictionary filled with per-stage latencies in milliseconds
+        
+    Returns:
+        Fused results; each has the fused "score" (1.0 means ranked first by
+        both searches) plus "vector_score"/"keyword_score" and their ranks
+        where the chunk was found
+    """
+    fetch = max(limit, limit * candidates)
+    stage_times = {}
+    
+    start_time = time.perf_counter()
+    vector_results = kb.search(query, limit=fetch, where=where)
+    vector_results = [r for r in vector_results if r.get("score", 0) >= threshold]
+    stage_times["vector_ms"] = (time.perf_counter() - start_time) * 1000
+    
+    stage_start = time.perf_counter()
+    keyword_results = kb.search_sparse(query, limit=fetch, where=where)
+    stage_times["keyword_ms"] = (time.perf_counter() - stage_start) * 1000
+    
+    stage_start = time.perf_counter()
+    results = reciprocal_rank_fusion(
+        {"vector": vector_results, "keyword": keyword_results},
+        limit=limit,
+        k=rrf_k
+    )
+    stage_times["fusion_ms"] = (time.perf_counter() - stage_start) * 1000
+    stage_times["total_ms"] = (time.perf_counter() - start_time) * 1000
+    
+    if timings is not None:
+        timings.update(stage_times)
+    
+    logger.info(
+        f"Hybrid search for '{query}' returned {len(results)} results "
+        f"(vector: {len(vector_results)} hits in {stage_times['vector_ms']:.1f}ms, "
+        f"keyword: {len(keyword_results)} hits in {stage_times['keyword_ms']:.1f}ms, "
+        f"fusion: {stage_times['fusion_ms']:.1f}ms)"
+    )
+    
+    return results
+
+
+def reciprocal_rank_fusion(
+        rankings: Dict[str, List[Dict[str, Any]]],
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        k: int = DEFAULT_RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists by reciprocal rank.
+    
+    A result scores ``sum(1 / (k + rank))`` over the rankings it appears in,
+    normalized so a result ranked first by every list scores 1.0. Results are
+    matched by id.
+    
+    Args:
+        rankings: Ranked result lists keyed by name (e.g. "vector", "keyword")
+        limit: Maximum number of results
+        k: Fusion constant (higher flattens the rank weighting)
+        
+    Returns:
+        Fused results sorted by score; each carries "<name>_score" and
+        "<name>_rank" for the rankings it appears in
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    totals: Dict[str, float] = {}
+    
+    for name, results in rankings.items():
+        seen = set()
+        for rank, result in enumerate(results, 1):
+            result_id = result.get("id")
+            if result_id in seen:
+                continue
+            seen.add(result_id)
+            
+            if result_id not in fused:
+                fused[result_id] = {key: value for key, value in result.items() if key != "score"}
+                totals[result_id] = 0.0
+            
+            fused[result_id][f"{name}_score"] = result.get("score")
+            fused[result_id][f"{name}_rank"] = rank
+            totals[result_id] += 1.0 / (k + rank)
+    
+    best_possible = len(rankings) / (k + 1) if rankings else 1.0
+    ranked = sorted(fused, key=lambda result_id: totals[result_id], reverse=True)[:limit]
+    
+    results = []
+    for result_id in ranked:
+        result = fused[result_id]
+        result["score"] = totals[result_id] / best_possible
+        results.append(result)
+    
+    return results
+
+
 def clean_query(query: str) -> str:
     """
     Clean a search query.
@@ -187,10 +325,9 @@ def get_recent_documents(kb: KnowledgeBase,
             doc_chunks = kb.get_document_chunks(doc['id'], limit=2)
 
             # Add each chunk to results
-            for chunk in doc_chunks:
-                # Make sure we have proper metadata
-                if 'metadata' not in chunk:
-                    chunk['metadata'] = {}
+            for chunk_view in doc_chunks:
+                # Copy the chunk out of the store's result
+                chunk = chunk_view.to_dict()
 
                 # Add document metadata to chunk
                 chunk['metadata']['document_id'] = doc['id']
@@ -13,12 +13,18 @@ from utils.notifications import get_notification_manager, NotificationLevel, Not
 from knowledge_base.embedding import get_embedding_function
 from knowledge_base.chunking import chunk_document
 from knowledge_base.vector_stores import get_vector_store, get_available_vector_stores
+from knowledge_base.vector_stores.chunk_view import ChunkView, chunk_views
+from knowledge_base.rebuild import IndexRebuild, finish_interrupted_swap
 from knowledge_base.config import (
     DEFAULT_COLLECTION_NAME,
     DEFAULT_VECTOR_DIR,
     DEFAULT_DATA_DIR,
     DEFAULT_DISTANCE_FUNC,
-    DEFAULT_VECTOR_STORE
+    DEFAULT_VECTOR_STORE,
+    DEFAULT_EMBEDDING_BATCH_SIZE,
+    DEFAULT_FAISS_INDEX_TYPE,
+    REBUILD_MODES,
+    DEFAULT_REBUILD_MODE
 )
 
 logger = get_logger(__name__)
@@ -38,7 +44,9 @@ class VectorStore:
         embedding_function: Optional[Callable] = None,
         distance_func: str = DEFAULT_DISTANCE_FUNC,
         vector_store_type: str = DEFAULT_VECTOR_STORE,
-        use_gpu: bool = True
+        use_gpu: bool = True,
+        embedding_batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+        faiss_index_type: str = DEFAULT_FAISS_INDEX_TYPE
     ):
         """
         Initialize the vector store.
@@ -51,6 +59,8 @@ class VectorStore:
             distance_func: Distance function to use ('cosine', 'l2', 'ip')
             vector_store_type: Type of vector store to use
             use_gpu: Whether to use GPU acceleration for FAISS (if available)
+            embedding_batch_size: Number of chunks embedded per call to the embedding function
+            faiss_index_type: FAISS index type ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
         """
         self.collection_name = collection_name
         self.base_path = base_path
@@ -67,26 +77,44 @@ class VectorStore:
             self.embedding_function = embedding_function
             
         # Create kwargs for vector store initialization
-        kwargs = {
+        self._store_kwargs = {
             'collection_name': collection_name,
-            'base_path': base_path,
-            'data_path': data_path,
             'embedding_function': self.embedding_function,
-            'distance_func': distance_func
+            'distance_func': distance_func,
+            'embedding_batch_size': embedding_batch_size
         }
         
-        # Add use_gpu parameter for FAISS
+        # Add use_gpu and index type parameters for FAISS
         if vector_store_type == 'faiss':
-            kwargs['use_gpu'] = use_gpu
+            self._store_kwargs['use_gpu'] = use_gpu
+            self._store_kwargs['index_type'] = faiss_index_type
+        
+        # Finish swapping in a rebuilt index if the process died halfway through
+        finish_interrupted_swap(base_path, data_path)
             
         # Create the underlying vector store
-        self.vector_store = get_vector_store(
-            store_type=vector_store_type,
-            **kwargs
-        )
+        self.vector_store = self._create_store(base_path, data_path)
         
         logger.info(f"Vector store initialized with type '{vector_store_type}' and collection '{collection_name}'")
     
+    def _create_store(self, base_path: str, data_path: str) -> Any:
+        """
+        Create a backend vector store with this store's settings.
+        
+        Args:
+            base_path: Path to store vector database files
+            data_path: Path to store document data
+        
+        Returns:
+            Backend vector store instance
+        """
+        return get_vector_store(
+            store_type=self.vector_store_type,
+            base_path=base_path,
+            data_path=data_path,
+            **self._store_kwargs
+        )
+    
     def add_document(
         self,
         document_id: str,
@@ -116,6 +144,39 @@ class VectorStore:
             chunk_overlap=chunk_overlap
         )
     
+    def update_document(
+        self,
+        document_id: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Re-index a document after its text changed.
+        
+        Only chunks whose text changed are embedded and only stale chunks are
+        removed, so small corrections to large books are cheap. Documents that
+        are not indexed yet are added.
+        
+        Args:
+            document_id: Document ID
+            text: New document text content
+            metadata: Optional document metadata
+            chunk_size: Optional custom chunk size
+            chunk_overlap: Optional custom chunk overlap
+        
+        Returns:
+            Number of chunks "added", "moved", "removed" and "unchanged"
+        """
+        return self.vector_store.update_document(
+            document_id=document_id,
+            text=text,
+            metadata=metadata,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+    
     def search(
         self,
         query: str,
@@ -125,6 +186,9 @@ class VectorStore:
         """
         Search the vector store.
         
+        Repeated searches are answered from the store's result cache until
+        the next add, delete or reset.
+        
         Args:
             query: Search query
             limit: Maximum number of results
@@ -133,9 +197,56 @@ class VectorStore:
         Returns:
             List of search results
         """
-        return self.vector_store.search(
+        return self.vector_store.cached_search(
+            query=query,
+            limit=limit,
+            where=where
+        )
+    
+    def search_sparse(
+        self,
+        query: str,
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the vector store's chunks by keywords, ranked by BM25.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of results
+            where: Filter condition
+        
+        Returns:
+            List of search results
+        """
+        return self.vector_store.cached_search(
             query=query,
             limit=limit,
+            where=where,
+            sparse=True
+        )
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search the vector store for many queries at once.
+        
+        Args:
+            queries: Search queries
+            limit: Maximum number of results per query
+            where: Filter condition applied to every query
+        
+        Returns:
+            List of result lists, aligned with ``queries``
+        """
+        return self.vector_store.search_batch(
+            queries=queries,
+            limit=limit,
             where=where
         )
     
@@ -175,7 +286,8 @@ class VectorStore:
     def get(
         self,
         ids: Optional[List[str]] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Get entries from the vector store.
@@ -183,11 +295,12 @@ class VectorStore:
         Args:
             ids: List of IDs to get
             where: Filter condition
+            limit: Maximum number of entries (in insertion order)
             
         Returns:
             Dictionary with documents, metadatas, and ids
         """
-        return self.vector_store.get(ids=ids, where=where)
+        return self.vector_store.get(ids=ids, where=where, limit=limit)
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -258,59 +371,37 @@ class VectorStore:
         Returns:
             List of document IDs
         """
-        documents = self.list_documents()
-        # Extract unique document IDs from the documents
-        book_ids = []
-        seen_ids = set()
-        
-        for doc in documents:
-            doc_id = doc.get('id')
-            if doc_id and doc_id not in seen_ids:
-                book_ids.append(doc_id)
-                seen_ids.add(doc_id)
+        # Read from the document manifest, not the full-text document files
+        return [doc_id for doc_id in self.vector_store.list_document_ids() if doc_id]
         
-        return book_ids
-        
-    def get_document_chunks(self, document_id: str) -> List[Any]:
+    def get_document_chunks(self, document_id: str, limit: Optional[int] = None) -> List[ChunkView]:
         """
         Get all chunks for a specific document.
         
+        The rows are found through the store's metadata index on document_id,
+        and each chunk is a view over the columnar get() result (id,
+        page_content, metadata, and metadata keys as attributes).
+        
         Args:
             document_id: Document ID
+            limit: Maximum number of chunks (the first ones of the document)
             
         Returns:
             List of chunks for the document
         """
-        # Get all chunks where the document_id matches
-        results = self.get(where={"document_id": document_id})
-        
-        # Extract chunks from results
-        chunks = []
-        if results and "documents" in results:
-            for i, doc in enumerate(results["documents"]):
-                # Create a chunk object with page_content
-                chunk = type('Chunk', (), {})()
-                chunk.page_content = doc
-                
-                # Add metadata if available
-                if "metadatas" in results and i < len(results["metadatas"]):
-                    for key, value in results["metadatas"][i].items():
-                        setattr(chunk, key, value)
-                
-                # Add ID if available
-                if "ids" in results and i < len(results["ids"]):
-                    chunk.id = results["ids"][i]
-                
-                chunks.append(chunk)
+        # Get the chunks where the document_id matches
+        results = self.get(where={"document_id": document_id}, limit=limit)
+        if not results:
+            return []
         
-        return chunks
+        return chunk_views(results)
         
     def toggle_book_in_knowledge_base(
         self, 
         book_id: str, 
         content: Optional[str] = None, 
         add_to_kb: bool = True,
-        progress_callback: Optional[Callable[[float, int, str], None]] = None,
+        progress_callback: Optional[Callable[[int, int, str], None]] = None,
         book_title: Optional[str] = None  # Added book_title parameter
     ) -> bool:
         """
@@ -389,26 +480,55 @@ class VectorStore:
     def rebuild_knowledge_base(
         self, 
         book_manager: Any,
-        progress_callback: Optional[Callable[[float, int, str], None]] = None
+        progress_callback: Optional[Callable[[int, int, str], None]] = None,
+        mode: str = DEFAULT_REBUILD_MODE,
+        max_workers: Optional[int] = None,
+        checkpoint_books: Optional[int] = None
     ) -> bool:
         """
         Rebuild the knowledge base from scratch.
         
+        In 'side_by_side' mode a new index is built next to the live one, with
+        books chunked and embedded in parallel and the index saved once per
+        checkpoint; it replaces the live index when complete, and an
+        interrupted rebuild resumes from its last checkpoint. 'in_place' mode
+        resets the store and re-adds the books one by one. Memory-only stores
+        are always rebuilt in place.
+        
         Args:
             book_manager: BookManager instance
-            progress_callback: Optional callback for progress updates
+            progress_callback: Optional callback called as (books done, total books, message)
+            mode: Rebuild mode ('side_by_side' or 'in_place')
+            max_workers: Number of threads chunking and embedding books (side_by_side only)
+            checkpoint_books: Number of books indexed between checkpoints (side_by_side only)
             
         Returns:
             True if successful
         """
+        if mode not in REBUILD_MODES:
+            logger.error(f"Unknown rebuild mode '{mode}', expected one of {REBUILD_MODES}")
+            return False
+        
+        if mode == "side_by_side" and self.vector_store.persistent:
+            try:
+                kwargs = {}
+                if max_workers:
+                    kwargs['max_workers'] = max_workers
+                if checkpoint_books:
+                    kwargs['checkpoint_books'] = checkpoint_books
+                return IndexRebuild(self, book_manager, **kwargs).run(progress_callback)
+            except Exception as e:
+                logger.error(f"Error rebuilding knowledge base (progress is kept for a resume): {str(e)}")
+                return False
+        
         try:
+            # Get all books before the reset removes them
+            indexed_book_ids = self.get_indexed_book_ids()
+            
             # Reset the vector store
             self.reset()
             logger.info("Vector store reset")
             
-            # Get all books
-            indexed_book_ids = self.get_indexed_book_ids()
-            
             # Re-add each book
             total_books = len(indexed_book_ids)
             for i, book_id in enumerate(indexed_book_ids):
@@ -428,8 +548,7 @@ class VectorStore:
                 
                 # Update progress
                 if progress_callback:
-                    progress = (i / total_books)
-                    progress_callback(progress, i, f"Processing book {i+1}/{total_books}: {book['title']}")
+                    progress_callback(i, total_books, f"Processing book {i+1}/{total_books}: {book['title']}")
                 
                 # Add to vector store
                 self.add_document(
@@ -442,7 +561,7 @@ class VectorStore:
             
             # Final progress update
             if progress_callback:
-                progress_callback(1.0, total_books, "Knowledge base rebuild complete")
+                progress_callback(total_books, total_books, "Knowledge base rebuild complete")
                 
             logger.info("Knowledge base rebuilt successfully")
             return True
@@ -451,6 +570,15 @@ class VectorStore:
             logger.error(f"Error rebuilding knowledge base: {str(e)}")
             return False
             
+    def has_pending_rebuild(self) -> bool:
+        """
+        Check whether an interrupted side-by-side rebuild can be resumed.
+        
+        Returns:
+            True if rebuild_knowledge_base would resume a previous rebuild
+        """
+        return self.vector_store.persistent and IndexRebuild(self, None).pending
+    
     def get_vector_store_stats(self) -> Dict[str, Any]:
         """
         Get vector store statistics.
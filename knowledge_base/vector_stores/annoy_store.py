@@ -1,15 +1,25 @@
 """
 Annoy vector store implementation for Book Knowledge AI.
+
+Annoy indexes cannot take new items once built, so the store is segmented:
+fresh items go to a small brute-force buffer, full buffers are sealed into
+built Annoy segments, and segments are merged by a background compaction.
 """
 
 import os
+import threading
 import importlib.util
 import numpy as np
-from typing import List, Dict, Any, Optional, Callable
-import pickle
+from typing import List, Dict, Any, Optional, Callable, Tuple
 
 from utils.logger import get_logger
-from knowledge_base.vector_stores.base import BaseVectorStore
+from knowledge_base.vector_stores.base import BaseVectorStore, store_lock
+from knowledge_base.vector_stores.metadata_index import MetadataIndex
+from knowledge_base.config import (
+    DEFAULT_FILTER_EXACT_SEARCH_LIMIT, DEFAULT_ANNOY_BUFFER_SIZE,
+    DEFAULT_ANNOY_MAX_SEGMENTS, DEFAULT_ANNOY_TOMBSTONE_RATIO
+)
+from knowledge_base.vector_stores.metadata_store import ChunkMetadataStore, LazyDocuments
 from knowledge_base.vector_stores import register_vector_store
 
 logger = get_logger(__name__)
@@ -20,6 +30,29 @@ ANNOY_AVAILABLE = importlib.util.find_spec("annoy") is not None
 if ANNOY_AVAILABLE:
     from annoy import AnnoyIndex
 
+class _AnnoySegment:
+    """A sealed, built Annoy index and the store labels of its items."""
+    
+    def __init__(self, name: str, index: "AnnoyIndex", labels: Optional[np.ndarray]):
+        """
+        Args:
+            name: File name of the index, relative to the store's base path
+            index: Built Annoy index; item ``i`` holds the vector of ``labels[i]``
+            labels: Store label of each item
+        """
+        self.name = name
+        self.index = index
+        self.labels = labels
+        self.dead = 0  # Number of items deleted since the segment was built
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    @property
+    def labels_name(self) -> str:
+        """File name of the saved label array."""
+        return os.path.splitext(self.name)[0] + ".labels.npy"
+
 class AnnoyVectorStore(BaseVectorStore):
     """Vector store with Annoy."""
     
@@ -30,7 +63,11 @@ class AnnoyVectorStore(BaseVectorStore):
         data_path: str = "./knowledge_base_data/knowledge_base_data",
         embedding_function: Optional[Callable] = None,
         distance_func: str = "cosine",
-        n_trees: int = 100  # Number of trees for Annoy index
+        n_trees: int = 100,  # Number of trees for Annoy index
+        embedding_batch_size: Optional[int] = None,
+        buffer_size: int = DEFAULT_ANNOY_BUFFER_SIZE,
+        max_segments: int = DEFAULT_ANNOY_MAX_SEGMENTS,
+        background_compaction: bool = True
     ):
         """
         Initialize the Annoy vector store.
@@ -42,11 +79,18 @@ class AnnoyVectorStore(BaseVectorStore):
             embedding_function: Function to create embeddings
             distance_func: Distance function ('cosine', 'l2', 'ip')
             n_trees: Number of trees for Annoy index (more = better accuracy but slower)
+            embedding_batch_size: Number of texts embedded per call to the embedding function
+            buffer_size: Number of fresh items searched by brute force before they are sealed into a segment
+            max_segments: Number of sealed segments allowed before the smallest ones are merged
+            background_compaction: Whether segments are merged on a background thread
         """
         if not ANNOY_AVAILABLE:
             raise ImportError("Annoy is not installed. Please install it with 'pip install annoy'.")
-            
+        
         self.n_trees = n_trees
+        self.buffer_size = buffer_size
+        self.max_segments = max_segments
+        self.background_compaction = background_compaction
         
         # Map distance functions to Annoy metric types
         self.metric_map = {
@@ -60,14 +104,17 @@ class AnnoyVectorStore(BaseVectorStore):
             base_path=base_path,
             data_path=data_path,
             embedding_function=embedding_function,
-            distance_func=distance_func
+            distance_func=distance_func,
+            embedding_batch_size=embedding_batch_size
         )
     
     def _init_store(self):
         """Initialize the Annoy vector store."""
         # Paths for storing index and metadata
-        self.index_path = os.path.join(self.base_path, f"{self.collection_name}.annoy")
-        self.metadata_path = os.path.join(self.base_path, f"{self.collection_name}_metadata.pickle")
+        self.index_path = os.path.join(self.base_path, f"{self.collection_name}.annoy")  # Legacy single index
+        self.buffer_path = os.path.join(self.base_path, f"{self.collection_name}_annoy_buffer.npz")
+        self.metadata_db_path = os.path.join(self.base_path, f"{self.collection_name}_annoy_metadata.sqlite")
+        self.metadata_path = os.path.join(self.base_path, f"{self.collection_name}_metadata.pickle")  # Legacy sidecar
         
         # Get embedding dimensions by creating a sample embedding
         sample_embedding = self.embedding_function("sample text")
@@ -76,43 +123,379 @@ class AnnoyVectorStore(BaseVectorStore):
         # Get Annoy metric type
         self.metric = self.metric_map.get(self.distance_func, "angular")
         
-        # Initialize index
-        self.index = AnnoyIndex(self.embedding_dim, self.metric)
+        # Guards the segment list and buffer against the compaction thread
+        self._lock = threading.RLock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        
+        # Open the chunk metadata store, importing a legacy pickle sidecar once
+        self.metadata_store = ChunkMetadataStore(self.metadata_db_path)
+        if os.path.exists(self.metadata_path):
+            if os.path.exists(self.index_path):
+                self.metadata_store.import_pickle(self.metadata_path)
+            else:
+                os.replace(self.metadata_path, self.metadata_path + ".migrated")
+        
+        # Load the segments, adopting a legacy single index as the first segment
+        manifest = self.metadata_store.get_value("segments")
+        if manifest is None:
+            manifest = self._migrate_legacy_index()
+        self._segments = [self._load_segment(name) for name in manifest]
+        self._load_buffer()
+        
+        if not self._segments and not len(self._buffer_labels):
+            # Metadata without an index is stale
+            self.metadata_store.clear()
+        
+        self._load_metadata()
+        
+        logger.info(
+            f"Annoy index initialized with dimension {self.embedding_dim} and metric {self.metric} "
+            f"({len(self._segments)} segments, {len(self._buffer_labels)} buffered items)"
+        )
+    
+    def _migrate_legacy_index(self) -> List[str]:
+        """
+        Adopt an index saved before segmentation as the first sealed segment.
+        
+        Its items were numbered by row, which is also how the metadata store
+        labelled them, so item ``i`` keeps label ``i``.
+        
+        Returns:
+            Segment manifest (list of index file names)
+        """
+        if not os.path.exists(self.index_path):
+            return []
+        
+        index = AnnoyIndex(self.embedding_dim, self.metric)
+        index.load(self.index_path)
+        n_items = index.get_n_items()
+        if n_items == 0:
+            return []
+        
+        name = os.path.basename(self.index_path)
+        segment = _AnnoySegment(name, index, np.arange(n_items, dtype=np.int64))
+        np.save(os.path.join(self.base_path, segment.labels_name), segment.labels)
+        
+        manifest = [name]
+        self.metadata_store.set_value("segments", manifest)
+        logger.info(f"Adopted legacy Annoy index with {n_items} items as the first segment")
+        return manifest
+    
+    def _load_segment(self, name: str) -> _AnnoySegment:
+        """
+        Memory-map a sealed segment.
+        
+        Args:
+            name: Index file name, relative to the base path
         
-        # Check if index and metadata exist
-        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-            # Load existing index and metadata
-            self.index.load(self.index_path)
-            with open(self.metadata_path, 'rb') as f:
-                self.metadata = pickle.load(f)
+        Returns:
+            Loaded segment
+        """
+        index = AnnoyIndex(self.embedding_dim, self.metric)
+        index.load(os.path.join(self.base_path, name))
+        segment = _AnnoySegment(name, index, None)
+        segment.labels = np.load(os.path.join(self.base_path, segment.labels_name))
+        return segment
+    
+    def _load_buffer(self) -> None:
+        """Load the brute-force buffer of items not yet sealed into a segment."""
+        if os.path.exists(self.buffer_path):
+            with np.load(self.buffer_path) as data:
+                self._buffer_labels = data["labels"].astype(np.int64)
+                self._buffer_vectors = data["vectors"].astype(np.float32)
         else:
-            # Create new metadata
-            self.metadata = {
-                "documents": [],
-                "metadatas": [],
-                "ids": [],
-                "index_map": {}  # Maps ID to index in the Annoy index
-            }
+            self._buffer_labels = np.empty(0, dtype=np.int64)
+            self._buffer_vectors = np.empty((0, self.embedding_dim), dtype=np.float32)
+    
+    def _load_metadata(self) -> None:
+        """
+        Load ids, labels and metadata from the metadata store.
+        
+        Chunk texts stay on disk and are fetched lazily through
+        ``self.metadata["documents"]``.
+        """
+        ids, labels, metadatas = self.metadata_store.load_columns()
+        
+        # Rows are committed before the buffer is saved, so rows without a saved vector
+        # were either lost in a crash or are still being written by another instance.
+        # Skip them here but leave them on disk: opening a store must not change shared state.
+        index_labels = np.concatenate([segment.labels for segment in self._segments] + [self._buffer_labels])
+        saved = set(index_labels.tolist())
+        unsaved_max = max((label for label in labels if label not in saved), default=-1)
+        if unsaved_max >= 0:
+            rows = [row for row in zip(ids, labels, metadatas) if row[1] in saved]
+            logger.info(f"Skipping {len(labels) - len(rows)} Annoy metadata rows whose vectors are not saved")
+            ids, labels, metadatas = (list(column) for column in zip(*rows)) if rows else ([], [], [])
+        
+        self.metadata = {
+            "metadatas": metadatas,
+            "ids": ids,
+            "labels": labels,  # Store label of each row
+            "index_map": dict(zip(ids, labels)),  # Maps ID to store label
+            # Never reuse a label that is still in a segment, the buffer or the metadata
+            "next_label": max(
+                self.metadata_store.get_value("next_label", 0),
+                int(index_labels.max()) + 1 if len(index_labels) else 0,
+                max(labels) + 1 if labels else 0,
+                unsaved_max + 1
+            )
+        }
+        self.metadata["documents"] = LazyDocuments(self.metadata_store, self.metadata)
+        self._rebuild_row_maps()
+        
+        # Inverted index over metadata, keyed by store label
+        self.metadata_index = MetadataIndex()
+        self.metadata_index.add_many(labels, metadatas)
+        
+        # Count items in each segment whose rows are already gone
+        for segment in self._segments:
+            segment.dead = int(np.count_nonzero(~np.isin(segment.labels, labels)))
+    
+    def _rebuild_row_maps(self) -> None:
+        """
+        Rebuild the reverse maps from store label and chunk ID to metadata row.
+        
+        Both maps are derived from the label and ID columns persisted in the
+        metadata store, so they always agree with the saved index.
+        """
+        with self._lock:
+            self._label_to_row = {label: row for row, label in enumerate(self.metadata["labels"])}
+            self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.metadata["ids"])}
+            self._rebuild_vector_locations()
+    
+    def _rebuild_vector_locations(self) -> None:
+        """Rebuild the mapping from store label to its segment and item (or buffer row)."""
+        with self._lock:
+            locations = {}
+            for segment in self._segments:
+                for item, label in enumerate(segment.labels.tolist()):
+                    locations[label] = (segment, item)
+            for row, label in enumerate(self._buffer_labels.tolist()):
+                locations[label] = (None, row)
+            self._vector_locations = locations
+    
+    def _rows_for_ids(self, ids: List[str]) -> set:
+        """
+        Get the metadata rows of the given chunk IDs.
         
-        logger.info(f"Annoy index initialized with dimension {self.embedding_dim} and metric {self.metric}")
+        Args:
+            ids: Chunk IDs (unknown IDs are ignored)
+        
+        Returns:
+            Set of metadata rows
+        """
+        return {self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row}
     
     def _save_index(self):
-        """Save Annoy index and metadata to disk."""
+        """Save the buffer and segment manifest (rows are written to the metadata store as they change)."""
         try:
-            # Save index
-            self.index.save(self.index_path)
-            
-            # Save metadata
-            with open(self.metadata_path, 'wb') as f:
-                pickle.dump(self.metadata, f)
+            with self._lock:
+                # Write the buffer to a temporary file first so a crash cannot truncate it
+                temp_path = self.buffer_path + ".tmp"
+                with open(temp_path, 'wb') as f:
+                    np.savez(f, labels=self._buffer_labels, vectors=self._buffer_vectors)
+                os.replace(temp_path, self.buffer_path)
                 
-            logger.debug(f"Annoy index saved to {self.index_path}")
-            return True
+                self.metadata_store.set_value("segments", [segment.name for segment in self._segments])
+                self.metadata_store.set_value("next_label", self.metadata["next_label"])
             
+            logger.debug(f"Annoy buffer and segment manifest saved to {self.base_path}")
+            return True
+        
         except Exception as e:
             logger.error(f"Error saving Annoy index: {str(e)}")
             return False
     
+    def _build_segment(self, labels: np.ndarray, vectors: Any) -> _AnnoySegment:
+        """
+        Build and save a new sealed segment.
+        
+        Args:
+            labels: Store labels of the items
+            vectors: Item vectors aligned with ``labels``
+        
+        Returns:
+            The new segment (not yet part of the manifest)
+        """
+        with self._lock:
+            sequence = self.metadata_store.get_value("next_segment", 0)
+            self.metadata_store.set_value("next_segment", sequence + 1)
+        
+        name = f"{self.collection_name}_segment_{sequence}.annoy"
+        index = AnnoyIndex(self.embedding_dim, self.metric)
+        for item, vector in enumerate(vectors):
+            index.add_item(item, vector)
+        index.build(self.n_trees)
+        index.save(os.path.join(self.base_path, name))
+        
+        segment = _AnnoySegment(name, index, np.asarray(labels, dtype=np.int64))
+        np.save(os.path.join(self.base_path, segment.labels_name), segment.labels)
+        return segment
+    
+    def _remove_segment_files(self, segment: _AnnoySegment) -> None:
+        """
+        Delete the files of a segment that is no longer in the manifest.
+        
+        Args:
+            segment: Retired segment
+        """
+        for name in (segment.name, segment.labels_name):
+            try:
+                os.remove(os.path.join(self.base_path, name))
+            except OSError as e:
+                logger.warning(f"Could not remove retired Annoy segment file {name}: {str(e)}")
+    
+    def _seal_buffer(self) -> None:
+        """Build the buffered items into a new sealed segment and empty the buffer."""
+        with self._lock:
+            labels, vectors = self._buffer_labels, self._buffer_vectors
+        
+        if len(labels):
+            segment = self._build_segment(labels, vectors)
+            logger.info(f"Sealed {len(labels)} buffered items into Annoy segment {segment.name}")
+        
+        with self._lock:
+            if len(labels):
+                self._segments.append(segment)
+                for item, label in enumerate(segment.labels.tolist()):
+                    self._vector_locations[label] = (segment, item)
+            self._buffer_labels = np.empty(0, dtype=np.int64)
+            self._buffer_vectors = np.empty((0, self.embedding_dim), dtype=np.float32)
+    
+    def _segments_to_compact(self) -> List[_AnnoySegment]:
+        """
+        Choose the segments a compaction should merge.
+        
+        Segments with many deleted items are always rewritten; when there are
+        too many segments the smallest ones are merged as well.
+        
+        Returns:
+            Segments to merge (empty if no compaction is needed)
+        """
+        with self._lock:
+            chosen = [
+                segment for segment in self._segments
+                if len(segment) and segment.dead / len(segment) > DEFAULT_ANNOY_TOMBSTONE_RATIO
+            ]
+            
+            if len(self._segments) > self.max_segments:
+                # Merge the smallest segments until half the allowed number remain
+                by_size = sorted(self._segments, key=lambda segment: len(segment) - segment.dead)
+                excess = len(self._segments) - max(1, self.max_segments // 2) + 1
+                for segment in by_size[:max(2, excess)]:
+                    if segment not in chosen:
+                        chosen.append(segment)
+            
+            return chosen
+    
+    def _maybe_compact(self) -> None:
+        """Start a compaction if one is needed and none is running."""
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        
+        segments = self._segments_to_compact()
+        if not segments:
+            return
+        
+        if self.background_compaction:
+            self._compaction_thread = threading.Thread(
+                target=self._compact_segments,
+                args=(segments,),
+                name=f"annoy-compaction-{self.collection_name}",
+                daemon=True
+            )
+            self._compaction_thread.start()
+        else:
+            self._compact_segments(segments)
+    
+    def _wait_for_compaction(self) -> None:
+        """Block until a running background compaction has finished."""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+            self._compaction_thread = None
+    
+    def _compact_segments(self, segments: List[_AnnoySegment]) -> None:
+        """
+        Merge segments into one, dropping deleted items.
+        
+        Vectors are read back from the sealed segments, so nothing is
+        re-embedded. Searches keep using the old segments until the merged
+        segment is swapped in.
+        
+        Args:
+            segments: Segments to merge
+        """
+        merged = None
+        try:
+            # Collect the live vectors of the chosen segments; items deleted
+            # after the snapshot are counted as dead when the merge is swapped in
+            with self._lock:
+                live_labels = set(self._label_to_row)
+            
+            labels, vectors = [], []
+            for segment in segments:
+                for item, label in enumerate(segment.labels.tolist()):
+                    if label in live_labels:
+                        labels.append(label)
+                        vectors.append(segment.index.get_item_vector(item))
+            
+            merged = self._build_segment(np.asarray(labels, dtype=np.int64), vectors) if labels else None
+            
+            with self._lock:
+                if any(segment not in self._segments for segment in segments):
+                    # The store was reset or changed underneath us; discard the merge
+                    if merged is not None:
+                        self._remove_segment_files(merged)
+                    return
+                
+                position = self._segments.index(segments[0])
+                remaining = [segment for segment in self._segments if segment not in segments]
+                if merged is not None:
+                    merged.dead = int(np.count_nonzero(~np.isin(merged.labels, list(self._label_to_row))))
+                    remaining.insert(position, merged)
+                
+                # Record the new manifest before switching to it, so a failed write changes nothing
+                self.metadata_store.set_value("segments", [segment.name for segment in remaining])
+                self._segments = remaining
+                if merged is not None:
+                    for item, label in enumerate(merged.labels.tolist()):
+                        self._vector_locations[label] = (merged, item)
+            
+            # Old files are only removed once the manifest no longer references them
+            for segment in segments:
+                self._remove_segment_files(segment)
+            
+            logger.info(
+                f"Compacted {len(segments)} Annoy segments into one with {len(labels)} items "
+                f"({len(self._segments)} segments remain)"
+            )
+        
+        except Exception as e:
+            logger.error(f"Error compacting Annoy segments: {str(e)}")
+            with self._lock:
+                if merged is not None and merged not in self._segments:
+                    self._remove_segment_files(merged)
+    
+    @store_lock("write")
+    def compact(self) -> bool:
+        """
+        Seal the buffer and merge all segments into one.
+        
+        Returns:
+            True if successful
+        """
+        try:
+            self._wait_for_compaction()
+            
+            self._seal_buffer()
+            if len(self._segments) > 1 or any(segment.dead for segment in self._segments):
+                self._compact_segments(list(self._segments))
+            return self._save_index()
+        
+        except Exception as e:
+            logger.error(f"Error compacting Annoy index: {str(e)}")
+            return False
+    
     def add_texts(
         self,
         texts: List[str],
@@ -122,17 +505,27 @@ class AnnoyVectorStore(BaseVectorStore):
         """
         Add texts to the vector store.
         
+        New items go to the brute-force buffer; a full buffer is sealed
+        into a new segment, so existing segments are never rebuilt.
+        
         Args:
             texts: List of texts to add
             metadatas: Optional list of metadata dictionaries
             ids: Optional list of IDs
-            
+        
         Returns:
             List of IDs of added texts
         """
         if not texts:
             return []
         
+        # Generate embeddings in batches
+        embeddings_array, valid_indices = self._embed_texts(texts)
+        
+        if not valid_indices:
+            logger.error("No valid embeddings generated. Skipping vector store update.")
+            return []
+        
         # Generate IDs if not provided
         if ids is None:
             ids = [self.generate_id() for _ in range(len(texts))]
@@ -141,34 +534,145 @@ class AnnoyVectorStore(BaseVectorStore):
         if metadatas is None:
             metadatas = [{} for _ in range(len(texts))]
         
-        # Start with current index size
-        current_index = len(self.metadata["documents"])
+        # Keep only the texts that produced valid embeddings
+        texts = [texts[i] for i in valid_indices]
+        metadatas = [metadatas[i] for i in valid_indices]
+        ids = [ids[i] for i in valid_indices]
         
-        # Add embeddings to index
-        for i, text in enumerate(texts):
-            # Generate embedding
-            embedding = self.embedding_function(text)
-            
-            # Add to Annoy index
-            self.index.add_item(current_index + i, embedding)
-            
-            # Update index map
-            self.metadata["index_map"][ids[i]] = current_index + i
+        # Assign stable labels to the new items
+        first_row = len(self.metadata["ids"])
+        first_label = self.metadata["next_label"]
+        labels = list(range(first_label, first_label + len(texts)))
         
         # Add to metadata
-        self.metadata["documents"].extend(texts)
+        self.metadata_store.append(labels, ids, texts, metadatas)
         self.metadata["metadatas"].extend(metadatas)
         self.metadata["ids"].extend(ids)
+        self.metadata["labels"].extend(labels)
+        self.metadata["next_label"] = first_label + len(texts)
+        with self._lock:
+            # A background compaction reads the row maps under the lock
+            for offset, (label, doc_id) in enumerate(zip(labels, ids)):
+                self._label_to_row[label] = first_row + offset
+                self._id_to_row[doc_id] = first_row + offset
+                self.metadata["index_map"][doc_id] = label
+        self.metadata_index.add_many(labels, metadatas)
+        self.sparse_index.add(ids, texts, metadatas)
+        
+        # Add embeddings to the buffer
+        with self._lock:
+            first_buffer_row = len(self._buffer_labels)
+            self._buffer_labels = np.concatenate([self._buffer_labels, np.asarray(labels, dtype=np.int64)])
+            self._buffer_vectors = np.concatenate([self._buffer_vectors, embeddings_array])
+            for offset, label in enumerate(labels):
+                self._vector_locations[label] = (None, first_buffer_row + offset)
         
-        # Build index if it's the first time
-        if current_index == 0:
-            self.index.build(self.n_trees)
+        # Seal the buffer into its own segment once it is full
+        if len(self._buffer_labels) >= self.buffer_size:
+            self._seal_buffer()
         
-        # Save index and metadata
-        self._save_index()
+        # Save index and metadata (compaction waits for deferred saves)
+        self._persist()
+        if not self._saves_deferred:
+            self._maybe_compact()
+        self._invalidate_search_cache()
         
         return ids
     
+    def _distances(self, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Compute distances with Annoy's conventions for the configured metric.
+        
+        Args:
+            vectors: Matrix of item vectors
+            query: Query vector
+        
+        Returns:
+            Distance of each row (for "dot", the dot product; higher is better)
+        """
+        if self.metric == "angular":
+            # Annoy's angular distance: sqrt(2 - 2 * cos)
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+            norms[norms == 0] = 1.0
+            cosine = (vectors @ query) / norms
+            return np.sqrt(np.maximum(2.0 - 2.0 * cosine, 0.0))
+        
+        if self.metric == "dot":
+            # Annoy reports the dot product itself (higher is better)
+            return vectors @ query
+        
+        return np.linalg.norm(vectors - query, axis=1)
+    
+    def _rank(self, labels: np.ndarray, distances: np.ndarray, limit: int) -> Tuple[List[int], List[float]]:
+        """
+        Order candidates by distance and keep the best ones.
+        
+        Args:
+            labels: Candidate store labels
+            distances: Distance of each candidate
+            limit: Maximum number of results
+        
+        Returns:
+            Tuple of (labels, distances), best first
+        """
+        if self.metric == "dot":
+            order = np.argsort(-distances, kind="stable")
+        else:
+            order = np.argsort(distances, kind="stable")
+        
+        order = order[:limit]
+        return labels[order].tolist(), distances[order].tolist()
+    
+    def _get_vector(self, label: int) -> Optional[Any]:
+        """
+        Get the stored vector of an item.
+        
+        Args:
+            label: Store label
+        
+        Returns:
+            The vector, or None if the label is unknown
+        """
+        location = self._vector_locations.get(label)
+        if location is None:
+            return None
+        
+        segment, item = location
+        if segment is None:
+            return self._buffer_vectors[item]
+        return segment.index.get_item_vector(item)
+    
+    def _search_segments(self, query: np.ndarray, search_limit: int) -> Tuple[List[int], List[float]]:
+        """
+        Search every segment and the buffer, then merge the results.
+        
+        Args:
+            query: Query vector
+            search_limit: Number of neighbors requested from each segment
+        
+        Returns:
+            Tuple of (labels, distances), best first
+        """
+        with self._lock:
+            segments = list(self._segments)
+            buffer_labels, buffer_vectors = self._buffer_labels, self._buffer_vectors
+        
+        labels, distances = [], []
+        query_list = query.tolist()
+        
+        for segment in segments:
+            # Ask for extra neighbors to make up for deleted items in the segment
+            n = min(len(segment), search_limit + segment.dead)
+            items, item_distances = segment.index.get_nns_by_vector(query_list, n, include_distances=True)
+            labels.extend(segment.labels[items].tolist())
+            distances.extend(item_distances)
+        
+        if len(buffer_labels):
+            labels.extend(buffer_labels.tolist())
+            distances.extend(self._distances(buffer_vectors, query).tolist())
+        
+        return self._rank(np.asarray(labels, dtype=np.int64), np.asarray(distances, dtype=np.float32), len(labels))
+    
     def search(
         self,
         query: str,
@@ -182,7 +686,7 @@ class AnnoyVectorStore(BaseVectorStore):
             query: Search query
             limit: Maximum number of results
             where: Filter condition
-            
+        
         Returns:
             List of search results
         """
@@ -190,29 +694,41 @@ class AnnoyVectorStore(BaseVectorStore):
             return []
         
         # Generate query embedding
-        query_embedding = self.embedding_function(query)
-        
-        # Find n nearest neighbors, get more to allow for filtering
-        search_limit = min(self.count(), max(100, limit * 10))
-        indices, distances = self.index.get_nns_by_vector(
-            query_embedding, 
-            search_limit, 
-            include_distances=True
-        )
+        query_embedding = self._embed_query(query)
+        
+        # Resolve the metadata filter to candidate items before searching
+        candidate_labels = None
+        if where:
+            candidate_labels = self._filter_labels(where)
+            if not candidate_labels:
+                return []
+        
+        if candidate_labels is not None and len(candidate_labels) <= DEFAULT_FILTER_EXACT_SEARCH_LIMIT:
+            # Score the few matching items exactly
+            indices, distances = self._nns_among(query_embedding, candidate_labels, limit)
+        else:
+            # Find n nearest neighbors, fetching more in proportion to how selective the filter is
+            search_limit = min(self.count(), max(100, limit * 10))
+            if candidate_labels is not None:
+                selectivity = self.count() / len(candidate_labels)
+                search_limit = min(self.count(), int(np.ceil(search_limit * selectivity)))
+            indices, distances = self._search_segments(query_embedding, search_limit)
         
         # Get results
         results = []
         for i, idx in enumerate(indices):
-            # Get metadata and document text
-            doc_index = self.metadata["ids"].index(self._get_id_from_index(idx))
+            # Filter by metadata if where condition is provided
+            if candidate_labels is not None and idx not in candidate_labels:
+                continue
+            
+            # Get metadata and document text (deleted items have no row)
+            doc_index = self._label_to_row.get(idx)
+            if doc_index is None:
+                continue
             metadata = self.metadata["metadatas"][doc_index]
             document = self.metadata["documents"][doc_index]
             doc_id = self.metadata["ids"][doc_index]
             
-            # Filter by metadata if where condition is provided
-            if where and not self._matches_filter(metadata, where):
-                continue
-            
             # Add to results
             if self.metric == "angular":
                 # Convert angular distance to cosine similarity
@@ -242,7 +758,8 @@ class AnnoyVectorStore(BaseVectorStore):
     def get(
         self,
         ids: Optional[List[str]] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Get entries from the vector store.
@@ -250,36 +767,76 @@ class AnnoyVectorStore(BaseVectorStore):
         Args:
             ids: List of IDs to get
             where: Filter condition
-            
+            limit: Maximum number of entries (in insertion order)
+        
         Returns:
             Dictionary with documents, metadatas, and ids
         """
         # Initialize result lists
-        result_documents = []
+        result_rows = []
         result_metadatas = []
         result_ids = []
         
-        # Filter by IDs and/or metadata
-        for i, doc_id in enumerate(self.metadata["ids"]):
-            # Filter by ID if provided
-            if ids and doc_id not in ids:
-                continue
-                
-            # Filter by metadata if provided
-            if where and not self._matches_filter(self.metadata["metadatas"][i], where):
-                continue
-                
+        # Look up rows by ID and resolve the metadata filter through the inverted index
+        if ids:
+            rows = self._rows_for_ids(ids)
+            if where:
+                rows &= {self._label_to_row[label] for label in self._filter_labels(where)}
+            rows = sorted(rows)
+        elif where:
+            rows = sorted(self._label_to_row[label] for label in self._filter_labels(where))
+        else:
+            rows = range(len(self.metadata["ids"]))
+        
+        if limit is not None:
+            rows = rows[:max(0, limit)]
+        
+        for i in rows:
+            doc_id = self.metadata["ids"][i]
+            
             # Add to results
-            result_documents.append(self.metadata["documents"][i])
+            result_rows.append(i)
             result_metadatas.append(self.metadata["metadatas"][i])
             result_ids.append(doc_id)
         
+        # Fetch the matching texts from the metadata store in batches
+        result_documents = self.metadata["documents"].take(result_rows)
+        
         return {
             "documents": result_documents,
             "metadatas": result_metadatas,
             "ids": result_ids
         }
     
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the metadata of existing entries, keeping their vectors.
+        
+        Args:
+            ids: IDs of the entries to update (unknown IDs are ignored)
+            metadatas: New metadata dictionaries aligned with ``ids``
+        
+        Returns:
+            True if successful
+        """
+        updates = dict(zip(ids, metadatas))
+        rows = sorted(self._rows_for_ids(list(updates)))
+        if not rows:
+            return True
+        
+        labels = [self.metadata["labels"][i] for i in rows]
+        updated_ids = [self.metadata["ids"][i] for i in rows]
+        for i, label, doc_id in zip(rows, labels, updated_ids):
+            self.metadata_index.remove(label, self.metadata["metadatas"][i])
+            self.metadata_index.add(label, updates[doc_id])
+            self.metadata["metadatas"][i] = updates[doc_id]
+        
+        self.metadata_store.update_metadata(labels, [updates[doc_id] for doc_id in updated_ids])
+        self.sparse_index.update_metadata(updated_ids, [updates[doc_id] for doc_id in updated_ids])
+        self._invalidate_search_cache()
+        
+        return True
+    
     def count(self) -> int:
         """
         Get the number of entries in the vector store.
@@ -287,7 +844,7 @@ class AnnoyVectorStore(BaseVectorStore):
         Returns:
             Number of entries
         """
-        return len(self.metadata["documents"])
+        return len(self.metadata["ids"])
     
     def delete(
         self,
@@ -297,84 +854,83 @@ class AnnoyVectorStore(BaseVectorStore):
         """
         Delete entries from the vector store.
         
+        Buffered items are dropped immediately. Items in sealed segments are
+        left as tombstones that search skips, and are removed when their
+        segment is compacted.
+        
         Args:
             ids: List of IDs to delete
             where: Filter condition
-            
+        
         Returns:
             True if successful
         """
-        # Find indices to keep
-        indices_to_keep = []
-        
-        for i, doc_id in enumerate(self.metadata["ids"]):
-            should_delete = False
-            
-            # Check if ID matches
-            if ids and doc_id in ids:
-                should_delete = True
-            
-            # Check if metadata matches
-            if where and self._matches_filter(self.metadata["metadatas"][i], where):
-                should_delete = True
-            
-            if not should_delete:
-                indices_to_keep.append(i)
+        # Find rows matching the IDs or the metadata filter
+        rows_to_delete = self._rows_for_ids(ids) if ids else set()
+        if where:
+            rows_to_delete |= {self._label_to_row[label] for label in self._filter_labels(where)}
         
         # If no changes, return
-        if len(indices_to_keep) == self.count():
+        if not rows_to_delete:
             return True
         
-        # Create new metadata
-        new_documents = [self.metadata["documents"][i] for i in indices_to_keep]
-        new_metadatas = [self.metadata["metadatas"][i] for i in indices_to_keep]
-        new_ids = [self.metadata["ids"][i] for i in indices_to_keep]
+        labels = [self.metadata["labels"][i] for i in rows_to_delete]
         
-        # For Annoy, we need to rebuild the entire index
-        # since it doesn't support removing items
-        if new_documents:
-            # Create new index
-            new_index = AnnoyIndex(self.embedding_dim, self.metric)
-            
-            # Add vectors to the new index
-            new_index_map = {}
-            
-            for i, (text, doc_id) in enumerate(zip(new_documents, new_ids)):
-                # Generate embedding
-                embedding = self.embedding_function(text)
-                
-                # Add to index
-                new_index.add_item(i, embedding)
-                
-                # Update index map
-                new_index_map[doc_id] = i
-            
-            # Build the index
-            new_index.build(self.n_trees)
+        # Drop removed rows from the metadata store and the in-memory columns
+        self.metadata_store.delete_labels(labels)
+        self.sparse_index.delete(ids=list({self.metadata["ids"][i] for i in rows_to_delete}))
+        for i in rows_to_delete:
+            self.metadata_index.remove(self.metadata["labels"][i], self.metadata["metadatas"][i])
+            self.metadata["index_map"].pop(self.metadata["ids"][i], None)
+        for key in ("metadatas", "ids", "labels"):
+            values = self.metadata[key]
+            self.metadata[key] = [value for i, value in enumerate(values) if i not in rows_to_delete]
+        
+        with self._lock:
+            # Drop buffered items and count tombstones in the sealed segments
+            keep = ~np.isin(self._buffer_labels, labels)
+            self._buffer_labels = self._buffer_labels[keep]
+            self._buffer_vectors = self._buffer_vectors[keep]
             
-            # Update the index and metadata
-            self.index = new_index
-            self.metadata = {
-                "documents": new_documents,
-                "metadatas": new_metadatas,
-                "ids": new_ids,
-                "index_map": new_index_map
-            }
-        else:
-            # Reset if no documents left
-            self.index = AnnoyIndex(self.embedding_dim, self.metric)
-            self.metadata = {
-                "documents": [],
-                "metadatas": [],
-                "ids": [],
-                "index_map": {}
-            }
+            for label in labels:
+                location = self._vector_locations.get(label)
+                if location is not None and location[0] is not None:
+                    location[0].dead += 1
         
-        # Save index and metadata
-        self._save_index()
+        self._rebuild_row_maps()
         
+        # Save index and metadata (compaction waits for deferred saves)
+        self._persist()
+        if not self._saves_deferred:
+            self._maybe_compact()
+        self._invalidate_search_cache()
+        
+        logger.info(f"Deleted {len(labels)} items from Annoy index")
         return True
     
+    def flush(self) -> bool:
+        """
+        Save changes made while saves were deferred, then compact if needed.
+        
+        Compaction rewrites the segment manifest, so it never runs ahead of
+        the saved buffer while saves are deferred.
+        
+        Returns:
+            True if successful
+        """
+        saved = super().flush()
+        if saved and not self._saves_deferred:
+            self._maybe_compact()
+        return saved
+    
+    def close(self) -> None:
+        """Save pending changes, finish compaction and close the index files."""
+        super().close()
+        self._wait_for_compaction()
+        for segment in self._segments:
+            segment.index.unload()
+        self.metadata_store.close()
+    
     def reset(self) -> bool:
         """
         Reset the vector store.
@@ -383,27 +939,74 @@ class AnnoyVectorStore(BaseVectorStore):
             True if successful
         """
         try:
-            # Create new index
-            self.index = AnnoyIndex(self.embedding_dim, self.metric)
+            self._wait_for_compaction()
+            
+            with self._lock:
+                segments = self._segments
+                self._segments = []
+                self._buffer_labels = np.empty(0, dtype=np.int64)
+                self._buffer_vectors = np.empty((0, self.embedding_dim), dtype=np.float32)
             
             # Reset metadata
-            self.metadata = {
-                "documents": [],
-                "metadatas": [],
-                "ids": [],
-                "index_map": {}
-            }
+            self.metadata_store.clear()
+            self.sparse_index.clear()
+            self._load_metadata()
             
             # Save changes
             self._save_index()
             
+            for segment in segments:
+                self._remove_segment_files(segment)
+            self._invalidate_search_cache()
+            
             logger.info("Annoy vector store reset")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Error resetting vector store: {str(e)}")
             return False
     
+    def _filter_labels(self, where: Dict[str, Any]) -> set:
+        """
+        Get the store labels whose metadata matches a filter.
+        
+        Args:
+            where: Filter condition
+        
+        Returns:
+            Set of matching store labels
+        """
+        return self._filter_keys(
+            where,
+            lambda label: self.metadata["metadatas"][self._label_to_row[label]],
+            lambda: self.metadata["labels"]
+        )
+    
+    def _nns_among(self, query_embedding: Any, labels: set, limit: int) -> Tuple[List[int], List[float]]:
+        """
+        Find the nearest items among a candidate set by brute force.
+        
+        Distances use Annoy's conventions for the configured metric, so the
+        results can be scored like ``get_nns_by_vector`` output.
+        
+        Args:
+            query_embedding: Query vector
+            labels: Candidate store labels
+            limit: Maximum number of results
+        
+        Returns:
+            Tuple of (labels, distances)
+        """
+        # Rows written without a vector (e.g. after a crash mid-add) cannot be scored
+        items = np.asarray([label for label in labels if label in self._vector_locations], dtype=np.int64)
+        if len(items) == 0:
+            return [], []
+        
+        vectors = np.asarray([self._get_vector(int(item)) for item in items], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        
+        return self._rank(items, self._distances(vectors, query), limit)
+    
     def _matches_filter(self, metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
         """
         Check if metadata matches filter.
@@ -411,7 +1014,7 @@ class AnnoyVectorStore(BaseVectorStore):
         Args:
             metadata: Metadata to check
             filter_dict: Filter dictionary
-            
+        
         Returns:
             True if metadata matches filter
         """
@@ -423,13 +1026,14 @@ class AnnoyVectorStore(BaseVectorStore):
     
     def _get_id_from_index(self, idx: int) -> str:
         """Get document ID from index."""
-        for doc_id, index in self.metadata["index_map"].items():
-            if index == idx:
-                return doc_id
+        row = self._label_to_row.get(idx)
         
         # This should not happen, but just in case
-        return self.metadata["ids"][0]
+        if row is None:
+            return self.metadata["ids"][0]
+        
+        return self.metadata["ids"][row]
 
 # Register the vector store if Annoy is available
 if ANNOY_AVAILABLE:
-    register_vector_store("annoy", AnnoyVectorStore)
\ No newline at end of file
+    register_vector_store("annoy", AnnoyVectorStore)
@@ -3,31 +3,80 @@ Base vector store class for Book Knowledge AI.
 """
 
 import os
+import functools
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Callable, Tuple
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Tuple, Set, Iterable
 import uuid
 import json
 import shutil
+import numpy as np
 
 from utils.logger import get_logger
 from knowledge_base.chunking import chunk_document
 from knowledge_base.embedding import get_embedding_function
+from knowledge_base.config import (DEFAULT_EMBEDDING_BATCH_SIZE, DEFAULT_SEARCH_CACHE_SIZE,
+                                   DEFAULT_USE_EMBEDDING_CACHE)
+from knowledge_base.embedding_cache import CachedEmbeddingFunction
+from knowledge_base.cache import (LRUCache, get_query_embedding_cache, normalize_query,
+                                  embedding_model_key, search_cache_key)
+from knowledge_base.vector_stores.sparse_index import SparseIndex
+from knowledge_base.vector_stores.manifest import DocumentManifest, content_hash
+from knowledge_base.vector_stores.rw_lock import ReadWriteLock
 
 logger = get_logger(__name__)
 
+def store_lock(mode: str) -> Callable:
+    """
+    Run a store method under the store's read/write lock.
+    
+    Args:
+        mode: 'read' or 'write'
+    
+    Returns:
+        Method decorator
+    """
+    def decorate(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def locked(self, *args, **kwargs):
+            with getattr(self._rw_lock, mode)():
+                return method(self, *args, **kwargs)
+        
+        locked._store_lock = mode
+        return locked
+    
+    return decorate
+
 class BaseVectorStore(ABC):
     """
     Abstract base class for vector stores.
     Provides a common interface for different vector store implementations.
     """
     
+    # Whether the index is saved under base_path and survives a restart
+    persistent = True
+    
+    # Backend methods that run under the store's read/write lock (wrapped in __init_subclass__)
+    _READ_METHODS = ("search", "search_batch", "get", "count")
+    _WRITE_METHODS = ("add_texts", "delete", "update_metadata", "reset", "flush", "close")
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for mode, names in (("read", cls._READ_METHODS), ("write", cls._WRITE_METHODS)):
+            for name in names:
+                method = cls.__dict__.get(name)
+                if callable(method) and not hasattr(method, "_store_lock"):
+                    setattr(cls, name, store_lock(mode)(method))
+    
     def __init__(
         self,
         collection_name: str,
         base_path: str,
         data_path: str,
         embedding_function: Optional[Callable] = None,
-        distance_func: str = "cosine"
+        distance_func: str = "cosine",
+        embedding_batch_size: Optional[int] = None
     ):
         """
         Initialize the vector store.
@@ -38,11 +87,13 @@ class BaseVectorStore(ABC):
             data_path: Path to store document data
             embedding_function: Function to create embeddings
             distance_func: Distance function ('cosine', 'l2', 'ip')
+            embedding_batch_size: Number of texts embedded per call to the embedding function
         """
         self.collection_name = collection_name
         self.base_path = base_path
         self.data_path = data_path
         self.distance_func = distance_func
+        self.embedding_batch_size = embedding_batch_size or DEFAULT_EMBEDDING_BATCH_SIZE
         
         # Create directories if they don't exist
         os.makedirs(self.base_path, exist_ok=True)
@@ -53,10 +104,34 @@ class BaseVectorStore(ABC):
             self.embedding_function = get_embedding_function()
         else:
             self.embedding_function = embedding_function
+        
+        # Chunk embeddings are read from the persistent cache before the model runs
+        if DEFAULT_USE_EMBEDDING_CACHE and not isinstance(self.embedding_function, CachedEmbeddingFunction):
+            self.embedding_function = CachedEmbeddingFunction(self.embedding_function)
+        
+        # Search results are cached per generation; add_texts, delete and reset start a new one
+        self.search_cache = LRUCache(DEFAULT_SEARCH_CACHE_SIZE)
+        self.generation = 0
+        
+        # Backends that save on every change only mark themselves unsaved while saves are deferred
+        self._saves_deferred = False
+        self._unsaved_changes = False
+        
+        # Searches may run while background workers index, so reads and writes take this lock
+        self._rw_lock = ReadWriteLock()
             
         # Initialize the vector store
         self._init_store()
         
+        # Open the BM25 keyword index kept in sync with the stored chunks
+        self.sparse_index = SparseIndex(os.path.join(self.base_path, f"{collection_name}_sparse.sqlite"))
+        self._sparse_index_checked = False
+        
+        # Open the document manifest, filling a new one from the documents already on disk
+        self.manifest = DocumentManifest(os.path.join(self.data_path, "manifest.sqlite"))
+        if self.manifest.created:
+            self.rebuild_manifest()
+        
         logger.info(f"Vector store initialized with collection '{collection_name}'")
     
     @abstractmethod
@@ -84,6 +159,330 @@ class BaseVectorStore(ABC):
         """
         pass
     
+    def _embed_texts(
+        self,
+        texts: List[str],
+        min_length: int = 0
+    ) -> Tuple[np.ndarray, List[int]]:
+        """
+        Embed texts in batches and drop invalid embeddings.
+        
+        Texts are passed to the embedding function in lists of
+        ``embedding_batch_size``. NaN and all-zero vectors are detected on the
+        whole matrix at once and removed.
+        
+        Args:
+            texts: Texts to embed
+            min_length: Minimum stripped length for a text to be embedded
+        
+        Returns:
+            Tuple of (float32 embedding matrix, indices into ``texts`` for each row)
+        """
+        candidates = [
+            i for i, text in enumerate(texts)
+            if text and len(text.strip()) >= max(min_length, 1)
+        ]
+        
+        if len(candidates) < len(texts):
+            logger.warning(f"Skipping {len(texts) - len(candidates)} texts with insufficient content (min length: {min_length})")
+        
+        vectors = []
+        valid_indices = []
+        batch_size = max(1, int(self.embedding_batch_size))
+        
+        for start in range(0, len(candidates), batch_size):
+            batch_indices = candidates[start:start + batch_size]
+            batch_vectors = self._embed_batch([texts[i] for i in batch_indices])
+            
+            for i, vector in zip(batch_indices, batch_vectors):
+                if vector is None or len(vector) == 0:
+                    logger.warning(f"Empty embedding generated for text at index {i}")
+                    continue
+                
+                vectors.append(vector)
+                valid_indices.append(i)
+        
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32), []
+        
+        # Drop vectors whose dimension disagrees with the first one
+        dimension = len(vectors[0])
+        if any(len(vector) != dimension for vector in vectors):
+            logger.warning(f"Dropping embeddings whose dimension differs from {dimension}")
+            kept = [(i, v) for i, v in zip(valid_indices, vectors) if len(v) == dimension]
+            valid_indices = [i for i, _ in kept]
+            vectors = [v for _, v in kept]
+        
+        matrix = np.asarray(vectors, dtype=np.float32)
+        
+        # Validate the whole matrix at once (no NaNs, no all-zero rows)
+        invalid = np.isnan(matrix).any(axis=1) | ~matrix.any(axis=1)
+        if invalid.any():
+            logger.warning(f"Dropping {int(invalid.sum())} invalid embeddings (NaN or all zeros)")
+            matrix = matrix[~invalid]
+            valid_indices = [i for i, bad in zip(valid_indices, invalid) if not bad]
+        
+        return np.ascontiguousarray(matrix), valid_indices
+    
+    def _embed_batch(self, texts: List[str], embedding_function: Optional[Callable] = None) -> List[Any]:
+        """
+        Embed one batch of texts, falling back to per-text calls on failure.
+        
+        Args:
+            texts: Texts to embed
+            embedding_function: Function to use instead of ``self.embedding_function``
+        
+        Returns:
+            List of embeddings (None where a text could not be embedded)
+        """
+        embedding_function = embedding_function or self.embedding_function
+        try:
+            embeddings = embedding_function(texts)
+            if embeddings is not None and len(embeddings) == len(texts):
+                return list(embeddings)
+            logger.warning("Batch embedding returned an unexpected number of vectors, embedding texts individually")
+        except Exception as e:
+            logger.warning(f"Batch embedding failed, embedding texts individually: {str(e)}")
+        
+        embeddings = []
+        for text in texts:
+            try:
+                embeddings.append(embedding_function(text))
+            except Exception as e:
+                logger.error(f"Error generating embedding: {str(e)}")
+                embeddings.append(None)
+        
+        return embeddings
+    
+    def _embed_query(self, query: str) -> Any:
+        """
+        Embed a search query through the shared query embedding cache.
+        
+        Args:
+            query: Search query
+        
+        Returns:
+            Query embedding as a float32 array
+        """
+        cache = get_query_embedding_cache()
+        key = (embedding_model_key(self.embedding_function), normalize_query(query))
+        
+        vector = cache.get(key)
+        if vector is None:
+            vector = np.asarray(self._query_embedding_function(query), dtype=np.float32).ravel()
+            vector.flags.writeable = False
+            cache.put(key, vector)
+        
+        # Callers may normalize the vector in place
+        return vector.copy()
+    
+    def _embed_queries(self, queries: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embed several search queries, batching only the ones not cached yet.
+        
+        Args:
+            queries: Search queries
+        
+        Returns:
+            List of float32 query embeddings (None where a query could not be embedded)
+        """
+        cache = get_query_embedding_cache()
+        model_key = embedding_model_key(self.embedding_function)
+        keys = [(model_key, normalize_query(query)) for query in queries]
+        vectors = [cache.get(key) for key in keys]
+        
+        # Embed each distinct uncached query once
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        computed = {}
+        batch_size = max(1, int(self.embedding_batch_size))
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            queries = [query for _, query in batch]
+            for key, vector in zip(batch, self._embed_batch(queries, self._query_embedding_function)):
+                if vector is None or len(vector) == 0:
+                    continue
+                vector = np.asarray(vector, dtype=np.float32).ravel()
+                vector.flags.writeable = False
+                cache.put(key, vector)
+                computed[key] = vector
+        
+        return [
+            (vector if vector is not None else computed.get(key))
+            for key, vector in zip(keys, vectors)
+        ]
+    
+    @property
+    def _query_embedding_function(self) -> Callable:
+        """The embedding function without the persistent cache (queries are cached in memory only)."""
+        return getattr(self.embedding_function, "wrapped", self.embedding_function)
+    
+    def _invalidate_search_cache(self) -> None:
+        """Start a new generation after the stored chunks changed, dropping cached results."""
+        self.generation += 1
+        self.search_cache.clear()
+    
+    def _save_index(self) -> bool:
+        """
+        Save the index to disk. Backends that write every change through
+        (or keep everything in memory) have nothing to save.
+        
+        Returns:
+            True if successful
+        """
+        return True
+    
+    def _persist(self) -> bool:
+        """
+        Save the index after a change, unless saves are deferred.
+        
+        Returns:
+            True if successful (or deferred)
+        """
+        if self._saves_deferred:
+            self._unsaved_changes = True
+            return True
+        return self._save_index()
+    
+    @store_lock("write")
+    def flush(self) -> bool:
+        """
+        Save changes made while saves were deferred.
+        
+        Returns:
+            True if successful
+        """
+        if not self._unsaved_changes:
+            return True
+        
+        saved = self._save_index()
+        if saved:
+            self._unsaved_changes = False
+        return saved
+    
+    @contextmanager
+    def deferred_saves(self):
+        """
+        Defer index saves until the block ends (or flush is called), so bulk
+        loads write the index once instead of after every add.
+        
+        Changes made after the last save are lost if the process dies. Nested
+        blocks save when the outermost one ends.
+        """
+        outermost = not self._saves_deferred
+        self._saves_deferred = True
+        try:
+            yield self
+        finally:
+            if outermost:
+                self._saves_deferred = False
+                self.flush()
+    
+    def cache_embeddings(
+        self,
+        texts: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> bool:
+        """
+        Embed texts into the persistent embedding cache ahead of add_texts,
+        which then reads the vectors instead of running the model. Safe to
+        call from worker threads.
+        
+        Args:
+            texts: Texts to embed
+            progress_callback: Optional callback called after every batch as
+                (texts done, total texts)
+        
+        Returns:
+            True if the texts were cached, False if the store's embedding
+            function has no persistent cache (nothing is embedded)
+        """
+        embedding_function = self.embedding_function
+        if not isinstance(embedding_function, CachedEmbeddingFunction) or not embedding_function.model_name:
+            return False
+        
+        batch_size = max(1, int(self.embedding_batch_size))
+        for start in range(0, len(texts), batch_size):
+            self._embed_batch(texts[start:start + batch_size])
+            if progress_callback:
+                progress_callback(min(start + batch_size, len(texts)), len(texts))
+        
+        return True
+    
+    @store_lock("write")
+    def close(self) -> None:
+        """Save pending changes and close the files held by the store; it cannot be used afterwards."""
+        self._saves_deferred = False
+        self.flush()
+        self.sparse_index.close()
+        self.manifest.close()
+    
+    def cached_search(
+        self,
+        query: str,
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        sparse: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Search through the result cache.
+        
+        Results are cached under (query, where, limit) for the current
+        generation, so any add_texts, delete or reset makes them unreachable.
+        Empty results are not cached, so a failed search is retried.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of results
+            where: Filter condition
+            sparse: Use the BM25 keyword index instead of the vectors
+        
+        Returns:
+            List of search results
+        """
+        generation = self.generation
+        key = search_cache_key("keyword" if sparse else "vector", query, limit, where, generation)
+        
+        results = self.search_cache.get(key)
+        if results is None:
+            if sparse:
+                results = self.search_sparse(query, limit=limit, where=where)
+            else:
+                results = self.search(query, limit=limit, where=where)
+            
+            # Skip results computed while the store changed
+            if results and generation == self.generation:
+                self.search_cache.put(key, results)
+        
+        # Copy the result dictionaries so callers cannot alter the cached ones
+        return [dict(result) for result in results]
+    
+    def _filter_keys(
+        self,
+        where: Dict[str, Any],
+        metadata_for_key: Callable[[int], Dict[str, Any]],
+        all_keys: Callable[[], Iterable[int]]
+    ) -> Set[int]:
+        """
+        Resolve a `where` clause to matching row keys through ``self.metadata_index``.
+        
+        Args:
+            where: Filter condition
+            metadata_for_key: Function returning the metadata of a row key
+            all_keys: Function returning every row key (used if nothing is indexed)
+        
+        Returns:
+            Set of row keys whose metadata matches every condition
+        """
+        candidates, residual = self.metadata_index.lookup(where)
+        
+        if candidates is None:
+            return {key for key in all_keys() if self._matches_filter(metadata_for_key(key), where)}
+        
+        if residual:
+            candidates = {key for key in candidates if self._matches_filter(metadata_for_key(key), residual)}
+        
+        return candidates
+    
     @abstractmethod
     def search(
         self,
@@ -104,11 +503,73 @@ class BaseVectorStore(ABC):
         """
         pass
     
+    @store_lock("read")
+    def search_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries at once.
+        
+        Stores that can embed and score a query matrix in one call override
+        this; the default runs one search per query.
+        
+        Args:
+            queries: Search queries
+            limit: Maximum number of results per query
+            where: Filter condition applied to every query
+        
+        Returns:
+            List of result lists, aligned with ``queries``
+        """
+        return [self.search(query, limit=limit, where=where) for query in queries]
+    
+    def search_sparse(
+        self,
+        query: str,
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the chunks by keywords, ranked by BM25.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of results
+            where: Filter condition
+        
+        Returns:
+            List of search results (score is the BM25 score, higher is better)
+        """
+        # Index chunks stored before the keyword index existed (checked once per instance)
+        if not self._sparse_index_checked:
+            self._sparse_index_checked = True
+            if self.sparse_index.available and len(self.sparse_index) != self.count():
+                self.rebuild_sparse_index()
+        
+        return self.sparse_index.search(query, limit=limit, where=where)
+    
+    def rebuild_sparse_index(self) -> int:
+        """
+        Rebuild the keyword index from the chunks in the vector store.
+        
+        Returns:
+            Number of chunks indexed
+        """
+        data = self.get()
+        ids = data.get("ids", [])
+        self.sparse_index.rebuild(ids, data.get("documents", []), data.get("metadatas", []))
+        logger.info(f"Rebuilt keyword index with {len(ids)} chunks")
+        return len(ids)
+    
     @abstractmethod
     def get(
         self,
         ids: Optional[List[str]] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Get entries from the vector store.
@@ -116,12 +577,27 @@ class BaseVectorStore(ABC):
         Args:
             ids: List of IDs to get
             where: Filter condition
+            limit: Maximum number of entries (in insertion order)
             
         Returns:
             Dictionary with documents, embeddings, metadatas, and ids
         """
         pass
     
+    @abstractmethod
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the metadata of existing entries, keeping their vectors.
+        
+        Args:
+            ids: IDs of the entries to update (unknown IDs are ignored)
+            metadatas: New metadata dictionaries aligned with ``ids``
+        
+        Returns:
+            True if successful
+        """
+        pass
+    
     @abstractmethod
     def count(self) -> int:
         """
@@ -181,25 +657,46 @@ class BaseVectorStore(ABC):
         Returns:
             Document ID
         """
-        # Initialize metadata if None
-        if metadata is None:
-            metadata = {}
-            
-        # Create document metadata
-        document_metadata = {
-            "document_id": document_id,
-            "is_document": True
-        }
-        document_metadata.update(metadata)
+        chunks = self.chunk_document_text(
+            document_id,
+            text,
+            metadata=metadata,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        self.index_document_chunks(document_id, text, chunks, metadata=metadata)
         
-        # Save document metadata to disk
-        self._save_document_to_disk(document_id, text, document_metadata)
+        return document_id
+    
+    def chunk_document_text(
+        self,
+        document_id: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Split a document into the chunks that add_document would index.
+        
+        Each chunk's metadata carries a content_hash of its text, which
+        update_document uses to find the chunks that changed.
+        
+        Args:
+            document_id: Document ID
+            text: Document text content
+            metadata: Optional document metadata
+            chunk_size: Optional custom chunk size
+            chunk_overlap: Optional custom chunk overlap
         
+        Returns:
+            List of chunks with id, text and metadata
+        """
         # Chunk the document
         document_data = {
             "text": text,
             "id": document_id,
-            "metadata": metadata
+            "metadata": metadata or {}
         }
         chunks = chunk_document(
             document=document_data,
@@ -207,20 +704,236 @@ class BaseVectorStore(ABC):
             chunk_overlap=chunk_overlap or 50
         )
         
-        # Add chunks to vector store
-        chunk_texts = [chunk["text"] for chunk in chunks]
-        chunk_metadatas = [chunk["metadata"] for chunk in chunks]
+        # Generate IDs for chunks and hash their text
+        return [
+            {
+                "id": f"{document_id}_{i}",
+                "text": chunk["text"],
+                "metadata": {**chunk["metadata"], "content_hash": content_hash(chunk["text"])}
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+    
+    @store_lock("write")
+    def index_document_chunks(
+        self,
+        document_id: str,
+        text: str,
+        chunks: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+        replace: bool = False
+    ) -> int:
+        """
+        Save a document and add its prepared chunks to the vector store.
         
-        # Generate IDs for chunks
-        chunk_ids = [f"{document_id}_{i}" for i in range(len(chunks))]
+        Args:
+            document_id: Document ID
+            text: Document text content
+            chunks: Chunks from chunk_document_text
+            metadata: Optional document metadata
+            replace: Delete the document's existing chunks first (makes
+                re-running an interrupted indexing safe)
+        
+        Returns:
+            Number of chunks indexed
+        """
+        # Create document metadata
+        document_metadata = {
+            "document_id": document_id,
+            "is_document": True
+        }
+        document_metadata.update(metadata or {})
+        
+        # Save document metadata to disk
+        self._save_document_to_disk(document_id, text, document_metadata)
+        
+        if replace:
+            self.delete(where={"document_id": document_id})
         
         # Add chunks to vector store
-        self.add_texts(chunk_texts, chunk_metadatas, chunk_ids)
+        added_ids = self.add_texts(
+            [chunk["text"] for chunk in chunks],
+            [chunk["metadata"] for chunk in chunks],
+            [chunk["id"] for chunk in chunks]
+        ) or []
+        
+        # Record the document in the manifest
+        self.manifest.upsert(document_id, document_metadata, len(added_ids), text=text)
         
         logger.info(f"Added document '{document_id}' with {len(chunks)} chunks")
         
-        return document_id
+        return len(added_ids)
     
+    def update_document(
+        self,
+        document_id: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Re-index a document after its text changed, touching only the chunks
+        that changed. Documents that are not indexed yet are added.
+        
+        Args:
+            document_id: Document ID
+            text: New document text content
+            metadata: Optional document metadata
+            chunk_size: Optional custom chunk size
+            chunk_overlap: Optional custom chunk overlap
+        
+        Returns:
+            Chunk counts (see update_document_chunks)
+        """
+        chunks = self.chunk_document_text(
+            document_id,
+            text,
+            metadata=metadata,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        return self.update_document_chunks(document_id, text, chunks, metadata=metadata)
+    
+    @store_lock("write")
+    def update_document_chunks(
+        self,
+        document_id: str,
+        text: str,
+        chunks: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, int]:
+        """
+        Save a document and bring its indexed chunks in line with new chunks.
+        
+        Indexed chunks are matched to the new ones by content hash. A matched
+        chunk keeps its vector and ID, and only has its metadata replaced if
+        it moved (different offsets or chunk count); indexed chunks without a
+        match are deleted and new chunks without a match are embedded and
+        added. New chunks take their usual ID unless a kept chunk holds it.
+        Safe to re-run after an interrupted indexing.
+        
+        Args:
+            document_id: Document ID
+            text: Document text content
+            chunks: Chunks from chunk_document_text
+            metadata: Optional document metadata
+        
+        Returns:
+            Dictionary with the number of chunks "added" (embedded), "moved"
+            (metadata updated), "removed" and "unchanged"
+        """
+        # Create document metadata
+        document_metadata = {
+            "document_id": document_id,
+            "is_document": True
+        }
+        document_metadata.update(metadata or {})
+        
+        self._save_document_to_disk(document_id, text, document_metadata)
+        
+        # Hash new chunks that predate per-chunk hashes (e.g. prepared by an older version)
+        chunks = [
+            chunk if "content_hash" in chunk["metadata"]
+            else {**chunk, "metadata": {**chunk["metadata"], "content_hash": content_hash(chunk["text"])}}
+            for chunk in chunks
+        ]
+        
+        # Index the current chunks by content hash, in document order
+        existing = self.get(where={"document_id": document_id}) or {}
+        old_ids = existing.get("ids") or []
+        old_texts = existing.get("documents") or [""] * len(old_ids)
+        old_metadatas = existing.get("metadatas") or [{}] * len(old_ids)
+        
+        id_counts = Counter(old_ids)
+        reusable: Dict[str, List[str]] = {}
+        old_metadata_keys: Dict[str, str] = {}
+        stale_ids: Set[str] = set()
+        
+        for chunk_id, chunk_text, chunk_metadata in zip(old_ids, old_texts, old_metadatas):
+            if id_counts[chunk_id] > 1:
+                # Entries sharing an ID cannot be told apart, so they are all replaced
+                stale_ids.add(chunk_id)
+                continue
+            
+            chunk_metadata = chunk_metadata or {}
+            text_hash = chunk_metadata.get("content_hash") or content_hash(chunk_text)
+            reusable.setdefault(text_hash, []).append(chunk_id)
+            old_metadata_keys[chunk_id] = self._chunk_metadata_key(chunk_metadata)
+        
+        # Match new chunks to current ones, preferring the chunk with the same ID
+        unchanged = 0
+        moved_ids = []
+        moved_metadatas = []
+        to_add = []
+        kept_ids: Set[str] = set()
+        
+        for chunk in chunks:
+            candidates = reusable.get(chunk["metadata"]["content_hash"])
+            if not candidates:
+                to_add.append(chunk)
+                continue
+            
+            chunk_id = chunk["id"] if chunk["id"] in candidates else candidates[0]
+            candidates.remove(chunk_id)
+            kept_ids.add(chunk_id)
+            
+            if old_metadata_keys[chunk_id] == self._chunk_metadata_key(chunk["metadata"]):
+                unchanged += 1
+            else:
+                moved_ids.append(chunk_id)
+                moved_metadatas.append(chunk["metadata"])
+        
+        stale_ids.update(chunk_id for candidates in reusable.values() for chunk_id in candidates)
+        
+        # Give new chunks whose usual ID is held by a kept chunk the next free ID
+        used_ids = set(kept_ids)
+        next_index = len(old_ids) + len(chunks)
+        for i, chunk in enumerate(to_add):
+            if chunk["id"] in used_ids:
+                while f"{document_id}_{next_index}" in used_ids:
+                    next_index += 1
+                to_add[i] = chunk = {**chunk, "id": f"{document_id}_{next_index}"}
+            used_ids.add(chunk["id"])
+        
+        # Delete before adding, since new chunks may reuse the IDs of stale ones
+        with self.deferred_saves():
+            if stale_ids:
+                self.delete(ids=list(stale_ids))
+            
+            if moved_ids:
+                self.update_metadata(moved_ids, moved_metadatas)
+            
+            added_ids = []
+            if to_add:
+                added_ids = self.add_texts(
+                    [chunk["text"] for chunk in to_add],
+                    [chunk["metadata"] for chunk in to_add],
+                    [chunk["id"] for chunk in to_add]
+                ) or []
+        
+        # Record the document in the manifest
+        self.manifest.upsert(document_id, document_metadata, len(kept_ids) + len(added_ids), text=text)
+        
+        counts = {
+            "added": len(to_add),
+            "moved": len(moved_ids),
+            "removed": len(old_ids) - len(kept_ids),
+            "unchanged": unchanged
+        }
+        logger.info(
+            f"Updated document '{document_id}': {counts['added']} chunks added, {counts['moved']} moved, "
+            f"{counts['removed']} removed, {counts['unchanged']} unchanged"
+        )
+        
+        return counts
+    
+    @staticmethod
+    def _chunk_metadata_key(metadata: Dict[str, Any]) -> str:
+        """Serialize chunk metadata for comparison, independent of key order."""
+        return json.dumps(metadata, sort_keys=True, default=str)
+    
+    @store_lock("read")
     def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a document from the vector store.
@@ -252,6 +965,7 @@ class BaseVectorStore(ABC):
             logger.error(f"Error getting document '{document_id}': {str(e)}")
             return None
     
+    @store_lock("write")
     def delete_document(self, document_id: str) -> bool:
         """
         Delete a document from the vector store.
@@ -268,6 +982,7 @@ class BaseVectorStore(ABC):
             
             # Delete from disk
             self._delete_document_from_disk(document_id)
+            self.manifest.remove(document_id)
             
             logger.info(f"Deleted document '{document_id}' from vector store")
             return True
@@ -280,16 +995,59 @@ class BaseVectorStore(ABC):
         """
         List all documents in the vector store.
         
+        Entries come from the manifest and carry no text; use get_document
+        for the full document.
+        
         Returns:
-            List of documents
+            List of documents with id, metadata, chunk_count, content_hash,
+            text_length and updated_at
         """
         try:
-            return self._list_documents_on_disk()
+            return self.manifest.list()
             
         except Exception as e:
             logger.error(f"Error listing documents: {str(e)}")
             return []
     
+    def list_document_ids(self) -> List[str]:
+        """
+        List the IDs of all documents in the vector store.
+        
+        Returns:
+            List of document IDs
+        """
+        try:
+            return self.manifest.ids()
+        
+        except Exception as e:
+            logger.error(f"Error listing document IDs: {str(e)}")
+            return []
+    
+    @store_lock("write")
+    def rebuild_manifest(self) -> int:
+        """
+        Rebuild the document manifest from the document files on disk.
+        
+        Reads every document file once; afterwards the manifest is kept up to
+        date by add_document and delete_document.
+        
+        Returns:
+            Number of documents recorded
+        """
+        documents = self._list_documents_on_disk()
+        
+        self.manifest.clear()
+        for document in documents:
+            document_id = document.get("id")
+            if document_id is None:
+                continue
+            chunk_ids = self.get(where={"document_id": document_id}).get("ids", [])
+            self.manifest.upsert(document_id, document.get("metadata", {}), len(chunk_ids), text=document.get("text", ""))
+        
+        if documents:
+            logger.info(f"Rebuilt document manifest with {len(documents)} documents")
+        return len(documents)
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         Get vector store statistics.
@@ -301,12 +1059,16 @@ class BaseVectorStore(ABC):
             stats = {}
             
             # Count documents
-            documents = self.list_documents()
-            stats["document_count"] = len(documents)
+            stats["document_count"] = len(self.manifest)
             
             # Count chunks
             stats["chunk_count"] = self.count()
             
+            # Cache effectiveness
+            stats["search_cache"] = self.search_cache.stats()
+            stats["query_embedding_cache"] = get_query_embedding_cache().stats()
+            stats["generation"] = self.generation
+            
             return stats
             
         except Exception as e:
@@ -77,7 +77,8 @@ class ChromaDBVectorStore(BaseVectorStore):
         base_path: str = "./knowledge_base_data/vectors",
         data_path: str = "./knowledge_base_data/knowledge_base_data",
         embedding_function: Optional[Callable] = None,
-        distance_func: str = "cosine"
+        distance_func: str = "cosine",
+        embedding_batch_size: Optional[int] = None
     ):
         """
         Initialize the ChromaDB vector store.
@@ -88,6 +89,7 @@ class ChromaDBVectorStore(BaseVectorStore):
             data_path: Path to store document data
             embedding_function: Function to create embeddings
             distance_func: Distance function ('cosine', 'l2', 'ip')
+            embedding_batch_size: Number of texts embedded per call to the embedding function
         """
         if not CHROMADB_AVAILABLE:
             raise ImportError("ChromaDB is not installed. Please install it with 'pip install chromadb'.")
@@ -97,7 +99,8 @@ class ChromaDBVectorStore(BaseVectorStore):
             base_path=base_path,
             data_path=data_path,
             embedding_function=embedding_function,
-            distance_func=distance_func
+            distance_func=distance_func,
+            embedding_batch_size=embedding_batch_size
         )
     
     def _init_store(self):
@@ -148,6 +151,13 @@ class ChromaDBVectorStore(BaseVectorStore):
         if not texts:
             return []
         
+        # Generate embeddings in batches so ChromaDB does not embed one text at a time
+        embeddings_array, valid_indices = self._embed_texts(texts)
+        
+        if not valid_indices:
+            logger.error("No valid embeddings generated. Skipping vector store update.")
+            return []
+        
         # Generate IDs if not provided
         if ids is None:
             ids = [self.generate_id() for _ in range(len(texts))]
@@ -156,12 +166,20 @@ class ChromaDBVectorStore(BaseVectorStore):
         if metadatas is None:
             metadatas = [{} for _ in range(len(texts))]
         
+        # Keep only the texts that produced valid embeddings
+        texts = [texts[i] for i in valid_indices]
+        metadatas = [metadatas[i] for i in valid_indices]
+        ids = [ids[i] for i in valid_indices]
+        
         # Add to collection
         self.collection.add(
             documents=texts,
+            embeddings=embeddings_array.tolist(),
             metadatas=metadatas,
             ids=ids
         )
+        self.sparse_index.add(ids, texts, metadatas)
+        self._invalidate_search_cache()
         
         return ids
     
@@ -183,9 +201,9 @@ class ChromaDBVectorStore(BaseVectorStore):
             List of search results
         """
         try:
-            # Search collection
+            # Search collection with the (cached) query embedding
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=[self._embed_query(query).tolist()],
                 n_results=limit,
                 where=where
             )
@@ -217,7 +235,8 @@ class ChromaDBVectorStore(BaseVectorStore):
     def get(
         self,
         ids: Optional[List[str]] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Get entries from the vector store.
@@ -225,6 +244,7 @@ class ChromaDBVectorStore(BaseVectorStore):
         Args:
             ids: List of IDs to get
             where: Filter condition
+            limit: Maximum number of entries (in insertion order)
             
         Returns:
             Dictionary with documents, metadatas, and ids
@@ -236,6 +256,8 @@ class ChromaDBVectorStore(BaseVectorStore):
                 kwargs["ids"] = ids
             if where:
                 kwargs["where"] = where
+            if limit is not None:
+                kwargs["limit"] = limit
                 
             return self.collection.get(**kwargs)
                 
@@ -247,6 +269,30 @@ class ChromaDBVectorStore(BaseVectorStore):
                 "ids": []
             }
     
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the metadata of existing entries, keeping their vectors.
+        
+        Args:
+            ids: IDs of the entries to update
+            metadatas: New metadata dictionaries aligned with ``ids``
+        
+        Returns:
+            True if successful
+        """
+        if not ids:
+            return True
+        
+        try:
+            self.collection.update(ids=ids, metadatas=metadatas)
+            self.sparse_index.update_metadata(ids, metadatas)
+            self._invalidate_search_cache()
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error updating metadata in ChromaDB: {str(e)}")
+            return False
+    
     def count(self) -> int:
         """
         Get the number of entries in the vector store.
@@ -291,6 +337,8 @@ class ChromaDBVectorStore(BaseVectorStore):
                 kwargs["where"] = where
                 
             self.collection.delete(**kwargs)
+            self.sparse_index.delete(ids=ids, where=where)
+            self._invalidate_search_cache()
             return True
                 
         except Exception as e:
@@ -319,6 +367,9 @@ class ChromaDBVectorStore(BaseVectorStore):
                 embedding_function=chroma_ef
             )
             
+            self.sparse_index.clear()
+            self._invalidate_search_cache()
+            
             logger.info("ChromaDB vector store reset")
             return True
             
@@ -0,0 +1,78 @@
+"""
+Lightweight chunk objects over columnar get() results.
+A vector store's get() returns parallel "ids", "documents" and "metadatas"
+lists; a ChunkView points at one position in them instead of copying the
+chunk's text and metadata into a new object.
+"""
+
+from typing import List, Dict, Any
+
+class ChunkView:
+    """
+    Read-only view of one chunk of a get() result.
+    
+    Metadata keys are readable as attributes (``chunk.document_id``), like the
+    chunk objects get_document_chunks used to build. The metadata dictionary
+    is shared with the result, so copy it before modifying it.
+    """
+    
+    __slots__ = ("_columns", "_position")
+    
+    def __init__(self, columns: Dict[str, Any], position: int):
+        """
+        Args:
+            columns: get() result with "ids", "documents" and "metadatas" lists
+            position: Position of the chunk in the lists
+        """
+        self._columns = columns
+        self._position = position
+    
+    @property
+    def id(self) -> Any:
+        """Chunk ID."""
+        return self._columns["ids"][self._position]
+    
+    @property
+    def page_content(self) -> str:
+        """Chunk text."""
+        documents = self._columns.get("documents")
+        return (documents[self._position] if documents else None) or ""
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Chunk metadata (shared with the get() result)."""
+        metadatas = self._columns.get("metadatas")
+        return (metadatas[self._position] if metadatas else None) or {}
+    
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for names that are not slots or properties
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.metadata[name]
+        except KeyError:
+            raise AttributeError(f"Chunk has no attribute or metadata key '{name}'") from None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Copy the chunk into a search-result style dictionary.
+        
+        Returns:
+            Dictionary with id, text and a copy of the metadata
+        """
+        return {"id": self.id, "text": self.page_content, "metadata": dict(self.metadata)}
+    
+    def __repr__(self) -> str:
+        return f"ChunkView(id={self.id!r})"
+
+def chunk_views(columns: Dict[str, Any]) -> List[ChunkView]:
+    """
+    Create a view for every chunk of a get() result.
+    
+    Args:
+        columns: get() result with "ids", "documents" and "metadatas" lists
+    
+    Returns:
+        List of chunk views in result order
+    """
+    return [ChunkView(columns, position) for position in range(len(columns.get("ids") or []))]
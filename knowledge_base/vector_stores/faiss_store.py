@@ -7,10 +7,17 @@ import os
 import faiss
 import numpy as np
 from typing import List, Dict, Any, Optional, Callable, Tuple, Union, Type
-import pickle
 
 from utils.logger import get_logger
-from knowledge_base.vector_stores.base import BaseVectorStore
+from knowledge_base.vector_stores.base import BaseVectorStore, store_lock
+from knowledge_base.config import (
+    FAISS_INDEX_TYPES, DEFAULT_FAISS_INDEX_TYPE, DEFAULT_FAISS_NLIST, DEFAULT_FAISS_NPROBE,
+    DEFAULT_FAISS_TRAIN_POINTS_PER_LIST, DEFAULT_FAISS_PQ_M, DEFAULT_FAISS_PQ_NBITS,
+    DEFAULT_FAISS_HNSW_M, DEFAULT_FAISS_EF_CONSTRUCTION, DEFAULT_FAISS_EF_SEARCH,
+    DEFAULT_FAISS_TOMBSTONE_RATIO, DEFAULT_FILTER_EXACT_SEARCH_LIMIT
+)
+from knowledge_base.vector_stores.metadata_store import ChunkMetadataStore, LazyDocuments
+from knowledge_base.vector_stores.metadata_index import MetadataIndex
 from knowledge_base.vector_stores import register_vector_store
 
 logger = get_logger(__name__)
@@ -35,7 +42,16 @@ class FAISSVectorStore(BaseVectorStore):
         data_path: str = "./knowledge_base_data/knowledge_base_data",
         embedding_function: Optional[Callable] = None,
         distance_func: str = "cosine",
-        use_gpu: bool = True
+        use_gpu: bool = True,
+        embedding_batch_size: Optional[int] = None,
+        index_type: str = DEFAULT_FAISS_INDEX_TYPE,
+        nlist: int = DEFAULT_FAISS_NLIST,
+        nprobe: int = DEFAULT_FAISS_NPROBE,
+        pq_m: int = DEFAULT_FAISS_PQ_M,
+        pq_nbits: int = DEFAULT_FAISS_PQ_NBITS,
+        hnsw_m: int = DEFAULT_FAISS_HNSW_M,
+        ef_construction: int = DEFAULT_FAISS_EF_CONSTRUCTION,
+        ef_search: int = DEFAULT_FAISS_EF_SEARCH
     ):
         """
         Initialize the FAISS vector store.
@@ -47,13 +63,36 @@ class FAISSVectorStore(BaseVectorStore):
             embedding_function: Function to create embeddings
             distance_func: Distance function ('cosine', 'l2', 'ip')
             use_gpu: Whether to use GPU acceleration if available
+            embedding_batch_size: Number of texts embedded per call to the embedding function
+            index_type: FAISS index type ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+            nlist: Number of IVF cells
+            nprobe: IVF cells visited per query
+            pq_m: Number of PQ sub-quantizers (IVF-PQ only)
+            pq_nbits: Bits per PQ sub-quantizer code (IVF-PQ only)
+            hnsw_m: Neighbors per HNSW node
+            ef_construction: HNSW build-time candidate list size
+            ef_search: HNSW query-time candidate list size
         """
+        if index_type not in FAISS_INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{index_type}'. Available types: {', '.join(FAISS_INDEX_TYPES)}")
+        
+        # Index settings are needed by _init_store, which runs inside the base constructor
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        
         super().__init__(
             collection_name=collection_name,
             base_path=base_path,
             data_path=data_path,
             embedding_function=embedding_function,
-            distance_func=distance_func
+            distance_func=distance_func,
+            embedding_batch_size=embedding_batch_size
         )
         # Initialize with public attributes for direct access
         self.gpu_enabled = use_gpu and GPU_AVAILABLE  # Public attribute
@@ -126,32 +165,39 @@ class FAISSVectorStore(BaseVectorStore):
         """Initialize the FAISS vector store."""
         # Path to store FAISS index and metadata
         self.index_path = os.path.join(self.base_path, f"{self.collection_name}.index")
-        self.metadata_path = os.path.join(self.base_path, f"{self.collection_name}.pickle")
+        self.metadata_db_path = os.path.join(self.base_path, f"{self.collection_name}_metadata.sqlite")
+        self.metadata_path = os.path.join(self.base_path, f"{self.collection_name}.pickle")  # Legacy sidecar
         
         # Get embedding dimensions by creating a sample embedding
         sample_embedding = self.embedding_function("sample text")
         self.embedding_dim = len(sample_embedding)
         
-        # Check if index and metadata exist
-        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-            # Load existing index and metadata
-            self.index = faiss.read_index(self.index_path)
-            with open(self.metadata_path, 'rb') as f:
-                self.metadata = pickle.load(f)
-        else:
-            # Create new index and metadata
-            if self.distance_func == "cosine" or self.distance_func == "ip":
-                # Inner product for cosine similarity (vectors should be normalized)
-                self.index = faiss.IndexFlatIP(self.embedding_dim)
+        # Open the chunk metadata store, importing a legacy pickle sidecar once
+        self.metadata_store = ChunkMetadataStore(self.metadata_db_path)
+        if os.path.exists(self.metadata_path):
+            if os.path.exists(self.index_path):
+                self.metadata_store.import_pickle(self.metadata_path)
             else:
-                # L2 distance
-                self.index = faiss.IndexFlatL2(self.embedding_dim)
+                os.replace(self.metadata_path, self.metadata_path + ".migrated")
+        
+        # Check if index exists
+        if os.path.exists(self.index_path):
+            # Load existing index
+            self.index = faiss.read_index(self.index_path)
             
-            self.metadata = {
-                "documents": [],
-                "metadatas": [],
-                "ids": []
-            }
+            # Upgrade indexes saved before rows carried stable FAISS labels
+            self._migrate_to_id_map()
+        else:
+            # Create new index; metadata without an index is stale
+            self.index = self._new_index(self._target_index_kind(0))
+            self.metadata_store.clear()
+        
+        self._load_metadata()
+        
+        # Re-index into the configured index type if the saved index differs
+        if self._ensure_index_type():
+            self._save_index()
+        self._apply_search_params()
         
         # Move index to GPU if available and enabled
         if self.use_gpu:
@@ -184,6 +230,449 @@ class FAISSVectorStore(BaseVectorStore):
             
         logger.info(f"FAISS index initialized with dimension {self.embedding_dim} (GPU: {self.using_gpu})")
     
+    def _new_flat_index(self):
+        """Create an empty flat index for the configured distance function."""
+        if self.distance_func == "cosine" or self.distance_func == "ip":
+            # Inner product for cosine similarity (vectors should be normalized)
+            return faiss.IndexFlatIP(self.embedding_dim)
+        
+        # L2 distance
+        return faiss.IndexFlatL2(self.embedding_dim)
+    
+    def _metric(self) -> int:
+        """Get the FAISS metric for the configured distance function."""
+        if self.distance_func == "cosine" or self.distance_func == "ip":
+            return faiss.METRIC_INNER_PRODUCT
+        return faiss.METRIC_L2
+    
+    def _pq_subquantizers(self) -> int:
+        """Get the largest PQ sub-quantizer count <= pq_m that divides the dimension."""
+        m = max(1, min(self.pq_m, self.embedding_dim))
+        while self.embedding_dim % m:
+            m -= 1
+        return m
+    
+    def _new_index(self, index_type: str = "flat"):
+        """
+        Create an empty index whose vectors carry stable 64-bit labels.
+        
+        Flat and HNSW indexes are wrapped in ``IndexIDMap2``; IVF indexes
+        store labels natively and keep a hash direct map so vectors can be
+        reconstructed by label. IVF indexes are returned untrained.
+        
+        Args:
+            index_type: One of FAISS_INDEX_TYPES
+        
+        Returns:
+            Empty FAISS index
+        """
+        if index_type == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(self.embedding_dim, self.hnsw_m, self._metric())
+            hnsw.hnsw.efConstruction = self.ef_construction
+            hnsw.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap2(hnsw)
+        
+        if index_type in ("ivf_flat", "ivf_pq"):
+            quantizer = self._new_flat_index()
+            if index_type == "ivf_pq":
+                index = faiss.IndexIVFPQ(
+                    quantizer, self.embedding_dim, self.nlist,
+                    self._pq_subquantizers(), self.pq_nbits, self._metric()
+                )
+            else:
+                index = faiss.IndexIVFFlat(quantizer, self.embedding_dim, self.nlist, self._metric())
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            index.nprobe = self.nprobe
+            return index
+        
+        return faiss.IndexIDMap2(self._new_flat_index())
+    
+    def _cpu_index(self):
+        """Get a CPU version of the current index."""
+        if hasattr(self, 'using_gpu') and self.using_gpu:
+            return faiss.index_gpu_to_cpu(self.index)
+        return self.index
+    
+    @staticmethod
+    def _index_kind(index) -> str:
+        """
+        Identify the type of a CPU index.
+        
+        Args:
+            index: FAISS index
+        
+        Returns:
+            One of FAISS_INDEX_TYPES
+        """
+        if isinstance(index, faiss.IndexIDMap2):
+            inner = faiss.downcast_index(index.index)
+            return "hnsw" if isinstance(inner, faiss.IndexHNSW) else "flat"
+        if isinstance(index, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(index, faiss.IndexIVF):
+            return "ivf_flat"
+        return "flat"
+    
+    def _train_threshold(self) -> int:
+        """Get the number of vectors needed before an IVF index can be trained."""
+        threshold = self.nlist * DEFAULT_FAISS_TRAIN_POINTS_PER_LIST
+        if self.index_type == "ivf_pq":
+            threshold = max(threshold, 2 ** self.pq_nbits * DEFAULT_FAISS_TRAIN_POINTS_PER_LIST)
+        return threshold
+    
+    def _target_index_kind(self, vector_count: int) -> str:
+        """
+        Decide which index type should hold the given number of vectors.
+        
+        IVF indexes need training data, so the store stays on a flat index
+        until enough vectors exist and is then re-indexed automatically.
+        
+        Args:
+            vector_count: Number of live vectors
+        
+        Returns:
+            One of FAISS_INDEX_TYPES
+        """
+        if self.index_type in ("ivf_flat", "ivf_pq") and vector_count < self._train_threshold():
+            return "flat"
+        return self.index_type
+    
+    def _load_metadata(self) -> None:
+        """
+        Load ids, labels and metadata from the metadata store.
+        
+        Chunk texts stay on disk and are fetched lazily through
+        ``self.metadata["documents"]``.
+        """
+        ids, labels, metadatas = self.metadata_store.load_columns()
+        
+        # Rows are committed before the index is saved, so rows without a saved vector
+        # were either lost in a crash or are still being written by another instance.
+        # Skip them here but leave them on disk: opening a store must not change shared state.
+        index_labels = self._index_labels()
+        saved = set(index_labels.tolist())
+        unsaved_max = max((label for label in labels if label not in saved), default=-1)
+        if unsaved_max >= 0:
+            rows = [row for row in zip(ids, labels, metadatas) if row[1] in saved]
+            logger.info(f"Skipping {len(labels) - len(rows)} FAISS metadata rows whose vectors are not saved")
+            ids, labels, metadatas = (list(column) for column in zip(*rows)) if rows else ([], [], [])
+        
+        self.metadata = {
+            "metadatas": metadatas,
+            "ids": ids,
+            "labels": labels,  # FAISS label of each row
+            # Never reuse a label that is still in the index or the metadata
+            "next_label": max(
+                self.metadata_store.get_value("next_label", 0),
+                int(index_labels.max()) + 1 if len(index_labels) else 0,
+                max(labels) + 1 if labels else 0,
+                unsaved_max + 1
+            )
+        }
+        self.metadata["documents"] = LazyDocuments(self.metadata_store, self.metadata)
+        
+        # Inverted index over metadata, keyed by FAISS label
+        self.metadata_index = MetadataIndex()
+        self.metadata_index.add_many(labels, metadatas)
+        
+        if len(ids) > self.index.ntotal:
+            logger.warning(f"FAISS metadata has {len(ids)} rows but index has {self.index.ntotal} vectors")
+        
+        self._rebuild_label_map()
+    
+    def _migrate_to_id_map(self) -> None:
+        """
+        Convert a legacy positional index into an ID-mapped index.
+        
+        The stored vectors are reconstructed from the old index, so no
+        embeddings have to be recomputed. Labels are the former positions.
+        """
+        if isinstance(self.index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+            return
+        
+        ntotal = self.index.ntotal
+        logger.info(f"Migrating FAISS index with {ntotal} vectors to an ID-mapped index")
+        
+        new_index = self._new_index()
+        if ntotal:
+            vectors = self.index.reconstruct_n(0, ntotal)
+            new_index.add_with_ids(
+                np.ascontiguousarray(vectors, dtype=np.float32),
+                np.arange(ntotal, dtype=np.int64)
+            )
+        self.index = new_index
+        
+        faiss.write_index(self.index, self.index_path)
+    
+    def _index_labels(self) -> np.ndarray:
+        """
+        Get the labels of all vectors in the index, including tombstones.
+        
+        Returns:
+            Array of FAISS labels
+        """
+        index = self._cpu_index()
+        
+        if isinstance(index, faiss.IndexIDMap2):
+            return faiss.vector_to_array(index.id_map)
+        
+        if isinstance(index, faiss.IndexIVF):
+            invlists = index.invlists
+            parts = [
+                faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+                for list_no in range(index.nlist)
+                if invlists.list_size(list_no)
+            ]
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        
+        return np.arange(index.ntotal, dtype=np.int64)
+    
+    def _rebuild_label_map(self) -> None:
+        """Rebuild the mappings from FAISS label and from ID to metadata rows."""
+        self._label_to_row = {label: row for row, label in enumerate(self.metadata["labels"])}
+        self._id_to_rows: Dict[str, List[int]] = {}
+        for row, doc_id in enumerate(self.metadata["ids"]):
+            self._id_to_rows.setdefault(doc_id, []).append(row)
+    
+    def _remove_rows(self, rows: List[int]) -> None:
+        """
+        Remove metadata rows, moving the last rows into the gaps.
+        
+        The cost depends on the number of removed rows, not on the size of
+        the store. Rows are therefore not kept in insertion order; labels are
+        assigned in insertion order, so ordered reads sort by label.
+        
+        Args:
+            rows: Row positions to remove
+        """
+        ids, labels, metadatas = self.metadata["ids"], self.metadata["labels"], self.metadata["metadatas"]
+        
+        for row in sorted(rows, reverse=True):
+            del self._label_to_row[labels[row]]
+            id_rows = self._id_to_rows[ids[row]]
+            id_rows.remove(row)
+            if not id_rows:
+                del self._id_to_rows[ids[row]]
+            
+            last = len(ids) - 1
+            if row != last:
+                ids[row], labels[row], metadatas[row] = ids[last], labels[last], metadatas[last]
+                self._label_to_row[labels[row]] = row
+                moved_rows = self._id_to_rows[ids[row]]
+                moved_rows[moved_rows.index(last)] = row
+            
+            ids.pop()
+            labels.pop()
+            metadatas.pop()
+    
+    def _filter_labels(self, where: Dict[str, Any]) -> set:
+        """
+        Get the labels of rows whose metadata matches a filter.
+        
+        Args:
+            where: Filter condition
+        
+        Returns:
+            Set of matching FAISS labels
+        """
+        return self._filter_keys(
+            where,
+            lambda label: self.metadata["metadatas"][self._label_to_row[label]],
+            lambda: self.metadata["labels"]
+        )
+    
+    def _search_candidates(
+        self,
+        query_array: np.ndarray,
+        candidate_labels: set,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search only among the given labels.
+        
+        Small candidate sets are scored exactly against their reconstructed
+        vectors; larger ones are searched through the index with an ID
+        selector so every returned vector already matches the filter.
+        
+        Args:
+            query_array: Query matrix of shape (n_queries, dimension)
+            candidate_labels: Labels allowed in the results
+            k: Number of results to return per query
+        
+        Returns:
+            Tuple of (scores, labels) shaped like ``index.search`` output
+        """
+        labels = np.fromiter(candidate_labels, dtype=np.int64, count=len(candidate_labels))
+        k = min(k, len(labels))
+        index = self.index
+        
+        if len(labels) <= DEFAULT_FILTER_EXACT_SEARCH_LIMIT:
+            vectors = self._cpu_index().reconstruct_batch(labels)
+            if self.distance_func == "l2":
+                # Squared L2 distance, like IndexFlatL2 (lower is better)
+                scores = (
+                    (query_array ** 2).sum(axis=1)[:, None]
+                    + (vectors ** 2).sum(axis=1)[None, :]
+                    - 2.0 * (query_array @ vectors.T)
+                )
+                np.maximum(scores, 0.0, out=scores)
+                top = np.argsort(scores, axis=1, kind="stable")[:, :k]
+            else:
+                scores = query_array @ vectors.T
+                top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+            return np.take_along_axis(scores, top, axis=1), labels[top]
+        
+        selector = faiss.IDSelectorBatch(labels)
+        kind = self._index_kind(index)
+        if kind in ("ivf_flat", "ivf_pq"):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        elif kind == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.ef_search, k))
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        
+        return index.search(query_array, k, params=params)
+    
+    def _export_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read back the live vectors and their labels from the index.
+        
+        Vectors from IVF-PQ indexes are decoded from their compressed codes,
+        so they are approximations of the original embeddings.
+        
+        Returns:
+            Tuple of (labels, vectors)
+        """
+        labels = np.asarray(self.metadata["labels"], dtype=np.int64)
+        if len(labels) == 0:
+            return labels, np.empty((0, self.embedding_dim), dtype=np.float32)
+        
+        index = self._cpu_index()
+        
+        if isinstance(index, faiss.IndexIDMap2):
+            stored_labels = faiss.vector_to_array(index.id_map)
+            vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+            # Drop tombstoned vectors that are no longer in the metadata
+            live = np.isin(stored_labels, labels)
+            return stored_labels[live], vectors[live]
+        
+        return labels, index.reconstruct_batch(labels)
+    
+    def _rebuild_index(self, index_type: str) -> None:
+        """
+        Re-index the live vectors into a new index of the given type.
+        
+        Vectors are reconstructed from the current index, so nothing is
+        re-embedded. IVF indexes are trained on the vectors before adding.
+        
+        Args:
+            index_type: One of FAISS_INDEX_TYPES
+        """
+        labels, vectors = self._export_vectors()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        
+        new_index = self._new_index(index_type)
+        if not new_index.is_trained:
+            logger.info(f"Training FAISS {index_type} index on {len(vectors)} vectors")
+            new_index.train(vectors)
+        if len(labels):
+            new_index.add_with_ids(vectors, labels)
+        
+        if hasattr(self, 'using_gpu') and self.using_gpu:
+            try:
+                self.index = faiss.index_cpu_to_gpu(self.gpu_resources, 0, new_index)
+            except Exception as e:
+                logger.warning(f"Failed to move rebuilt index to GPU, falling back to CPU: {str(e)}")
+                self.index = new_index
+                self.using_gpu = False
+        else:
+            self.index = new_index
+        
+        logger.info(f"FAISS index rebuilt as {index_type} with {len(labels)} vectors")
+    
+    def _ensure_index_type(self) -> bool:
+        """
+        Re-index if the current index does not match the configured type.
+        
+        Also compacts HNSW indexes once too many deleted vectors remain in
+        the graph.
+        
+        Returns:
+            True if the index was rebuilt
+        """
+        current = self._index_kind(self._cpu_index())
+        
+        # A trained index of the configured type is kept even if deletes shrink it
+        if current == self.index_type:
+            target = current
+        else:
+            target = self._target_index_kind(len(self.metadata["ids"]))
+        
+        if current == target:
+            if current != "hnsw" or self.index.ntotal == 0:
+                return False
+            dead = self.index.ntotal - len(self.metadata["ids"])
+            if dead / self.index.ntotal <= DEFAULT_FAISS_TOMBSTONE_RATIO:
+                return False
+        
+        self._rebuild_index(target)
+        return True
+    
+    @store_lock("write")
+    def migrate_index(self, index_type: Optional[str] = None) -> bool:
+        """
+        Re-index existing vectors into another index type.
+        
+        Args:
+            index_type: Target index type; the configured type if None
+        
+        Returns:
+            True if successful
+        """
+        if index_type is not None:
+            if index_type not in FAISS_INDEX_TYPES:
+                logger.error(f"Unknown FAISS index type '{index_type}'")
+                return False
+            self.index_type = index_type
+        
+        try:
+            target = self._target_index_kind(len(self.metadata["ids"]))
+            if target != self.index_type:
+                logger.info(f"Not enough vectors to train {self.index_type}; keeping a {target} index for now")
+            self._rebuild_index(target)
+            return self._save_index()
+        except Exception as e:
+            logger.error(f"Error migrating FAISS index: {str(e)}")
+            return False
+    
+    @store_lock("write")
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """
+        Change query-time recall/latency settings.
+        
+        Args:
+            nprobe: IVF cells visited per query
+            ef_search: HNSW query-time candidate list size
+        """
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        self._apply_search_params()
+    
+    def _apply_search_params(self) -> None:
+        """Apply nprobe/efSearch to the current index."""
+        index = self.index
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.nprobe
+        elif isinstance(index, faiss.IndexIDMap2):
+            inner = faiss.downcast_index(index.index)
+            if isinstance(inner, faiss.IndexHNSW):
+                inner.hnsw.efSearch = self.ef_search
+        elif hasattr(index, "nprobe"):
+            # GPU IVF indexes
+            index.nprobe = self.nprobe
+    
     def _save_index(self):
         """Save FAISS index and metadata to disk."""
         try:
@@ -195,9 +684,8 @@ class FAISSVectorStore(BaseVectorStore):
             else:
                 faiss.write_index(self.index, self.index_path)
             
-            # Save metadata
-            with open(self.metadata_path, 'wb') as f:
-                pickle.dump(self.metadata, f)
+            # Rows are written to the metadata store as they change; only the label counter is saved here
+            self.metadata_store.set_value("next_label", self.metadata["next_label"])
                 
             logger.debug(f"FAISS index saved to {self.index_path}")
             return True
@@ -230,66 +718,14 @@ class FAISSVectorStore(BaseVectorStore):
         # Log basic information about what's being added
         logger.info(f"Adding {len(texts)} texts to FAISS vector store")
         
-        # Generate embeddings with error handling
-        embeddings = []
-        valid_indices = []  # Track which texts have valid embeddings
+        # Generate embeddings in batches (skips very short texts and invalid vectors)
+        embeddings_array, valid_indices = self._embed_texts(texts, min_length=10)
         
-        for i, text in enumerate(texts):
-            try:
-                if not text or len(text.strip()) < 10:  # Skip very short texts
-                    logger.warning(f"Skipping text at index {i} due to insufficient content (length: {len(text) if text else 0})")
-                    continue
-                    
-                embedding = self.embedding_function(text)
-                
-                # Check if embedding is valid (not all zeros, no NaNs)
-                if not embedding or len(embedding) == 0:
-                    logger.warning(f"Empty embedding generated for text at index {i}")
-                    continue
-                    
-                embedding_array = np.array(embedding)
-                if np.isnan(embedding_array).any() or np.all(embedding_array == 0):
-                    logger.warning(f"Invalid embedding (NaN or all zeros) generated for text at index {i}")
-                    continue
-                
-                embeddings.append(embedding)
-                valid_indices.append(i)
-            except Exception as e:
-                logger.error(f"Error generating embedding for text at index {i}: {str(e)}")
-                
         # Skip further processing if no valid embeddings
-        if not embeddings:
+        if not valid_indices:
             logger.error("No valid embeddings generated. Skipping vector store update.")
             return []
         
-        # Filter texts, metadatas, and ids to match valid embeddings
-        filtered_texts = [texts[i] for i in valid_indices]
-        
-        if metadatas:
-            filtered_metadatas = [metadatas[i] for i in valid_indices]
-        else:
-            filtered_metadatas = None
-            
-        if ids:
-            filtered_ids = [ids[i] for i in valid_indices]
-        else:
-            filtered_ids = None
-        
-        # Convert to numpy array
-        embeddings_array = np.array(embeddings).astype('float32')
-        
-        # Normalize vectors for cosine similarity - handle potential zero vectors
-        if self.distance_func == "cosine":
-            # Check for zero vectors and add small epsilon to avoid NaN errors
-            zero_norm_indices = np.where(np.linalg.norm(embeddings_array, axis=1) == 0)[0]
-            if len(zero_norm_indices) > 0:
-                logger.warning(f"Found {len(zero_norm_indices)} zero-norm vectors, adding small epsilon")
-                for idx in zero_norm_indices:
-                    embeddings_array[idx] = np.ones(embeddings_array.shape[1], dtype=np.float32) * 1e-5
-            
-            # Normalize vectors
-            faiss.normalize_L2(embeddings_array)
-        
         # Generate IDs if not provided
         if ids is None:
             ids = [self.generate_id() for _ in range(len(texts))]
@@ -298,16 +734,40 @@ class FAISSVectorStore(BaseVectorStore):
         if metadatas is None:
             metadatas = [{} for _ in range(len(texts))]
         
-        # Add to index
-        self.index.add(embeddings_array)
+        # Filter texts, metadatas, and ids to match valid embeddings
+        texts = [texts[i] for i in valid_indices]
+        metadatas = [metadatas[i] for i in valid_indices]
+        ids = [ids[i] for i in valid_indices]
+        
+        # Normalize vectors for cosine similarity
+        if self.distance_func == "cosine":
+            faiss.normalize_L2(embeddings_array)
+        
+        # Assign stable labels and add to index
+        first_label = self.metadata["next_label"]
+        labels = np.arange(first_label, first_label + len(texts), dtype=np.int64)
+        self.index.add_with_ids(embeddings_array, labels)
         
         # Add to metadata
-        self.metadata["documents"].extend(texts)
+        first_row = len(self.metadata["ids"])
+        self.metadata_store.append(labels.tolist(), ids, texts, metadatas)
         self.metadata["metadatas"].extend(metadatas)
         self.metadata["ids"].extend(ids)
+        self.metadata["labels"].extend(labels.tolist())
+        self.metadata["next_label"] = first_label + len(texts)
+        
+        for offset, (doc_id, label) in enumerate(zip(ids, labels.tolist())):
+            self._label_to_row[label] = first_row + offset
+            self._id_to_rows.setdefault(doc_id, []).append(first_row + offset)
+        self.metadata_index.add_many(labels.tolist(), metadatas)
+        self.sparse_index.add(ids, texts, metadatas)
+        
+        # Train and switch to an IVF index once enough vectors exist
+        self._ensure_index_type()
         
         # Save index and metadata
-        self._save_index()
+        self._persist()
+        self._invalidate_search_cache()
         
         return ids
     
@@ -333,101 +793,174 @@ class FAISSVectorStore(BaseVectorStore):
         # Log the search request
         logger.info(f"Searching FAISS index with query: '{query[:50]}...' (limit={limit})")
         
+        # Clean query before embedding
+        if not query.strip():
+            logger.warning("Empty query provided for search")
+            return []
+        
+        return self.search_batch([query], limit=limit, where=where, score_threshold=score_threshold)[0]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        score_threshold: float = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries with batched embedding and a single index search.
+        
+        Args:
+            queries: Search queries
+            limit: Maximum number of results per query
+            where: Filter condition applied to every query
+            score_threshold: Optional minimum score threshold (0-1 for cosine, lower is better for L2)
+        
+        Returns:
+            List of result lists, aligned with ``queries``
+        """
+        all_results = [[] for _ in queries]
+        
+        if not queries:
+            return all_results
+        
         if self.count() == 0:
             logger.warning("Search attempted on empty FAISS index")
-            return []
+            return all_results
         
         try:
-            # Clean query before embedding
-            clean_query = query.strip()
-            if not clean_query:
-                logger.warning("Empty query provided for search")
-                return []
-                
-            # Generate query embedding
-            query_embedding = self.embedding_function(clean_query)
+            # Embed the non-empty queries in batches (cached embeddings are reused)
+            clean_queries = [query.strip() for query in queries]
+            positions = [i for i, query in enumerate(clean_queries) if query]
+            if not positions:
+                return all_results
+            
+            vectors = self._embed_queries([clean_queries[i] for i in positions])
             
-            # Convert to numpy array
-            query_array = np.array([query_embedding]).astype('float32')
+            # Queries that could not be embedded get no results
+            embedded = [(i, v) for i, v in zip(positions, vectors) if v is not None and len(v) > 0]
+            if not embedded:
+                return all_results
+            positions = [i for i, _ in embedded]
+            query_array = np.asarray([v for _, v in embedded], dtype=np.float32)
             
             # Check for zero vectors and add small epsilon to avoid NaN errors
-            if np.linalg.norm(query_array) == 0:
+            zero_rows = ~query_array.any(axis=1)
+            if zero_rows.any():
                 logger.warning("Zero-norm query vector detected, adding small epsilon")
-                query_array = np.ones(query_array.shape, dtype=np.float32) * 1e-5
+                query_array[zero_rows] = 1e-5
+            query_array = np.ascontiguousarray(query_array)
             
             # Normalize for cosine similarity
             if self.distance_func == "cosine":
                 faiss.normalize_L2(query_array)
             
-            # Adjust search limit - always search for more than needed to account for filtering
-            search_limit = min(self.count(), max(limit * 4, 20))
+            # Resolve the metadata filter to candidate labels before scoring
+            candidate_labels = None
+            if where:
+                candidate_labels = self._filter_labels(where)
+                if not candidate_labels:
+                    return all_results
             
-            # Search index
-            scores, indices = self.index.search(query_array, search_limit)
+            # Over-fetch only to make up for the score threshold and deleted HNSW vectors
+            search_limit = min(self.index.ntotal, max(limit * 4, 20))
             
-            # Get results
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx == -1:  # FAISS returns -1 if there are not enough results
-                    break
-                
-                # Skip invalid indices
-                if idx >= len(self.metadata["metadatas"]) or idx >= len(self.metadata["documents"]):
-                    logger.warning(f"FAISS returned invalid index {idx}, skipping")
-                    continue
-                
-                # Get metadata and document text
-                try:
-                    metadata = self.metadata["metadatas"][idx]
-                    document = self.metadata["documents"][idx]
-                    doc_id = self.metadata["ids"][idx]
-                except IndexError as e:
-                    logger.error(f"Index error accessing metadata for result {i}: {str(e)}")
-                    continue
-                
-                # Get the score - adjust based on distance metric
-                score = float(scores[0][i])
-                
-                # Filter by score threshold if provided
-                if score_threshold is not None:
-                    if self.distance_func == "cosine" or self.distance_func == "ip":
-                        # For cosine and inner product, higher is better
-                        if score < score_threshold:
-                            continue
-                    else:
-                        # For L2 distance, lower is better
-                        if score > score_threshold:
-                            continue
-                
-                # Filter by metadata if where condition is provided
-                if where and not self._matches_filter(metadata, where):
-                    continue
-                
-                # Add to results
-                result = {
-                    "id": doc_id,
-                    "text": document,
-                    "metadata": metadata,
-                    "score": score
-                }
-                
-                results.append(result)
-                
-                # Limit results
-                if len(results) >= limit:
-                    break
+            if candidate_labels is None:
+                scores, indices = self.index.search(query_array, search_limit)
+            elif self.using_gpu:
+                # GPU indexes do not take ID selectors; scale the over-fetch by the filter selectivity
+                selectivity = self.index.ntotal / len(candidate_labels)
+                search_limit = min(self.index.ntotal, int(np.ceil(search_limit * selectivity)))
+                scores, indices = self.index.search(query_array, search_limit)
+            else:
+                scores, indices = self._search_candidates(query_array, candidate_labels, search_limit)
             
-            logger.info(f"Search returned {len(results)} results out of {len(indices[0])} matches")
-            return results
+            # Pick the hits of every query, then fetch all their texts at once
+            hits = [
+                self._collect_hits(scores[row], indices[row], candidate_labels, limit, score_threshold)
+                for row in range(len(positions))
+            ]
+            rows = [idx for query_hits in hits for idx, _ in query_hits]
+            texts = iter(self.metadata["documents"].take(rows))
+            
+            for position, query_hits in zip(positions, hits):
+                all_results[position] = [
+                    {
+                        "id": self.metadata["ids"][idx],
+                        "text": next(texts),
+                        "metadata": self.metadata["metadatas"][idx],
+                        "score": score
+                    }
+                    for idx, score in query_hits
+                ]
+            
+            logger.info(f"Search returned {len(rows)} results for {len(queries)} queries")
+            return all_results
         
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
-            return []
+            return all_results
+    
+    def _collect_hits(
+        self,
+        scores: np.ndarray,
+        labels: np.ndarray,
+        candidate_labels: Optional[set],
+        limit: int,
+        score_threshold: Optional[float]
+    ) -> List[Tuple[int, float]]:
+        """
+        Turn one row of index search output into metadata rows and scores.
+        
+        Args:
+            scores: Scores returned for one query
+            labels: FAISS labels returned for one query
+            candidate_labels: Labels allowed by the metadata filter (None for all)
+            limit: Maximum number of hits
+            score_threshold: Optional minimum score threshold
+        
+        Returns:
+            List of (metadata row, score) tuples
+        """
+        hits = []
+        for label, score in zip(labels.tolist(), scores.tolist()):
+            if label == -1:  # FAISS returns -1 if there are not enough results
+                break
+            
+            # Map the FAISS label back to its metadata row
+            idx = self._label_to_row.get(label)
+            if idx is None:
+                logger.debug(f"FAISS returned deleted label {label}, skipping")
+                continue
+            
+            # Filter by metadata if where condition is provided
+            if candidate_labels is not None and label not in candidate_labels:
+                continue
+            
+            # Filter by score threshold if provided
+            if score_threshold is not None:
+                if self.distance_func == "cosine" or self.distance_func == "ip":
+                    # For cosine and inner product, higher is better
+                    if score < score_threshold:
+                        continue
+                else:
+                    # For L2 distance, lower is better
+                    if score > score_threshold:
+                        continue
+            
+            hits.append((idx, float(score)))
+            
+            # Limit results
+            if len(hits) >= limit:
+                break
+        
+        return hits
     
     def get(
         self,
         ids: Optional[List[str]] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Get entries from the vector store.
@@ -435,36 +968,88 @@ class FAISSVectorStore(BaseVectorStore):
         Args:
             ids: List of IDs to get
             where: Filter condition
+            limit: Maximum number of entries (in insertion order)
             
         Returns:
             Dictionary with documents, metadatas, and ids
         """
         # Initialize result lists
-        result_documents = []
+        result_rows = []
         result_metadatas = []
         result_ids = []
         
+        id_set = set(ids) if ids else None
+        
+        # Resolve the metadata filter through the inverted index, or the IDs
+        # through the ID map; labels give the insertion order
+        labels = self.metadata["labels"]
+        if where:
+            matching_labels = self._filter_labels(where)
+            rows = [self._label_to_row[label] for label in sorted(matching_labels)]
+        elif id_set is not None:
+            rows = sorted(
+                (row for doc_id in id_set for row in self._id_to_rows.get(doc_id, ())),
+                key=labels.__getitem__
+            )
+        else:
+            rows = np.argsort(np.asarray(labels, dtype=np.int64), kind="stable").tolist()
+        
         # Filter by IDs and/or metadata
-        for i, doc_id in enumerate(self.metadata["ids"]):
+        for i in rows:
+            if limit is not None and len(result_rows) >= limit:
+                break
+            
+            doc_id = self.metadata["ids"][i]
+            
             # Filter by ID if provided
-            if ids and doc_id not in ids:
-                continue
-                
-            # Filter by metadata if provided
-            if where and not self._matches_filter(self.metadata["metadatas"][i], where):
+            if id_set is not None and doc_id not in id_set:
                 continue
                 
             # Add to results
-            result_documents.append(self.metadata["documents"][i])
+            result_rows.append(i)
             result_metadatas.append(self.metadata["metadatas"][i])
             result_ids.append(doc_id)
         
+        # Fetch the matching texts from the metadata store in batches
+        result_documents = self.metadata["documents"].take(result_rows)
+        
         return {
             "documents": result_documents,
             "metadatas": result_metadatas,
             "ids": result_ids
         }
     
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the metadata of existing entries, keeping their vectors.
+        
+        Args:
+            ids: IDs of the entries to update (unknown IDs are ignored)
+            metadatas: New metadata dictionaries aligned with ``ids``
+        
+        Returns:
+            True if successful
+        """
+        updates = dict(zip(ids, metadatas))
+        labels = []
+        updated_ids = []
+        
+        for doc_id, metadata in updates.items():
+            for i in self._id_to_rows.get(doc_id, ()):
+                label = self.metadata["labels"][i]
+                self.metadata_index.remove(label, self.metadata["metadatas"][i])
+                self.metadata_index.add(label, metadata)
+                self.metadata["metadatas"][i] = metadata
+                labels.append(label)
+                updated_ids.append(doc_id)
+        
+        if labels:
+            self.metadata_store.update_metadata(labels, [updates[doc_id] for doc_id in updated_ids])
+            self.sparse_index.update_metadata(updated_ids, [updates[doc_id] for doc_id in updated_ids])
+            self._invalidate_search_cache()
+        
+        return True
+    
     def count(self) -> int:
         """
         Get the number of entries in the vector store.
@@ -472,7 +1057,7 @@ class FAISSVectorStore(BaseVectorStore):
         Returns:
             Number of entries
         """
-        return self.index.ntotal
+        return len(self.metadata["ids"])
     
     def delete(
         self,
@@ -489,97 +1074,61 @@ class FAISSVectorStore(BaseVectorStore):
         Returns:
             True if successful
         """
-        # Find indices to delete
-        indices_to_keep = []
-        indices_to_remove = []
+        # Find rows to delete through the ID map and the inverted metadata index
+        rows = {row for doc_id in set(ids or ()) for row in self._id_to_rows.get(doc_id, ())}
+        if where:
+            rows.update(self._label_to_row[label] for label in self._filter_labels(where))
+        rows_to_remove = sorted(rows)
         
-        for i, doc_id in enumerate(self.metadata["ids"]):
-            should_delete = False
-            
-            # Check if ID matches
-            if ids and doc_id in ids:
-                should_delete = True
-            
-            # Check if metadata matches
-            if where and self._matches_filter(self.metadata["metadatas"][i], where):
-                should_delete = True
-            
-            if should_delete:
-                indices_to_remove.append(i)
-            else:
-                indices_to_keep.append(i)
-        
-        if not indices_to_remove:
+        if not rows_to_remove:
             return True  # Nothing to delete
         
-        # Create a new index without the removed vectors
-        if self.distance_func == "cosine" or self.distance_func == "ip":
-            new_index = faiss.IndexFlatIP(self.embedding_dim)
-        else:
-            new_index = faiss.IndexFlatL2(self.embedding_dim)
-        
-        # Get vectors to keep
-        keep_docs = [self.metadata["documents"][i] for i in indices_to_keep]
-        keep_metadatas = [self.metadata["metadatas"][i] for i in indices_to_keep]
-        keep_ids = [self.metadata["ids"][i] for i in indices_to_keep]
-        
-        # Create a new metadata dict
-        new_metadata = {
-            "documents": keep_docs,
-            "metadatas": keep_metadatas,
-            "ids": keep_ids
-        }
-        
-        # If no documents left, just reset the index
-        if not keep_docs:
-            # Reset using the reset method which handles GPU properly
-            self.metadata = new_metadata
-            self._save_index()
-            return self.reset()
-        
-        # Otherwise, add the kept vectors to the new index
-        kept_embeddings = []
-        for text in keep_docs:
-            embedding = self.embedding_function(text)
-            kept_embeddings.append(embedding)
+        # Remove the vectors by label; the remaining vectors are left untouched.
+        # HNSW graphs do not support removal, so their vectors stay as tombstones
+        # that search skips until the index is compacted.
+        labels = np.asarray([self.metadata["labels"][i] for i in rows_to_remove], dtype=np.int64)
+        if self._index_kind(self._cpu_index()) != "hnsw":
+            self._remove_labels(labels)
         
-        # Convert to numpy array
-        embeddings_array = np.array(kept_embeddings).astype('float32')
+        # Drop the removed rows from metadata
+        self.metadata_store.delete_labels(labels.tolist())
+        self.sparse_index.delete(ids=list({self.metadata["ids"][i] for i in rows_to_remove}))
+        for i in rows_to_remove:
+            self.metadata_index.remove(self.metadata["labels"][i], self.metadata["metadatas"][i])
+        self._remove_rows(rows_to_remove)
+        self._ensure_index_type()
         
-        # Normalize vectors for cosine similarity
-        if self.distance_func == "cosine":
-            faiss.normalize_L2(embeddings_array)
+        # Save changes
+        self._persist()
+        self._invalidate_search_cache()
         
-        # Add vectors to the new index
-        new_index.add(embeddings_array)
+        logger.info(f"Deleted {len(rows_to_remove)} vectors from FAISS index")
+        return True
+    
+    def _remove_labels(self, labels: np.ndarray) -> None:
+        """
+        Remove vectors from the index by FAISS label.
         
-        # Move to GPU if needed
+        Args:
+            labels: Labels of the vectors to remove
+        """
         if hasattr(self, 'using_gpu') and self.using_gpu:
+            # GPU indexes do not support removal; remove on a CPU copy and move it back
+            cpu_index = faiss.index_gpu_to_cpu(self.index)
+            cpu_index.remove_ids(labels)
             try:
-                gpu_resources = faiss.StandardGpuResources()
-                config = faiss.GpuIndexFlatConfig()
-                config.device = 0  # Use first GPU
-                config.useFloat16 = True
-                
-                gpu_index = faiss.index_cpu_to_gpu(gpu_resources, 0, new_index)
-                # Store GPU resources reference
-                self.gpu_resources = gpu_resources
-                self.index = gpu_index
-                logger.info("New FAISS index after delete moved to GPU")
+                self.index = faiss.index_cpu_to_gpu(self.gpu_resources, 0, cpu_index)
             except Exception as e:
                 logger.warning(f"Failed to move index to GPU after delete, falling back to CPU: {str(e)}")
-                self.index = new_index
+                self.index = cpu_index
                 self.using_gpu = False
         else:
-            self.index = new_index
-            
-        # Update metadata
-        self.metadata = new_metadata
-        
-        # Save changes
-        self._save_index()
-        
-        return True
+            self.index.remove_ids(labels)
+    
+    def close(self) -> None:
+        """Save pending changes and close the metadata store."""
+        super().close()
+        self.metadata_store.close()
     
     def reset(self) -> bool:
         """
@@ -590,10 +1139,7 @@ class FAISSVectorStore(BaseVectorStore):
         """
         try:
             # Create new index
-            if self.distance_func == "cosine" or self.distance_func == "ip":
-                new_index = faiss.IndexFlatIP(self.embedding_dim)
-            else:
-                new_index = faiss.IndexFlatL2(self.embedding_dim)
+            new_index = self._new_index(self._target_index_kind(0))
             
             # Move to GPU if using GPU
             if hasattr(self, 'using_gpu') and self.using_gpu:
@@ -622,14 +1168,13 @@ class FAISSVectorStore(BaseVectorStore):
                 self.using_gpu = False
             
             # Reset metadata
-            self.metadata = {
-                "documents": [],
-                "metadatas": [],
-                "ids": []
-            }
+            self.metadata_store.clear()
+            self.sparse_index.clear()
+            self._load_metadata()
             
             # Save changes
             self._save_index()
+            self._invalidate_search_cache()
             
             logger.info(f"FAISS vector store reset (GPU: {self.using_gpu})")
             return True
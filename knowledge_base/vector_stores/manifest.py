@@ -0,0 +1,207 @@
+"""
+Document manifest for the vector stores.
+Keeps one small row per document (id, metadata, chunk count, content hash) so
+listing documents and computing stats never reads the per-document JSON files,
+which hold the full book text. Document IDs are returned with the type they
+were added with (book IDs are integers).
+"""
+
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def content_hash(text: str) -> str:
+    """
+    Hash a document's text.
+    
+    Args:
+        text: Document text
+    
+    Returns:
+        Hex SHA-256 digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+class DocumentManifest:
+    """
+    SQLite-backed index of the documents saved next to a vector store.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the manifest.
+        
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        
+        # A new manifest has to be filled from the documents already on disk
+        self.created = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='documents'"
+        ).fetchone() is None
+        
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL DEFAULT 0,
+                content_hash TEXT NOT NULL,
+                text_length INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL,
+                id_json TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def __contains__(self, document_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM documents WHERE document_id = ?", (str(document_id),)
+            ).fetchone() is not None
+    
+    def upsert(
+        self,
+        document_id: str,
+        metadata: Dict[str, Any],
+        chunk_count: int,
+        text: Optional[str] = None,
+        text_hash: Optional[str] = None
+    ) -> None:
+        """
+        Add or replace a document's entry.
+        
+        Args:
+            document_id: Document ID
+            metadata: Document metadata
+            chunk_count: Number of chunks indexed for the document
+            text: Document text (hashed; not stored)
+            text_hash: Precomputed content hash, used instead of hashing ``text``
+        """
+        row = (
+            str(document_id),
+            json.dumps(metadata or {}, ensure_ascii=False, default=str),
+            int(chunk_count),
+            text_hash or content_hash(text),
+            len(text) if text is not None else 0,
+            datetime.now().isoformat(),
+            json.dumps(document_id, default=str)
+        )
+        
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO documents
+                    (document_id, metadata, chunk_count, content_hash, text_length, updated_at, id_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                row
+            )
+    
+    def remove(self, document_id: str) -> None:
+        """
+        Remove a document's entry.
+        
+        Args:
+            document_id: Document ID
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE document_id = ?", (str(document_id),))
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents")
+    
+    @staticmethod
+    def _to_entry(row: tuple) -> Dict[str, Any]:
+        """Turn a documents row into the dictionary returned to callers."""
+        _, metadata, chunk_count, text_hash, text_length, updated_at, id_json = row
+        return {
+            "id": json.loads(id_json),
+            "metadata": json.loads(metadata),
+            "chunk_count": chunk_count,
+            "content_hash": text_hash,
+            "text_length": text_length,
+            "updated_at": updated_at
+        }
+    
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a document's entry.
+        
+        Args:
+            document_id: Document ID
+        
+        Returns:
+            Entry with id, metadata, chunk_count, content_hash, text_length and
+            updated_at, or None if the document is unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT document_id, metadata, chunk_count, content_hash, text_length, updated_at, id_json
+                FROM documents WHERE document_id = ?
+                """,
+                (str(document_id),)
+            ).fetchone()
+        return self._to_entry(row) if row else None
+    
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        List all entries, in insertion order.
+        
+        Returns:
+            List of entries (see ``get``)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT document_id, metadata, chunk_count, content_hash, text_length, updated_at, id_json
+                FROM documents ORDER BY rowid
+                """
+            ).fetchall()
+        return [self._to_entry(row) for row in rows]
+    
+    def ids(self) -> List[str]:
+        """
+        List the document IDs, in insertion order.
+        
+        Returns:
+            List of document IDs, with the type they were added with
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id_json FROM documents ORDER BY rowid").fetchall()
+        return [json.loads(id_json) for (id_json,) in rows]
+    
+    def total_chunks(self) -> int:
+        """
+        Get the number of chunks over all documents.
+        
+        Returns:
+            Sum of the chunk counts
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()[0]
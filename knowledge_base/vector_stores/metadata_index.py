@@ -0,0 +1,138 @@
+"""
+Inverted metadata index used to pre-filter vector searches.
+Maps metadata key/value pairs to the rows that carry them, so `where`
+clauses resolve to a candidate set before any vectors are scored.
+"""
+
+from collections import defaultdict
+from typing import Dict, Any, Optional, Set, Tuple, Iterable, Hashable
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class MetadataIndex:
+    """
+    Inverted index from metadata (key, value) pairs to integer row keys.
+    
+    Row keys are chosen by the vector store (FAISS labels, Annoy items or
+    row positions). Values that cannot be hashed (lists, dicts) are not
+    indexed; conditions on them are returned as a residual filter.
+    """
+    
+    def __init__(self):
+        """Create an empty index."""
+        self._postings: Dict[Tuple[str, Hashable], Set[int]] = defaultdict(set)
+        self._keys: Set[int] = set()
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    @staticmethod
+    def _term(key: str, value: Any) -> Optional[Tuple[str, Hashable]]:
+        """Get the posting list key for a metadata pair, or None if the value is unhashable."""
+        try:
+            hash(value)
+        except TypeError:
+            return None
+        return (key, value)
+    
+    def add(self, row_key: int, metadata: Dict[str, Any]) -> None:
+        """
+        Index the metadata of one row.
+        
+        Args:
+            row_key: Row key chosen by the vector store
+            metadata: Metadata dictionary of the row
+        """
+        self._keys.add(row_key)
+        for key, value in metadata.items():
+            term = self._term(key, value)
+            if term is not None:
+                self._postings[term].add(row_key)
+    
+    def add_many(self, row_keys: Iterable[int], metadatas: Iterable[Dict[str, Any]]) -> None:
+        """
+        Index the metadata of several rows.
+        
+        Args:
+            row_keys: Row keys chosen by the vector store
+            metadatas: Metadata dictionaries aligned with ``row_keys``
+        """
+        for row_key, metadata in zip(row_keys, metadatas):
+            self.add(row_key, metadata)
+    
+    def remove(self, row_key: int, metadata: Dict[str, Any]) -> None:
+        """
+        Remove one row from the index.
+        
+        Args:
+            row_key: Row key chosen by the vector store
+            metadata: Metadata dictionary the row was indexed with
+        """
+        self._keys.discard(row_key)
+        for key, value in metadata.items():
+            term = self._term(key, value)
+            if term is None:
+                continue
+            
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.discard(row_key)
+                if not posting:
+                    del self._postings[term]
+    
+    def rebuild(self, row_keys: Iterable[int], metadatas: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace the index contents.
+        
+        Args:
+            row_keys: Row keys chosen by the vector store
+            metadatas: Metadata dictionaries aligned with ``row_keys``
+        """
+        self.clear()
+        self.add_many(row_keys, metadatas)
+    
+    def clear(self) -> None:
+        """Remove all rows from the index."""
+        self._postings.clear()
+        self._keys.clear()
+    
+    def lookup(self, where: Dict[str, Any]) -> Tuple[Optional[Set[int]], Dict[str, Any]]:
+        """
+        Resolve a `where` clause against the index.
+        
+        Args:
+            where: Equality filter (all conditions must match)
+        
+        Returns:
+            Tuple of (candidate row keys, residual filter). Candidates are
+            None if no condition could be resolved through the index; the
+            residual holds conditions that still have to be checked per row.
+        """
+        postings = []
+        residual = {}
+        
+        for key, value in where.items():
+            term = self._term(key, value)
+            if term is None:
+                residual[key] = value
+                continue
+            
+            posting = self._postings.get(term)
+            if not posting:
+                return set(), {}
+            postings.append(posting)
+        
+        if not postings:
+            return None, residual
+        
+        # Intersect starting from the most selective condition
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        
+        return candidates, residual
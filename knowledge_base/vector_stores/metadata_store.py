@@ -0,0 +1,320 @@
+"""
+SQLite-backed chunk metadata store for the FAISS and Annoy vector stores.
+Replaces the pickle sidecar that had to be rewritten in full on every change.
+"""
+
+import os
+import json
+import pickle
+import sqlite3
+import threading
+import collections.abc
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Sequence
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_MAX_PARAMS = 900
+
+class ChunkMetadataStore:
+    """
+    Indexed store for chunk ids, text and metadata.
+    
+    Rows are addressed by an integer label chosen by the vector store (the
+    FAISS label or Annoy item id). Appends and deletes only touch the affected
+    rows, and chunk text is read on demand rather than loaded at startup.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the metadata store.
+        
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY AUTOINCREMENT,
+                label INTEGER NOT NULL UNIQUE,
+                chunk_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_chunk_id ON chunks(chunk_id);
+            CREATE TABLE IF NOT EXISTS store_info (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    def append(
+        self,
+        labels: Sequence[int],
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ) -> None:
+        """
+        Append rows in a single transaction.
+        
+        A label that is already taken raises sqlite3.IntegrityError rather
+        than replacing the row.
+        
+        Args:
+            labels: Vector store label for each row
+            ids: Chunk IDs
+            texts: Chunk texts
+            metadatas: Chunk metadata dictionaries
+        """
+        rows = [
+            (int(label), chunk_id, text, json.dumps(metadata, ensure_ascii=False, default=str))
+            for label, chunk_id, text, metadata in zip(labels, ids, texts, metadatas)
+        ]
+        
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO chunks (label, chunk_id, text, metadata) VALUES (?, ?, ?, ?)",
+                rows
+            )
+    
+    def load_columns(self) -> Tuple[List[str], List[int], List[Dict[str, Any]]]:
+        """
+        Load ids, labels and metadata for all rows in insertion order (no text).
+        
+        Returns:
+            Tuple of (ids, labels, metadatas)
+        """
+        ids, labels, metadatas = [], [], []
+        
+        with self._lock:
+            cursor = self._conn.execute("SELECT chunk_id, label, metadata FROM chunks ORDER BY row")
+            for chunk_id, label, metadata in cursor:
+                ids.append(chunk_id)
+                labels.append(label)
+                metadatas.append(json.loads(metadata))
+        
+        return ids, labels, metadatas
+    
+    def get_text(self, label: int) -> Optional[str]:
+        """
+        Get the text of one row.
+        
+        Args:
+            label: Row label
+        
+        Returns:
+            Chunk text or None if the label is unknown
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM chunks WHERE label = ?", (int(label),)).fetchone()
+        return row[0] if row else None
+    
+    def get_texts(self, labels: Sequence[int]) -> List[Optional[str]]:
+        """
+        Get the texts of many rows with as few queries as possible.
+        
+        Args:
+            labels: Row labels
+        
+        Returns:
+            Texts in the order of ``labels`` (None for unknown labels)
+        """
+        found: Dict[int, str] = {}
+        labels = [int(label) for label in labels]
+        
+        with self._lock:
+            for start in range(0, len(labels), _MAX_PARAMS):
+                batch = labels[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(
+                    f"SELECT label, text FROM chunks WHERE label IN ({placeholders})",
+                    batch
+                )
+                found.update(cursor.fetchall())
+        
+        return [found.get(label) for label in labels]
+    
+    def delete_labels(self, labels: Sequence[int]) -> None:
+        """
+        Delete rows by label.
+        
+        Args:
+            labels: Labels of the rows to delete
+        """
+        labels = [int(label) for label in labels]
+        
+        with self._lock, self._conn:
+            for start in range(0, len(labels), _MAX_PARAMS):
+                batch = labels[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM chunks WHERE label IN ({placeholders})", batch)
+    
+    def update_metadata(self, labels: Sequence[int], metadatas: Sequence[Dict[str, Any]]) -> None:
+        """
+        Replace the metadata of existing rows in a single transaction.
+        
+        Args:
+            labels: Labels of the rows to update
+            metadatas: New metadata dictionaries aligned with ``labels``
+        """
+        rows = [
+            (json.dumps(metadata, ensure_ascii=False, default=str), int(label))
+            for label, metadata in zip(labels, metadatas)
+        ]
+        
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE chunks SET metadata = ? WHERE label = ?", rows)
+    
+    def relabel(self, mapping: Dict[int, int]) -> None:
+        """
+        Change the labels of existing rows.
+        
+        Args:
+            mapping: Old label to new label
+        """
+        if not mapping:
+            return
+        
+        with self._lock, self._conn:
+            # Move through negative labels first so new labels cannot collide with old ones
+            self._conn.executemany(
+                "UPDATE chunks SET label = ? WHERE label = ?",
+                [(-old - 1, old) for old in mapping]
+            )
+            self._conn.executemany(
+                "UPDATE chunks SET label = ? WHERE label = ?",
+                [(new, -old - 1) for old, new in mapping.items()]
+            )
+    
+    def clear(self) -> None:
+        """Delete all rows and stored values."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM store_info")
+    
+    def get_value(self, key: str, default: Any = None) -> Any:
+        """
+        Get a JSON value stored alongside the rows.
+        
+        Args:
+            key: Value name
+            default: Value returned when the key is missing
+        
+        Returns:
+            Stored value or default
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM store_info WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+    
+    def set_value(self, key: str, value: Any) -> None:
+        """
+        Store a JSON value alongside the rows.
+        
+        Args:
+            key: Value name
+            value: JSON-serializable value
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_info (key, value) VALUES (?, ?)",
+                (key, json.dumps(value))
+            )
+    
+    def import_pickle(self, pickle_path: str) -> Dict[str, Any]:
+        """
+        Import a legacy pickle sidecar and rename it so it is not imported twice.
+        
+        Row labels come from the pickle's "labels" list (FAISS), its
+        "index_map" (Annoy), or else the row positions.
+        
+        Args:
+            pickle_path: Path to the legacy pickle file
+        
+        Returns:
+            The unpickled metadata dictionary
+        """
+        with open(pickle_path, 'rb') as f:
+            legacy = pickle.load(f)
+        
+        ids = legacy.get("ids", [])
+        if legacy.get("labels"):
+            labels = legacy["labels"]
+        elif legacy.get("index_map"):
+            labels = [legacy["index_map"].get(chunk_id, i) for i, chunk_id in enumerate(ids)]
+        else:
+            labels = list(range(len(ids)))
+        
+        self.clear()
+        self.append(labels, ids, legacy.get("documents", []), legacy.get("metadatas", []))
+        
+        os.replace(pickle_path, pickle_path + ".migrated")
+        logger.info(f"Imported {len(ids)} rows from legacy metadata file {pickle_path}")
+        
+        return legacy
+
+class LazyDocuments(collections.abc.Sequence):
+    """
+    Read-only sequence of chunk texts that are fetched from the metadata store on access.
+    
+    Positions follow the vector store's ``labels`` list, so code indexing
+    ``metadata["documents"][i]`` keeps working without loading every text.
+    """
+    
+    # Number of texts fetched per query while iterating
+    FETCH_SIZE = 500
+    
+    def __init__(self, store: ChunkMetadataStore, columns: Dict[str, Any]):
+        """
+        Args:
+            store: Metadata store holding the texts
+            columns: Vector store metadata dictionary with a "labels" list
+        """
+        self._store = store
+        self._columns = columns
+    
+    def __len__(self) -> int:
+        return len(self._columns["labels"])
+    
+    def __getitem__(self, index):
+        labels = self._columns["labels"]
+        if isinstance(index, slice):
+            return self._store.get_texts(labels[index])
+        return self._store.get_text(labels[index])
+    
+    def __iter__(self) -> Iterator[str]:
+        labels = self._columns["labels"]
+        for start in range(0, len(labels), self.FETCH_SIZE):
+            yield from self._store.get_texts(labels[start:start + self.FETCH_SIZE])
+    
+    def take(self, positions: Sequence[int]) -> List[Optional[str]]:
+        """
+        Fetch the texts at several positions with batched queries.
+        
+        Args:
+            positions: Row positions
+        
+        Returns:
+            Texts in the order of ``positions``
+        """
+        labels = self._columns["labels"]
+        return self._store.get_texts([labels[i] for i in positions])
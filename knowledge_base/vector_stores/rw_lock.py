@@ -0,0 +1,72 @@
+"""
+Read/write lock for the vector stores.
+Searches and gets run concurrently; adds, deletes and other changes run alone,
+so a background ingestion never changes a store halfway through a search.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+class ReadWriteLock:
+    """
+    Reentrant lock held by many readers or by one writer.
+    
+    A thread holding the write lock may also read, and a reader may read
+    again. Upgrading a read lock to a write lock would deadlock, so it raises
+    RuntimeError. Waiting writers block new readers, so a stream of searches
+    cannot starve an indexing job.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}  # Thread ident to read depth
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock for reading for the duration of the block."""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers[me] -= 1
+                if not self._readers[me]:
+                    del self._readers[me]
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock for writing for the duration of the block."""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                if me in self._readers:
+                    raise RuntimeError("Cannot upgrade a read lock to a write lock")
+                
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._condition.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._write_depth += 1
+        
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._condition.notify_all()
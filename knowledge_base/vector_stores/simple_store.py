@@ -7,12 +7,31 @@ from typing import List, Dict, Any, Optional, Callable, Tuple
 
 from utils.logger import get_logger
 from knowledge_base.vector_stores.base import BaseVectorStore
+from knowledge_base.vector_stores.metadata_index import MetadataIndex
 from knowledge_base.vector_stores import register_vector_store
 
 logger = get_logger(__name__)
 
 class SimpleVectorStore(BaseVectorStore):
-    """Simple in-memory vector store."""
+    """
+    Simple in-memory vector store.
+    
+    Embeddings are kept in a contiguous float32 matrix (pre-normalized for
+    cosine distance) that grows geometrically, so a search is a single
+    matrix-vector product followed by a partial top-k selection.
+    """
+    
+    # Nothing is saved to disk, so the store starts empty after a restart
+    persistent = False
+    
+    # Number of rows allocated for the first batch of embeddings
+    INITIAL_CAPACITY = 1024
+    
+    # Factor by which the embedding matrix grows when it runs out of rows
+    GROWTH_FACTOR = 1.5
+    
+    # Number of queries scored per matrix product in batch searches
+    QUERY_BLOCK_SIZE = 256
     
     def __init__(
         self,
@@ -20,7 +39,8 @@ class SimpleVectorStore(BaseVectorStore):
         base_path: str = "./knowledge_base_data/vectors",
         data_path: str = "./knowledge_base_data/knowledge_base_data",
         embedding_function: Optional[Callable] = None,
-        distance_func: str = "cosine"
+        distance_func: str = "cosine",
+        embedding_batch_size: Optional[int] = None
     ):
         """
         Initialize the simple vector store.
@@ -31,13 +51,15 @@ class SimpleVectorStore(BaseVectorStore):
             data_path: Path to store document data
             embedding_function: Function to create embeddings
             distance_func: Distance function ('cosine', 'l2', 'ip')
+            embedding_batch_size: Number of texts embedded per call to the embedding function
         """
         super().__init__(
             collection_name=collection_name,
             base_path=base_path,
             data_path=data_path,
             embedding_function=embedding_function,
-            distance_func=distance_func
+            distance_func=distance_func,
+            embedding_batch_size=embedding_batch_size
         )
     
     def _init_store(self):
@@ -45,13 +67,182 @@ class SimpleVectorStore(BaseVectorStore):
         # Simple in-memory collection
         self.collection = {
             "documents": [],
-            "embeddings": [],
             "metadatas": [],
             "ids": []
         }
         
+        # Embedding matrix (allocated on first add, once the dimension is known)
+        self._matrix: Optional[np.ndarray] = None
+        self._squared_norms: Optional[np.ndarray] = None
+        self._size = 0
+        
+        # Inverted index over metadata, keyed by row
+        self.metadata_index = MetadataIndex()
+        
         logger.info("Simple vector store initialized")
     
+    @property
+    def embeddings(self) -> np.ndarray:
+        """
+        Get the stored embeddings as a read-only matrix view.
+        
+        Returns:
+            Array of shape (count, dimension); rows are unit length for cosine distance
+        """
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        
+        view = self._matrix[:self._size]
+        view.flags.writeable = False
+        return view
+    
+    def _reserve(self, extra_rows: int, dimension: int) -> None:
+        """
+        Make room for extra rows in the embedding matrix.
+        
+        Args:
+            extra_rows: Number of rows about to be appended
+            dimension: Embedding dimension
+        """
+        required = self._size + extra_rows
+        
+        if self._matrix is None:
+            capacity = max(self.INITIAL_CAPACITY, required)
+            self._matrix = np.empty((capacity, dimension), dtype=np.float32)
+            self._squared_norms = np.empty(capacity, dtype=np.float32)
+            return
+        
+        if self._matrix.shape[1] != dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match store dimension {self._matrix.shape[1]}")
+        
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+        
+        # Grow geometrically so repeated appends stay amortized O(1) per row
+        while capacity < required:
+            capacity = int(capacity * self.GROWTH_FACTOR) + 1
+        
+        matrix = np.empty((capacity, dimension), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        squared_norms = np.empty(capacity, dtype=np.float32)
+        squared_norms[:self._size] = self._squared_norms[:self._size]
+        
+        self._matrix = matrix
+        self._squared_norms = squared_norms
+    
+    def _append_embeddings(self, embeddings: np.ndarray) -> None:
+        """
+        Append embeddings to the matrix, normalizing them for cosine distance.
+        
+        Args:
+            embeddings: Array of shape (n, dimension)
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self._reserve(len(embeddings), embeddings.shape[1])
+        
+        if self.distance_func == "cosine":
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = embeddings / norms
+        
+        start, end = self._size, self._size + len(embeddings)
+        self._matrix[start:end] = embeddings
+        self._squared_norms[start:end] = np.einsum("ij,ij->i", embeddings, embeddings)
+        self._size = end
+    
+    def _score(self, query_embedding: Any, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Score stored embeddings against a query (higher is better).
+        
+        Args:
+            query_embedding: Query vector
+            rows: Optional row indices to score; all rows if None
+        
+        Returns:
+            Array of scores aligned with ``rows``
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        return self._score_batch(query[None, :], rows)[0]
+    
+    def _score_batch(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Score stored embeddings against several queries with one matrix product.
+        
+        Args:
+            queries: Query matrix of shape (n_queries, dimension)
+            rows: Optional row indices to score; all rows if None
+        
+        Returns:
+            Array of shape (n_queries, len(rows)) with higher-is-better scores
+        """
+        if rows is None:
+            matrix = self._matrix[:self._size]
+            squared_norms = self._squared_norms[:self._size]
+        else:
+            matrix = self._matrix[rows]
+            squared_norms = self._squared_norms[rows]
+        
+        if self.distance_func == "cosine":
+            # Zero-norm queries score 0 against everything
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            query_norms[query_norms == 0] = np.inf
+            return (queries / query_norms) @ matrix.T
+        
+        if self.distance_func == "ip":  # Inner product
+            return queries @ matrix.T
+        
+        # L2 distance: ||q - e||^2 = ||q||^2 + ||e||^2 - 2 q.e
+        squared_distances = (
+            squared_norms[None, :]
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2.0 * (queries @ matrix.T)
+        )
+        np.maximum(squared_distances, 0.0, out=squared_distances)
+        return 1.0 / (1.0 + np.sqrt(squared_distances))
+    
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Select the positions of the k highest scores without sorting the full array.
+        
+        Args:
+            scores: One-dimensional score array
+            k: Number of positions to select
+        
+        Returns:
+            Positions ordered by descending score
+        """
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+    
+    def _format_results(self, scores: np.ndarray, top: np.ndarray, rows: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Build result dictionaries for the selected positions.
+        
+        Args:
+            scores: Scores aligned with ``rows``
+            top: Selected positions into ``scores``
+            rows: Row indices that were scored; all rows if None
+        
+        Returns:
+            List of search results
+        """
+        results = []
+        for position in top:
+            i = int(rows[position]) if rows is not None else int(position)
+            results.append({
+                "id": self.collection["ids"][i],
+                "text": self.collection["documents"][i],
+                "metadata": self.collection["metadatas"][i],
+                "score": float(scores[position])
+            })
+        return results
+    
     def add_texts(
         self,
         texts: List[str],
@@ -65,15 +256,19 @@ class SimpleVectorStore(BaseVectorStore):
             texts: List of texts to add
             metadatas: Optional list of metadata dictionaries
             ids: Optional list of IDs
-            
+        
         Returns:
             List of IDs of added texts
         """
         if not texts:
             return []
         
-        # Generate embeddings
-        embeddings = [self.embedding_function(text) for text in texts]
+        # Generate embeddings in batches
+        embeddings_array, valid_indices = self._embed_texts(texts)
+        
+        if not valid_indices:
+            logger.error("No valid embeddings generated. Skipping vector store update.")
+            return []
         
         # Generate IDs if not provided
         if ids is None:
@@ -83,11 +278,19 @@ class SimpleVectorStore(BaseVectorStore):
         if metadatas is None:
             metadatas = [{} for _ in range(len(texts))]
         
+        # Keep only the texts that produced valid embeddings
+        texts = [texts[i] for i in valid_indices]
+        metadatas = [metadatas[i] for i in valid_indices]
+        ids = [ids[i] for i in valid_indices]
+        
         # Add to collection
+        self.metadata_index.add_many(range(self._size, self._size + len(ids)), metadatas)
+        self._append_embeddings(embeddings_array)
         self.collection["documents"].extend(texts)
-        self.collection["embeddings"].extend(embeddings)
         self.collection["metadatas"].extend(metadatas)
         self.collection["ids"].extend(ids)
+        self.sparse_index.add(ids, texts, metadatas)
+        self._invalidate_search_cache()
         
         return ids
     
@@ -104,62 +307,81 @@ class SimpleVectorStore(BaseVectorStore):
             query: Search query
             limit: Maximum number of results
             where: Filter condition
-            
+        
         Returns:
             List of search results
         """
-        if not self.collection["embeddings"]:
+        if self._size == 0 or limit <= 0:
             return []
         
         # Generate query embedding
-        query_embedding = self.embedding_function(query)
-        
-        # Calculate similarities
-        scores = []
-        for embedding in self.collection["embeddings"]:
-            # Calculate similarity based on distance function
-            if self.distance_func == "cosine":
-                score = self._cosine_similarity(query_embedding, embedding)
-            elif self.distance_func == "ip":  # Inner product
-                score = np.dot(query_embedding, embedding)
-            else:  # L2 distance
-                score = 1.0 / (1.0 + np.linalg.norm(np.array(query_embedding) - np.array(embedding)))
-            
-            scores.append(score)
+        query_embedding = self._embed_query(query)
         
-        # Create results with indices
-        indexed_scores = [(i, score) for i, score in enumerate(scores)]
-        
-        # Filter by metadata if provided
+        # Restrict scoring to rows matching the filter
+        rows = None
         if where:
-            indexed_scores = [
-                (i, score) for i, score in indexed_scores
-                if self._matches_filter(self.collection["metadatas"][i], where)
-            ]
+            matching_rows = self._filter_rows(where)
+            if not matching_rows:
+                return []
+            rows = np.fromiter(sorted(matching_rows), dtype=np.int64, count=len(matching_rows))
         
-        # Sort by score in descending order
-        indexed_scores.sort(key=lambda x: x[1], reverse=True)
+        # Score all candidate rows with one matrix-vector product
+        scores = self._score(query_embedding, rows)
         
-        # Limit results
-        indexed_scores = indexed_scores[:limit]
+        # Select the top-k without sorting the full score array
+        return self._format_results(scores, self._top_k(scores, limit), rows)
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries with batched embedding and one matrix product per block of queries.
         
-        # Format results
-        results = []
-        for i, score in indexed_scores:
-            result = {
-                "id": self.collection["ids"][i],
-                "text": self.collection["documents"][i],
-                "metadata": self.collection["metadatas"][i],
-                "score": float(score)
-            }
-            results.append(result)
+        Args:
+            queries: Search queries
+            limit: Maximum number of results per query
+            where: Filter condition applied to every query
         
-        return results
+        Returns:
+            List of result lists, aligned with ``queries``
+        """
+        all_results = [[] for _ in queries]
+        if self._size == 0 or limit <= 0 or not queries:
+            return all_results
+        
+        # Restrict scoring to rows matching the filter
+        rows = None
+        if where:
+            matching_rows = self._filter_rows(where)
+            if not matching_rows:
+                return all_results
+            rows = np.fromiter(sorted(matching_rows), dtype=np.int64, count=len(matching_rows))
+        
+        # Empty queries and queries that cannot be embedded get no results
+        positions = [i for i, query in enumerate(queries) if query and query.strip()]
+        vectors = self._embed_queries([queries[i] for i in positions])
+        positions = [i for i, vector in zip(positions, vectors) if vector is not None]
+        query_matrix = np.asarray([vector for vector in vectors if vector is not None], dtype=np.float32)
+        
+        # Score blocks of queries so the score matrix stays small
+        for start in range(0, len(positions), self.QUERY_BLOCK_SIZE):
+            block = query_matrix[start:start + self.QUERY_BLOCK_SIZE]
+            block_scores = self._score_batch(block, rows)
+            for offset, scores in enumerate(block_scores):
+                all_results[positions[start + offset]] = self._format_results(
+                    scores, self._top_k(scores, limit), rows
+                )
+        
+        return all_results
     
     def get(
         self,
         ids: Optional[List[str]] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Get entries from the vector store.
@@ -167,7 +389,8 @@ class SimpleVectorStore(BaseVectorStore):
         Args:
             ids: List of IDs to get
             where: Filter condition
-            
+            limit: Maximum number of entries (in insertion order)
+        
         Returns:
             Dictionary with documents, metadatas, and ids
         """
@@ -176,16 +399,20 @@ class SimpleVectorStore(BaseVectorStore):
         result_metadatas = []
         result_ids = []
         
+        id_set = set(ids) if ids else None
+        rows = sorted(self._filter_rows(where)) if where else range(self._size)
+        
         # Filter by IDs and/or metadata
-        for i, doc_id in enumerate(self.collection["ids"]):
+        for i in rows:
+            if limit is not None and len(result_ids) >= limit:
+                break
+            
+            doc_id = self.collection["ids"][i]
+            
             # Filter by ID if provided
-            if ids and doc_id not in ids:
-                continue
-                
-            # Filter by metadata if provided
-            if where and not self._matches_filter(self.collection["metadatas"][i], where):
+            if id_set is not None and doc_id not in id_set:
                 continue
-                
+            
             # Add to results
             result_documents.append(self.collection["documents"][i])
             result_metadatas.append(self.collection["metadatas"][i])
@@ -197,6 +424,36 @@ class SimpleVectorStore(BaseVectorStore):
             "ids": result_ids
         }
     
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the metadata of existing entries, keeping their vectors.
+        
+        Args:
+            ids: IDs of the entries to update (unknown IDs are ignored)
+            metadatas: New metadata dictionaries aligned with ``ids``
+        
+        Returns:
+            True if successful
+        """
+        updates = dict(zip(ids, metadatas))
+        updated_ids = []
+        
+        for i, doc_id in enumerate(self.collection["ids"]):
+            metadata = updates.get(doc_id)
+            if metadata is None:
+                continue
+            
+            self.metadata_index.remove(i, self.collection["metadatas"][i])
+            self.metadata_index.add(i, metadata)
+            self.collection["metadatas"][i] = metadata
+            updated_ids.append(doc_id)
+        
+        if updated_ids:
+            self.sparse_index.update_metadata(updated_ids, [updates[doc_id] for doc_id in updated_ids])
+            self._invalidate_search_cache()
+        
+        return True
+    
     def count(self) -> int:
         """
         Get the number of entries in the vector store.
@@ -217,36 +474,51 @@ class SimpleVectorStore(BaseVectorStore):
         Args:
             ids: List of IDs to delete
             where: Filter condition
-            
+        
         Returns:
             True if successful
         """
-        # Find indices to delete
-        indices_to_delete = []
+        id_set = set(ids) if ids else set()
+        matching_rows = self._filter_rows(where) if where else set()
+        
+        # Find rows to keep
+        keep = []
         
         for i, doc_id in enumerate(self.collection["ids"]):
             should_delete = False
             
             # Check if ID matches
-            if ids and doc_id in ids:
+            if doc_id in id_set:
                 should_delete = True
             
             # Check if metadata matches
-            if where and self._matches_filter(self.collection["metadatas"][i], where):
+            if i in matching_rows:
                 should_delete = True
             
-            if should_delete:
-                indices_to_delete.append(i)
+            if not should_delete:
+                keep.append(i)
+        
+        if len(keep) == self._size:
+            return True  # Nothing to delete
         
-        # Sort indices in reverse order to avoid index issues
-        indices_to_delete.sort(reverse=True)
+        # Drop the removed chunks from the keyword index
+        kept = set(keep)
+        self.sparse_index.delete(ids=list({doc_id for i, doc_id in enumerate(self.collection["ids"]) if i not in kept}))
         
-        # Delete entries
-        for idx in indices_to_delete:
-            self.collection["documents"].pop(idx)
-            self.collection["embeddings"].pop(idx)
-            self.collection["metadatas"].pop(idx)
-            self.collection["ids"].pop(idx)
+        # Compact the embedding matrix in place
+        keep_rows = np.asarray(keep, dtype=np.int64)
+        self._matrix[:len(keep)] = self._matrix[keep_rows]
+        self._squared_norms[:len(keep)] = self._squared_norms[keep_rows]
+        self._size = len(keep)
+        
+        # Compact the parallel lists
+        for key in ("documents", "metadatas", "ids"):
+            values = self.collection[key]
+            self.collection[key] = [values[i] for i in keep]
+        
+        # Rows were renumbered, so re-index the metadata
+        self.metadata_index.rebuild(range(self._size), self.collection["metadatas"])
+        self._invalidate_search_cache()
         
         return True
     
@@ -260,37 +532,34 @@ class SimpleVectorStore(BaseVectorStore):
         # Reset collection
         self.collection = {
             "documents": [],
-            "embeddings": [],
             "metadatas": [],
             "ids": []
         }
+        self._matrix = None
+        self._squared_norms = None
+        self._size = 0
+        self.metadata_index.clear()
+        self.sparse_index.clear()
+        self._invalidate_search_cache()
         
         logger.info("Simple vector store reset")
         return True
     
-    def _cosine_similarity(self, v1: List[float], v2: List[float]) -> float:
+    def _filter_rows(self, where: Dict[str, Any]) -> set:
         """
-        Calculate cosine similarity between two vectors.
+        Get the rows whose metadata matches a filter.
         
         Args:
-            v1: First vector
-            v2: Second vector
-            
+            where: Filter condition
+        
         Returns:
-            Cosine similarity (0-1)
+            Set of matching row indices
         """
-        v1_array = np.array(v1)
-        v2_array = np.array(v2)
-        
-        # Check for zero vectors
-        if np.all(v1_array == 0) or np.all(v2_array == 0):
-            return 0.0
-            
-        dot_product = np.dot(v1_array, v2_array)
-        norm_v1 = np.linalg.norm(v1_array)
-        norm_v2 = np.linalg.norm(v2_array)
-        
-        return dot_product / (norm_v1 * norm_v2)
+        return self._filter_keys(
+            where,
+            lambda row: self.collection["metadatas"][row],
+            lambda: range(self._size)
+        )
     
     def _matches_filter(self, metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
         """
@@ -299,7 +568,7 @@ class SimpleVectorStore(BaseVectorStore):
         Args:
             metadata: Metadata to check
             filter_dict: Filter dictionary
-            
+        
         Returns:
             True if metadata matches filter
         """
@@ -310,4 +579,4 @@ class SimpleVectorStore(BaseVectorStore):
         return True
 
 # Register the vector store
-register_vector_store("simple", SimpleVectorStore)
\ No newline at end of file
+register_vector_store("simple", SimpleVectorStore)
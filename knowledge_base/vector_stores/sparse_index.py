@@ -0,0 +1,307 @@
+"""
+BM25 keyword index kept next to a vector store.
+Indexes the same chunks as the dense vectors with SQLite FTS5, so exact-term
+queries (names, part numbers, ISBNs) can be answered and fused with vector results.
+"""
+
+import re
+import json
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Sequence
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_MAX_PARAMS = 900
+
+# Chunk rows; the FTS table indexes their text as external content
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sparse_chunks (
+    row INTEGER PRIMARY KEY AUTOINCREMENT,
+    chunk_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sparse_chunks_chunk_id ON sparse_chunks(chunk_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS sparse_chunks_fts USING fts5(
+    text,
+    content='sparse_chunks',
+    content_rowid='row',
+    tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS sparse_chunks_insert AFTER INSERT ON sparse_chunks BEGIN
+    INSERT INTO sparse_chunks_fts(rowid, text) VALUES (new.row, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS sparse_chunks_delete AFTER DELETE ON sparse_chunks BEGIN
+    INSERT INTO sparse_chunks_fts(sparse_chunks_fts, rowid, text) VALUES ('delete', old.row, old.text);
+END;
+"""
+
+class SparseIndex:
+    """
+    BM25-ranked keyword index over chunk texts.
+    
+    Rows mirror the vector store's chunks (the same ids may occur more than
+    once, as in the stores themselves). If SQLite lacks FTS5 the index is
+    unavailable and every method is a no-op.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the sparse index.
+        
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        
+        try:
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+            self.available = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Keyword index unavailable (SQLite built without FTS5?): {str(e)}")
+            self.available = False
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def __len__(self) -> int:
+        if not self.available:
+            return 0
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sparse_chunks").fetchone()[0]
+    
+    def add(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ) -> None:
+        """
+        Index chunks in a single transaction.
+        
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+            metadatas: Chunk metadata dictionaries
+        """
+        if not self.available:
+            return
+        
+        rows = [
+            (chunk_id, text or "", json.dumps(metadata or {}, ensure_ascii=False, default=str))
+            for chunk_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+        
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO sparse_chunks (chunk_id, text, metadata) VALUES (?, ?, ?)",
+                rows
+            )
+    
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Remove chunks by ID and/or by metadata filter.
+        
+        Args:
+            ids: Chunk IDs to remove
+            where: Equality filter; chunks matching every condition are removed
+        """
+        if not self.available:
+            return
+        
+        with self._lock, self._conn:
+            ids = list(ids or [])
+            for start in range(0, len(ids), _MAX_PARAMS):
+                batch = ids[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM sparse_chunks WHERE chunk_id IN ({placeholders})", batch)
+            
+            if where:
+                rows = [row for row, _ in self._filter_rows(self._conn.execute(
+                    "SELECT row, metadata FROM sparse_chunks"
+                ), where)]
+                for start in range(0, len(rows), _MAX_PARAMS):
+                    batch = rows[start:start + _MAX_PARAMS]
+                    placeholders = ",".join("?" * len(batch))
+                    self._conn.execute(f"DELETE FROM sparse_chunks WHERE row IN ({placeholders})", batch)
+    
+    def update_metadata(self, ids: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+        """
+        Replace the metadata of indexed chunks (their text stays indexed).
+        
+        Args:
+            ids: Chunk IDs
+            metadatas: New metadata dictionaries aligned with ``ids``
+        """
+        if not self.available:
+            return
+        
+        rows = [
+            (json.dumps(metadata or {}, ensure_ascii=False, default=str), chunk_id)
+            for chunk_id, metadata in zip(ids, metadatas)
+        ]
+        
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE sparse_chunks SET metadata = ? WHERE chunk_id = ?", rows)
+    
+    def rebuild(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ) -> None:
+        """
+        Replace the index contents.
+        
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+            metadatas: Chunk metadata dictionaries
+        """
+        if not self.available:
+            return
+        
+        with self._lock:
+            self.clear()
+            self.add(ids, texts, metadatas)
+            with self._conn:
+                self._conn.execute("INSERT INTO sparse_chunks_fts(sparse_chunks_fts) VALUES ('optimize')")
+    
+    def clear(self) -> None:
+        """Remove all chunks."""
+        if not self.available:
+            return
+        
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sparse_chunks")
+            self._conn.execute("INSERT INTO sparse_chunks_fts(sparse_chunks_fts) VALUES ('delete-all')")
+    
+    @staticmethod
+    def match_query(query: str) -> str:
+        """
+        Turn free text into an FTS5 expression matching any of its terms.
+        
+        Words are quoted so user input cannot inject FTS5 syntax. A word that
+        the tokenizer would split (e.g. ``978-0-13-468599-1``) is also matched
+        as a phrase, so exact identifiers rank above scattered pieces.
+        
+        Args:
+            query: Free-text query
+        
+        Returns:
+            MATCH expression, or an empty string if the query has no terms
+        """
+        clauses = []
+        for word in query.split():
+            terms = re.findall(r"\w+", word)
+            clauses.extend(f'"{term}"' for term in terms)
+            if len(terms) > 1:
+                clauses.append('"' + " ".join(terms) + '"')
+        
+        # Keep the first occurrence of each clause
+        return " OR ".join(dict.fromkeys(clauses))
+    
+    @staticmethod
+    def _filter_rows(rows, where: Dict[str, Any]):
+        """Yield the (key, metadata JSON) rows whose metadata matches every condition."""
+        for key, metadata in rows:
+            values = json.loads(metadata)
+            if all(values.get(field) == value for field, value in where.items()):
+                yield key, values
+    
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank chunks by BM25 against a query.
+        
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+            where: Equality filter on chunk metadata
+        
+        Returns:
+            List of results with id, text, metadata and score (BM25, higher is better)
+        """
+        match = self.match_query(query)
+        if not self.available or not match or limit <= 0:
+            return []
+        
+        with self._lock:
+            if not where:
+                cursor = self._conn.execute(
+                    """
+                    SELECT sparse_chunks.chunk_id, sparse_chunks.text, sparse_chunks.metadata,
+                           -bm25(sparse_chunks_fts) AS score
+                    FROM sparse_chunks_fts
+                    JOIN sparse_chunks ON sparse_chunks.row = sparse_chunks_fts.rowid
+                    WHERE sparse_chunks_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                    """,
+                    (match, limit)
+                )
+                return [
+                    {"id": chunk_id, "text": text, "metadata": json.loads(metadata), "score": score}
+                    for chunk_id, text, metadata, score in cursor.fetchall()
+                ]
+            
+            # Rank every match, then keep the best ones that pass the filter
+            cursor = self._conn.execute(
+                """
+                SELECT rowid, -bm25(sparse_chunks_fts) AS score
+                FROM sparse_chunks_fts
+                WHERE sparse_chunks_fts MATCH ?
+                ORDER BY rank
+                """,
+                (match,)
+            )
+            scores = cursor.fetchall()
+            
+            # Check the filter in rank order, reading metadata only
+            hits = []
+            for start in range(0, len(scores), _MAX_PARAMS):
+                batch = scores[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = {
+                    row: (chunk_id, metadata)
+                    for row, chunk_id, metadata in self._conn.execute(
+                        f"SELECT row, chunk_id, metadata FROM sparse_chunks WHERE row IN ({placeholders})",
+                        [row for row, _ in batch]
+                    )
+                }
+                
+                for row, score in batch:
+                    chunk_id, metadata = rows[row]
+                    for _, values in self._filter_rows([(row, metadata)], where):
+                        hits.append((row, chunk_id, values, score))
+                    if len(hits) >= limit:
+                        break
+                if len(hits) >= limit:
+                    break
+            
+            # Fetch the texts of the kept hits only
+            placeholders = ",".join("?" * len(hits))
+            texts = dict(self._conn.execute(
+                f"SELECT row, text FROM sparse_chunks WHERE row IN ({placeholders})",
+                [row for row, _, _, _ in hits]
+            ).fetchall()) if hits else {}
+            
+            return [
+                {"id": chunk_id, "text": texts.get(row, ""), "metadata": values, "score": score}
+                for row, chunk_id, values, score in hits
+            ]
@@ -15,6 +15,9 @@ from utils.ui_helpers import show_progress_bar
 from utils.file_helpers import is_valid_document, save_uploaded_file
 from components.book_list import render_book_list
 
+# Number of books shown on each page of the library
+LIBRARY_PAGE_SIZE = 24
+
 def render_book_management_page(book_manager, document_processor, knowledge_base):
     """
     Render the Book Management page.
@@ -474,6 +477,8 @@ def render_library_section(book_manager):
         st.session_state.search_query = ""
     if 'filter_category' not in st.session_state:
         st.session_state.filter_category = "All"
+    if 'library_page' not in st.session_state:
+        st.session_state.library_page = 0
     
     # Search and filter
     col1, col2 = st.columns(2)
@@ -481,6 +486,7 @@ def render_library_section(book_manager):
         search_query = st.text_input("Search books", st.session_state.search_query, key="search_books_query")
         if search_query != st.session_state.search_query:
             st.session_state.search_query = search_query
+            st.session_state.library_page = 0
     
     with col2:
         categories = book_manager.get_all_categories()
@@ -493,12 +499,22 @@ def render_library_section(book_manager):
         )
         if filter_category != st.session_state.filter_category:
             st.session_state.filter_category = filter_category
+            st.session_state.library_page = 0
     
-    # Get filtered books
+    # Get one page of filtered books, plus one more to know whether a next page exists
+    page = st.session_state.library_page
+    offset = page * LIBRARY_PAGE_SIZE
     if filter_category == "All":
-        books = book_manager.search_books(search_query)
+        books = book_manager.search_books(search_query, limit=LIBRARY_PAGE_SIZE + 1, offset=offset)
     else:
-        books = book_manager.search_books(search_query, category=filter_category)
+        books = book_manager.search_books(search_query, category=filter_category, limit=LIBRARY_PAGE_SIZE + 1, offset=offset)
+    has_next_page = len(books) > LIBRARY_PAGE_SIZE
+    books = books[:LIBRARY_PAGE_SIZE]
+    
+    # Step back if deleting the last book of a page left it empty
+    if not books and page > 0:
+        st.session_state.library_page = page - 1
+        st.rerun()
     
     # Render book list
     def on_edit(book_id):
@@ -535,6 +551,20 @@ def render_library_section(book_manager):
             st.rerun()
     
     render_book_list(books, on_edit=on_edit, on_delete=on_delete)
+    
+    # Page navigation
+    if page > 0 or has_next_page:
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("← Previous", disabled=page == 0, use_container_width=True, key="library_previous_page"):
+                st.session_state.library_page = page - 1
+                st.rerun()
+        with page_col:
+            st.caption(f"Page {page + 1} · books {offset + 1}-{offset + len(books)}")
+        with next_col:
+            if st.button("Next →", disabled=not has_next_page, use_container_width=True, key="library_next_page"):
+                st.session_state.library_page = page + 1
+                st.rerun()
 
 def render_edit_modal(book_manager, document_processor, knowledge_base):
     """
@@ -751,18 +781,19 @@ def render_edit_modal(book_manager, document_processor, knowledge_base):
                                     if is_indexed:
                                         add_log("Book found in knowledge base, updating...", "INFO")
                                         
-                                        # Remove document from knowledge base
-                                        knowledge_base.remove_document(book['id'])
-                                        
-                                        # Add updated document to knowledge base
+                                        # Re-index only the chunks whose text changed
                                         metadata = {
                                             "title": book['title'],
                                             "author": book['author'],
                                             "categories": book['categories'],
                                             "book_id": book['id']
                                         }
-                                        knowledge_base.add_document(book['id'], extracted_text, metadata)
-                                        add_log("Knowledge base updated successfully", "SUCCESS")
+                                        counts = knowledge_base.update_document(book['id'], extracted_text, metadata)
+                                        add_log(
+                                            f"Knowledge base updated successfully ({counts['added']} chunks re-embedded, "
+                                            f"{counts['removed']} removed, {counts['unchanged'] + counts['moved']} reused)",
+                                            "SUCCESS"
+                                        )
                                     else:
                                         add_log("Book not found in knowledge base, skipping KB update", "WARNING")
                                     
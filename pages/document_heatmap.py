@@ -12,7 +12,8 @@ import os
 from PIL import Image
 import io
 import base64
-from typing import Dict, List, Tuple, Any, Optional
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Any, Optional, Callable, Hashable
 
 # For text processing
 import nltk
@@ -24,7 +25,7 @@ from nltk.probability import FreqDist
 from knowledge_base import KnowledgeBase
 from book_manager.manager import BookManager
 from utils.logger import get_logger
-from utils.text_processing import clean_text
+from utils.text_processing import clean_text, MultiPatternMatcher
 
 # Define functions that may not be imported properly
 def extract_page_as_image(pdf_path, page_number):
@@ -104,6 +105,64 @@ HEATMAP_COLORS = {
     "low": "rgba(255, 255, 0, 0.3)"     # Yellow
 }
 
+# Number of computed heatmaps kept per session
+HEATMAP_CACHE_SIZE = 16
+
+# Number of words per chunk when extracting key concepts
+CONCEPT_CHUNK_WORDS = 200
+
+def get_cached_heatmap(cache_key: Optional[Hashable], compute: Callable[[], Any]) -> Any:
+    """
+    Get a computed heatmap result from the session cache, computing it on a miss.
+    
+    Results are keyed by (book, mode, parameters) but not by the highlight
+    threshold, so moving the threshold slider only re-renders.
+    
+    Args:
+        cache_key: Key identifying the book, heatmap mode and parameters (None disables caching)
+        compute: Function computing the result
+    
+    Returns:
+        The cached or freshly computed result
+    """
+    if cache_key is None:
+        return compute()
+    
+    if "heatmap_cache" not in st.session_state:
+        st.session_state.heatmap_cache = OrderedDict()
+    cache = st.session_state.heatmap_cache
+    
+    if cache_key in cache:
+        cache.move_to_end(cache_key)
+        return cache[cache_key]
+    
+    result = compute()
+    cache[cache_key] = result
+    
+    # Evict the least recently used results
+    while len(cache) > HEATMAP_CACHE_SIZE:
+        cache.popitem(last=False)
+    
+    return result
+
+def knowledge_base_fingerprint(knowledge_base: KnowledgeBase) -> int:
+    """
+    Fingerprint the documents in the knowledge base.
+    
+    The fingerprint changes whenever a document is added, re-indexed or
+    removed, even if the number of chunks stays the same.
+    
+    Args:
+        knowledge_base: The knowledge base
+    
+    Returns:
+        Hash of every document's ID, content hash and update time
+    """
+    return hash(tuple(sorted(
+        (str(entry["id"]), entry.get("content_hash") or "", entry.get("updated_at") or "")
+        for entry in knowledge_base.list_documents()
+    )))
+
 def render():
     """Render the document heatmap page."""
     st.title("Document Heatmap")
@@ -175,6 +234,9 @@ def render():
             thumbnail = st.session_state.thumbnail_cache[selected_book_id]
             st.image(thumbnail, width=150)
     
+    # Cached results are keyed by book and content, so edited books are recomputed
+    content_key = (selected_book_id, len(content), hash(content))
+    
     # Process based on heatmap type
     if heatmap_type == "Keyword Density":
         if 'custom_keywords' in locals() and custom_keywords:
@@ -182,29 +244,39 @@ def render():
             st.write(f"Highlighting keywords: {', '.join(keywords)}")
         else:
             # Use top keywords from the document
-            keywords = extract_top_keywords(content, 10)
+            keywords = get_cached_heatmap(
+                (content_key, "top_keywords"),
+                lambda: extract_top_keywords(content, 10)
+            )
             st.write("Highlighting top keywords (extracted automatically):")
             for kw, freq in keywords:
                 st.write(f"- {kw} ({freq} occurrences)")
             keywords = [kw for kw, _ in keywords]
         
         # Create keyword heatmap
-        create_keyword_heatmap(content, keywords, threshold)
+        create_keyword_heatmap(content, keywords, threshold,
+                               cache_key=(content_key, heatmap_type, tuple(keywords)))
         
     elif heatmap_type == "Key Concepts":
-        # Extract concepts using knowledge base
-        concepts = extract_key_concepts(content, knowledge_base)
-        create_concept_heatmap(content, concepts, threshold)
+        # Extract concepts using knowledge base (recomputed when its documents change)
+        concepts_key = (content_key, heatmap_type, knowledge_base_fingerprint(knowledge_base))
+        with st.spinner("Finding key concepts..."):
+            concepts = get_cached_heatmap(
+                (concepts_key, "concepts"),
+                lambda: extract_key_concepts(content, knowledge_base)
+            )
+        create_concept_heatmap(content, concepts, threshold, cache_key=concepts_key)
         
     elif heatmap_type == "Sentiment Analysis":
         # Create sentiment heatmap
-        create_sentiment_heatmap(content, threshold)
+        create_sentiment_heatmap(content, threshold, cache_key=(content_key, heatmap_type))
         
     elif heatmap_type == "Information Density":
         # Create information density heatmap
         window = window_size if 'window_size' in locals() else 10
         overlap_size = overlap if 'overlap' in locals() else 2
-        create_information_density_heatmap(content, window, overlap_size, threshold)
+        create_information_density_heatmap(content, window, overlap_size, threshold,
+                                           cache_key=(content_key, heatmap_type, window, overlap_size))
 
 def extract_top_keywords(text: str, limit: int = 10) -> List[Tuple[str, int]]:
     """
@@ -234,6 +306,8 @@ def extract_key_concepts(text: str, knowledge_base: KnowledgeBase) -> List[Tuple
     """
     Extract key concepts from text using vector database.
     
+    All chunks are searched with one batched call instead of one search per chunk.
+    
     Args:
         text: The text to analyze
         knowledge_base: KnowledgeBase instance
@@ -251,7 +325,7 @@ def extract_key_concepts(text: str, knowledge_base: KnowledgeBase) -> List[Tuple
     
     for sentence in sentences:
         words = len(sentence.split())
-        if current_length + words > 200:
+        if current_length + words > CONCEPT_CHUNK_WORDS:
             # Save current chunk and start a new one
             chunks.append(' '.join(current_chunk))
             current_chunk = [sentence]
@@ -264,27 +338,27 @@ def extract_key_concepts(text: str, knowledge_base: KnowledgeBase) -> List[Tuple
     if current_chunk:
         chunks.append(' '.join(current_chunk))
     
-    # Extract concepts for each chunk
+    # Use knowledge base search to find related concepts for every chunk at once
     concepts = []
     
-    for chunk in chunks:
-        # Use knowledge base search to find related concepts
-        try:
-            similar_chunks = knowledge_base.search(chunk, limit=3)
+    try:
+        results_per_chunk = knowledge_base.search_batch(chunks, limit=3)
+    except Exception as e:
+        logger.error(f"Error extracting concepts: {e}")
+        results_per_chunk = []
+    
+    for similar_chunks in results_per_chunk:
+        # Extract key phrases from similar chunks
+        for similar in similar_chunks:
+            # Get the document title or snippet as concept
+            concept = (similar.get('metadata') or {}).get('title', '')
+            if not concept:
+                # Fall back to first 50 chars of content
+                content = similar.get('text') or ''
+                concept = content[:50] + '...' if len(content) > 50 else content
             
-            # Extract key phrases from similar chunks
-            for similar in similar_chunks:
-                # Get the document title or snippet as concept
-                concept = similar.get('document', {}).get('title', '')
-                if not concept:
-                    # Fall back to first 50 chars of content
-                    content = similar.get('document', {}).get('content', '')
-                    concept = content[:50] + '...' if len(content) > 50 else content
-                
-                # Add concept with score
-                concepts.append((concept, similar.get('score', 0.0)))
-        except Exception as e:
-            logger.error(f"Error extracting concepts: {e}")
+            # Add concept with score
+            concepts.append((concept, similar.get('score', 0.0)))
     
     # Deduplicate and sort concepts by score
     unique_concepts = {}
@@ -299,7 +373,8 @@ def extract_key_concepts(text: str, knowledge_base: KnowledgeBase) -> List[Tuple
     
     return sorted_concepts[:10]  # Return top 10 concepts
 
-def create_keyword_heatmap(text: str, keywords: List[str], threshold: float = 0.4):
+def create_keyword_heatmap(text: str, keywords: List[str], threshold: float = 0.4,
+                           cache_key: Optional[Hashable] = None):
     """
     Create a heatmap visualization of keyword density.
     
@@ -307,33 +382,41 @@ def create_keyword_heatmap(text: str, keywords: List[str], threshold: float = 0.
         text: Document text
         keywords: List of keywords to highlight
         threshold: Minimum score to include in highlights
+        cache_key: Optional key for reusing the computed scores across re-renders
+    """
+    paragraphs, scores = get_cached_heatmap(cache_key, lambda: compute_keyword_scores(text, keywords))
+    
+    # Create visualization
+    create_heatmap_visualization(paragraphs, scores, "Keyword Density", 
+                               threshold, "Keyword density across document")
+
+def compute_keyword_scores(text: str, keywords: List[str]) -> Tuple[List[str], List[float]]:
+    """
+    Score each paragraph by keyword density.
+    
+    Args:
+        text: Document text
+        keywords: List of keywords to highlight
+    
+    Returns:
+        Tuple of (paragraphs, scores)
     """
     # Split text into paragraphs
     paragraphs = text.split('\n\n')
     paragraphs = [p for p in paragraphs if p.strip()]
     
-    # Calculate keyword density for each paragraph
-    scores = []
-    for para in paragraphs:
-        para_lower = para.lower()
-        
-        # Count keyword occurrences
-        keyword_count = sum(para_lower.count(kw.lower()) for kw in keywords)
-        
-        # Normalize by paragraph length
-        word_count = len(para.split())
-        if word_count > 0:
-            density = min(1.0, keyword_count / (word_count * 0.1))  # Cap at 1.0
-        else:
-            density = 0.0
-            
-        scores.append(density)
+    # Count all keywords in all paragraphs in one scan
+    keyword_counts = MultiPatternMatcher(keywords).total(paragraphs)
     
-    # Create visualization
-    create_heatmap_visualization(paragraphs, scores, "Keyword Density", 
-                               threshold, "Keyword density across document")
+    # Normalize by paragraph length
+    word_counts = np.array([len(para.split()) for para in paragraphs], dtype=float)
+    density = np.divide(keyword_counts, word_counts * 0.1, out=np.zeros(len(paragraphs)), where=word_counts > 0)
+    scores = np.minimum(density, 1.0)  # Cap at 1.0
+    
+    return paragraphs, scores.tolist()
 
-def create_concept_heatmap(text: str, concepts: List[Tuple[str, float]], threshold: float = 0.4):
+def create_concept_heatmap(text: str, concepts: List[Tuple[str, float]], threshold: float = 0.4,
+                           cache_key: Optional[Hashable] = None):
     """
     Create a heatmap visualization of key concepts.
     
@@ -341,39 +424,65 @@ def create_concept_heatmap(text: str, concepts: List[Tuple[str, float]], thresho
         text: Document text
         concepts: List of (concept, score) tuples
         threshold: Minimum score to include in highlights
+        cache_key: Optional key for reusing the computed scores across re-renders
     """
-    # Extract concept texts only
-    concept_texts = [concept for concept, _ in concepts]
+    paragraphs, scores = get_cached_heatmap(cache_key, lambda: compute_concept_scores(text, concepts))
     
+    # Create visualization
+    concept_list = ", ".join([c for c, _ in concepts[:5]])
+    create_heatmap_visualization(paragraphs, scores, "Key Concepts", 
+                               threshold, f"Top concepts: {concept_list}...")
+
+def compute_concept_scores(text: str, concepts: List[Tuple[str, float]]) -> Tuple[List[str], List[float]]:
+    """
+    Score each paragraph by the strongest key concept it mentions.
+    
+    Args:
+        text: Document text
+        concepts: List of (concept, score) tuples
+    
+    Returns:
+        Tuple of (paragraphs, scores)
+    """
     # Split text into paragraphs
     paragraphs = text.split('\n\n')
     paragraphs = [p for p in paragraphs if p.strip()]
     
-    # Calculate concept relevance for each paragraph
-    scores = []
-    for para in paragraphs:
-        para_lower = para.lower()
-        
-        # Check for concept mentions
-        relevance = 0.0
-        for concept, score in concepts:
-            if concept.lower() in para_lower:
-                relevance = max(relevance, score)
-        
-        scores.append(relevance)
+    if not concepts:
+        return paragraphs, [0.0] * len(paragraphs)
     
-    # Create visualization
-    concept_list = ", ".join([c for c, _ in concepts[:5]])
-    create_heatmap_visualization(paragraphs, scores, "Key Concepts", 
-                               threshold, f"Top concepts: {concept_list}...")
+    # Find every concept mention in one scan, then keep the strongest concept per paragraph
+    mentioned = MultiPatternMatcher([concept for concept, _ in concepts]).count(paragraphs) > 0
+    concept_scores = np.array([score for _, score in concepts], dtype=float)
+    relevance = np.where(mentioned, concept_scores, 0.0).max(axis=1)
+    scores = np.maximum(relevance, 0.0)
+    
+    return paragraphs, scores.tolist()
 
-def create_sentiment_heatmap(text: str, threshold: float = 0.4):
+def create_sentiment_heatmap(text: str, threshold: float = 0.4, cache_key: Optional[Hashable] = None):
     """
     Create a heatmap visualization of sentiment.
     
     Args:
         text: Document text
         threshold: Minimum score to include in highlights
+        cache_key: Optional key for reusing the computed scores across re-renders
+    """
+    paragraphs, scores = get_cached_heatmap(cache_key, lambda: compute_sentiment_scores(text))
+    
+    # Create visualization
+    create_heatmap_visualization(paragraphs, scores, "Sentiment Analysis", 
+                               threshold, "Sentiment across document (higher = more positive)")
+
+def compute_sentiment_scores(text: str) -> Tuple[List[str], List[float]]:
+    """
+    Score each paragraph by keyword-based sentiment.
+    
+    Args:
+        text: Document text
+    
+    Returns:
+        Tuple of (paragraphs, scores)
     """
     # Split text into paragraphs
     paragraphs = text.split('\n\n')
@@ -386,30 +495,21 @@ def create_sentiment_heatmap(text: str, threshold: float = 0.4):
     negative_words = ['bad', 'worst', 'terrible', 'negative', 'ugly', 'sad', 
                      'hate', 'poor', 'awful', 'horrible', 'failure', 'problem']
     
-    scores = []
-    for para in paragraphs:
-        para_lower = para.lower()
-        
-        # Count positive and negative words
-        pos_count = sum(para_lower.count(word) for word in positive_words)
-        neg_count = sum(para_lower.count(word) for word in negative_words)
-        
-        total = pos_count + neg_count
-        if total > 0:
-            # Map to range [-1, 1] then to [0, 1]
-            sentiment = (pos_count - neg_count) / total
-            score = (sentiment + 1) / 2  # Map to [0, 1]
-        else:
-            score = 0.5  # Neutral
-            
-        scores.append(score)
+    # Count positive and negative words in one scan
+    counts = MultiPatternMatcher(positive_words + negative_words).count(paragraphs)
+    pos_count = counts[:, :len(positive_words)].sum(axis=1)
+    neg_count = counts[:, len(positive_words):].sum(axis=1)
     
-    # Create visualization
-    create_heatmap_visualization(paragraphs, scores, "Sentiment Analysis", 
-                               threshold, "Sentiment across document (higher = more positive)")
+    # Map to range [-1, 1] then to [0, 1]; paragraphs without sentiment words are neutral
+    total = pos_count + neg_count
+    sentiment = np.divide(pos_count - neg_count, total, out=np.zeros(len(paragraphs)), where=total > 0)
+    scores = (sentiment + 1) / 2
+    
+    return paragraphs, scores.tolist()
 
 def create_information_density_heatmap(text: str, window_size: int = 10, 
-                                     overlap: int = 2, threshold: float = 0.4):
+                                     overlap: int = 2, threshold: float = 0.4,
+                                     cache_key: Optional[Hashable] = None):
     """
     Create a heatmap visualization of information density.
     
@@ -418,6 +518,28 @@ def create_information_density_heatmap(text: str, window_size: int = 10,
         window_size: Number of sentences per analysis window
         overlap: Number of sentences to overlap between windows
         threshold: Minimum score to include in highlights
+        cache_key: Optional key for reusing the computed scores across re-renders
+    """
+    windows, scores = get_cached_heatmap(
+        cache_key, lambda: compute_information_density_scores(text, window_size, overlap)
+    )
+    
+    # Create visualization
+    create_heatmap_visualization(windows, scores, "Information Density", 
+                               threshold, "Information density across document")
+
+def compute_information_density_scores(text: str, window_size: int = 10,
+                                       overlap: int = 2) -> Tuple[List[str], List[float]]:
+    """
+    Score overlapping windows of sentences by information density.
+    
+    Args:
+        text: Document text
+        window_size: Number of sentences per analysis window
+        overlap: Number of sentences to overlap between windows
+    
+    Returns:
+        Tuple of (windows, scores)
     """
     # Split text into sentences
     sentences = sent_tokenize(text)
@@ -441,9 +563,7 @@ def create_information_density_heatmap(text: str, window_size: int = 10,
         info_density = (0.4 * avg_word_length / 10) + (0.6 * unique_ratio)
         scores.append(min(1.0, info_density * 2))  # Scale and cap at 1.0
     
-    # Create visualization
-    create_heatmap_visualization(windows, scores, "Information Density", 
-                               threshold, "Information density across document")
+    return windows, scores
 
 def create_heatmap_visualization(text_blocks: List[str], scores: List[float], 
                                title: str, threshold: float, description: str):
@@ -3,7 +3,6 @@ Knowledge Base page for the application.
 """
 
 import streamlit as st
-import time
 from utils.ui_helpers import create_download_link, show_progress_bar
 from utils.notifications import get_notification_manager, render_notification_center, NotificationLevel, NotificationType
 
@@ -89,6 +88,9 @@ def render_knowledge_base_page(book_manager, knowledge_base):
     # Book grid for toggling knowledge base inclusion
     render_book_grid(book_manager, knowledge_base, all_books, indexed_book_ids)
     
+    # Background indexing jobs
+    render_ingestion_jobs(book_manager, knowledge_base)
+    
     # Knowledge base operations
     render_knowledge_base_operations(book_manager, knowledge_base)
 
@@ -150,6 +152,11 @@ def render_book_grid(book_manager, knowledge_base, books, indexed_book_ids):
         st.info("No books found in your library. Upload some books to get started!")
         return
     
+    # Adding and removing books runs in the background ingestion queue
+    from knowledge_base.ingestion import get_ingestion_queue
+    ingestion_queue = get_ingestion_queue(knowledge_base, book_manager)
+    active_jobs = ingestion_queue.active_jobs()
+    
     # Create a grid of books with toggle switches
     book_columns = st.columns(3)
     
@@ -199,99 +206,110 @@ def render_book_grid(book_manager, knowledge_base, books, indexed_book_ids):
                     # Save the new value for the next rerun
                     st.session_state[book_state_key] = toggle_value
                     
-                    # Toggle turned ON - Add to KB
+                    # Toggle turned ON - Queue the book for indexing
                     if toggle_value and not is_in_kb:
-                        with st.spinner(f"Adding '{book['title']}' to knowledge base..."):
-                            # Get the book content
-                            content = book_manager.get_book_content(book['id'])
-                            
-                            # Check if content exists
-                            if not content:
-                                st.error(f"Cannot add '{book['title']}' to knowledge base: no content available")
-                                get_notification_manager().notify_missing_content(
-                                    book_id=book['id'],
-                                    book_title=book['title']
-                                )
-                                # Mark this book as having no content for future runs
-                                st.session_state[book_state_key + "_no_content"] = True
-                                # Reset the KB status
-                                st.session_state[book_state_key] = False
-                                st.rerun()
-                                
-                            # Create progress tracking
-                            progress_container = st.empty()
-                            
-                            # Define progress callback
-                            def update_progress(current, total, message):
-                                if isinstance(message, str):
-                                    show_progress_bar(
-                                        progress_container, 
-                                        current, 
-                                        total, 
-                                        f"Processing: {message}"
-                                    )
-                                else:
-                                    show_progress_bar(
-                                        progress_container, 
-                                        current, 
-                                        total, 
-                                        "Processing document"
-                                    )
-                            
-                            # Add to knowledge base with progress updates
-                            success = knowledge_base.toggle_book_in_knowledge_base(
-                                book['id'], 
-                                content, 
-                                add_to_kb=True,
-                                progress_callback=update_progress,
-                                book_title=book['title']  # Pass book title for notifications
-                            )
-                            
-                            if success:
-                                st.success(f"Added '{book['title']}' to knowledge base!")
-                                # Display success notification
-                                get_notification_manager().create_notification(
-                                    message=f"Successfully added '{book['title']}' to knowledge base.",
-                                    level=NotificationLevel.SUCCESS,
-                                    notification_type=NotificationType.GENERAL,
-                                    book_id=book['id'],
-                                    book_title=book['title']
-                                )
-                            else:
-                                st.error(f"Failed to add '{book['title']}' to knowledge base.")
-                                # Reset the toggle state in session
-                                st.session_state[book_state_key] = False
-                                
-                            time.sleep(1)  # Brief pause to show message
-                            st.rerun()  # Refresh to update stats
-                            
-                    # Toggle turned OFF - Remove from KB
-                    elif not toggle_value and is_in_kb:
-                        with st.spinner(f"Removing '{book['title']}' from knowledge base..."):
-                            success = knowledge_base.toggle_book_in_knowledge_base(
-                                book['id'], 
-                                None, 
-                                add_to_kb=False,
+                        # Check content before queueing, so the toggle can be disabled right away
+                        content = book_manager.get_book_content(book['id'])
+                        if not content:
+                            st.error(f"Cannot add '{book['title']}' to knowledge base: no content available")
+                            get_notification_manager().notify_missing_content(
+                                book_id=book['id'],
                                 book_title=book['title']
                             )
+                            # Mark this book as having no content for future runs
+                            st.session_state[book_state_key + "_no_content"] = True
+                            # Reset the KB status
+                            st.session_state[book_state_key] = False
+                            st.rerun()
+                        
+                        ingestion_queue.enqueue(book['id'], action="add", title=book['title'])
+                        st.info(f"Queued '{book['title']}' for indexing")
+                        st.rerun()
                             
-                            if success:
-                                st.warning(f"Removed '{book['title']}' from knowledge base")
-                                # Display removal notification
-                                get_notification_manager().create_notification(
-                                    message=f"Removed '{book['title']}' from knowledge base.",
-                                    level=NotificationLevel.INFO,
-                                    notification_type=NotificationType.GENERAL,
-                                    book_id=book['id'],
-                                    book_title=book['title']
-                                )
-                            else:
-                                st.error(f"Failed to remove '{book['title']}' from knowledge base.")
-                                # Reset the toggle state in session
-                                st.session_state[book_state_key] = True
-                                
-                            time.sleep(1)  # Brief pause to show message
-                            st.rerun()  # Refresh to update stats
+                    # Toggle turned OFF - Queue the book for removal
+                    elif not toggle_value and is_in_kb:
+                        ingestion_queue.enqueue(book['id'], action="remove", title=book['title'])
+                        st.info(f"Queued '{book['title']}' for removal")
+                        st.rerun()
+                
+                # Show the progress of the book's pending job
+                job = active_jobs.get(book['id'])
+                if job:
+                    action = "Indexing" if job['action'] == "add" else "Removing"
+                    state = " (paused)" if job['paused'] or ingestion_queue.paused else ""
+                    show_progress_bar(
+                        st.empty(),
+                        round(job['progress'] * 100),
+                        100,
+                        f"{action}{state}: {job['message'] or job['status']}"
+                    )
+
+def render_ingestion_jobs(book_manager, knowledge_base):
+    """
+    Render the background indexing jobs section.
+    
+    Args:
+        book_manager: The BookManager instance
+        knowledge_base: The KnowledgeBase instance
+    """
+    from knowledge_base.ingestion import get_ingestion_queue
+    
+    ingestion_queue = get_ingestion_queue(knowledge_base, book_manager)
+    jobs = ingestion_queue.list_jobs(limit=20)
+    if not jobs:
+        return
+    
+    st.header("Indexing Jobs")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if ingestion_queue.paused:
+            if st.button("Resume Indexing", key="ingestion_resume"):
+                ingestion_queue.resume()
+                st.rerun()
+        elif st.button("Pause Indexing", key="ingestion_pause", help="Running jobs stop after their current step and continue from there when resumed"):
+            ingestion_queue.pause()
+            st.rerun()
+    with col2:
+        if st.button("Refresh", key="ingestion_refresh"):
+            st.rerun()
+    with col3:
+        if st.button("Clear Finished", key="ingestion_clear"):
+            ingestion_queue.clear_finished()
+            st.rerun()
+    
+    for job in jobs:
+        action = "Add" if job['action'] == "add" else "Remove"
+        status = "paused" if job['paused'] and job['status'] in ("queued", "running") else job['status']
+        
+        job_col, button_col = st.columns([4, 1])
+        with job_col:
+            st.markdown(f"**{action}: {job['title']}** - {status}")
+            if job['status'] in ("queued", "running"):
+                show_progress_bar(st.empty(), round(job['progress'] * 100), 100, job['message'] or "Waiting")
+            elif job['status'] == "failed":
+                st.caption(f"❌ {job['error']}")
+            elif job['message']:
+                st.caption(job['message'])
+        
+        with button_col:
+            if job['status'] in ("queued", "running"):
+                if job['paused']:
+                    if st.button("Resume", key=f"ingestion_job_resume_{job['id']}"):
+                        ingestion_queue.resume_job(job['id'])
+                        st.rerun()
+                elif st.button("Pause", key=f"ingestion_job_pause_{job['id']}"):
+                    ingestion_queue.pause_job(job['id'])
+                    st.rerun()
+            elif job['status'] == "failed":
+                if st.button("Retry", key=f"ingestion_job_retry_{job['id']}"):
+                    ingestion_queue.resume_job(job['id'])
+                    st.rerun()
+            
+            if job['status'] in ("queued", "running", "failed"):
+                if st.button("Cancel", key=f"ingestion_job_cancel_{job['id']}"):
+                    ingestion_queue.cancel_job(job['id'])
+                    st.rerun()
 
 def render_knowledge_base_operations(book_manager, knowledge_base):
     """
@@ -306,7 +324,14 @@ def render_knowledge_base_operations(book_manager, knowledge_base):
     col1, col2 = st.columns(2)
     
     with col1:
-        if st.button("Rebuild Knowledge Base", help="Rebuilds the entire knowledge base. Useful if there are issues."):
+        # An interrupted rebuild continues from its last checkpoint
+        if knowledge_base.has_pending_rebuild():
+            st.caption("A previous rebuild was interrupted and will resume from its last checkpoint.")
+            rebuild_label = "Resume Rebuild"
+        else:
+            rebuild_label = "Rebuild Knowledge Base"
+        
+        if st.button(rebuild_label, help="Rebuilds the entire knowledge base next to the current one and swaps it in when done. Useful if there are issues."):
             # Create a progress container
             progress_container = st.empty()
             status_container = st.empty()
@@ -323,11 +348,13 @@ def render_knowledge_base_operations(book_manager, knowledge_base):
             # Rebuild with progress updates
             with st.spinner("Rebuilding knowledge base..."):
                 try:
-                    knowledge_base.rebuild_knowledge_base(
+                    if knowledge_base.rebuild_knowledge_base(
                         book_manager,
                         progress_callback=update_progress
-                    )
-                    st.success("Knowledge base rebuilt successfully!")
+                    ):
+                        st.success("Knowledge base rebuilt successfully!")
+                    else:
+                        st.error("Error rebuilding knowledge base. Run the rebuild again to resume from the last checkpoint.")
                 except Exception as e:
                     st.error(f"Error rebuilding knowledge base: {str(e)}")
     
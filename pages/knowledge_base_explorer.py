@@ -11,6 +11,8 @@ from sklearn.decomposition import PCA
 from sklearn.manifold import TSNE
 import time
 
+from utils.text_processing import highlight_terms
+
 # Try to import plotly (but have matplotlib as fallback)
 try:
     import plotly.express as px
@@ -97,14 +99,8 @@ def render_query_explorer(knowledge_base):
                     # Split query into terms
                     term_list = [t.strip().lower() for t in terms.lower().split() if len(t.strip()) > 2]
                     
-                    # Create a highlighted version using markdown
-                    highlighted = text
-                    for term in term_list:
-                        # Case-insensitive replacement with markdown highlighting
-                        pattern = re.compile(re.escape(term), re.IGNORECASE)
-                        highlighted = pattern.sub(f"**{term}**", highlighted)
-                    
-                    return highlighted
+                    # Highlight all terms in one pass using markdown bold
+                    return highlight_terms(text, term_list, "**", "**")
                 
                 # Display each result
                 for i, result in enumerate(results, 1):
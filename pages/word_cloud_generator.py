@@ -31,35 +31,59 @@ def render_word_cloud_generator_page(book_manager):
         st.info("No books found in your library. Upload some books to get started!")
         return
     
-    # Book selection
-    st.header("Select a Book")
+    # Choose what to analyze
+    scope = st.radio("Analyze", ["Single book", "Category"], horizontal=True)
     
-    book_options = [f"{book['title']} by {book['author']}" for book in books]
-    book_options.insert(0, "Select a book...")
+    selected_book = None
+    selected_category = None
+    content = None
     
-    selected_option = st.selectbox("Choose a book to analyze", book_options)
-    
-    if selected_option == "Select a book...":
-        st.info("Please select a book to generate a word cloud.")
-        return
-    
-    # Find the selected book
-    selected_index = book_options.index(selected_option) - 1  # -1 because we added "Select a book..." at index 0
-    selected_book = books[selected_index]
-    
-    # Display book info
-    st.subheader(f"Selected: {selected_book['title']}")
-    st.caption(f"Author: {selected_book['author']}")
-    
-    # Get book content
-    content = book_manager.get_book_content(selected_book['id'])
-    
-    if not content:
-        st.error("No content found for this book.")
-        return
-    
-    # Clean up the content
-    text_to_analyze = cleanup_text(content)
+    if scope == "Category":
+        # Category selection
+        st.header("Select a Category")
+        
+        category_options = book_manager.get_all_categories()
+        if not category_options:
+            st.info("No categories found in your library.")
+            return
+        
+        category_options.insert(0, "Select a category...")
+        selected_category = st.selectbox("Choose a category to analyze", category_options)
+        
+        if selected_category == "Select a category...":
+            st.info("Please select a category to generate a word cloud.")
+            return
+        
+        st.subheader(f"Selected: {selected_category}")
+        scope_title = selected_category
+    else:
+        # Book selection
+        st.header("Select a Book")
+        
+        book_options = [f"{book['title']} by {book['author']}" for book in books]
+        book_options.insert(0, "Select a book...")
+        
+        selected_option = st.selectbox("Choose a book to analyze", book_options)
+        
+        if selected_option == "Select a book...":
+            st.info("Please select a book to generate a word cloud.")
+            return
+        
+        # Find the selected book
+        selected_index = book_options.index(selected_option) - 1  # -1 because we added "Select a book..." at index 0
+        selected_book = books[selected_index]
+        
+        # Display book info
+        st.subheader(f"Selected: {selected_book['title']}")
+        st.caption(f"Author: {selected_book['author']}")
+        scope_title = selected_book['title']
+        
+        # Get book content
+        content = book_manager.get_book_content(selected_book['id'])
+        
+        if not content:
+            st.error("No content found for this book.")
+            return
     
     # Word Cloud settings in a collapsible section
     with st.expander("Word Cloud Settings"):
@@ -100,31 +124,24 @@ def render_word_cloud_generator_page(book_manager):
             
             # Generate word cloud
             with st.spinner("Generating word cloud..."):
-                try:
-                    # Ensure NLTK resources are available
-                    from utils.text_processing import ensure_nltk_resources
-                    ensure_nltk_resources()
-                    
-                    # Analyze word frequency
-                    word_freq = analyze_word_frequency(
-                        text_to_analyze,
-                        min_word_length=min_word_length,
-                        max_words=max_words*2,  # Get more words than needed for the cloud to have options
-                        exclude_stopwords=exclude_stopwords,
-                        custom_stopwords=custom_stopword_list
-                    )
-                except Exception as nltk_error:
-                    st.error(f"Error with text processing: {str(nltk_error)}")
-                    st.info("Installing missing NLTK resources...")
-                    # Force direct download of required resources
-                    import nltk
-                    nltk.download('punkt')
-                    nltk.download('stopwords')
-                    
-                    # Try again after downloading
+                # Read precomputed term counts instead of re-tokenizing the text
+                term_filters = dict(
+                    book_id=selected_book['id'] if selected_book else None,
+                    category=selected_category,
+                    min_length=min_word_length,
+                    exclude_stopwords=exclude_stopwords,
+                    custom_stopwords=custom_stopword_list
+                )
+                word_freq = book_manager.get_term_frequencies(
+                    limit=max_words*2,  # Get more words than needed for the cloud to have options
+                    **term_filters
+                )
+                
+                if not word_freq and content:
+                    # Content stored outside BookManager has no term statistics yet
                     word_freq = analyze_word_frequency(
-                        text_to_analyze,
-                        min_word_length=min_word_length,
+                        cleanup_text(content),
+                        min_length=min_word_length,
                         max_words=max_words*2,
                         exclude_stopwords=exclude_stopwords,
                         custom_stopwords=custom_stopword_list
@@ -135,7 +152,7 @@ def render_word_cloud_generator_page(book_manager):
                     return
                 
                 # Create tabs for different visualizations
-                tab1, tab2 = st.tabs(["Word Cloud", "Word Frequency Analysis"])
+                tab1, tab2, tab3 = st.tabs(["Word Cloud", "Word Frequency Analysis", "Distinctive Terms"])
                 
                 with tab1:
                     st.subheader("Word Cloud Visualization")
@@ -144,7 +161,7 @@ def render_word_cloud_generator_page(book_manager):
                     top_words = word_freq[:max_words]
                     
                     # Create a message about generating word clouds
-                    st.info(f"Word cloud generated with {len(top_words)} most frequent words from '{selected_book['title']}'")
+                    st.info(f"Word cloud generated with {len(top_words)} most frequent words from '{scope_title}'")
                     
                     # Convert the word frequency list to a dictionary for the word cloud
                     word_freq_dict = {word: count for word, count in top_words}
@@ -165,7 +182,7 @@ def render_word_cloud_generator_page(book_manager):
                     # Add download link
                     download_link = get_word_cloud_download_link(
                         word_cloud_fig, 
-                        filename=f"{selected_book['title']}_wordcloud.png".replace(" ", "_")
+                        filename=f"{scope_title}_wordcloud.png".replace(" ", "_")
                     )
                     st.markdown(download_link, unsafe_allow_html=True)
                 
@@ -226,18 +243,46 @@ def render_word_cloud_generator_page(book_manager):
                     
                     # Show the plot
                     st.pyplot(fig)
+                
+                with tab3:
+                    st.subheader("Distinctive Terms (TF-IDF)")
+                    st.caption("Words that are frequent here but rare across the rest of your library")
+                    
+                    tfidf_terms = book_manager.get_tfidf_terms(limit=max_words, **term_filters)
+                    
+                    if tfidf_terms:
+                        tfidf_df = pd.DataFrame(tfidf_terms, columns=["Word", "TF-IDF"])
+                        st.dataframe(
+                            tfidf_df,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "Word": "Word",
+                                "TF-IDF": st.column_config.NumberColumn(
+                                    "TF-IDF",
+                                    help="Term frequency weighted by how rare the word is across the library",
+                                    format="%.5f"
+                                )
+                            }
+                        )
+                    else:
+                        st.info("No term statistics available yet.")
         
         except Exception as e:
             st.error(f"Error generating word cloud: {str(e)}")
     
     # Show a sample of the text
-    with st.expander("Text Sample"):
-        # Show the first 1000 characters as a sample
-        sample_length = min(1000, len(text_to_analyze))
-        st.markdown(f"**Sample of text being analyzed (first {sample_length} characters):**")
-        st.text_area(
-            "Text Sample", 
-            text_to_analyze[:sample_length] + ("..." if len(text_to_analyze) > sample_length else ""),
-            height=200,
-            disabled=True
-        )
+    if content:
+        with st.expander("Text Sample"):
+            # Only clean the part of the text that is shown
+            text_sample = cleanup_text(content[:2000])
+            
+            # Show the first 1000 characters as a sample
+            sample_length = min(1000, len(text_sample))
+            st.markdown(f"**Sample of text being analyzed (first {sample_length} characters):**")
+            st.text_area(
+                "Text Sample", 
+                text_sample[:sample_length] + ("..." if len(content) > sample_length else ""),
+                height=200,
+                disabled=True
+            )
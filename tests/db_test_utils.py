@@ -0,0 +1,42 @@
+"""
+Helpers shared by the book database tests.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection
+
+class BookDatabaseTestCase(unittest.TestCase):
+    """
+    Test case with a fresh book database in a temporary directory.
+    
+    The schema, indexes and triggers are created by BookManager, and
+    ``self.conn`` is opened with the same pragmas as the application.
+    """
+    
+    def setUp(self):
+        from book_manager.manager import BookManager
+        
+        self.root = tempfile.mkdtemp()
+        db_path = patch("database.connection.DB_PATH", os.path.join(self.root, "books.db"))
+        db_path.start()
+        self.addCleanup(db_path.stop)
+        
+        self.book_manager = BookManager()
+        self.conn = get_connection()
+    
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def add_book(self, title, content, categories=()):
+        """Add a book through BookManager and return its ID."""
+        return self.book_manager.add_book(title, "Author", list(categories), content=content)
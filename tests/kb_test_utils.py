@@ -0,0 +1,57 @@
+"""
+Helpers shared by the knowledge base tests.
+"""
+
+import os
+import sys
+
+# Add parent directory to path to import application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.embedding import SimpleEmbedding
+
+STORE_TYPES = ["simple", "faiss", "annoy"]
+
+def embedding_function(dimension: int = 32):
+    """
+    Get a deterministic embedding function that bypasses the persistent
+    embedding cache (it has no model_name).
+    """
+    embedding = SimpleEmbedding(dimension=dimension)
+    return lambda texts: embedding(texts)
+
+def make_store(store_type: str, root: str, **kwargs):
+    """
+    Open a vector store of the given type under a test directory.
+    
+    Args:
+        store_type: 'simple', 'faiss' or 'annoy'
+        root: Directory holding the store's files
+        **kwargs: Additional arguments for the store constructor
+    
+    Returns:
+        Vector store instance
+    """
+    if store_type == "faiss":
+        from knowledge_base.vector_stores.faiss_store import FAISSVectorStore as store_class
+        kwargs.setdefault("use_gpu", False)
+    elif store_type == "annoy":
+        from knowledge_base.vector_stores.annoy_store import AnnoyVectorStore as store_class
+    else:
+        from knowledge_base.vector_stores.simple_store import SimpleVectorStore as store_class
+    
+    return store_class(
+        collection_name="test",
+        base_path=os.path.join(root, "vectors"),
+        data_path=os.path.join(root, "data"),
+        embedding_function=kwargs.pop("embedding_function", None) or embedding_function(),
+        **kwargs
+    )
+
+def book_text(paragraphs: int = 40, seed: int = 0) -> str:
+    """Build a deterministic multi-paragraph text."""
+    words = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda omicron".split()
+    return "\n\n".join(
+        " ".join(words[(seed + p * 7 + w * 3 + p * w) % len(words)] for w in range(60)) + f" paragraph {p}."
+        for p in range(paragraphs)
+    )
@@ -0,0 +1,84 @@
+"""
+Tests for keyword extraction with the Space-Saving sketch.
+"""
+
+import os
+import random
+import re
+import sys
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+# Add parent directory to path to import application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base import analytics
+from knowledge_base.analytics import STOPWORDS, SpaceSavingCounter, extract_keywords
+
+def exact_keywords(text: str, max_words: int) -> Counter:
+    """Count every keyword and phrase of a text exactly."""
+    words = [
+        word for word in re.findall(r"\w+", text.lower())
+        if len(word) >= 3 and word not in STOPWORDS["english"]
+    ]
+    counts = Counter()
+    for n in range(1, max_words + 1):
+        counts.update(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return counts
+
+class KeywordExtractionTests(unittest.TestCase):
+    """Counts of the top keywords are exact while the sketch has room."""
+    
+    def setUp(self):
+        rng = random.Random(0)
+        vocabulary = ["river", "stone", "bridge", "lantern", "harbor", "willow", "ember", "falcon", "meadow"]
+        sentences = [
+            " ".join(rng.choice(vocabulary) for _ in range(rng.randint(4, 12))) + "."
+            for _ in range(200)
+        ]
+        self.text = " The ".join(sentences)
+    
+    def test_top_keywords_match_exact_counts(self):
+        expected = exact_keywords(self.text, 3)
+        keywords = extract_keywords(self.text, min_count=2, max_words=3)
+        
+        self.assertEqual(keywords, {phrase: count for phrase, count in expected.items() if count >= 2})
+        top = sorted(expected.values(), reverse=True)[:20]
+        self.assertEqual(list(keywords.values())[:20], top)
+    
+    def test_batches_do_not_break_phrases(self):
+        expected = extract_keywords(self.text, min_count=1, max_words=3)
+        with patch.object(analytics, "_KEYWORD_BATCH_WORDS", 7):
+            self.assertEqual(extract_keywords(self.text, min_count=1, max_words=3), expected)
+    
+    def test_small_sketch_keeps_heavy_hitters(self):
+        expected = exact_keywords(self.text, 2)
+        keywords = extract_keywords(self.text, min_count=1, max_words=2, capacity=20)
+        
+        # Counts are lower bounds, and the most frequent words are all kept
+        for phrase, count in keywords.items():
+            self.assertLessEqual(count, expected[phrase])
+        for phrase, _ in expected.most_common(3):
+            self.assertIn(phrase, keywords)
+    
+    def test_update_keeps_count_bounds(self):
+        rng = random.Random(1)
+        batches = [Counter(rng.choices(range(50), k=100)) for _ in range(5)]
+        batched, single = SpaceSavingCounter(capacity=8), SpaceSavingCounter(capacity=8)
+        for batch in batches:
+            batched.update(batch)
+            for key, count in batch.items():
+                single.add(key, count)
+        
+        self.assertEqual(batched.total, single.total)
+        totals = sum(batches, Counter())
+        for sketch in (batched, single):
+            for key, lower in ((key, count) for key, count, _ in sketch.most_common()):
+                low, high = sketch.estimate(key)
+                self.assertEqual(low, lower)
+                self.assertLessEqual(low, totals[key])
+                self.assertGreaterEqual(high, totals[key])
+
+if __name__ == "__main__":
+    unittest.main()
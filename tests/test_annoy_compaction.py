@@ -0,0 +1,71 @@
+"""
+Tests for background compaction of the Annoy store's segments.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kb_test_utils import make_store, book_text
+
+def segment_files(store) -> set:
+    """Get the segment index files on disk."""
+    return {name for name in os.listdir(store.base_path) if name.endswith(".annoy")}
+
+class AnnoyCompactionTests(unittest.TestCase):
+    """Compaction runs safely next to adds and deletes."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def test_compaction_alongside_adds_and_deletes(self):
+        from knowledge_base.vector_stores import annoy_store
+        
+        store = make_store("annoy", self.root, buffer_size=4, max_segments=2, background_compaction=True)
+        with patch.object(annoy_store, "logger") as logger:
+            for round_number in range(30):
+                store.add_document(f"d{round_number}", book_text(3, seed=round_number))
+                if round_number % 3 == 2:
+                    store.delete_document(f"d{round_number - 1}")
+            store._wait_for_compaction()
+        
+        logger.error.assert_not_called()
+        self.assertEqual(segment_files(store), {segment.name for segment in store._segments})
+        
+        expected = sum(
+            len(store.chunk_document_text(f"d{i}", book_text(3, seed=i)))
+            for i in range(30) if i % 3 != 1
+        )
+        self.assertEqual(store.count(), expected)
+        store.close()
+    
+    def test_failed_compaction_removes_merged_segment(self):
+        store = make_store("annoy", self.root, buffer_size=4, max_segments=100, background_compaction=False)
+        for i in range(4):
+            store.add_document(f"d{i}", book_text(3, seed=i))
+        store._seal_buffer()
+        segments = list(store._segments)
+        self.assertGreater(len(segments), 1)
+        
+        # Fail when the merged segment is recorded in the manifest
+        set_value = store.metadata_store.set_value
+        def fail_on_manifest(key, value):
+            if key == "segments":
+                raise OSError("disk full")
+            set_value(key, value)
+        
+        with patch.object(store.metadata_store, "set_value", side_effect=fail_on_manifest):
+            store._compact_segments(segments)
+        
+        # The old segments stay in use and the merged segment's files are gone
+        self.assertEqual(store._segments, segments)
+        self.assertEqual(segment_files(store), {segment.name for segment in segments})
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Tests for listing and searching books in BookManager.
+"""
+
+import sqlite3
+import unittest
+
+from db_test_utils import BookDatabaseTestCase
+
+class BookQueryTests(BookDatabaseTestCase):
+    """Books come back with their categories, one page at a time."""
+    
+    def setUp(self):
+        super().setUp()
+        self.ids = {
+            "Dune": self.add_book("Dune", "Spice.", ["Fiction", "Classics"]),
+            "Algorithms": self.add_book("Algorithms", "Sorting.", ["Computing"]),
+            "Emma": self.add_book("Emma", "Matchmaking.", ["Fiction"]),
+            "Biology": self.add_book("Biology", "Cells.", []),
+            "Cosmos": self.add_book("Cosmos", "Stars.", ["Science", "Classics"])
+        }
+    
+    def titles(self, books):
+        return [book["title"] for book in books]
+    
+    def test_query_returns_categories(self):
+        self.conn.row_factory = sqlite3.Row
+        books = self.book_manager._query_books(self.conn.cursor())
+        
+        self.assertEqual(self.titles(books), ["Algorithms", "Biology", "Cosmos", "Dune", "Emma"])
+        categories = {book["title"]: sorted(book["categories"]) for book in books}
+        self.assertEqual(categories["Dune"], ["Classics", "Fiction"])
+        self.assertEqual(categories["Biology"], [])
+        self.assertEqual(books[0]["id"], self.ids["Algorithms"])
+        self.assertEqual(set(books[0]), {"id", "title", "author", "file_path", "date_added", "categories"})
+    
+    def test_limit_and_offset(self):
+        self.conn.row_factory = sqlite3.Row
+        cursor = self.conn.cursor()
+        
+        self.assertEqual(self.titles(self.book_manager._query_books(cursor, limit=2)), ["Algorithms", "Biology"])
+        self.assertEqual(self.titles(self.book_manager._query_books(cursor, limit=2, offset=2)), ["Cosmos", "Dune"])
+        self.assertEqual(self.titles(self.book_manager._query_books(cursor, offset=3)), ["Dune", "Emma"])
+        self.assertEqual(self.book_manager._query_books(cursor, limit=2, offset=5), [])
+        
+        # Pages of the public listing line up with the full listing
+        pages = [self.book_manager.get_all_books(limit=2, offset=offset) for offset in (0, 2, 4)]
+        self.assertEqual(sum(pages, []), self.book_manager.get_all_books())
+    
+    def test_search_pages_keep_all_categories(self):
+        classics = self.book_manager.search_books(category="Classics", limit=1, offset=1)
+        self.assertEqual(self.titles(classics), ["Dune"])
+        self.assertEqual(sorted(classics[0]["categories"]), ["Classics", "Fiction"])
+        
+        self.assertEqual(self.titles(self.book_manager.search_books("m", limit=2)), ["Algorithms", "Cosmos"])
+        self.assertEqual(self.titles(self.book_manager.search_books("m", limit=2, offset=2)), ["Emma"])
+        self.assertEqual(self.titles(self.book_manager.search_books("m", category="Fiction")), ["Emma"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for chunk offsets and page numbers.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_test_utils import make_store, book_text
+
+from core.config import PAGE_BREAK
+from document_processing.formats.pdf import join_pages
+from knowledge_base.chunking import chunk_document
+
+class ChunkPageTests(unittest.TestCase):
+    """Chunks point back at their text and the page it starts on."""
+    
+    def setUp(self):
+        # Page 3 has no text
+        self.pages = [
+            book_text(4, seed=1).replace("\n\n", " "),
+            book_text(3, seed=2).replace("\n\n", " "),
+            "",
+            book_text(2, seed=3).replace("\n\n", " ")
+        ]
+        self.text = join_pages(self.pages)
+    
+    def expected_page(self, offset):
+        return self.text.count(PAGE_BREAK, 0, offset) + 1
+    
+    def test_join_pages_keeps_empty_pages(self):
+        self.assertEqual(self.text.count(PAGE_BREAK), len(self.pages) - 1)
+        self.assertEqual(join_pages(["", " "]), "")
+    
+    def test_offsets_and_pages(self):
+        chunks = chunk_document({"id": "b1", "text": self.text}, chunk_size=300, chunk_overlap=40)
+        
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            self.assertEqual(self.text[metadata["start_char"]:metadata["end_char"]], chunk["text"])
+            self.assertEqual(metadata["page"], self.expected_page(metadata["start_char"]))
+        
+        pages = {chunk["metadata"]["page"] for chunk in chunks}
+        self.assertEqual(pages, {1, 2, 4})
+    
+    def test_text_without_page_breaks_is_one_page(self):
+        text = book_text(10)
+        chunks = chunk_document({"id": "b1", "text": text}, chunk_size=300, chunk_overlap=40)
+        
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual({chunk["metadata"]["page"] for chunk in chunks}, {1})
+        for chunk in chunks:
+            self.assertEqual(text[chunk["metadata"]["start_char"]:chunk["metadata"]["end_char"]], chunk["text"])
+    
+    def test_indexed_chunks_keep_pages(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        store = make_store("simple", root)
+        self.addCleanup(store.close)
+        
+        store.add_document("b1", self.text, chunk_size=300, chunk_overlap=40)
+        
+        rows = store.get(where={"document_id": "b1"})
+        pages = [metadata["page"] for metadata in rows["metadatas"]]
+        self.assertEqual(
+            pages,
+            [self.expected_page(metadata["start_char"]) for metadata in rows["metadatas"]]
+        )
+        self.assertIn(4, pages)
+
+if __name__ == "__main__":
+    unittest.main()
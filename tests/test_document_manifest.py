@@ -0,0 +1,46 @@
+"""
+Tests for the document manifest kept next to the vector stores.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_test_utils import STORE_TYPES, make_store, book_text
+
+class DocumentManifestTests(unittest.TestCase):
+    """Document IDs keep their type through the manifest."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def test_int_document_id_round_trip(self):
+        """Book IDs are integers and must come back as integers."""
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                root = os.path.join(self.root, store_type)
+                store = make_store(store_type, root)
+                store.add_document(7, book_text(5), {"title": "Seven"})
+                store.add_document("b1", book_text(5, seed=1))
+                
+                self.assertEqual(store.list_document_ids(), [7, "b1"])
+                self.assertEqual(store.list_documents()[0]["id"], 7)
+                self.assertIn(7, store.list_document_ids())
+                self.assertGreater(len(store.get(where={"document_id": 7})["ids"]), 0)
+                
+                store.close()
+                
+                # The type survives a reopen
+                store = make_store(store_type, root)
+                self.assertEqual(store.list_document_ids(), [7, "b1"])
+                self.assertTrue(store.delete_document(7))
+                self.assertEqual(store.get(where={"document_id": 7})["ids"], [])
+                self.assertEqual(store.list_document_ids(), ["b1"])
+                store.close()
+
+if __name__ == "__main__":
+    unittest.main()
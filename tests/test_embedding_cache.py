@@ -0,0 +1,133 @@
+"""
+Tests for the persistent embedding cache.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path to import application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+
+class FakeModel:
+    """Embedding model recording the texts it is asked to embed."""
+    
+    def __init__(self, model_name="fake-model", drop_last=False):
+        self.model_name = model_name
+        self.drop_last = drop_last
+        self.calls = []
+    
+    @staticmethod
+    def vector(text):
+        # Small integers, exact in float32
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0, -2.0]
+    
+    def __call__(self, texts):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return self.vector(texts)
+        vectors = [self.vector(text) for text in texts]
+        return vectors[:-1] if self.drop_last and len(vectors) > 1 else vectors
+
+class EmbeddingCacheTests(unittest.TestCase):
+    """Vectors are stored once, read back after reopening, and sharded."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = EmbeddingCache(self.root, shard_rows=3)
+    
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def shard_rows(self, model="fake-model"):
+        return self.cache._conn.execute(
+            "SELECT rows FROM embedding_shards WHERE model = ? ORDER BY shard", (model,)
+        ).fetchall()
+    
+    def test_only_misses_reach_the_model(self):
+        model = FakeModel()
+        embed = CachedEmbeddingFunction(model, self.cache)
+        
+        self.assertEqual(embed(["a", "bb", "a"]), [FakeModel.vector(text) for text in ["a", "bb", "a"]])
+        self.assertEqual(embed(["bb", "ccc", "a"]), [FakeModel.vector(text) for text in ["bb", "ccc", "a"]])
+        self.assertEqual(embed("ccc"), FakeModel.vector("ccc"))
+        self.assertEqual(embed("dddd"), FakeModel.vector("dddd"))
+        
+        self.assertEqual(model.calls, [["a", "bb"], ["ccc"], "dddd"])
+        self.assertEqual(len(self.cache), 4)
+    
+    def test_shards_roll_over(self):
+        texts = [f"text {i}" for i in range(8)]
+        vectors = [FakeModel.vector(text) for text in texts]
+        
+        self.assertEqual(self.cache.put_many("fake-model", texts[:2], vectors[:2]), 2)
+        self.assertEqual(self.cache.put_many("fake-model", texts[1:], vectors[1:]), 6)
+        
+        self.assertEqual(self.shard_rows(), [(3,), (3,), (2,)])
+        shard_files = [name for name in os.listdir(self.root) if name.endswith(".f32")]
+        self.assertEqual(len(shard_files), 3)
+        read = self.cache.get_many("fake-model", texts + ["missing"])
+        self.assertEqual([vector.tolist() for vector in read[:-1]], vectors)
+        self.assertIsNone(read[-1])
+    
+    def test_reopen_reads_and_appends(self):
+        texts = [f"text {i}" for i in range(5)]
+        self.cache.put_many("fake-model", texts, [FakeModel.vector(text) for text in texts])
+        self.cache.put_many("other-model", texts[:1], [[9.0, 9.0]])
+        self.cache.close()
+        
+        self.cache = EmbeddingCache(self.root, shard_rows=3)
+        self.assertEqual(len(self.cache), 6)
+        self.assertEqual(
+            [vector.tolist() for vector in self.cache.get_many("fake-model", texts)],
+            [FakeModel.vector(text) for text in texts]
+        )
+        self.assertEqual(self.cache.get_many("other-model", texts[:1])[0].tolist(), [9.0, 9.0])
+        
+        # New vectors fill the open shard without overwriting the saved ones
+        self.cache.put_many("fake-model", ["text 5"], [FakeModel.vector("text 5")])
+        self.assertEqual(self.shard_rows(), [(3,), (3,)])
+        self.assertEqual(
+            [vector.tolist() for vector in self.cache.get_many("fake-model", texts + ["text 5"])],
+            [FakeModel.vector(text) for text in texts + ["text 5"]]
+        )
+        
+        self.cache.clear("fake-model")
+        self.assertEqual(self.cache.stats(), {"vector_count": 1, "models": {"other-model": 1}})
+    
+    def test_invalid_vectors_are_not_stored(self):
+        written = self.cache.put_many("fake-model", ["a", "b", "c"], [None, [float("nan"), 1.0], [1.0, 2.0]])
+        
+        self.assertEqual(written, 1)
+        self.assertEqual([vector is None for vector in self.cache.get_many("fake-model", ["a", "b", "c"])], [True, True, False])
+    
+    def test_mismatched_batch_falls_back_to_the_model(self):
+        model = FakeModel(drop_last=True)
+        embed = CachedEmbeddingFunction(model, self.cache)
+        embed(["a"])
+        model.calls.clear()
+        
+        # The model returns one vector too few: the whole list is embedded again, nothing is cached
+        result = embed(["a", "bb", "ccc"])
+        
+        self.assertEqual(model.calls, [["bb", "ccc"], ["a", "bb", "ccc"]])
+        self.assertEqual(result, [FakeModel.vector(text) for text in ["a", "bb"]])
+        self.assertEqual(len(self.cache), 1)
+    
+    def test_models_without_a_name_bypass_the_cache(self):
+        model = FakeModel(model_name=None)
+        embed = CachedEmbeddingFunction(model, self.cache)
+        
+        embed(["a", "a"])
+        embed(["a"])
+        
+        self.assertEqual(model.calls, [["a", "a"], ["a"]])
+        self.assertEqual(len(self.cache), 0)
+
+if __name__ == "__main__":
+    unittest.main()
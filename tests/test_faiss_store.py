@@ -0,0 +1,200 @@
+"""
+Tests for the FAISS vector store.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_test_utils import make_store, book_text, embedding_function
+
+from knowledge_base.config import (
+    FAISS_INDEX_TYPES, DEFAULT_FAISS_TRAIN_POINTS_PER_LIST, DEFAULT_FAISS_TOMBSTONE_RATIO
+)
+
+class FAISSDeleteTests(unittest.TestCase):
+    """Deletes remove vectors by label and keep the other rows intact."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.embedded = []
+        embed = embedding_function()
+        
+        def counting_embed(texts):
+            self.embedded.extend(texts)
+            return embed(texts)
+        
+        self.embed = counting_embed
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def open_store(self):
+        return make_store("faiss", self.root, embedding_function=self.embed)
+    
+    def test_delete_removes_by_label_without_reembedding(self):
+        store = self.open_store()
+        texts = {f"b{i}": book_text(6, seed=i) for i in range(1, 5)}
+        for document_id, text in texts.items():
+            store.add_document(document_id, text)
+        before = {document_id: store.get(where={"document_id": document_id}) for document_id in texts}
+        query = before["b3"]["documents"][1]
+        hits_before = [(hit["id"], hit["text"]) for hit in store.search(query, 3, where={"document_id": "b3"})]
+        ntotal = store.index.ntotal
+        self.embedded.clear()
+        
+        self.assertTrue(store.delete_document("b2"))
+        self.assertTrue(store.delete(ids=[before["b4"]["ids"][0]]))
+        
+        self.assertEqual(self.embedded, [])
+        self.assertEqual(store.index.ntotal, ntotal - len(before["b2"]["ids"]) - 1)
+        self.assertEqual(store.get(where={"document_id": "b2"})["ids"], [])
+        
+        # The remaining rows still line up with their labels, IDs and texts, in insertion order
+        expected = {
+            "b1": before["b1"],
+            "b3": before["b3"],
+            "b4": {key: values[1:] for key, values in before["b4"].items()}
+        }
+        for document_id, rows in expected.items():
+            self.assertEqual(store.get(where={"document_id": document_id}), rows)
+            self.assertEqual(store.get(ids=rows["ids"]), rows)
+        self.assertEqual(
+            store.get()["ids"],
+            expected["b1"]["ids"] + expected["b3"]["ids"] + expected["b4"]["ids"]
+        )
+        for label, row in store._label_to_row.items():
+            self.assertEqual(store.metadata["labels"][row], label)
+            self.assertIn(row, store._id_to_rows[store.metadata["ids"][row]])
+        
+        hits = [(hit["id"], hit["text"]) for hit in store.search(query, 3, where={"document_id": "b3"})]
+        self.assertEqual(hits, hits_before)
+        store.close()
+        
+        # Reopening reads the same rows back
+        reopened = self.open_store()
+        for document_id, rows in expected.items():
+            self.assertEqual(reopened.get(where={"document_id": document_id}), rows)
+        reopened.close()
+
+class FAISSIndexTypeTests(unittest.TestCase):
+    """Each index type trains, searches, persists and migrates correctly."""
+    
+    # Small IVF settings: 4 cells need 4 * 39 vectors, 4-bit PQ needs 16 * 39
+    PARAMS = {"nlist": 4, "nprobe": 4, "pq_m": 8, "pq_nbits": 4}
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.texts = book_text(720).split("\n\n")
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def open_store(self, index_type, **kwargs):
+        return make_store("faiss", os.path.join(self.root, index_type), index_type=index_type, **{**self.PARAMS, **kwargs})
+    
+    def add(self, store, start, end):
+        store.add_texts(
+            self.texts[start:end],
+            [{"group": i % 3} for i in range(start, end)],
+            [f"t{i}" for i in range(start, end)]
+        )
+    
+    def kind(self, store):
+        return store._index_kind(store._cpu_index())
+    
+    def test_ivf_is_trained_once_enough_vectors_exist(self):
+        store = self.open_store("ivf_flat")
+        threshold = store._train_threshold()
+        self.assertEqual(threshold, 4 * DEFAULT_FAISS_TRAIN_POINTS_PER_LIST)
+        
+        self.add(store, 0, threshold - 1)
+        self.assertEqual(self.kind(store), "flat")
+        
+        self.add(store, threshold - 1, threshold + 10)
+        self.assertEqual(self.kind(store), "ivf_flat")
+        self.assertTrue(store.index.is_trained)
+        self.assertEqual(store.index.ntotal, threshold + 10)
+        self.assertEqual(store.search(self.texts[5], 1)[0]["text"], self.texts[5])
+        store.close()
+    
+    def test_filtered_search_on_each_index_type(self):
+        for index_type in FAISS_INDEX_TYPES:
+            with self.subTest(index_type=index_type):
+                store = self.open_store(index_type)
+                self.add(store, 0, 700)
+                self.assertEqual(self.kind(store), index_type)
+                
+                hits = store.search(self.texts[10], 5, where={"group": 1})
+                self.assertEqual(len(hits), 5)
+                self.assertTrue(all(hit["metadata"]["group"] == 1 for hit in hits))
+                self.assertEqual(hits[0]["id"], "t10")
+                
+                batches = store.search_batch([self.texts[10], self.texts[11]], 3, where={"group": 2})
+                self.assertTrue(all(hit["metadata"]["group"] == 2 for hits in batches for hit in hits))
+                self.assertEqual(batches[1][0]["id"], "t11")
+                store.close()
+    
+    def test_hnsw_tombstones_are_compacted(self):
+        store = self.open_store("hnsw")
+        self.add(store, 0, 50)
+        
+        # Deleted vectors stay in the graph until they pass the tombstone ratio
+        store.delete(ids=[f"t{i}" for i in range(5)])
+        self.assertEqual(store.index.ntotal, 50)
+        self.assertEqual(store.count(), 45)
+        hits = store.search(self.texts[2], 10)
+        self.assertFalse({hit["id"] for hit in hits} & {f"t{i}" for i in range(5)})
+        
+        store.delete(ids=[f"t{i}" for i in range(5, 5 + int(50 * DEFAULT_FAISS_TOMBSTONE_RATIO))])
+        self.assertEqual(store.index.ntotal, store.count())
+        self.assertEqual(self.kind(store), "hnsw")
+        self.assertEqual(store.search(self.texts[30], 1)[0]["id"], "t30")
+        store.close()
+    
+    def test_reopen_after_save(self):
+        for index_type in FAISS_INDEX_TYPES:
+            with self.subTest(index_type=index_type):
+                store = self.open_store(index_type)
+                self.add(store, 0, 700)
+                store.delete(ids=["t3"])
+                expected = [hit["id"] for hit in store.search(self.texts[20], 5)]
+                store.close()
+                
+                reopened = self.open_store(index_type)
+                self.assertEqual(self.kind(reopened), index_type)
+                self.assertEqual(reopened.count(), 699)
+                self.assertEqual([hit["id"] for hit in reopened.search(self.texts[20], 5)], expected)
+                
+                # New vectors continue after the saved labels
+                self.add(reopened, 700, 701)
+                self.assertEqual(reopened.search(self.texts[700], 1)[0]["id"], "t700")
+                reopened.close()
+    
+    def test_migrate_index(self):
+        store = self.open_store("flat")
+        self.add(store, 0, 300)
+        expected = [hit["id"] for hit in store.search(self.texts[40], 5)]
+        
+        self.assertTrue(store.migrate_index("ivf_flat"))
+        self.assertEqual(self.kind(store), "ivf_flat")
+        self.assertEqual([hit["id"] for hit in store.search(self.texts[40], 5)], expected)
+        
+        self.assertTrue(store.migrate_index("hnsw"))
+        self.assertEqual(self.kind(store), "hnsw")
+        self.assertEqual(store.search(self.texts[40], 1)[0]["id"], "t40")
+        
+        # Too few vectors to train IVF-PQ: stay flat until there are enough
+        self.assertTrue(store.migrate_index("ivf_pq"))
+        self.assertEqual(store.index_type, "ivf_pq")
+        self.assertEqual(self.kind(store), "flat")
+        self.add(store, 300, 700)
+        self.assertEqual(self.kind(store), "ivf_pq")
+        
+        self.assertFalse(store.migrate_index("unknown"))
+        self.assertEqual(store.count(), 700)
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()
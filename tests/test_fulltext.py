@@ -0,0 +1,107 @@
+"""
+Tests for the full-text index of book contents.
+"""
+
+import sqlite3
+import unittest
+
+from db_test_utils import BookDatabaseTestCase
+
+from database.fulltext import FTS_TABLE, build_match_query, search_fulltext
+
+class FulltextSyncTests(BookDatabaseTestCase):
+    """Triggers keep the index in sync with book_contents."""
+    
+    def book_ids(self, query):
+        return [result["book_id"] for result in search_fulltext(self.conn, query)]
+    
+    def assert_index_matches_contents(self):
+        # Fails if the index holds terms that book_contents no longer has
+        self.conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)")
+    
+    def test_index_follows_content_changes(self):
+        weevil = self.add_book("Weevils", "The zyzzyva is a weevil found in tropical America.")
+        quokka = self.add_book("Quokkas", "A quokka smiles at the camera all day.")
+        self.assertEqual(self.book_ids("zyzzyva"), [weevil])
+        self.assertEqual(self.book_ids("quokka"), [quokka])
+        
+        self.conn.execute(
+            "UPDATE book_contents SET content = ? WHERE book_id = ?",
+            ("The aardvark digs for termites at night.", weevil)
+        )
+        self.assertEqual(self.book_ids("zyzzyva"), [])
+        self.assertEqual(self.book_ids("aardvark"), [weevil])
+        
+        # REPLACE deletes the old row first; its delete trigger only fires with recursive_triggers
+        self.conn.execute(
+            "INSERT OR REPLACE INTO book_contents (book_id, content) VALUES (?, ?)",
+            (quokka, "A numbat eats termites too.")
+        )
+        self.assertEqual(self.book_ids("quokka"), [])
+        self.assertEqual(self.book_ids("numbat"), [quokka])
+        self.assertEqual(sorted(self.book_ids("termites")), sorted([weevil, quokka]))
+        self.assert_index_matches_contents()
+        self.conn.commit()
+        
+        # Deleting a book cascades to its contents and from there to the index
+        self.book_manager.delete_book(weevil)
+        self.assertEqual(self.book_ids("aardvark"), [])
+        self.assertEqual(self.book_ids("termites"), [quokka])
+        self.assert_index_matches_contents()
+
+class MatchQueryTests(BookDatabaseTestCase):
+    """User input is quoted word by word before it reaches MATCH."""
+    
+    def test_operators_and_punctuation_are_quoted(self):
+        self.assertEqual(
+            build_match_query('NEAR(" col:umn) OR -x* ^start'),
+            '"NEAR" AND "col" AND "umn" AND "OR" AND "x"* AND "start"'
+        )
+        self.assertEqual(build_match_query("alpha beta*", match_all=False), '"alpha" OR "beta"*')
+        self.assertEqual(build_match_query('*** "" ()'), "")
+    
+    def test_hostile_queries_run(self):
+        book_id = self.add_book("Operators", "Pages of NEAR and OR operators: col:umn \"quoted\" (group) *star*")
+        
+        for query in ['NEAR(', '"', 'col:umn', 'a OR', 'AND NOT', '(group', 'star*', "'; DROP TABLE books; --"]:
+            with self.subTest(query=query):
+                try:
+                    search_fulltext(self.conn, query)
+                except sqlite3.OperationalError as e:
+                    self.fail(f"{query!r} raised {e}")
+        
+        self.assertEqual([result["book_id"] for result in search_fulltext(self.conn, "(group")], [book_id])
+        self.assertEqual([result["book_id"] for result in search_fulltext(self.conn, "col:umn")], [book_id])
+        self.assertEqual(search_fulltext(self.conn, "*"), [])
+
+class FulltextPaginationTests(BookDatabaseTestCase):
+    """Pages of results partition the ranking and carry highlighted snippets."""
+    
+    def test_pages_partition_the_ranking(self):
+        filler = "plain words about gardens rivers and mountains " * 3
+        for i in range(1, 6):
+            self.add_book(f"Book {i}", f"{filler} {'needle ' * i} {filler}")
+        self.add_book("Unrelated", filler)
+        
+        ranking = search_fulltext(self.conn, "needle", limit=10)
+        self.assertEqual(len(ranking), 5)
+        scores = [result["score"] for result in ranking]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        
+        pages = [search_fulltext(self.conn, "needle", limit=2, offset=offset) for offset in (0, 2, 4, 6)]
+        self.assertEqual([len(page) for page in pages], [2, 2, 1, 0])
+        self.assertEqual(
+            [result["book_id"] for page in pages for result in page],
+            [result["book_id"] for result in ranking]
+        )
+        
+        for result in ranking:
+            self.assertIn("<mark>needle</mark>", result["snippet"])
+            self.assertEqual(result["title"], f"Book {result['book_id']}")
+        
+        snippet = search_fulltext(self.conn, "needle", limit=1, snippet_tokens=4, highlight_start="[", highlight_end="]")[0]["snippet"]
+        self.assertIn("[needle]", snippet)
+        self.assertLessEqual(len(snippet.replace("...", "").split()), 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests for re-indexing a changed document chunk by chunk.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from kb_test_utils import STORE_TYPES, make_store, book_text
+
+class IncrementalUpdateTests(unittest.TestCase):
+    """Only chunks whose text changed are embedded again."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.text = book_text(40)
+        self.metadata = {"title": "Book", "author": "Author"}
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def index_book(self, store_type: str):
+        """Open a fresh store of the given type with the book indexed."""
+        store = make_store(store_type, os.path.join(self.root, store_type))
+        store.add_document("book", self.text, self.metadata)
+        return store
+    
+    def test_identical_text_is_unchanged(self):
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                store = self.index_book(store_type)
+                chunk_count = store.count()
+                counts = store.update_document("book", self.text, self.metadata)
+                
+                self.assertEqual(counts, {"added": 0, "moved": 0, "removed": 0, "unchanged": chunk_count})
+                self.assertEqual(store.count(), chunk_count)
+                store.close()
+    
+    def test_inserted_paragraph(self):
+        paragraphs = self.text.split("\n\n")
+        paragraphs.insert(20, book_text(1, seed=99).replace("paragraph 0.", "an inserted paragraph."))
+        new_text = "\n\n".join(paragraphs)
+        
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                store = self.index_book(store_type)
+                old_chunks = store.chunk_document_text("book", self.text, self.metadata)
+                new_chunks = store.chunk_document_text("book", new_text, self.metadata)
+                old_hashes = Counter(chunk["metadata"]["content_hash"] for chunk in old_chunks)
+                new_hashes = Counter(chunk["metadata"]["content_hash"] for chunk in new_chunks)
+                
+                counts = store.update_document("book", new_text, self.metadata)
+                
+                # Only the chunks around the insertion are embedded again; the
+                # others are kept, with new metadata as the chunk count changed
+                self.assertEqual(counts["added"], sum((new_hashes - old_hashes).values()))
+                self.assertEqual(counts["removed"], sum((old_hashes - new_hashes).values()))
+                self.assertGreater(counts["added"], 0)
+                self.assertGreater(counts["moved"], 0)
+                self.assertEqual(counts["added"] + counts["moved"] + counts["unchanged"], len(new_chunks))
+                
+                self.assertEqual(store.count(), len(new_chunks))
+                self.assertEqual(
+                    store.get(where={"document_id": "book"})["documents"].count(new_chunks[-1]["text"]),
+                    1
+                )
+                self.assertEqual(store.manifest.get("book")["chunk_count"], len(new_chunks))
+                store.close()
+    
+    def test_metadata_change_moves_every_chunk(self):
+        metadata = {**self.metadata, "title": "Renamed Book"}
+        
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                store = self.index_book(store_type)
+                chunk_count = store.count()
+                counts = store.update_document("book", self.text, metadata)
+                
+                self.assertEqual(counts, {"added": 0, "moved": chunk_count, "removed": 0, "unchanged": 0})
+                titles = {chunk["title"] for chunk in store.get(where={"document_id": "book"})["metadatas"]}
+                self.assertEqual(titles, {"Renamed Book"})
+                
+                # Vectors were kept, so the chunks are still found
+                results = store.search(self.text[:200], 1, where={"title": "Renamed Book"})
+                self.assertEqual(results[0]["metadata"]["document_id"], "book")
+                store.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Tests for cancelling ingestion jobs around the index stage.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from kb_test_utils import embedding_function, book_text
+
+class FakeBookManager:
+    """Book manager serving generated books."""
+    
+    def get_book(self, book_id):
+        return {"id": book_id, "title": f"Book {book_id}", "author": "Author"}
+    
+    def get_book_content(self, book_id):
+        return book_text(8, seed=book_id)
+
+class IngestionCancellationTests(unittest.TestCase):
+    """A cancelled job never changes the index; a job writing to it completes."""
+    
+    def setUp(self):
+        from knowledge_base.ingestion import IngestionQueue
+        from knowledge_base.vector_store import VectorStore
+        
+        self.root = tempfile.mkdtemp()
+        self.kb = VectorStore(
+            base_path=os.path.join(self.root, "vectors"),
+            data_path=os.path.join(self.root, "data"),
+            embedding_function=embedding_function(),
+            vector_store_type="simple",
+            use_gpu=False
+        )
+        self.queue = IngestionQueue(
+            self.kb,
+            FakeBookManager(),
+            path=os.path.join(self.root, "ingestion.db"),
+            work_dir=os.path.join(self.root, "jobs"),
+            max_workers=1
+        )
+    
+    def tearDown(self):
+        self.queue.close()
+        self.kb.vector_store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def wait_for_stage(self, job_id, stage):
+        deadline = time.monotonic() + 10
+        while self.queue.get_job(job_id)["stage"] != stage and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.queue.get_job(job_id)["stage"], stage)
+    
+    def test_cancel_while_waiting_for_index_lock(self):
+        # The job finishes embedding, then waits for the index lock held here
+        with self.queue._index_lock:
+            job_id = self.queue.enqueue(1)
+            self.wait_for_stage(job_id, "embed")
+            time.sleep(0.2)
+            self.assertTrue(self.queue.cancel_job(job_id))
+        
+        # The single worker takes the next job once it is done with the cancelled one
+        next_job_id = self.queue.enqueue(2)
+        self.assertTrue(self.queue.wait([next_job_id], timeout=30))
+        self.assertEqual(self.queue.get_job(job_id)["status"], "cancelled")
+        self.assertEqual(self.kb.vector_store.get(where={"document_id": 1})["ids"], [])
+    
+    def test_cancel_while_indexing_is_refused(self):
+        store = self.kb.vector_store
+        indexing = threading.Event()
+        release = threading.Event()
+        update_document_chunks = store.update_document_chunks
+        
+        def slow_update(*args, **kwargs):
+            indexing.set()
+            release.wait(10)
+            return update_document_chunks(*args, **kwargs)
+        
+        with patch.object(store, "update_document_chunks", slow_update):
+            job_id = self.queue.enqueue(1)
+            self.assertTrue(indexing.wait(10))
+            self.assertFalse(self.queue.cancel_job(job_id))
+            release.set()
+            self.assertTrue(self.queue.wait([job_id], timeout=30))
+        
+        self.assertEqual(self.queue.get_job(job_id)["status"], "completed")
+        self.assertTrue(store.get(where={"document_id": 1})["ids"])
+
+if __name__ == "__main__":
+    unittest.main()
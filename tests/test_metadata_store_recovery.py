@@ -0,0 +1,107 @@
+"""
+Tests for reopening FAISS and Annoy stores after a crash between committing
+chunk rows and saving the index.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from kb_test_utils import make_store, book_text
+
+def abandon(store) -> None:
+    """Release a store's files without saving, as if the process had died."""
+    store.metadata_store.close()
+    store.sparse_index.close()
+    store.manifest.close()
+
+class MetadataStoreRecoveryTests(unittest.TestCase):
+    """Rows whose vectors were never saved are skipped on reopen, not deleted."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def test_reopen_after_crash_with_unsaved_rows(self):
+        for store_type in ["faiss", "annoy"]:
+            with self.subTest(store_type=store_type):
+                root = os.path.join(self.root, store_type)
+                store = make_store(store_type, root)
+                store.add_document("a", book_text(6, seed=1))
+                saved = store.get(where={"document_id": "a"})
+                
+                # Rows of "b" reach SQLite but the index is never saved
+                store._saves_deferred = True
+                store.add_document("b", book_text(6, seed=2))
+                abandon(store)
+                
+                store = make_store(store_type, root)
+                self.assertEqual(store.count(), len(saved["ids"]))
+                self.assertEqual(store.get(where={"document_id": "b"})["ids"], [])
+                self.assertGreater(len(store.metadata_store), store.count())
+                if store_type == "faiss":
+                    self.assertEqual(store.index.ntotal, store.count())
+                
+                # New rows get fresh labels instead of overwriting rows or reusing vectors
+                store.add_document("c", book_text(6, seed=3))
+                self.assertEqual(len(store.metadata["labels"]), len(set(store.metadata["labels"])))
+                self.assertEqual(store.get(where={"document_id": "a"})["documents"], saved["documents"])
+                
+                expected = store.chunk_document_text("c", book_text(6, seed=3))
+                self.assertEqual(
+                    store.get(where={"document_id": "c"})["documents"],
+                    [chunk["text"] for chunk in expected]
+                )
+                
+                results = store.search(expected[0]["text"], 1, where={"document_id": "c"})
+                self.assertEqual(results[0]["metadata"]["document_id"], "c")
+                store.close()
+    
+    def test_opening_during_deferred_saves_keeps_rows(self):
+        """A second instance opening mid-write must not drop the writer's rows."""
+        for store_type in ["faiss", "annoy"]:
+            with self.subTest(store_type=store_type):
+                root = os.path.join(self.root, store_type)
+                writer = make_store(store_type, root)
+                writer.add_document("b1", book_text(6, seed=1))
+                
+                with writer.deferred_saves():
+                    writer.add_document("b2", book_text(6, seed=2))
+                    
+                    # Another session opens the store before the writer saved its index
+                    reader = make_store(store_type, root)
+                    self.assertEqual(reader.get(where={"document_id": "b2"})["ids"], [])
+                    reader.close()
+                
+                expected = writer.count()
+                writer.close()
+                
+                store = make_store(store_type, root)
+                self.assertEqual(store.count(), expected)
+                chunks = store.chunk_document_text("b2", book_text(6, seed=2))
+                self.assertEqual(
+                    store.get(where={"document_id": "b2"})["documents"],
+                    [chunk["text"] for chunk in chunks]
+                )
+                results = store.search(chunks[0]["text"], 1, where={"document_id": "b2"})
+                self.assertEqual(results[0]["metadata"]["document_id"], "b2")
+                self.assertIn("b2", store.list_document_ids())
+                store.close()
+    
+    def test_label_collision_raises(self):
+        """A reused label is an error, not a silent overwrite."""
+        from knowledge_base.vector_stores.metadata_store import ChunkMetadataStore
+        
+        metadata_store = ChunkMetadataStore(os.path.join(self.root, "metadata.sqlite"))
+        metadata_store.append([0], ["x_0"], ["first"], [{}])
+        with self.assertRaises(sqlite3.IntegrityError):
+            metadata_store.append([0], ["y_0"], ["second"], [{}])
+        self.assertEqual(metadata_store.get_text(0), "first")
+        metadata_store.close()
+
+if __name__ == "__main__":
+    unittest.main()
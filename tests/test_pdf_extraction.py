@@ -0,0 +1,47 @@
+"""
+Tests for parallel PDF text extraction and its serial fallback.
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def fake_page_range(file_path, start, end):
+    """Stand-in for a worker extracting a page range."""
+    return [(f"page {i + 1}", "ok", []) for i in range(start, end)]
+
+def hung_page_range(file_path, start, end):
+    """Stand-in for a worker stuck on a malformed page."""
+    time.sleep(60)
+    return []
+
+class ParallelPDFExtractionTests(unittest.TestCase):
+    """The process pool returns pages in order or gives up in time."""
+    
+    def setUp(self):
+        from document_processing.formats import pdf
+        
+        self.pdf = pdf
+        self.processor = pdf.PDFProcessor(max_workers=2, parallel_min_pages=0, range_timeout=2)
+    
+    def test_pages_come_back_in_order(self):
+        with patch.object(self.pdf, "_extract_page_range", fake_page_range):
+            results = self.processor._extract_pages_parallel("book.pdf", 20, 2)
+        
+        self.assertEqual([text for text, _, _ in results], [f"page {i + 1}" for i in range(20)])
+    
+    def test_stalled_pool_falls_back(self):
+        started = time.monotonic()
+        with patch.object(self.pdf, "_extract_page_range", hung_page_range):
+            results = self.processor._extract_pages_parallel("book.pdf", 20, 2)
+        
+        self.assertIsNone(results)
+        self.assertLess(time.monotonic() - started, 30)
+
+if __name__ == "__main__":
+    unittest.main()
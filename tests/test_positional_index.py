@@ -0,0 +1,92 @@
+"""
+Tests for the positional index used by in-document search.
+"""
+
+import unittest
+
+from db_test_utils import BookDatabaseTestCase
+
+from database.positional_index import find_phrase_spans, find_term_spans, search_book_text
+from utils.text_processing import highlight_spans
+
+TEXT = "The cat sat. On the mat, the cat -- slept!"
+
+class PhraseLookupTests(BookDatabaseTestCase):
+    """Terms, prefixes and phrases resolve to character spans of the book text."""
+    
+    def setUp(self):
+        super().setUp()
+        self.book_id = self.add_book("Cats", TEXT)
+    
+    def matched(self, query):
+        return [TEXT[start:end] for start, end in find_phrase_spans(self.conn, self.book_id, query).tolist()]
+    
+    def test_terms_and_prefixes(self):
+        self.assertEqual(self.matched("cat"), ["cat", "cat"])
+        self.assertEqual(self.matched("THE"), ["The", "the", "the"])
+        self.assertEqual(self.matched("sl*"), ["slept"])
+        self.assertEqual(self.matched("s*"), ["sat", "slept"])
+        self.assertEqual(self.matched("dog"), [])
+        self.assertEqual(self.matched("..."), [])
+    
+    def test_phrases_span_stopwords_and_punctuation(self):
+        # Stopwords keep their token positions, punctuation has none
+        self.assertEqual(self.matched("on the mat"), ["On the mat"])
+        self.assertEqual(self.matched("the cat"), ["The cat", "the cat"])
+        self.assertEqual(self.matched("sat on"), ["sat. On"])
+        self.assertEqual(self.matched("mat the cat slept"), ["mat, the cat -- slept"])
+        self.assertEqual(self.matched("ca* sl*"), ["cat -- slept"])
+        self.assertEqual(self.matched("cat the"), [])
+    
+    def test_term_spans_for_highlighting(self):
+        spans = find_term_spans(self.conn, self.book_id, [("cat", False), ("sl", True), ("cat", False)])
+        self.assertEqual([TEXT[start:end] for start, end in spans.tolist()], ["cat", "cat", "slept"])
+    
+    def test_books_are_indexed_on_first_use(self):
+        self.conn.execute("INSERT INTO books (title, author) VALUES ('Raw', 'Author')")
+        book_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        self.conn.execute("INSERT INTO book_contents (book_id, content) VALUES (?, ?)", (book_id, "A dog barks."))
+        self.conn.commit()
+        
+        self.assertEqual(find_phrase_spans(self.conn, book_id, "dog barks").tolist(), [[2, 11]])
+        self.assertEqual(
+            self.conn.execute("SELECT token_count FROM book_position_totals WHERE book_id = ?", (book_id,)).fetchone(),
+            (3,)
+        )
+        
+        # Postings go with the book
+        self.book_manager.delete_book(self.book_id)
+        self.assertEqual(
+            self.conn.execute("SELECT COUNT(*) FROM book_term_positions WHERE book_id = ?", (self.book_id,)).fetchone(),
+            (0,)
+        )
+
+class SearchBookTextTests(BookDatabaseTestCase):
+    """Matches are paginated and highlighted inside their context windows."""
+    
+    def test_pagination(self):
+        book_id = self.add_book("Cats", TEXT)
+        
+        matches = search_book_text(self.conn, book_id, "the", context_window=0)
+        self.assertEqual(matches, [("The", 0), ("the", 16), ("the", 25)])
+        self.assertEqual(search_book_text(self.conn, book_id, "the", context_window=0, limit=1, offset=1), [("the", 16)])
+        self.assertEqual(search_book_text(self.conn, book_id, "the", context_window=0, offset=3), [])
+        self.assertEqual(search_book_text(self.conn, book_id, "cat", context_window=4)[0], ("The cat sat", 4))
+    
+    def test_highlights_are_clipped_at_context_edges(self):
+        book_id = self.add_book("Soup", "soupy soup")
+        
+        # Each window cuts into the other match, which is highlighted only up to the edge
+        matches = search_book_text(self.conn, book_id, "soup*", context_window=3, highlight_start="**", highlight_end="**")
+        self.assertEqual(matches, [("**soupy** **so**", 0), ("**py** **soup**", 6)])
+        
+        phrase = search_book_text(self.conn, book_id, "soupy soup", context_window=0, highlight_start="[", highlight_end="]")
+        self.assertEqual(phrase, [("[soupy] [soup]", 0)])
+    
+    def test_highlight_spans(self):
+        self.assertEqual(highlight_spans("abcdef", [(4, 9), (-2, 1), (3, 5)], "[", "]"), "[a]bc[def]")
+        self.assertEqual(highlight_spans("abcdef", [(18, 21), (8, 11), (13, 15), (14, 20)], "[", "]", offset=10), "[a]bc[def]")
+        self.assertEqual(highlight_spans("abcdef", [(6, 8), (2, 2)], "[", "]"), "abcdef")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Tests for the resumable side-by-side knowledge base rebuild.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from kb_test_utils import embedding_function, book_text
+
+class FakeBookManager:
+    """Book manager serving fixed books with integer IDs."""
+    
+    def __init__(self, count: int):
+        self.books = {
+            book_id: {"id": book_id, "title": f"Book {book_id}", "author": "Author"}
+            for book_id in range(1, count + 1)
+        }
+    
+    def get_book(self, book_id):
+        return self.books.get(book_id)
+    
+    def get_book_content(self, book_id):
+        return book_text(8, seed=book_id) if book_id in self.books else None
+
+class Interrupted(Exception):
+    """Raised by the progress callback to simulate a crash."""
+
+class IndexRebuildTests(unittest.TestCase):
+    """An interrupted rebuild resumes from its last checkpoint."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def open_knowledge_base(self, store_type: str):
+        from knowledge_base.vector_store import VectorStore
+        
+        return VectorStore(
+            base_path=os.path.join(self.root, store_type, "vectors"),
+            data_path=os.path.join(self.root, store_type, "data"),
+            embedding_function=embedding_function(),
+            vector_store_type=store_type,
+            use_gpu=False
+        )
+    
+    def build_knowledge_base(self, store_type: str, book_manager: FakeBookManager, book_ids):
+        """Open a knowledge base with some of the manager's books indexed."""
+        kb = self.open_knowledge_base(store_type)
+        for book_id in book_ids:
+            kb.add_document(book_id, book_manager.get_book_content(book_id), book_manager.get_book(book_id))
+        return kb
+    
+    def test_ingestion_waits_for_rebuild(self):
+        from knowledge_base import ingestion
+        from knowledge_base.rebuild import IndexRebuild
+        
+        book_manager = FakeBookManager(6)
+        kb = self.build_knowledge_base("faiss", book_manager, range(1, 6))
+        queue = ingestion.IngestionQueue(
+            kb, book_manager, path=os.path.join(self.root, "ingestion.db"), work_dir=os.path.join(self.root, "jobs")
+        )
+        ingestion._queues[queue.path] = queue
+        self.addCleanup(ingestion._queues.pop, queue.path, None)
+        self.addCleanup(queue.close)
+        
+        # Queue a book mid-rebuild; its job reaches the index stage while the rebuild holds it back
+        job_ids = []
+        def enqueue_during_rebuild(done, total, message):
+            if not job_ids:
+                job_ids.append(queue.enqueue(6))
+                deadline = time.monotonic() + 10
+                while queue.get_job(job_ids[0])["stage"] != "embed" and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                time.sleep(0.2)
+                self.assertEqual(queue.get_job(job_ids[0])["status"], "running")
+        
+        self.assertTrue(IndexRebuild(kb, book_manager, max_workers=2, checkpoint_books=2).run(enqueue_during_rebuild))
+        self.assertTrue(queue.wait(job_ids, timeout=30))
+        self.assertEqual(queue.get_job(job_ids[0])["status"], "completed")
+        
+        # The job indexed into the rebuilt store, not the one that was swapped out
+        self.assertEqual(sorted(kb.vector_store.list_document_ids()), [1, 2, 3, 4, 5, 6])
+        self.assertTrue(kb.vector_store.get(where={"document_id": 6})["ids"])
+        kb.vector_store.close()
+    
+    def test_live_changes_during_rebuild_are_kept(self):
+        from knowledge_base.rebuild import IndexRebuild
+        
+        book_manager = FakeBookManager(6)
+        kb = self.build_knowledge_base("annoy", book_manager, range(1, 6))
+        new_text = book_text(4, seed=42)
+        
+        # Edit, add and remove books in the live store while the rebuild runs
+        def edit_live_store(done, total, message):
+            if done == 2 and book_manager.books[3].get("edited") is None:
+                book_manager.books[3]["edited"] = True
+                book_manager.get_book_content = lambda book_id, original=book_manager.get_book_content: (
+                    new_text if book_id == 3 else original(book_id)
+                )
+                kb.vector_store.update_document(3, new_text, book_manager.get_book(3))
+                kb.add_document(6, book_manager.get_book_content(6), book_manager.get_book(6))
+                kb.vector_store.delete_document(5)
+        
+        self.assertTrue(IndexRebuild(kb, book_manager, max_workers=1, checkpoint_books=1).run(edit_live_store))
+        
+        store = kb.vector_store
+        self.assertEqual(sorted(store.list_document_ids()), [1, 2, 3, 4, 6])
+        expected = store.chunk_document_text(3, new_text, book_manager.get_book(3))
+        self.assertEqual(store.get(where={"document_id": 3})["documents"], [chunk["text"] for chunk in expected])
+        self.assertEqual(store.get(where={"document_id": 5})["ids"], [])
+        store.close()
+    
+    def test_resume_after_interruption(self):
+        from knowledge_base import rebuild
+        from knowledge_base.rebuild import IndexRebuild
+        
+        for store_type in ["faiss", "annoy"]:
+            with self.subTest(store_type=store_type):
+                book_manager = FakeBookManager(5)
+                kb = self.open_knowledge_base(store_type)
+                for book_id in book_manager.books:
+                    kb.add_document(book_id, book_manager.get_book_content(book_id), book_manager.get_book(book_id))
+                expected_count = kb.vector_store.count()
+                
+                # Crash after the third book; only the first two are checkpointed
+                def crash_after_third(done, total, message):
+                    if done == 3:
+                        raise Interrupted()
+                
+                first = IndexRebuild(kb, book_manager, max_workers=2, checkpoint_books=2)
+                with self.assertRaises(Interrupted):
+                    first.run(crash_after_third)
+                self.assertTrue(first.pending)
+                completed = rebuild._read_state(first.data_path)["completed"]
+                self.assertEqual(len(completed), 2)
+                
+                # Books finish in any order; one was indexed into staging after the checkpoint
+                staging = kb._create_store(first.staging_base_path, first.staging_data_path)
+                uncheckpointed = [book_id for book_id in staging.list_document_ids() if book_id not in completed]
+                staging.close()
+                self.assertEqual(len(uncheckpointed), 1)
+                
+                # The live index kept serving while the rebuild was staged
+                self.assertEqual(kb.vector_store.count(), expected_count)
+                
+                with patch.object(rebuild, "_swap_directories", wraps=rebuild._swap_directories) as swap:
+                    self.assertTrue(IndexRebuild(kb, book_manager, max_workers=2, checkpoint_books=2).run())
+                    self.assertEqual(swap.call_count, 1)
+                
+                store = kb.vector_store
+                self.assertFalse(first.pending)
+                self.assertEqual(sorted(store.list_document_ids()), [1, 2, 3, 4, 5])
+                self.assertEqual(store.count(), expected_count)
+                self.assertEqual(len(store.sparse_index), expected_count)
+                
+                # The uncheckpointed book was discarded and indexed again, exactly once
+                chunk_ids = store.get(where={"document_id": uncheckpointed[0]})["ids"]
+                self.assertEqual(len(chunk_ids), len(set(chunk_ids)))
+                self.assertEqual(len(chunk_ids), store.manifest.get(uncheckpointed[0])["chunk_count"])
+                
+                self.assertFalse(os.path.exists(first.staging_base_path))
+                self.assertFalse(os.path.exists(first.staging_data_path))
+                store.close()
+
+if __name__ == "__main__":
+    unittest.main()
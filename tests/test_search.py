@@ -0,0 +1,168 @@
+"""
+Tests for keyword and hybrid search.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_test_utils import STORE_TYPES, make_store, book_text, embedding_function
+
+from knowledge_base.config import DEFAULT_HYBRID_CANDIDATES, DEFAULT_RRF_K, DEFAULT_SEARCH_MODE
+from knowledge_base.search import reciprocal_rank_fusion, search_knowledge_base
+
+class SparseIndexSyncTests(unittest.TestCase):
+    """The BM25 index follows every change to the store."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def keyword_ids(self, store, query, where=None):
+        # Query the index directly: search_sparse would repair a stale index
+        return sorted(hit["id"] for hit in store.sparse_index.search(query, limit=50, where=where))
+    
+    def test_index_follows_store_changes(self):
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                store = make_store(store_type, os.path.join(self.root, store_type))
+                store.add_document("b1", book_text(6, seed=1))
+                store.add_texts(
+                    ["The zyzzyva is a weevil found in tropical America.", "A quokka smiles at the camera all day."],
+                    [{"document_id": "b2", "shelf": "insects"}, {"document_id": "b2", "shelf": "mammals"}],
+                    ["b2_0", "b2_1"]
+                )
+                self.assertEqual(len(store.sparse_index), store.count())
+                self.assertEqual(self.keyword_ids(store, "zyzzyva"), ["b2_0"])
+                self.assertEqual(self.keyword_ids(store, "quokka", where={"shelf": "mammals"}), ["b2_1"])
+                
+                # Metadata changes are visible to filtered keyword search
+                store.update_metadata(["b2_1"], [{"document_id": "b2", "shelf": "marsupials"}])
+                self.assertEqual(self.keyword_ids(store, "quokka", where={"shelf": "mammals"}), [])
+                self.assertEqual(self.keyword_ids(store, "quokka", where={"shelf": "marsupials"}), ["b2_1"])
+                
+                store.delete(ids=["b2_0"])
+                self.assertEqual(self.keyword_ids(store, "zyzzyva"), [])
+                self.assertEqual(len(store.sparse_index), store.count())
+                
+                store.delete_document("b1")
+                self.assertEqual(self.keyword_ids(store, "alpha beta"), [])
+                self.assertEqual(len(store.sparse_index), store.count())
+                
+                store.reset()
+                self.assertEqual(len(store.sparse_index), 0)
+                self.assertEqual(self.keyword_ids(store, "quokka"), [])
+                store.close()
+    
+    def test_hostile_queries_are_quoted(self):
+        store = make_store("simple", self.root)
+        store.add_texts(["Pages of NEAR and OR operators: col:umn \"quoted\" (group) *star*"], [{}], ["c1"])
+        
+        for query in ['NEAR(', '"', 'col:umn', 'a OR', '*', '(group', 'AND NOT']:
+            with self.subTest(query=query):
+                store.sparse_index.search(query, limit=5)
+        self.assertEqual(self.keyword_ids(store, "(group"), ["c1"])
+        store.close()
+
+class ReciprocalRankFusionTests(unittest.TestCase):
+    """Results are scored by summed reciprocal ranks."""
+    
+    def test_scores_and_order(self):
+        k = DEFAULT_RRF_K
+        rankings = {
+            "vector": [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}],
+            "keyword": [{"id": "b", "score": 12.0}, {"id": "b", "score": 11.0}, {"id": "d", "score": 3.0}]
+        }
+        
+        results = reciprocal_rank_fusion(rankings, limit=10, k=k)
+        
+        # A repeated hit counts at its best rank only
+        best = 2 / (k + 1)
+        expected = {
+            "b": (1 / (k + 2) + 1 / (k + 1)) / best,
+            "a": (1 / (k + 1)) / best,
+            "c": (1 / (k + 3)) / best,
+            "d": (1 / (k + 3)) / best
+        }
+        self.assertEqual([result["id"] for result in results[:2]], ["b", "a"])
+        self.assertEqual({result["id"] for result in results[2:]}, {"c", "d"})
+        for result in results:
+            self.assertAlmostEqual(result["score"], expected[result["id"]])
+        
+        fused_b = results[0]
+        self.assertEqual((fused_b["vector_rank"], fused_b["keyword_rank"]), (2, 1))
+        self.assertEqual((fused_b["vector_score"], fused_b["keyword_score"]), (0.8, 12.0))
+        self.assertNotIn("keyword_rank", results[1])
+    
+    def test_first_everywhere_scores_one(self):
+        rankings = {"vector": [{"id": "a"}, {"id": "b"}], "keyword": [{"id": "a"}]}
+        
+        results = reciprocal_rank_fusion(rankings, limit=1)
+        
+        self.assertEqual(len(results), 1)
+        self.assertAlmostEqual(results[0]["score"], 1.0)
+        self.assertEqual(reciprocal_rank_fusion({}), [])
+
+class HybridSearchTests(unittest.TestCase):
+    """search_knowledge_base fuses vector and keyword hits by default."""
+    
+    def setUp(self):
+        from knowledge_base.vector_store import VectorStore
+        
+        self.root = tempfile.mkdtemp()
+        self.kb = VectorStore(
+            base_path=os.path.join(self.root, "vectors"),
+            data_path=os.path.join(self.root, "data"),
+            embedding_function=embedding_function(),
+            vector_store_type="simple",
+            use_gpu=False
+        )
+        self.kb.add_document("b1", book_text(6, seed=1))
+        self.kb.vector_store.add_texts(
+            ["Catalogue number 978-0-13-468599-1 appears on the back cover."],
+            [{"document_id": "b2"}],
+            ["b2_0"]
+        )
+    
+    def tearDown(self):
+        self.kb.vector_store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def test_hybrid_is_the_default(self):
+        self.assertEqual(DEFAULT_SEARCH_MODE, "hybrid")
+        timings = {}
+        
+        query = "catalogue 978-0-13-468599-1 alpha"
+        
+        results = search_knowledge_base(query, self.kb, limit=3, threshold=-1.0, timings=timings)
+        
+        # Both rankings fetch DEFAULT_HYBRID_CANDIDATES times the limit before fusion
+        fetch = 3 * DEFAULT_HYBRID_CANDIDATES
+        expected = reciprocal_rank_fusion(
+            {"vector": self.kb.search(query, limit=fetch), "keyword": self.kb.search_sparse(query, limit=fetch)},
+            limit=3
+        )
+        self.assertEqual([result["id"] for result in results], [result["id"] for result in expected])
+        self.assertEqual([result["score"] for result in results], [result["score"] for result in expected])
+        self.assertTrue(any("keyword_rank" in result and "vector_rank" in result for result in results))
+        keyword_hit = self.kb.search_sparse("978-0-13-468599-1", limit=1)[0]
+        self.assertEqual(keyword_hit["id"], "b2_0")
+        self.assertEqual(set(timings), {"vector_ms", "keyword_ms", "fusion_ms", "total_ms"})
+    
+    def test_modes_and_filters(self):
+        keyword = search_knowledge_base("catalogue cover", self.kb, mode="keyword")
+        self.assertEqual([result["id"] for result in keyword], ["b2_0"])
+        
+        vector = search_knowledge_base("alpha beta", self.kb, limit=3, threshold=-1.0, mode="vector")
+        self.assertEqual(len(vector), 3)
+        self.assertNotIn("keyword_rank", vector[0])
+        
+        filtered = search_knowledge_base("alpha cover", self.kb, threshold=-1.0, filters={"document_id": "b1"})
+        self.assertTrue(filtered)
+        self.assertTrue(all(result["metadata"]["document_id"] == "b1" for result in filtered))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Tests for the LRU caches and the vector store's search result cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kb_test_utils import STORE_TYPES, make_store, book_text
+
+from knowledge_base.cache import LRUCache, search_cache_key
+
+class LRUCacheTests(unittest.TestCase):
+    """Entries are evicted least recently used first and lookups are counted."""
+    
+    def test_eviction_and_counters(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", None)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        
+        # "b" was least recently used; a cached None is a hit, not a miss
+        self.assertEqual(cache.get("b", "missing"), "missing")
+        self.assertEqual(cache.get("c"), 3)
+        cache.put("b", None)
+        self.assertIsNone(cache.get("b", "missing"))
+        
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"]), (2, 3, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 0.75)
+        
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["hits"], 3)
+    
+    def test_zero_size_disables_caching(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["hit_rate"], 0.0)
+    
+    def test_search_keys(self):
+        self.assertEqual(
+            search_cache_key("vector", " alpha   beta ", 5, {"b": 1, "a": 2}, 3),
+            search_cache_key("vector", "alpha beta", 5, {"a": 2, "b": 1}, 3)
+        )
+        self.assertNotEqual(
+            search_cache_key("vector", "alpha", 5, None, 3),
+            search_cache_key("keyword", "alpha", 5, None, 3)
+        )
+        self.assertNotEqual(
+            search_cache_key("vector", "alpha", 5, None, 3),
+            search_cache_key("vector", "alpha", 5, None, 4)
+        )
+
+class SearchCacheTests(unittest.TestCase):
+    """Cached results never outlive a change to the store."""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def open_store(self, store_type):
+        store = make_store(store_type, os.path.join(self.root, store_type))
+        store.add_document("b1", book_text(6, seed=1))
+        return store
+    
+    def test_changes_invalidate_cached_results(self):
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                store = self.open_store(store_type)
+                chunk_id = store.get(limit=1)["ids"][0]
+                changes = [
+                    ("add_texts", lambda: store.add_texts(["A further chunk about alpha and beta."], [{}], ["extra"])),
+                    ("update_metadata", lambda: store.update_metadata([chunk_id], [{"document_id": "b1", "tag": 1}])),
+                    ("delete", lambda: store.delete(ids=["extra"])),
+                    ("reset", store.reset)
+                ]
+                
+                with patch.object(store, "search", wraps=store.search) as search:
+                    store.cached_search("alpha beta", 3)
+                    store.cached_search("alpha  beta", 3)
+                    self.assertEqual(search.call_count, 1)
+                    
+                    for name, change in changes:
+                        generation = store.generation
+                        change()
+                        self.assertGreater(store.generation, generation, name)
+                        calls = search.call_count
+                        store.cached_search("alpha beta", 3)
+                        self.assertEqual(search.call_count, calls + 1, name)
+                store.close()
+    
+    def test_results_of_a_concurrent_write_are_not_cached(self):
+        store = self.open_store("simple")
+        search = store.search
+        
+        def search_during_write(*args, **kwargs):
+            # Another writer changes the store after the results were computed
+            results = search(*args, **kwargs)
+            store.add_texts([f"Chunk {len(store.get()['ids'])} written during the search."], [{}])
+            return results
+        
+        with patch.object(store, "search", side_effect=search_during_write) as patched:
+            store.cached_search("alpha", 3)
+            store.cached_search("alpha", 3)
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual(len(store.search_cache), 0)
+        
+        # Once the store is quiet, results are cached again
+        with patch.object(store, "search", wraps=store.search) as patched:
+            store.cached_search("alpha", 3)
+            store.cached_search("alpha", 3)
+        self.assertEqual(patched.call_count, 1)
+        store.close()
+    
+    def test_cached_results_are_copies(self):
+        store = self.open_store("simple")
+        results = store.cached_search("alpha", 3)
+        results[0]["text"] = "changed"
+        
+        self.assertNotEqual(store.cached_search("alpha", 3)[0]["text"], "changed")
+        store.close()
+    
+    def test_stats_report_hit_rate(self):
+        store = self.open_store("simple")
+        store.cached_search("alpha", 3)
+        store.cached_search("alpha", 3)
+        store.cached_search("alpha", 3, sparse=True)
+        store.cached_search("alpha", 3, sparse=True)
+        
+        stats = store.get_stats()["search_cache"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (2, 2, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(store.get_stats()["generation"], store.generation)
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()
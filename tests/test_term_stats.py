@@ -0,0 +1,96 @@
+"""
+Tests for the per-book and library-wide term statistics.
+"""
+
+import math
+import unittest
+
+from db_test_utils import BookDatabaseTestCase
+
+from database.term_stats import index_book_terms, get_term_frequencies, get_tfidf_terms
+
+class CorpusTermsTests(BookDatabaseTestCase):
+    """Triggers keep corpus_terms equal to the sum of the book_terms rows."""
+    
+    def corpus(self):
+        return {
+            term: (total_count, doc_count)
+            for term, total_count, doc_count in self.conn.execute("SELECT term, total_count, doc_count FROM corpus_terms")
+        }
+    
+    def assert_corpus_matches_books(self):
+        expected = {
+            term: (total_count, doc_count)
+            for term, total_count, doc_count in self.conn.execute(
+                "SELECT term, SUM(count), COUNT(*) FROM book_terms GROUP BY term"
+            )
+        }
+        self.assertEqual(self.corpus(), expected)
+    
+    def test_aggregates_follow_books(self):
+        first = self.add_book("First", "Apple, banana; APPLE!")
+        second = self.add_book("Second", "banana cherry")
+        self.assertEqual(self.corpus(), {"apple": (2, 1), "banana": (2, 2), "cherry": (1, 1)})
+        self.assert_corpus_matches_books()
+        
+        # Re-indexing a book swaps its counts without touching the other book's
+        self.conn.execute("UPDATE book_contents SET content = ? WHERE book_id = ?", ("cherry cherry date", first))
+        index_book_terms(self.conn, first, "cherry cherry date")
+        self.conn.commit()
+        self.assertEqual(self.corpus(), {"banana": (1, 1), "cherry": (3, 2), "date": (1, 1)})
+        self.assert_corpus_matches_books()
+        self.assertEqual(
+            self.conn.execute("SELECT total_terms, unique_terms FROM book_term_totals WHERE book_id = ?", (first,)).fetchone(),
+            (3, 2)
+        )
+        
+        # Deleting the book cascades to book_terms, and the delete trigger drops unused terms
+        self.book_manager.delete_book(second)
+        self.assertEqual(self.corpus(), {"cherry": (2, 1), "date": (1, 1)})
+        self.assert_corpus_matches_books()
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM book_term_totals").fetchone()[0], 1)
+        
+        index_book_terms(self.conn, first, None)
+        self.assertEqual(self.corpus(), {})
+
+class TermQueryTests(BookDatabaseTestCase):
+    """Frequencies and TF-IDF scores are read from the stored counts."""
+    
+    def setUp(self):
+        super().setUp()
+        self.first = self.add_book("First", "The apple and the banana, then the apple again.")
+        self.second = self.add_book("Second", "The banana and a cherry.")
+    
+    def test_term_frequencies(self):
+        library = dict(get_term_frequencies(self.conn))
+        self.assertEqual(library, {"apple": 2, "banana": 2, "then": 1, "again": 1, "cherry": 1})
+        
+        self.assertEqual(dict(get_term_frequencies(self.conn, [self.second])), {"banana": 1, "cherry": 1})
+        self.assertEqual(
+            dict(get_term_frequencies(self.conn, [self.first, self.second], custom_stopwords=["Banana"])),
+            {"apple": 2, "then": 1, "again": 1, "cherry": 1}
+        )
+        self.assertEqual(get_term_frequencies(self.conn, [self.first], limit=1), [("apple", 2)])
+        self.assertEqual(dict(get_term_frequencies(self.conn, [self.second], exclude_stopwords=False))["the"], 1)
+        self.assertEqual(dict(get_term_frequencies(self.conn, [self.first], min_length=6)), {"banana": 1})
+        self.assertEqual(get_term_frequencies(self.conn, []), [])
+    
+    def test_tfidf_scores(self):
+        # First book: 9 tokens; "apple" appears twice and only in this book, "banana" in both
+        idf = lambda doc_count: math.log((1 + 2) / (1 + doc_count)) + 1
+        scores = dict(get_tfidf_terms(self.conn, [self.first]))
+        self.assertAlmostEqual(scores["apple"], 2 / 9 * idf(1))
+        self.assertAlmostEqual(scores["banana"], 1 / 9 * idf(2))
+        self.assertNotIn("the", scores)
+        self.assertEqual(get_tfidf_terms(self.conn, [self.first], limit=1)[0][0], "apple")
+        
+        # Several books share one TF denominator: 14 tokens in total
+        both = get_tfidf_terms(self.conn, [self.first, self.second])
+        self.assertEqual([term for term, _ in both[:2]], ["apple", "banana"])
+        self.assertAlmostEqual(dict(both)["cherry"], 1 / 14 * idf(1))
+        
+        self.assertEqual(get_tfidf_terms(self.conn, []), [])
+        self.assertEqual(get_tfidf_terms(self.conn, [999]), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests for counting many patterns in one scan.
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# Add parent directory to path to import application modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text_processing import MultiPatternMatcher, count_patterns
+
+class CountPatternsTests(unittest.TestCase):
+    """Counts agree with str.count on the lowercased text."""
+    
+    WORDS = ["good", "great", "bad", "ana", "banana", "bb", "b", "an", "nan", "the", "then", "he", "happy", "ha"]
+    
+    def assert_matches_str_count(self, texts, patterns):
+        expected = [[text.lower().count(pattern.lower()) for pattern in patterns] for text in texts]
+        self.assertEqual(count_patterns(texts, patterns).tolist(), expected)
+    
+    def test_overlapping_occurrences_count_once(self):
+        self.assertEqual(count_patterns(["bbb", "banana"], ["bb", "ana"]).tolist(), [[1, 0], [0, 1]])
+        self.assertEqual(count_patterns(["aaaaa"], ["aa", "aaa", "a"]).tolist(), [[2, 1, 5]])
+    
+    def test_word_list_matches_str_count(self):
+        texts = [
+            "Then the happy banana had a great, good day. Ha ha HA!",
+            "bbb bb b banana bananas nanana",
+            "",
+            "Bad, bad, BAD. Nothing good came of the theme.",
+        ]
+        self.assert_matches_str_count(texts, self.WORDS)
+    
+    def test_random_texts_match_str_count(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            texts = ["".join(rng.choice("ab n") for _ in range(rng.randint(0, 40))) for _ in range(4)]
+            patterns = ["".join(rng.choice("abn") for _ in range(rng.randint(1, 4))) for _ in range(6)]
+            self.assert_matches_str_count(texts, patterns)
+    
+    def test_duplicate_and_empty_patterns(self):
+        matcher = MultiPatternMatcher(["Ana", "ana", ""])
+        self.assertEqual(matcher.count(["Banana"]).tolist(), [[1, 1, 0]])
+        self.assertEqual(matcher.total(["Banana", "x"]).tolist(), [2, 0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Tests for searching a vector store while another thread indexes into it.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from kb_test_utils import STORE_TYPES, make_store, book_text
+
+class VectorStoreConcurrencyTests(unittest.TestCase):
+    """Reads never see a store halfway through a change."""
+    
+    DURATION = 2.0
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+    
+    def test_filtered_reads_during_reindexing(self):
+        for store_type in STORE_TYPES:
+            with self.subTest(store_type=store_type):
+                store = make_store(store_type, os.path.join(self.root, store_type))
+                texts = {"b1": book_text(6, seed=1), "b2": book_text(6, seed=2)}
+                for document_id, text in texts.items():
+                    store.add_document(document_id, text)
+                
+                errors = []
+                wrong_document = []
+                stop = threading.Event()
+                
+                def reindex():
+                    turn = 0
+                    while not stop.is_set():
+                        document_id = "b1" if turn % 2 else "b2"
+                        store.delete_document(document_id)
+                        store.add_document(document_id, texts[document_id])
+                        turn += 1
+                
+                def read():
+                    where = {"document_id": "b1"}
+                    while not stop.is_set():
+                        results = store.search("alpha beta gamma", 5, where=where)
+                        results += [hit for hits in store.search_batch(["delta", "kappa"], 3, where=where) for hit in hits]
+                        rows = store.get(where=where)
+                        wrong_document.extend(hit for hit in results if hit["metadata"]["document_id"] != "b1")
+                        wrong_document.extend(
+                            metadata for metadata in rows["metadatas"] if metadata["document_id"] != "b1"
+                        )
+                
+                def guarded(target):
+                    def run():
+                        try:
+                            target()
+                        except Exception as e:
+                            errors.append(e)
+                            stop.set()
+                    return threading.Thread(target=run)
+                
+                threads = [guarded(reindex), guarded(read), guarded(read)]
+                for thread in threads:
+                    thread.start()
+                time.sleep(self.DURATION)
+                stop.set()
+                for thread in threads:
+                    thread.join()
+                
+                self.assertEqual(errors, [])
+                self.assertEqual(wrong_document, [])
+                store.close()
+    
+    def test_maintenance_methods_take_the_write_lock(self):
+        from knowledge_base.vector_stores.annoy_store import AnnoyVectorStore
+        from knowledge_base.vector_stores.faiss_store import FAISSVectorStore
+        
+        methods = [AnnoyVectorStore.compact, FAISSVectorStore.migrate_index, FAISSVectorStore.set_search_params]
+        for method in methods:
+            with self.subTest(method=method.__qualname__):
+                self.assertEqual(getattr(method, "_store_lock", None), "write")
+        
+        # Compaction waits for a reader in another thread
+        store = make_store("annoy", os.path.join(self.root, "annoy"))
+        store.add_document("b1", book_text(6, seed=1))
+        events = []
+        reading = threading.Event()
+        
+        def reader():
+            with store._rw_lock.read():
+                reading.set()
+                time.sleep(0.2)
+                events.append("read done")
+        
+        thread = threading.Thread(target=reader)
+        thread.start()
+        reading.wait()
+        store.compact()
+        events.append("compacted")
+        thread.join()
+        
+        self.assertEqual(events, ["read done", "compacted"])
+        store.close()
+    
+    def test_write_lock_excludes_readers(self):
+        from knowledge_base.vector_stores.rw_lock import ReadWriteLock
+        
+        lock = ReadWriteLock()
+        events = []
+        
+        def reader():
+            with lock.read():
+                events.append("read")
+        
+        with lock.write():
+            # The writer may read; other threads wait until it is done
+            with lock.read():
+                pass
+            thread = threading.Thread(target=reader)
+            thread.start()
+            time.sleep(0.1)
+            events.append("write done")
+        thread.join()
+        
+        self.assertEqual(events, ["write done", "read"])
+        
+        with lock.read():
+            with self.assertRaises(RuntimeError):
+                with lock.write():
+                    pass
+
+if __name__ == "__main__":
+    unittest.main()
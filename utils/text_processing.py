@@ -6,14 +6,30 @@ Provides functions for working with text content.
 import re
 import string
 import unicodedata
-from typing import Dict, List, Set, Tuple, Union, Optional, Any
+from typing import Dict, List, Set, Tuple, Union, Optional, Any, Iterable, Iterator
 from collections import Counter
 
+import numpy as np
+
 from utils.logger import get_logger
 
 # Get a logger for this module
 logger = get_logger(__name__)
 
+# Basic English stopwords used when no other set is given
+BASIC_STOPWORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'if', 'because', 'as', 'what',
+    'while', 'of', 'to', 'in', 'for', 'on', 'by', 'about', 'like', 'with',
+    'from', 'at', 'this', 'that', 'these', 'those', 'is', 'are', 'was',
+    'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does',
+    'did', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him',
+    'her', 'us', 'them', 'my', 'your', 'his', 'its', 'our', 'their',
+})
+
+# A token is a run of characters that are neither whitespace nor ASCII punctuation
+# (the same tokens tokenize() produces, but matched in place so offsets are kept)
+TOKEN_PATTERN = re.compile(f"[^\\s{re.escape(string.punctuation)}]+")
+
 def cleanup_text(text: str) -> str:
     """
     Alias for clean_text function for backward compatibility.
@@ -165,14 +181,7 @@ def remove_stopwords(tokens: List[str], stopwords: Optional[Set[str]] = None) ->
     
     # Basic English stopwords if none provided
     if stopwords is None:
-        stopwords = {
-            'a', 'an', 'the', 'and', 'or', 'but', 'if', 'because', 'as', 'what',
-            'while', 'of', 'to', 'in', 'for', 'on', 'by', 'about', 'like', 'with',
-            'from', 'at', 'this', 'that', 'these', 'those', 'is', 'are', 'was',
-            'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does',
-            'did', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him',
-            'her', 'us', 'them', 'my', 'your', 'his', 'its', 'our', 'their',
-        }
+        stopwords = BASIC_STOPWORDS
     
     # Filter out stopwords
     filtered_tokens = [token for token in tokens if token not in stopwords]
@@ -359,6 +368,107 @@ def find_matching_text(query: str,
     
     return matches
 
+def tokenize_with_offsets(text: str) -> Iterator[Tuple[str, int, int]]:
+    """
+    Split text into lowercase tokens, keeping their character offsets.
+    
+    Produces the same tokens as tokenize(), so counts and positions agree.
+    
+    Args:
+        text: Input text
+    
+    Yields:
+        Tuples of (token, start, end), where text[start:end] is the original token
+    """
+    if not text:
+        return
+    
+    for match in TOKEN_PATTERN.finditer(text):
+        yield match.group().lower(), match.start(), match.end()
+
+def parse_search_terms(query: str) -> List[Tuple[str, bool]]:
+    """
+    Split a search query into terms, noting which ones are prefixes.
+    
+    A term followed by ``*`` (e.g. ``learn*``) matches every token that starts with it.
+    
+    Args:
+        query: Search query
+    
+    Returns:
+        List of (term, is_prefix) tuples in query order
+    """
+    return [
+        (match.group().lower(), query.startswith("*", match.end()))
+        for match in TOKEN_PATTERN.finditer(query or "")
+    ]
+
+def highlight_spans(text: str,
+                    spans: Iterable[Tuple[int, int]],
+                    highlight_start: str = "**",
+                    highlight_end: str = "**",
+                    offset: int = 0) -> str:
+    """
+    Wrap character spans of a text in highlight markers.
+    
+    Overlapping or adjacent spans are merged; spans outside the text are clipped.
+    
+    Args:
+        text: Text to highlight
+        spans: (start, end) character spans, relative to ``offset``
+        highlight_start: Marker inserted before each span
+        highlight_end: Marker inserted after each span
+        offset: Position of text[0] in the coordinates of ``spans`` (e.g. where
+            a context window starts in the full document)
+    
+    Returns:
+        Highlighted text
+    """
+    merged: List[List[int]] = []
+    for start, end in sorted((max(0, start - offset), min(len(text), end - offset)) for start, end in spans):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    
+    parts = []
+    position = 0
+    for start, end in merged:
+        parts.append(text[position:start])
+        parts.append(f"{highlight_start}{text[start:end]}{highlight_end}")
+        position = end
+    parts.append(text[position:])
+    
+    return "".join(parts)
+
+def highlight_terms(text: str,
+                    terms: Iterable[str],
+                    highlight_start: str = "**",
+                    highlight_end: str = "**") -> str:
+    """
+    Highlight every occurrence of several terms in one pass.
+    
+    Matching is case-insensitive and the original casing is kept. Where terms
+    overlap, the longest one starting at a position is highlighted.
+    
+    Args:
+        text: Text to highlight
+        terms: Terms to highlight
+        highlight_start: Marker inserted before each occurrence
+        highlight_end: Marker inserted after each occurrence
+    
+    Returns:
+        Highlighted text
+    """
+    terms = sorted({term for term in terms if term}, key=len, reverse=True)
+    if not text or not terms:
+        return text
+    
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    return pattern.sub(lambda match: f"{highlight_start}{match.group()}{highlight_end}", text)
+
 def calculate_text_similarity(text1: str, text2: str) -> float:
     """
     Calculate a simple similarity score between two texts.
@@ -430,4 +540,176 @@ def detect_language(text: str) -> str:
     
     # Return the language with the highest score, or 'unknown' if all scores are 0
     max_lang = max(scores.items(), key=lambda x: x[1])
-    return max_lang[0] if max_lang[1] > 0.2 else 'unknown'
\ No newline at end of file
+    return max_lang[0] if max_lang[1] > 0.2 else 'unknown'
+
+class MultiPatternMatcher:
+    """
+    Count occurrences of many literal patterns in a single scan.
+    
+    The patterns are compiled into one regular expression shaped like a trie
+    (shared prefixes are factored out), wrapped in a lookahead so the scan
+    tries every text position once and reports the longest pattern starting
+    there. Shorter patterns that are prefixes of it are credited from a
+    precomputed table. Overlapping occurrences of the same pattern are then
+    dropped, so each count equals ``str.count`` on the (lowercased) text:
+    'bb' occurs once in 'bbb' and 'ana' once in 'banana'.
+    """
+    
+    # Separator placed between blocks; cannot be part of a match
+    _BLOCK_SEPARATOR = "\x00"
+    
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = True):
+        """
+        Compile the matcher.
+        
+        Args:
+            patterns: Literal patterns to count (empty patterns never match)
+            ignore_case: Whether matching is case-insensitive
+        """
+        self.ignore_case = ignore_case
+        self.patterns = list(patterns)
+        
+        # Distinct non-empty keys; several input patterns may share one key
+        self._key_columns: Dict[str, List[int]] = {}
+        for column, pattern in enumerate(self.patterns):
+            key = pattern.lower() if ignore_case else pattern
+            key = key.replace(self._BLOCK_SEPARATOR, "")
+            if key:
+                self._key_columns.setdefault(key, []).append(column)
+        
+        # Build a character trie of the keys
+        trie: Dict[str, Any] = {}
+        for key in self._key_columns:
+            node = trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[""] = key
+        
+        # For each key, the IDs of every key that is a prefix of it (including
+        # itself), stored CSR-style: key i credits _credit_keys[_credit_offsets[i]:_credit_offsets[i + 1]]
+        self._key_ids = {key: key_id for key_id, key in enumerate(self._key_columns)}
+        credit_keys: List[int] = []
+        credit_offsets = [0]
+        for key in self._key_columns:
+            node = trie
+            for char in key:
+                node = node[char]
+                if "" in node:
+                    credit_keys.append(self._key_ids[node[""]])
+            credit_offsets.append(len(credit_keys))
+        self._credit_keys = np.asarray(credit_keys, dtype=np.int64)
+        self._credit_offsets = np.asarray(credit_offsets, dtype=np.int64)
+        self._key_lengths = np.fromiter((len(key) for key in self._key_columns), dtype=np.int64,
+                                        count=len(self._key_columns))
+        
+        # Key ID of each pattern column; empty patterns point past the last key (always zero)
+        self._column_keys = np.full(len(self.patterns), len(self._key_columns), dtype=np.int64)
+        for key, columns in self._key_columns.items():
+            self._column_keys[columns] = self._key_ids[key]
+        
+        self._regex = re.compile(f"(?=({self._trie_pattern(trie)}))") if trie else None
+    
+    @classmethod
+    def _trie_pattern(cls, node: Dict[str, Any]) -> str:
+        """Turn a trie node into a regex that matches the longest key below it."""
+        branches = [re.escape(char) + cls._trie_pattern(child) for char, child in node.items() if char != ""]
+        if not branches:
+            return ""
+        
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        
+        # A key ends here: the longer continuations are optional (greedy, so longest wins)
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+    
+    def count(self, texts: List[str]) -> np.ndarray:
+        """
+        Count every pattern in every text.
+        
+        The texts are joined and scanned once; match positions are mapped
+        back to their text with a binary search over the block boundaries.
+        
+        Args:
+            texts: Texts to scan (e.g. the paragraphs of a document)
+        
+        Returns:
+            Integer array of shape (len(texts), len(patterns))
+        """
+        counts = np.zeros((len(texts), len(self.patterns)), dtype=np.int64)
+        if self._regex is None or not texts:
+            return counts
+        
+        joined = self._BLOCK_SEPARATOR.join(texts)
+        if self.ignore_case:
+            joined = joined.lower()
+        
+        # Start offset of each text in the joined string
+        lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        
+        key_ids = self._key_ids
+        matches = [(match.start(), key_ids[match.group(1)]) for match in self._regex.finditer(joined)]
+        if not matches:
+            return counts
+        
+        positions, match_keys = np.asarray(matches, dtype=np.int64).T
+        blocks = np.searchsorted(starts, positions, side="right") - 1
+        
+        # Expand each match into one credit per key that is a prefix of its key
+        first = self._credit_offsets[match_keys]
+        widths = self._credit_offsets[match_keys + 1] - first
+        credit_rows = np.repeat(blocks, widths)
+        credit_positions = np.repeat(positions, widths)
+        credit_index = np.arange(len(credit_rows)) + np.repeat(first - (np.cumsum(widths) - widths), widths)
+        credit_keys = self._credit_keys[credit_index]
+        
+        # Drop occurrences overlapping the previous counted one of the same key.
+        # Blocks are separated, so occurrences in different texts never overlap.
+        order = np.lexsort((credit_positions, credit_keys))
+        credit_rows, credit_positions, credit_keys = credit_rows[order], credit_positions[order], credit_keys[order]
+        overlaps = np.flatnonzero(
+            (credit_keys[1:] == credit_keys[:-1])
+            & (np.diff(credit_positions) < self._key_lengths[credit_keys[1:]])
+        ) + 1
+        if len(overlaps):
+            keep = np.ones(len(credit_keys), dtype=bool)
+            for i in overlaps:
+                # Runs of overlapping occurrences start with a kept one, so this stops within the run
+                previous = i - 1
+                while not keep[previous]:
+                    previous -= 1
+                if credit_positions[i] - credit_positions[previous] < self._key_lengths[credit_keys[i]]:
+                    keep[i] = False
+            credit_rows, credit_keys = credit_rows[keep], credit_keys[keep]
+        
+        n_keys = len(self._key_columns) + 1
+        key_counts = np.bincount(credit_rows * n_keys + credit_keys, minlength=len(texts) * n_keys)
+        return key_counts.reshape(len(texts), n_keys)[:, self._column_keys]
+    
+    def total(self, texts: List[str]) -> np.ndarray:
+        """
+        Count all patterns together in every text.
+        
+        Args:
+            texts: Texts to scan
+        
+        Returns:
+            Integer array of shape (len(texts),)
+        """
+        return self.count(texts).sum(axis=1)
+
+def count_patterns(texts: List[str], patterns: Iterable[str], ignore_case: bool = True) -> np.ndarray:
+    """
+    Count occurrences of many literal patterns in many texts with one scan.
+    Counts are non-overlapping, like ``str.count``.
+    
+    Args:
+        texts: Texts to scan (e.g. the paragraphs of a document)
+        patterns: Literal patterns to count
+        ignore_case: Whether matching is case-insensitive
+    
+    Returns:
+        Integer array of shape (len(texts), len(patterns))
+    """
+    return MultiPatternMatcher(patterns, ignore_case=ignore_case).count(texts)
\ No newline at end of file